@@ -1,23 +1,54 @@
 import os
 import time
-import asyncio
 import unicodedata
+import codecs
+import shutil
+import tempfile
 import concurrent.futures
+import functools
+import queue
+import threading
 from typing import Any, Dict, Optional
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, Response
-from werkzeug.utils import secure_filename
+from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, Response, g
 import json
+import logging
 import uuid
-from config import config
-from services.sqlite_service import SQLiteService
+from config import Config, config
 from services.ai_manager_service import AIManagerService
-from services.export_service import ExportService
+from services.export_service import FORMATOS_EXPORTACAO_STREAMING, ExportService
+from services.exportacao_parquet_analises_colunar_service import ParquetIndisponivelError
+from services.importacao_lote_transacional_intimacoes_service import (
+    importar_registros_intimacoes_lote,
+    importar_registros_intimacoes_lote_em_blocos,
+    sincronizar_registros_intimacoes_lote,
+)
+from services.jobs_exportacao_assincrona_analises_download_retomavel_service import (
+    MIMETYPES_JOB_EXPORTACAO,
+    GerenciadorJobsExportacao,
+    JobExportacaoExpiradoError,
+    JobExportacaoNaoEncontradoError,
+)
 from services.cost_calculation_service import cost_service
+from services.barramento_progresso_sessao_analise_eventos_sse_service import (
+    TIPO_EVENTO_CANCELADO,
+    TIPO_EVENTO_CONCLUSAO,
+    TIPO_EVENTO_ERRO,
+    ProgressoSessaoAnalise,
+    gerar_eventos_sse_sessao,
+)
+from services.estimativa_previa_tokens_custo_execucao_analise_lote_service import (
+    EstimadorExecucaoAnaliseLote,
+    montar_prompt_analise_intimacao,
+)
 from services.triagem_feedback_transformacao_json_para_importacao_intimacoes_service import (
+    iter_feedback_stream_registros,
     normalize_feedback_export_layout,
     transform_feedback_json_text,
 )
+from services.leitura_incremental_itens_array_content_json_grande_service import (
+    ConteudoJsonIncrementalError,
+)
 from services.calcular_acerto_classificacao_analise_intimacao_service import (
     MODO_FOCADO,
     MODO_PADRAO,
@@ -36,29 +67,80 @@ from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_servic
     ALIASES_TRIAGEM_IA_PARA_CANONICO,
 )
 
-# Carregar variáveis de ambiente do arquivo .env
-from dotenv import load_dotenv
-load_dotenv()
-
-# Fallback: definir variável diretamente se não foi carregada do .env
-if not os.environ.get('OPENAI_API_KEY'):
-    try:
-        with open('.env', 'r', encoding='utf-8') as f:
-            content = f.read()
-            for line in content.split('\n'):
-                # Remover BOM se presente
-                line = line.replace('\ufeff', '')
-                if line.startswith('OPENAI_API_KEY='):
-                    os.environ['OPENAI_API_KEY'] = line.strip().split('=', 1)[1]
-                    break
-    except Exception as e:
-        pass
-
 # Inicializar serviços
-from services.sqlite_service import SQLiteService
-data_service = SQLiteService()  # Mudança para SQLite
+from services.sqlite_service import obter_sqlite_service
+from services.backup_online_banco_sqlite_compactado_retencao_service import (
+    ServicoBackupBanco,
+    remover_arquivo_silencioso,
+)
+from services.troca_segura_arquivo_banco_sqlite_hot_swap_service import (
+    BancoInvalidoError,
+    TrocaBancoTimeoutError,
+    caminho_temporario_ao_lado,
+    restaurar_banco_com_troca_segura,
+)
+from services.manutencao_periodica_banco_sqlite_vacuum_analyze_checkpoint_service import ServicoManutencaoBanco
+from services.trava_arquivo_exclusiva_entre_processos_agendadores_service import TravaArquivoEntreProcessos
+from services.instrumentacao_metricas_latencia_consultas_lentas_prometheus_service import (
+    METRICA_BYTES_REQUISICAO,
+    METRICA_BYTES_RESPOSTA,
+    METRICA_ROTAS,
+    definir_limite_consulta_lenta,
+    registro_metricas,
+)
+data_service = obter_sqlite_service()  # Mesma instância usada pelos provedores de IA e pela exportação
 ai_manager_service = AIManagerService()
 export_service = ExportService()
+jobs_exportacao = GerenciadorJobsExportacao(
+    export_service,
+    retencao_max_bytes=export_service.config.EXPORT_JOBS_RETENCAO_MAX_MB * 1024 * 1024,
+    retencao_max_idade_horas=export_service.config.EXPORT_JOBS_RETENCAO_MAX_HORAS,
+)
+backup_service = ServicoBackupBanco(data_service.db_path, data_service.get_config)
+manutencao_service = ServicoManutencaoBanco(data_service)  # VACUUM incremental, ANALYZE e checkpoint do WAL
+trava_agendadores_banco = TravaArquivoEntreProcessos(
+    os.path.join(os.path.dirname(os.path.abspath(data_service.db_path)), '.agendadores.lock')
+)
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+
+def iniciar_agendadores_banco() -> bool:
+    """
+    Backup automático e manutenção do banco em segundo plano, num só processo por banco.
+
+    Chamado pelo `python app.py` ou, no gunicorn, com AGENDADORES_BANCO=true; importar o módulo
+    (testes, scripts) não inicia thread nenhuma. Entre workers, quem pega a trava de arquivo roda
+    os agendadores e os demais seguem só atendendo requisições.
+    """
+    if not trava_agendadores_banco.tentar_adquirir():
+        logger.info('Agendadores do banco já rodam em outro processo (%s)', trava_agendadores_banco.caminho)
+        return False
+    backup_service.iniciar_agendador()
+    manutencao_service.iniciar_agendador()
+    return True
+
+
+if Config.AGENDADORES_BANCO:
+    iniciar_agendadores_banco()
+
+
+def _aplicar_nivel_log(config_atual: Dict[str, Any], alteradas=None) -> None:
+    """Nível do log pelo config.json (log_level); a variável de ambiente LOG_LEVEL tem precedência."""
+    if alteradas is not None and 'log_level' not in alteradas:
+        return
+    nome = Config.LOG_LEVEL or str(config_atual.get('log_level') or 'INFO').upper()
+    logging.getLogger().setLevel(getattr(logging, nome, logging.INFO))
+
+
+_aplicar_nivel_log(data_service.get_config())
+data_service.armazenamento_config.registrar_observador(_aplicar_nivel_log)
+definir_limite_consulta_lenta(Config.SLOW_QUERY_MS)
+registro_metricas.registrar_coletor(
+    lambda: {f'sqlite_cache_consultas_{nome}': valor
+             for nome, valor in data_service.cache_consultas.estatisticas().items()}
+)
 
 # Sistema de controle de cancelamento de análises
 analises_em_andamento = {}  # {session_id: {'cancelado': bool, 'total': int, 'atual': int}}
@@ -69,9 +151,9 @@ def criar_session_id():
 
 def registrar_analise(session_id, total_intimacoes):
     """Registra uma nova análise em andamento"""
-    print(f"=== DEBUG: registrar_analise chamada ===")
-    print(f"=== DEBUG: session_id: {session_id} (tipo: {type(session_id)}) ===")
-    print(f"=== DEBUG: total_intimacoes: {total_intimacoes} (tipo: {type(total_intimacoes)}) ===")
+    logger.debug('registrar_analise chamada')
+    logger.debug('session_id: %s (tipo: %s)', session_id, type(session_id))
+    logger.debug('total_intimacoes: %s (tipo: %s)', total_intimacoes, type(total_intimacoes))
     
     analises_em_andamento[session_id] = {
         'cancelado': False,
@@ -79,13 +161,13 @@ def registrar_analise(session_id, total_intimacoes):
         'atual': 0,
         'inicio': time.time()
     }
-    print(f"=== DEBUG: Análise registrada - Session ID: {session_id}, Total: {total_intimacoes} ===")
+    logger.debug('Análise registrada - Session ID: %s, Total: %s', session_id, total_intimacoes)
 
 def cancelar_analise(session_id):
     """Marca uma análise para cancelamento"""
     if session_id in analises_em_andamento:
         analises_em_andamento[session_id]['cancelado'] = True
-        print(f"=== DEBUG: Análise cancelada - Session ID: {session_id} ===")
+        logger.debug('Análise cancelada - Session ID: %s', session_id)
         return True
     return False
 
@@ -105,7 +187,7 @@ def finalizar_analise(session_id):
     """Remove uma análise do controle"""
     if session_id in analises_em_andamento:
         del analises_em_andamento[session_id]
-        print(f"=== DEBUG: Análise finalizada - Session ID: {session_id} ===")
+        logger.debug('Análise finalizada - Session ID: %s', session_id)
 
 # Criar aplicação Flask
 app = Flask(__name__)
@@ -114,6 +196,40 @@ app.secret_key = 'sua_chave_secreta_aqui_mude_em_producao'
 # Configurar limite de upload para 300MB
 app.config['MAX_CONTENT_LENGTH'] = 300 * 1024 * 1024  # 300MB
 
+
+@app.before_request
+def _iniciar_cronometro_requisicao():
+    g.inicio_requisicao = time.perf_counter()
+
+
+@app.after_request
+def _anotar_resposta_requisicao(response):
+    g.status_resposta = response.status_code
+    g.bytes_resposta = response.content_length
+    return response
+
+
+@app.teardown_request
+def _registrar_metricas_requisicao(exc):
+    """
+    Latência por rota (o padrão da URL, não o caminho) e bytes de entrada/saída.
+
+    No teardown, e não no after_request, para contar também as requisições que terminam em exceção
+    não tratada (status 500).
+    """
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is None:
+        return
+    status = g.pop('status_resposta', 500) if exc is None else 500
+    bytes_resposta = g.pop('bytes_resposta', None) if exc is None else None
+    rota = request.url_rule.rule if request.url_rule is not None else 'sem_rota'
+    registro_metricas.observar(METRICA_ROTAS, time.perf_counter() - inicio,
+                               rota=rota, metodo=request.method, status=str(status))
+    if request.content_length:
+        registro_metricas.incrementar(METRICA_BYTES_REQUISICAO, request.content_length, rota=rota)
+    if bytes_resposta is not None:
+        registro_metricas.incrementar(METRICA_BYTES_RESPOSTA, bytes_resposta, rota=rota)
+
 # Configurações padrão
 DEFAULT_CONFIG = {
     'openai_api_key': '',
@@ -174,11 +290,17 @@ def obter_defensores_disponiveis() -> list:
     return list(Config.DEFENSORES)
 
 
-def _import_get_field(reg: dict, *names):
+def _import_mapa_campos(reg: dict) -> dict:
+    """Chaves do registro normalizadas (casefold/strip), para várias leituras com _import_get_field."""
+    return {str(k).casefold().strip(): v for k, v in reg.items()}
+
+
+def _import_get_field(reg: dict, *names, key_map: Optional[dict] = None):
     """Lê campo do JSON aceitando variações de nome (case-insensitive)."""
     if not isinstance(reg, dict):
         return None
-    key_map = {str(k).casefold().strip(): v for k, v in reg.items()}
+    if key_map is None:
+        key_map = _import_mapa_campos(reg)
     for name in names:
         nk = str(name).casefold().strip()
         if nk in key_map:
@@ -186,6 +308,7 @@ def _import_get_field(reg: dict, *names):
     return None
 
 
+@functools.lru_cache(maxsize=256)
 def _import_strip_accents(s: str) -> str:
     return ''.join(
         c for c in unicodedata.normalize('NFD', s)
@@ -270,7 +393,7 @@ def _import_parse_bool(val) -> bool:
     return s in ('1', 'true', 'sim', 'yes', 'on')
 
 
-def _import_extrair_intimacao_id_externo(reg: dict) -> Optional[str]:
+def _import_extrair_intimacao_id_externo(reg: dict, key_map: Optional[dict] = None) -> Optional[str]:
     """ID único do portal (ex.: intimacaoId no JSON)."""
     v = _import_get_field(
         reg,
@@ -278,6 +401,7 @@ def _import_extrair_intimacao_id_externo(reg: dict) -> Optional[str]:
         'intimacao_id',
         'id_intimacao',
         'intimacao id',
+        key_map=key_map,
     )
     if v is None:
         return None
@@ -285,11 +409,12 @@ def _import_extrair_intimacao_id_externo(reg: dict) -> Optional[str]:
     return s if s else None
 
 
-def _import_resolver_defensor_select(nome: Optional[str]) -> Optional[str]:
+def _import_resolver_defensor_select(nome: Optional[str], permitidos: Optional[list] = None) -> Optional[str]:
     if nome is None or not str(nome).strip():
         return None
     nome = str(nome).strip()
-    permitidos = obter_defensores_disponiveis()
+    if permitidos is None:
+        permitidos = obter_defensores_disponiveis()
     for n in permitidos:
         if n.casefold() == nome.casefold():
             return n
@@ -299,12 +424,23 @@ def _import_resolver_defensor_select(nome: Optional[str]) -> Optional[str]:
     )
 
 
-def _import_montar_intimacao(reg: dict) -> dict:
+def _import_montar_intimacao(reg: dict,
+                             defensores_permitidos: Optional[list] = None,
+                             verificar_duplicado: bool = True) -> dict:
+    """
+    Valida e normaliza um registro da importação em lote.
+
+    defensores_permitidos: lista já carregada (evita uma consulta por registro no lote);
+    verificar_duplicado=False deixa a checagem de intimacaoId para a importação em lote,
+    que a faz numa consulta só para todos os registros.
+    """
+    campos = _import_mapa_campos(reg)
     ctx = _import_get_field(
         reg,
         'contexto',
         'contexto da intimação',
         'contexto_da_intimacao',
+        key_map=campos,
     )
     if ctx is None or not str(ctx).strip():
         raise ValueError(
@@ -322,12 +458,13 @@ def _import_montar_intimacao(reg: dict) -> dict:
             reg,
             'classificacao_manual',
             'classificação manual',
+            key_map=campos,
         ),
         obrigatorio=True,
     )
 
-    intimacao_id_externo = _import_extrair_intimacao_id_externo(reg)
-    if intimacao_id_externo:
+    intimacao_id_externo = _import_extrair_intimacao_id_externo(reg, key_map=campos)
+    if intimacao_id_externo and verificar_duplicado:
         existente = data_service.get_id_por_intimacao_id_externo(intimacao_id_externo)
         if existente:
             raise ValueError(
@@ -340,6 +477,7 @@ def _import_montar_intimacao(reg: dict) -> dict:
         'informacoes_adicionais',
         'informações adicionais',
         'informacao_adicional',
+        key_map=campos,
     )
     informacoes = '' if info is None else str(info)
 
@@ -348,6 +486,7 @@ def _import_montar_intimacao(reg: dict) -> dict:
         'regras_usuario_prioridade_alta',
         'regras do usuário (prioridade alta)',
         'regras_do_usuario_prioridade_alta',
+        key_map=campos,
     )
     regras_usuario_prioridade_alta = (
         None
@@ -361,19 +500,21 @@ def _import_montar_intimacao(reg: dict) -> dict:
         'observação',
         'observacao',
         'observações',
+        key_map=campos,
     )
     observacoes = None if obs_u is None else (str(obs_u).strip() or None)
 
     defensor = _import_resolver_defensor_select(
-        _import_get_field(reg, 'defensor', 'nome do defensor', 'nome_do_defensor')
+        _import_get_field(reg, 'defensor', 'nome do defensor', 'nome_do_defensor', key_map=campos),
+        defensores_permitidos,
     )
 
     cor = _import_normalize_cor(
-        _import_get_field(reg, 'cor_etiqueta', 'cor da etiqueta', 'cor_da_etiqueta')
+        _import_get_field(reg, 'cor_etiqueta', 'cor da etiqueta', 'cor_da_etiqueta', key_map=campos)
     )
 
     smart_bool = _import_parse_bool(
-        _import_get_field(reg, 'smart_context', 'smart context')
+        _import_get_field(reg, 'smart_context', 'smart context', key_map=campos)
     )
 
     def _s(v):
@@ -382,14 +523,14 @@ def _import_montar_intimacao(reg: dict) -> dict:
         t = str(v).strip()
         return t if t else None
 
-    proc = _import_get_field(reg, 'processo')
-    org = _import_get_field(reg, 'orgao_julgador', 'órgão julgador', 'orgao julgador')
-    classe = _import_get_field(reg, 'classe')
-    disp = _import_get_field(reg, 'disponibilizacao', 'disponibilização')
-    intimado = _import_get_field(reg, 'intimado')
-    status = _import_get_field(reg, 'status')
-    prazo = _import_get_field(reg, 'prazo')
-    id_tarefa = _import_get_field(reg, 'id_tarefa', 'id da tarefa')
+    proc = _import_get_field(reg, 'processo', key_map=campos)
+    org = _import_get_field(reg, 'orgao_julgador', 'órgão julgador', 'orgao julgador', key_map=campos)
+    classe = _import_get_field(reg, 'classe', key_map=campos)
+    disp = _import_get_field(reg, 'disponibilizacao', 'disponibilização', key_map=campos)
+    intimado = _import_get_field(reg, 'intimado', key_map=campos)
+    status = _import_get_field(reg, 'status', key_map=campos)
+    prazo = _import_get_field(reg, 'prazo', key_map=campos)
+    id_tarefa = _import_get_field(reg, 'id_tarefa', 'id da tarefa', key_map=campos)
 
     out = {
         'contexto': ctx_str,
@@ -445,87 +586,6 @@ def resolve_analise_em_lote_paralelismo(config) -> tuple:
     return n, delay
 
 
-def gerar_dados_graficos(analises, performance_prompts):
-    """Gera dados para os gráficos baseados nas análises reais"""
-    try:
-        dados = {
-            'acuracia_periodo': {'labels': [], 'data': []},
-            'classificacoes_manuais': {'labels': [], 'data': []},
-            'resultados_ia': {'labels': [], 'data': []},
-            'performance_prompts': {'labels': [], 'acuracia': [], 'usos': []}
-        }
-        
-        if not analises:
-            print("=== DEBUG: Nenhuma análise encontrada ===")
-            return dados
-        
-        print(f"=== DEBUG: Gerando dados para {len(analises)} análises ===")
-        
-        # 1. Acurácia por período (últimos 6 meses)
-        hoje = datetime.now()
-        meses = []
-        acuracias_mes = {}
-        
-        for i in range(6):
-            data = hoje - timedelta(days=30*i)
-            mes_ano = data.strftime('%b/%Y')
-            meses.insert(0, mes_ano)
-            acuracias_mes[mes_ano] = {'total': 0, 'acertos': 0}
-        
-        for analise in analises:
-            if analise.get('data_analise'):
-                try:
-                    data_analise = datetime.fromisoformat(analise['data_analise'].replace('Z', '+00:00'))
-                    mes_ano = data_analise.strftime('%b/%Y')
-                    if mes_ano in acuracias_mes:
-                        acuracias_mes[mes_ano]['total'] += 1
-                        if analise.get('acertou'):
-                            acuracias_mes[mes_ano]['acertos'] += 1
-                except:
-                    pass
-        
-        dados['acuracia_periodo']['labels'] = meses
-        dados['acuracia_periodo']['data'] = [
-            round((acuracias_mes[mes]['acertos'] / acuracias_mes[mes]['total'] * 100) if acuracias_mes[mes]['total'] > 0 else 0, 1)
-            for mes in meses
-        ]
-        
-        # 2. Distribuição de classificações manuais
-        dist_manual = {}
-        for analise in analises:
-            class_manual = analise.get('classificacao_manual', 'Não classificado')
-            dist_manual[class_manual] = dist_manual.get(class_manual, 0) + 1
-        
-        dados['classificacoes_manuais']['labels'] = list(dist_manual.keys())
-        dados['classificacoes_manuais']['data'] = list(dist_manual.values())
-        
-        # 3. Distribuição de resultados da IA
-        dist_ia = {}
-        for analise in analises:
-            class_ia = analise.get('resultado_ia', 'Não classificado')
-            dist_ia[class_ia] = dist_ia.get(class_ia, 0) + 1
-        
-        dados['resultados_ia']['labels'] = list(dist_ia.keys())
-        dados['resultados_ia']['data'] = list(dist_ia.values())
-        
-        # 4. Performance por prompt
-        if performance_prompts:
-            dados['performance_prompts']['labels'] = list(performance_prompts.keys())
-            dados['performance_prompts']['acuracia'] = [p['acuracia'] for p in performance_prompts.values()]
-            dados['performance_prompts']['usos'] = [p['total'] for p in performance_prompts.values()]
-        
-        print(f"=== DEBUG: Dados gerados com sucesso ===")
-        return dados
-        
-    except Exception as e:
-        print(f"=== ERRO ao gerar dados dos gráficos: {e} ===")
-        return {
-            'acuracia_periodo': {'labels': [], 'data': []},
-            'classificacoes_manuais': {'labels': [], 'data': []},
-            'resultados_ia': {'labels': [], 'data': []},
-            'performance_prompts': {'labels': [], 'acuracia': [], 'usos': []}
-        }
-
 @app.route('/')
 def dashboard():
     """Página principal - Dashboard"""
@@ -706,8 +766,8 @@ def nova_intimacao():
     """Página para criar nova intimação"""
     if request.method == 'POST':
         try:
-            print("=== DEBUG: BOTÃO SALVAR CLICADO ===")
-            print(f"Form data completo: {dict(request.form)}")
+            logger.debug('BOTÃO SALVAR CLICADO')
+            logger.debug('Form data completo: %s', dict(request.form))
             
             contexto = request.form.get('contexto', '').strip()
             classificacao_manual = request.form.get('classificacao_manual', '').strip()
@@ -728,23 +788,23 @@ def nova_intimacao():
             cor_etiqueta = request.form.get('cor_etiqueta', '').strip()
             smart_context = request.form.get('smart_context') == '1'  # Checkbox retorna '1' se marcado
             
-            print(f"Contexto extraído: '{contexto}'")
-            print(f"Classificação extraída: '{classificacao_manual}'")
-            print(f"Informações extraídas: '{informacoes_adicionais}'")
-            print(f"Processo: '{processo}'")
-            print(f"Órgão Julgador: '{orgao_julgador}'")
-            print(f"Classe: '{classe}'")
-            print(f"Disponibilização: '{disponibilizacao}'")
-            print(f"Intimado: '{intimado}'")
-            print(f"Status: '{status}'")
-            print(f"Prazo: '{prazo}'")
-            print(f"Defensor: '{defensor}'")
-            print(f"ID Tarefa: '{id_tarefa}'")
-            print(f"Cor Etiqueta: '{cor_etiqueta}'")
-            print(f"Smart Context: {smart_context}")
+            logger.debug("Contexto extraído: '%s'", contexto)
+            logger.debug("Classificação extraída: '%s'", classificacao_manual)
+            logger.debug("Informações extraídas: '%s'", informacoes_adicionais)
+            logger.debug("Processo: '%s'", processo)
+            logger.debug("Órgão Julgador: '%s'", orgao_julgador)
+            logger.debug("Classe: '%s'", classe)
+            logger.debug("Disponibilização: '%s'", disponibilizacao)
+            logger.debug("Intimado: '%s'", intimado)
+            logger.debug("Status: '%s'", status)
+            logger.debug("Prazo: '%s'", prazo)
+            logger.debug("Defensor: '%s'", defensor)
+            logger.debug("ID Tarefa: '%s'", id_tarefa)
+            logger.debug("Cor Etiqueta: '%s'", cor_etiqueta)
+            logger.debug('Smart Context: %s', smart_context)
             
             if not contexto:
-                print("DEBUG: Contexto vazio, retornando erro")
+                logger.debug('Contexto vazio, retornando erro')
                 flash('O contexto da intimação é obrigatório.', 'error')
                 return render_template('nova_intimacao.html', 
                                      classificacoes=Config.TIPOS_ACAO,
@@ -839,18 +899,18 @@ def nova_intimacao():
                 'analises': []
             }
             
-            print(f"DEBUG: Dados da intimação preparados: {intimacao_data}")
+            logger.debug('Dados da intimação preparados: %s', intimacao_data)
             
-            print("DEBUG: Chamando data_service.criar_intimacao...")
+            logger.debug('Chamando data_service.criar_intimacao...')
             intimacao_id = data_service.criar_intimacao(intimacao_data)
-            print(f"DEBUG: Intimação criada com ID: {intimacao_id}")
+            logger.debug('Intimação criada com ID: %s', intimacao_id)
             
-            print("DEBUG: Verificando se a intimação foi realmente criada...")
+            logger.debug('Verificando se a intimação foi realmente criada...')
             intimacao_criada = data_service.get_intimacao_by_id(intimacao_id)
-            print(f"DEBUG: Intimação recuperada: {intimacao_criada}")
+            logger.debug('Intimação recuperada: %s', intimacao_criada)
             
             flash('Intimação criada com sucesso!', 'success')
-            print(f"DEBUG: Redirecionando para visualizar_intimacao com ID: {intimacao_id}")
+            logger.debug('Redirecionando para visualizar_intimacao com ID: %s', intimacao_id)
             return redirect(url_for('visualizar_intimacao', id=intimacao_id))
             
         except Exception as e:
@@ -1462,28 +1522,7 @@ def upload_database():
                 'message': 'Arquivo muito grande. Máximo 300MB.',
             }), 400
         
-        # Fazer backup do banco atual
-        backup_path = f"data/database_backup_antes_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-        import shutil
-        shutil.copy2('data/database.db', backup_path)
-        
-        # Salvar novo banco
-        file.save('data/database.db')
-        
-        # Testar se o banco é válido
-        try:
-            test_conn = sqlite3.connect('data/database.db')
-            test_conn.execute('SELECT COUNT(*) FROM intimacoes LIMIT 1')
-            test_conn.close()
-        except Exception as e:
-            # Restaurar backup se o banco for inválido
-            shutil.copy2(backup_path, 'data/database.db')
-            return jsonify({'success': False, 'message': f'Banco de dados inválido: {str(e)}'}), 400
-        
-        return jsonify({
-            'success': True, 
-            'message': f'Banco de dados atualizado com sucesso! Backup salvo em: {backup_path}'
-        })
+        return _trocar_banco_pelo_enviado(file, 'antes_upload')
         
     except Exception as e:
         return jsonify({'success': False, 'message': f'Erro ao fazer upload: {str(e)}'}), 500
@@ -1492,7 +1531,7 @@ def upload_database():
 def download_database():
     """Download do banco de dados atual"""
     try:
-        return send_file('data/database.db', as_attachment=True, download_name='database.db')
+        return _enviar_snapshot_banco('database.db')
     except Exception as e:
         return jsonify({'success': False, 'message': f'Erro ao fazer download: {str(e)}'}), 500
 
@@ -1591,38 +1630,41 @@ def exportar_sessao_analise():
 def executar_analise_paralela(intimacao_ids, prompt, modelo, temperatura, max_tokens,
                               salvar_resultados, calcular_acuracia, session_id,
                               analise_paralela, delay_entre_lotes,
-                              modo_avaliacao: str, tipo_alvo_focado: Optional[str]):
-    """Executar análise de intimações em paralelo"""
+                              modo_avaliacao: str, tipo_alvo_focado: Optional[str],
+                              apenas_classificacao: bool = False,
+                              progresso: Optional[ProgressoSessaoAnalise] = None):
+    """Executar análise de intimações em paralelo (progresso: publica cada resultado no barramento SSE)"""
     resultados = []
     
     # Dividir intimações em lotes
     lotes = [intimacao_ids[i:i + analise_paralela] for i in range(0, len(intimacao_ids), analise_paralela)]
     
-    print(f"=== DEBUG: Executando {len(lotes)} lotes de até {analise_paralela} análises ===")
+    logger.debug('Executando %s lotes de até %s análises', len(lotes), analise_paralela)
     
     for lote_idx, lote in enumerate(lotes, 1):
         # Verificar cancelamento antes de cada lote
         if verificar_cancelamento(session_id):
-            print(f"=== DEBUG: Análise cancelada no lote {lote_idx} ===")
+            logger.debug('Análise cancelada no lote %s', lote_idx)
             break
             
-        print(f"=== DEBUG: Processando lote {lote_idx}/{len(lotes)} com {len(lote)} intimações ===")
+        logger.debug('Processando lote %s/%s com %s intimações', lote_idx, len(lotes), len(lote))
         
         # Executar análises do lote em paralelo
         with concurrent.futures.ThreadPoolExecutor(max_workers=analise_paralela) as executor:
             # Criar tasks para cada intimação do lote
-            futures = []
+            futures = {}
             for intimacao_id in lote:
                 future = executor.submit(
                     analisar_intimacao_individual,
                     intimacao_id, prompt, modelo, temperatura, max_tokens,
                     salvar_resultados, calcular_acuracia, session_id,
-                    modo_avaliacao, tipo_alvo_focado,
+                    modo_avaliacao, tipo_alvo_focado, apenas_classificacao,
                 )
-                futures.append(future)
+                futures[future] = intimacao_id
             
             # Coletar resultados do lote
             for future in concurrent.futures.as_completed(futures):
+                resultado = None
                 try:
                     resultado = future.result()
                     if resultado:
@@ -1630,50 +1672,41 @@ def executar_analise_paralela(intimacao_ids, prompt, modelo, temperatura, max_to
                         # Atualizar progresso
                         atualizar_progresso_analise(session_id, len(resultados))
                 except Exception as e:
-                    print(f"=== DEBUG: Erro na análise paralela: {str(e)} ===")
+                    logger.error('Erro na análise paralela: %s', str(e))
+                if progresso:
+                    progresso.registrar_item(resultado, futures[future])
         
         # Delay entre lotes (exceto no último lote)
         if lote_idx < len(lotes) and delay_entre_lotes > 0:
-            print(f"=== DEBUG: Aguardando {delay_entre_lotes}s antes do próximo lote ===")
+            logger.debug('Aguardando %ss antes do próximo lote', delay_entre_lotes)
             time.sleep(delay_entre_lotes)
     
     return resultados
 
 def analisar_intimacao_individual(intimacao_id, prompt, modelo, temperatura, max_tokens,
                                   salvar_resultados, calcular_acuracia, session_id,
-                                  modo_avaliacao: str, tipo_alvo_focado: Optional[str]):
+                                  modo_avaliacao: str, tipo_alvo_focado: Optional[str],
+                                  apenas_classificacao: bool = False):
     """Analisar uma intimação individual (para uso em paralelo)"""
     try:
         intimacao = data_service.get_intimacao_by_id(intimacao_id)
         if not intimacao:
-            print(f"=== DEBUG: Intimação {intimacao_id} não encontrada ===")
+            logger.debug('Intimação %s não encontrada', intimacao_id)
             return None
             
-        print(f"=== DEBUG: Analisando intimação {intimacao_id} ===")
-        
-        # Preparar o prompt final
-        contexto = f"""
-Contexto da Intimação:
-{intimacao.get('contexto', '')}
-"""
-        
-        # Substituir variáveis no prompt (mesma lógica da análise sequencial)
-        prompt_final = prompt['conteudo']
+        logger.debug('Analisando intimação %s', intimacao_id)
         
-        # Substituir {REGRADENEGOCIO} se existir
-        if prompt.get('regra_negocio') and '{REGRADENEGOCIO}' in prompt_final:
-            prompt_final = prompt_final.replace('{REGRADENEGOCIO}', prompt['regra_negocio'])
+        # Preparar o prompt final (mesma lógica da análise sequencial e da estimativa prévia)
+        contexto, prompt_final = montar_prompt_analise_intimacao(prompt, intimacao.get('contexto', ''))
         
-        # Substituir {CONTEXTO}
-        prompt_final = prompt_final.replace('{CONTEXTO}', contexto)
-        
-        print(f"=== DEBUG: Prompt final preparado (primeiros 200 chars): {prompt_final[:200]}... ===")
+        logger.debug('Prompt final preparado (primeiros 200 chars): %s...', prompt_final[:200])
         
         # Preparar parâmetros para a IA
         parametros = {
             'model': modelo,
             'temperature': temperatura,
             'max_tokens': max_tokens,
+            'parar_apos_classificacao': apenas_classificacao,
         }
         
         # Chamar IA
@@ -1748,48 +1781,83 @@ Contexto da Intimação:
                 'resposta_completa': resposta_ia,
                 'modo_avaliacao': modo_avaliacao,
                 'tipo_alvo_focado': tipo_alvo_focado if modo_avaliacao == MODO_FOCADO else None,
+                'provider': provider,
             }
             data_service.save_analise(analise_data)
         
         return resultado
         
     except Exception as e:
-        print(f"=== DEBUG: Erro ao analisar intimação {intimacao_id}: {str(e)} ===")
+        logger.error('Erro ao analisar intimação %s: %s', intimacao_id, str(e))
         return None
 
+@app.route('/api/estimar-execucao-analise', methods=['POST'])
+def estimar_execucao_analise():
+    """Estimativa prévia de tokens, custo e estouro de janela de contexto (mesmo corpo de /executar-analise)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        prompt_id = data.get('prompt_id')
+        intimacao_ids = data.get('intimacao_ids') or []
+        configuracoes = data.get('configuracoes') or {}
+        if not prompt_id or not intimacao_ids:
+            return jsonify({'success': False, 'message': 'Prompt e intimações são obrigatórios'}), 400
+        
+        prompt = data_service.get_prompt_by_id(prompt_id)
+        if not prompt:
+            return jsonify({'success': False, 'message': 'Prompt não encontrado'}), 404
+        
+        config = data_service.get_config()
+        modelo = configuracoes.get('modelo') or config.get('modelo_padrao', 'gpt-4')
+        max_tokens = configuracoes.get('max_tokens') or config.get('max_tokens_padrao') or None
+        
+        estimador = EstimadorExecucaoAnaliseLote(
+            data_service,
+            cost_service,
+            ai_manager_service.get_current_provider(),
+            ai_manager_service.construir_prompt_provedor,
+        )
+        estimativa = estimador.estimar(
+            prompt, intimacao_ids, modelo, max_tokens=int(max_tokens) if max_tokens else None
+        )
+        return jsonify({'success': True, 'estimativa': estimativa})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao estimar execução: {str(e)}'
+        }), 500
+
 @app.route('/executar-analise', methods=['POST'])
 def executar_analise():
     """Executar análise de intimações com prompts selecionados"""
-    print("=== DEBUG: ROTA /executar-analise CHAMADA ===")
-    print("=== DEBUG: Método HTTP:", request.method)
-    print("=== DEBUG: Content-Type:", request.content_type)
-    print("=== DEBUG: Headers:", dict(request.headers))
+    logger.debug('ROTA /executar-analise CHAMADA')
+    logger.debug('Método HTTP: %s', request.method)
+    logger.debug('Content-Type: %s', request.content_type)
     
     try:
-        print("=== DEBUG: executar_analise iniciada ===")
-        print("=== DEBUG: Tentando obter JSON... ===")
+        logger.debug('executar_analise iniciada')
+        logger.debug('Tentando obter JSON...')
         data = request.get_json()
-        print(f"=== DEBUG: Dados recebidos: {data} ===")
+        logger.debug('Dados recebidos: %s', data)
         
         if data is None:
-            print("=== DEBUG: ERRO: data é None! ===")
+            logger.warning('data é None!')
             return jsonify({'error': 'Dados JSON inválidos'}), 400
         
-        print("=== DEBUG: Extraindo prompt_id... ===")
+        logger.debug('Extraindo prompt_id...')
         prompt_id = data.get('prompt_id')
-        print(f"=== DEBUG: prompt_id extraído: {prompt_id} (tipo: {type(prompt_id)}) ===")
+        logger.debug('prompt_id extraído: %s (tipo: %s)', prompt_id, type(prompt_id))
         
-        print("=== DEBUG: Extraindo intimacao_ids... ===")
+        logger.debug('Extraindo intimacao_ids...')
         intimacao_ids = data.get('intimacao_ids', [])
-        print(f"=== DEBUG: intimacao_ids extraído: {len(intimacao_ids)} itens ===")
+        logger.debug('intimacao_ids extraído: %s itens', len(intimacao_ids))
         
-        print("=== DEBUG: Extraindo configuracoes... ===")
+        logger.debug('Extraindo configuracoes...')
         configuracoes = data.get('configuracoes', {})
-        print(f"=== DEBUG: configuracoes extraído: {configuracoes} ===")
+        logger.debug('configuracoes extraído: %s', configuracoes)
         
-        print("=== DEBUG: Extraindo session_id... ===")
+        logger.debug('Extraindo session_id...')
         session_id = data.get('session_id')  # ID da sessão para cancelamento
-        print(f"=== DEBUG: session_id extraído: {session_id} (tipo: {type(session_id)}) ===")
+        logger.debug('session_id extraído: %s (tipo: %s)', session_id, type(session_id))
         
         if not prompt_id or not intimacao_ids:
             return jsonify({'error': 'Prompt e intimações são obrigatórios'}), 400
@@ -1797,9 +1865,9 @@ def executar_analise():
         if not session_id:
             return jsonify({'error': 'Session ID é obrigatório para cancelamento'}), 400
         
-        print(f"=== DEBUG: Prompt ID: {prompt_id} ===")
-        print(f"=== DEBUG: Intimação IDs: {intimacao_ids} ===")
-        print(f"=== DEBUG: Session ID: {session_id} ===")
+        logger.debug('Prompt ID: %s', prompt_id)
+        logger.debug('Intimação IDs: %s', intimacao_ids)
+        logger.debug('Session ID: %s', session_id)
         
         # Registrar análise para controle de cancelamento
         registrar_analise(session_id, len(intimacao_ids))
@@ -1831,31 +1899,31 @@ def executar_analise():
                 return jsonify({'error': 'tipo_alvo_focado não pode ser INDETERMINADO'}), 400
         
         # Preparar configurações para a sessão
-        print(f"=== DEBUG: Configurações recebidas: {configuracoes} ===")
-        print(f"=== DEBUG: Config padrão: {config} ===")
+        logger.debug('Configurações recebidas: %s', configuracoes)
+        logger.debug('Config padrão: %s', config)
         
         max_tokens_value = configuracoes.get('max_tokens')
-        print(f"=== DEBUG: max_tokens_value: {max_tokens_value} (tipo: {type(max_tokens_value)}) ===")
+        logger.debug('max_tokens_value: %s (tipo: %s)', max_tokens_value, type(max_tokens_value))
         
         if max_tokens_value is None:
             max_tokens_value = config.get('max_tokens_padrao', 500)
-            print(f"=== DEBUG: max_tokens_value após fallback: {max_tokens_value} ===")
+            logger.debug('max_tokens_value após fallback: %s', max_tokens_value)
         
-        print(f"=== DEBUG: Tentando converter temperatura... ===")
+        logger.debug('Tentando converter temperatura...')
         temperatura_value = configuracoes.get('temperatura', config.get('temperatura_padrao', 0.7))
-        print(f"=== DEBUG: temperatura_value: {temperatura_value} (tipo: {type(temperatura_value)}) ===")
+        logger.debug('temperatura_value: %s (tipo: %s)', temperatura_value, type(temperatura_value))
         temperatura_float = float(temperatura_value)
-        print(f"=== DEBUG: temperatura_float: {temperatura_float} ===")
+        logger.debug('temperatura_float: %s', temperatura_float)
         
-        print(f"=== DEBUG: Tentando converter timeout... ===")
+        logger.debug('Tentando converter timeout...')
         timeout_value = configuracoes.get('timeout', config.get('timeout_padrao', 30))
-        print(f"=== DEBUG: timeout_value: {timeout_value} (tipo: {type(timeout_value)}) ===")
+        logger.debug('timeout_value: %s (tipo: %s)', timeout_value, type(timeout_value))
         timeout_int = int(timeout_value)
-        print(f"=== DEBUG: timeout_int: {timeout_int} ===")
+        logger.debug('timeout_int: %s', timeout_int)
         
-        print(f"=== DEBUG: Tentando converter max_tokens... ===")
+        logger.debug('Tentando converter max_tokens...')
         max_tokens_int = int(max_tokens_value) if max_tokens_value is not None else None
-        print(f"=== DEBUG: max_tokens_int: {max_tokens_int} ===")
+        logger.debug('max_tokens_int: %s', max_tokens_int)
         
         config_sessao = {
             'modelo': configuracoes.get('modelo', config.get('modelo_padrao', 'gpt-4')),
@@ -1868,9 +1936,11 @@ def executar_analise():
             'regra_negocio': prompt.get('regra_negocio', ''),
             'modo_avaliacao': modo_avaliacao_req,
             'tipo_alvo_focado': tipo_alvo_focado_canon,
+            # Streaming com corte na classificação: resposta_completa fica parcial
+            'apenas_classificacao': bool(configuracoes.get('apenas_classificacao', False)),
         }
         
-        print(f"=== DEBUG: config_sessao final: {config_sessao} ===")
+        logger.debug('config_sessao final: %s', config_sessao)
         
         # Criar sessão no banco
         data_service.criar_sessao_analise(
@@ -1885,22 +1955,27 @@ def executar_analise():
             configuracoes=config_sessao
         )
         
+        # Progresso real da sessão (eventos no banco, lidos por /api/analise-progresso em qualquer worker)
+        progresso = ProgressoSessaoAnalise(data_service, session_id, len(intimacao_ids))
+        progresso.iniciar()
+        
         # Configurações da OpenAI (usar configurações da página se fornecidas, senão usar padrões)
         modelo = configuracoes.get('modelo', config.get('modelo_padrao', 'gpt-4'))
         temperatura = float(configuracoes.get('temperatura', config.get('temperatura_padrao', 0.7)))
         max_tokens = int(configuracoes.get('max_tokens') or config.get('max_tokens_padrao') or 500)
         salvar_resultados = configuracoes.get('salvar_resultados', True)
         calcular_acuracia = configuracoes.get('calcular_acuracia', True)
+        apenas_classificacao = config_sessao['apenas_classificacao']
         
         provider_atual = ai_manager_service.get_current_provider()
         analise_paralela, delay_entre_lotes = resolve_analise_em_lote_paralelismo(config)
 
-        print(f"=== DEBUG: Provider: {provider_atual}, Modelo: {modelo}, Temp: {temperatura}, Tokens: {max_tokens} ===")
-        print(f"=== DEBUG: Análise em lote (max_concurrent): {analise_paralela}, Delay: {delay_entre_lotes}s ===")
+        logger.debug('Provider: %s, Modelo: %s, Temp: %s, Tokens: %s', provider_atual, modelo, temperatura, max_tokens)
+        logger.debug('Análise em lote (max_concurrent): %s, Delay: %ss', analise_paralela, delay_entre_lotes)
         
         resultados = []
         
-        print(f"=== DEBUG: Prompt encontrado: {prompt['nome']} ===")
+        logger.debug('Prompt encontrado: %s', prompt['nome'])
         
         # Executar análise paralela ou sequencial
         if analise_paralela > 1:
@@ -1909,13 +1984,16 @@ def executar_analise():
                 salvar_resultados, calcular_acuracia, session_id,
                 analise_paralela, delay_entre_lotes,
                 modo_avaliacao_req, tipo_alvo_focado_canon,
+                apenas_classificacao,
+                progresso=progresso,
             )
         else:
             # Análise sequencial (comportamento original)
             for i, intimacao_id in enumerate(intimacao_ids, 1):
                 # Verificar se a análise foi cancelada
                 if verificar_cancelamento(session_id):
-                    print(f"=== DEBUG: Análise cancelada pelo usuário - Session ID: {session_id} ===")
+                    logger.debug('Análise cancelada pelo usuário - Session ID: %s', session_id)
+                    progresso.concluir(TIPO_EVENTO_CANCELADO, 'Análise cancelada pelo usuário')
                     finalizar_analise(session_id)
                     return jsonify({
                         'success': False,
@@ -1928,30 +2006,20 @@ def executar_analise():
                 
                 intimacao = data_service.get_intimacao_by_id(intimacao_id)
                 if not intimacao:
-                    print(f"=== DEBUG: Intimação {intimacao_id} não encontrada ===")
+                    logger.debug('Intimação %s não encontrada', intimacao_id)
+                    progresso.registrar_item({'intimacao_id': intimacao_id, 'erro': 'Intimação não encontrada'})
                     continue
                     
-                print(f"=== DEBUG: Analisando intimação {intimacao_id} ({i}/{len(intimacao_ids)}) ===")
-                print(f"=== DEBUG: Classificação manual: {intimacao.get('classificacao_manual')} ===")
+                logger.debug('Analisando intimação %s (%s/%s)', intimacao_id, i, len(intimacao_ids))
+                logger.debug('Classificação manual: %s', intimacao.get('classificacao_manual'))
                     
                 try:
                     # Preparar o prompt final
-                    contexto = f"""
-Contexto da Intimação:
-{intimacao.get('contexto', '')}
-"""
-                    
-                    # Substituir variáveis no prompt
-                    prompt_final = prompt['conteudo']
-                    
-                    # Substituir {REGRADENEGOCIO} se existir
-                    if prompt.get('regra_negocio') and '{REGRADENEGOCIO}' in prompt_final:
-                        prompt_final = prompt_final.replace('{REGRADENEGOCIO}', prompt['regra_negocio'])
-                    
-                    # Substituir {CONTEXTO}
-                    prompt_final = prompt_final.replace('{CONTEXTO}', contexto)
+                    contexto, prompt_final = montar_prompt_analise_intimacao(
+                        prompt, intimacao.get('contexto', '')
+                    )
                     
-                    print(f"=== DEBUG: Prompt final preparado (primeiros 200 chars): {prompt_final[:200]}... ===")
+                    logger.debug('Prompt final preparado (primeiros 200 chars): %s...', prompt_final[:200])
                     
                     inicio = time.time()
                     
@@ -1960,6 +2028,7 @@ Contexto da Intimação:
                         'model': modelo,
                         'temperature': temperatura,
                         'max_tokens': max_tokens,
+                        'parar_apos_classificacao': apenas_classificacao,
                     }
                     
                     # Fazer chamada para IA usando o gerenciador
@@ -2033,9 +2102,10 @@ Contexto da Intimação:
                             'modo_avaliacao': modo_avaliacao_req,
                             'tipo_alvo_focado': tipo_alvo_focado_canon
                             if modo_avaliacao_req == MODO_FOCADO else None,
+                            'provider': provider,
                         }
                         data_service.save_analise(analise_data)
-                        print(f"=== DEBUG: Resultado salvo no banco ===")
+                        logger.debug('Resultado salvo no banco')
                     
                     resultados.append(resultado)
                     
@@ -2048,8 +2118,10 @@ Contexto da Intimação:
                         'erro': str(e)
                     }
                     resultados.append(resultado)
+                progresso.registrar_item(resultado)
         
         # Finalizar análise
+        cancelada = verificar_cancelamento(session_id)
         finalizar_analise(session_id)
         
         # Calcular estatísticas gerais
@@ -2083,7 +2155,7 @@ Contexto da Intimação:
                 acuracia=acuracia,
                 session_id=session_id
             )
-            print(f"=== DEBUG: Histórico de acurácia salvo - Prompt: {prompt_id}, Intimações: {numero_intimacoes}, Temp: {temperatura}, Acurácia: {acuracia}% ===")
+            logger.debug('Histórico de acurácia salvo - Prompt: %s, Intimações: %s, Temp: %s, Acurácia: %s%%', prompt_id, numero_intimacoes, temperatura, acuracia)
         
         # Finalizar sessão no banco
         estatisticas_sessao = {
@@ -2095,6 +2167,13 @@ Contexto da Intimação:
             'tokens_total': tokens_total
         }
         data_service.finalizar_sessao_analise(session_id, estatisticas_sessao)
+        cost_service.registrar_custos_sessao(
+            data_service, session_id, ai_manager_service.get_current_provider(), resultados
+        )
+        if cancelada:
+            progresso.concluir(TIPO_EVENTO_CANCELADO, 'Análise cancelada pelo usuário')
+        else:
+            progresso.concluir(TIPO_EVENTO_CONCLUSAO, 'Análise concluída com sucesso!')
         
         return jsonify({
             'success': True,
@@ -2103,17 +2182,14 @@ Contexto da Intimação:
         })
         
     except Exception as e:
-        print(f"=== DEBUG: EXCEÇÃO CAPTURADA em executar_analise ===")
-        print(f"=== DEBUG: Tipo da exceção: {type(e)} ===")
-        print(f"=== DEBUG: Mensagem da exceção: {str(e)} ===")
-        print(f"=== DEBUG: Traceback completo:")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Exceção em executar_analise: %s', e)
         
         # Garantir que a análise seja finalizada mesmo em caso de erro
         session_id = data.get('session_id') if 'data' in locals() else None
         if session_id:
             finalizar_analise(session_id)
+        if 'progresso' in locals():
+            progresso.concluir(TIPO_EVENTO_ERRO, str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/relatorios')
@@ -2640,6 +2716,56 @@ def exportar_dados():
         prompt_id = request.args.get('prompt_id', '')
         classificacao = request.args.get('classificacao', '')
         
+        if tipo == 'analises' and formato in FORMATOS_EXPORTACAO_STREAMING:
+            # Filtros no SQL e linhas do cursor direto para a resposta (memória constante)
+            return export_service.exportar_analises_streaming(
+                formato=formato,
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                prompt_id=prompt_id,
+                classificacao=classificacao,
+                conteudos_completos=request.args.get('conteudos_completos') in ('1', 'true', 'on'),
+            )
+        
+        if tipo == 'analises' and formato == 'parquet':
+            try:
+                arquivo, filename = export_service.gerar_analises_parquet_temporario(
+                    data_inicio=data_inicio,
+                    data_fim=data_fim,
+                    prompt_id=prompt_id,
+                    classificacao=classificacao,
+                    compressao=request.args.get('compressao', 'zstd'),
+                    incluir_contexto=request.args.get('incluir_contexto') in ('1', 'true', 'on'),
+                )
+            except ParquetIndisponivelError as e:
+                return jsonify({'error': str(e)}), 501
+            return send_file(
+                arquivo,
+                mimetype='application/vnd.apache.parquet',
+                as_attachment=True,
+                download_name=filename,
+            )
+
+        if tipo == 'resumo':
+            return export_service.exportar_relatorio_resumo_csv(
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                prompt_id=prompt_id,
+                classificacao=classificacao,
+            )
+
+        if tipo == 'matriz_confusao':
+            agrupar_por = request.args.get('agrupar_por') or None
+            if agrupar_por not in (None, 'prompt', 'modelo'):
+                return jsonify({'error': 'agrupar_por deve ser prompt ou modelo'}), 400
+            return export_service.exportar_matriz_confusao_csv(
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                prompt_id=prompt_id,
+                classificacao=classificacao,
+                agrupar_por=agrupar_por,
+            )
+
         if tipo == 'intimacoes':
             dados = data_service.get_all_intimacoes()
             filename = f'intimacoes_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{formato}'
@@ -2647,93 +2773,24 @@ def exportar_dados():
             dados = data_service.get_all_prompts()
             filename = f'prompts_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{formato}'
         elif tipo == 'analises':
-            # Coletar todas as análises
-            intimacoes = data_service.get_all_intimacoes()
-            todas_analises = []
-            for intimacao in intimacoes:
-                for analise in intimacao.get('analises', []):
-                    analise['intimacao_id'] = intimacao['id']
-                    analise['contexto'] = intimacao['contexto']
-                    analise['classificacao_manual'] = intimacao.get('classificacao_manual')
-                    analise['informacao_adicional'] = intimacao.get('informacao_adicional')
-                    # Garantir que os campos de prompt e resposta completos estejam presentes
-                    analise['prompt_completo'] = analise.get('prompt_completo', 'N/A')
-                    analise['resposta_completa'] = analise.get('resposta_completa', 'N/A')
-                    todas_analises.append(analise)
-            
-            # Aplicar filtros
-            dados = todas_analises
-            
-            if data_inicio:
-                dados = [a for a in dados if a.get('data_analise', '') >= data_inicio]
-            
-            if data_fim:
-                dados = [a for a in dados if a.get('data_analise', '') <= data_fim]
-            
-            if prompt_id:
-                dados = [a for a in dados if a.get('prompt_id') == prompt_id]
-            
-            if classificacao:
-                dados = [a for a in dados if a.get('classificacao_manual') == classificacao]
-            
+            dados = list(data_service.iterar_analises_exportacao(
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                prompt_id=prompt_id,
+                classificacao_manual=classificacao,
+                incluir_conteudos_completos=True,
+            ))
             filename = f'analises_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{formato}'
         else:
             return jsonify({'error': 'Tipo de dados inválido'}), 400
         
-        # Gerar CSV diretamente se for formato CSV
-        if formato == 'csv' and tipo == 'analises':
-            import csv
-            import io
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Cabeçalho
-            writer.writerow([
-                'Data', 'Intimação ID', 'Contexto', 'Prompt', 'Classificação Manual',
-                'Resultado IA', 'Acertou', 'Modelo', 'Temperatura', 'Tempo (s)', 'Custo ($)'
-            ])
-            
-            # Dados
-            for analise in dados:
-                # Formatar data
-                data_formatada = ''
-                if analise.get('data_analise'):
-                    try:
-                        data = datetime.fromisoformat(analise['data_analise'].replace('Z', '+00:00'))
-                        data_formatada = data.strftime('%d/%m/%Y %H:%M:%S')
-                    except:
-                        data_formatada = analise['data_analise']
-                
-                writer.writerow([
-                    data_formatada,
-                    analise.get('intimacao_id', '')[:8] + '...',
-                    analise.get('contexto', '')[:100] + ('...' if len(analise.get('contexto', '')) > 100 else ''),
-                    analise.get('prompt_nome', ''),
-                    analise.get('classificacao_manual', ''),
-                    analise.get('resultado_ia', ''),
-                    'Sim' if analise.get('acertou') else 'Não',
-                    analise.get('modelo', ''),
-                    f"{analise.get('temperatura', 0):.1f}" if analise.get('temperatura') is not None else 'N/A',
-                    f"{analise.get('tempo_processamento', 0):.3f}",
-                    "N/A"  # Custo removido - simulação desabilitada
-                ])
-            
-            output.seek(0)
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=filename
-            )
+        # Usar o export_service para outros formatos
+        arquivo_path = export_service.exportar(dados, formato, filename)
+        
+        if arquivo_path:
+            return send_file(arquivo_path, as_attachment=True, download_name=filename)
         else:
-            # Usar o export_service para outros formatos
-            arquivo_path = export_service.exportar(dados, formato, filename)
-            
-            if arquivo_path:
-                return send_file(arquivo_path, as_attachment=True, download_name=filename)
-            else:
-                return jsonify({'error': 'Erro ao gerar arquivo de exportação'}), 500
+            return jsonify({'error': 'Erro ao gerar arquivo de exportação'}), 500
             
     except Exception as e:
         print(f"=== ERRO na exportação: {e} ===")
@@ -2791,12 +2848,10 @@ def configuracoes():
                 'litellm_default_model': (request.form.get('litellm_default_model') or '').strip(),
             }
             
+            # Troca de provedor (ai_provider) é aplicada pelo observador do config.json no
+            # ai_manager_service, que também alcança os demais workers quando releem o arquivo
             data_service.save_config(config_data)
             
-            # Atualizar o provider na instância global do ai_manager_service
-            novo_provider = config_data.get('ai_provider', 'openai')
-            ai_manager_service.set_provider(novo_provider)
-            
             flash('Configurações salvas com sucesso!', 'success')
             
         except Exception as e:
@@ -2822,7 +2877,7 @@ def configuracoes():
             config['openai_api_key'] = 'NÃO CONFIGURADA'
         
         # Debug: verificar se a chave está sendo passada
-        print("=== DEBUG: Chave da API configurada via variável de ambiente ===")
+        logger.debug('Chave da API configurada via variável de ambiente')
         
         # Usar o ai_manager_service global
         provedor_atual = ai_manager_service.get_current_provider()
@@ -2868,7 +2923,9 @@ def configuracoes():
             'uptime': '2 horas, 15 minutos',
             'memoria_usada': '45.2 MB',
             'espaco_disco': '2.1 GB disponível',
-            'ultima_backup': '2024-01-15 10:30:00',
+            'ultima_backup': next(
+                (b['criado_em'].replace('T', ' ')[:19] for b in backup_service.listar_backups()), 'Nunca'
+            ),
             'conexao_openai': 'Conectado'
         }
         
@@ -3082,7 +3139,9 @@ def importar_intimacoes_lote():
     """
     Importa várias intimações a partir de JSON.
     Corpo: { "registros": [ {...}, ... ] } ou lista na raiz, ou { "origem", "total_registros", "registros" }.
-    Opções: "dry_run": true apenas valida sem gravar.
+    Opções: "dry_run": true apenas valida sem gravar; "tudo_ou_nada": true grava somente se
+    todos os registros forem válidos (uma transação só); "sincronizar": true reimporta pelo
+    intimacaoId — insere as novas, atualiza só as colunas alteradas e pula as que não mudaram.
     """
     try:
         payload = request.get_json(silent=True)
@@ -3104,59 +3163,38 @@ def importar_intimacoes_lote():
         if not isinstance(registros, list):
             return jsonify({'success': False, 'message': '"registros" deve ser uma lista.'}), 400
 
-        dry_run = bool(
-            (isinstance(payload, dict) and payload.get('dry_run') is True)
-            or (isinstance(payload, dict) and str(payload.get('dry_run', '')).lower() == 'true')
-        )
+        def _opcao(nome):
+            return bool(
+                (isinstance(payload, dict) and payload.get(nome) is True)
+                or (isinstance(payload, dict) and str(payload.get(nome, '')).lower() == 'true')
+            )
 
-        resultados = []
-        ok_count = 0
-        falhas = 0
-
-        for idx, reg in enumerate(registros):
-            if not isinstance(reg, dict):
-                falhas += 1
-                resultados.append({
-                    'indice': idx,
-                    'sucesso': False,
-                    'erro': 'Item não é um objeto JSON.',
-                })
-                continue
-            try:
-                dados = _import_montar_intimacao(reg)
-                if dry_run:
-                    ok_count += 1
-                    resultados.append({
-                        'indice': idx,
-                        'sucesso': True,
-                        'dry_run': True,
-                        'preview_processo': dados.get('processo'),
-                    })
-                else:
-                    oid = data_service.criar_intimacao(dados)
-                    ok_count += 1
-                    resultados.append({
-                        'indice': idx,
-                        'sucesso': True,
-                        'id': oid,
-                    })
-            except Exception as e:
-                falhas += 1
-                resultados.append({
-                    'indice': idx,
-                    'sucesso': False,
-                    'erro': str(e),
-                })
+        dry_run = _opcao('dry_run')
+        tudo_ou_nada = _opcao('tudo_ou_nada')
+        sincronizar = _opcao('sincronizar')
+        if sincronizar and tudo_ou_nada:
+            return jsonify({
+                'success': False,
+                'message': '"sincronizar" e "tudo_ou_nada" não podem ser usados juntos.',
+            }), 400
 
-        return jsonify({
-            'success': True,
-            'dry_run': dry_run,
-            'total': len(registros),
-            'importados': ok_count if not dry_run else 0,
-            'validados': ok_count if dry_run else 0,
-            'falhas': falhas,
-            'resultados': resultados,
-        })
+        # Defensores carregados uma vez; duplicidade de intimacaoId resolvida para o lote todo
+        defensores = obter_defensores_disponiveis()
+
+        def _montar(reg):
+            return _import_montar_intimacao(reg, defensores_permitidos=defensores, verificar_duplicado=False)
+
+        if sincronizar:
+            resumo = sincronizar_registros_intimacoes_lote(data_service, registros, _montar, dry_run=dry_run)
+        else:
+            resumo = importar_registros_intimacoes_lote(
+                data_service,
+                registros,
+                _montar,
+                dry_run=dry_run,
+                tudo_ou_nada=tudo_ou_nada,
+            )
+        return jsonify({'success': True, **resumo})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -3215,18 +3253,124 @@ def transformar_json_feedback_triagem():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/intimacoes/transformar-json-feedback-triagem/stream', methods=['POST'])
+def transformar_json_feedback_triagem_stream():
+    """
+    Versão incremental da transformação do export de feedback, para arquivos grandes.
+    Entrada: arquivo no campo multipart "arquivo" ou o JSON cru no corpo da requisição.
+    Parâmetros (query/form): layout; destino — "ndjson" (padrão: uma linha por registro, inconsistência
+    e resumo final) ou "importar" (grava direto pela importação em lote, em blocos); dry_run;
+    sincronizar=true (com destino "importar") reimporta pelo intimacaoId, gravando só o que mudou.
+    Com destino "importar" a resposta traz contagens e só os registros com falha; se a leitura do
+    arquivo falhar no meio, volta 400 com o resumo do que já foi gravado.
+    """
+    try:
+        parametros = request.values
+        try:
+            layout = normalize_feedback_export_layout(
+                parametros.get('layout') or parametros.get('formato_layout_feedback')
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        destino = (parametros.get('destino') or 'ndjson').strip().lower()
+        if destino not in ('ndjson', 'importar'):
+            return jsonify({'success': False, 'message': 'destino deve ser "ndjson" ou "importar".'}), 400
+
+        arquivo = request.files.get('arquivo')
+        binario = arquivo.stream if arquivo else request.stream
+
+        if destino == 'importar':
+            itens = iter_feedback_stream_registros(codecs.getreader('utf-8-sig')(binario), layout=layout)
+            issues = []
+            erro_leitura = []
+
+            def _registros():
+                # Erro de leitura no meio do arquivo encerra a entrada; os blocos anteriores já foram
+                # gravados e o resumo parcial volta junto com o erro
+                try:
+                    for _, registro, issues_item in itens:
+                        issues.extend(issues_item)
+                        if registro is not None:
+                            yield registro
+                except ConteudoJsonIncrementalError as e:
+                    erro_leitura.append(str(e))
+
+            defensores = obter_defensores_disponiveis()
+            resumo = importar_registros_intimacoes_lote_em_blocos(
+                data_service,
+                _registros(),
+                lambda reg: _import_montar_intimacao(
+                    reg, defensores_permitidos=defensores, verificar_duplicado=False
+                ),
+                dry_run=str(parametros.get('dry_run', '')).lower() == 'true',
+                sincronizar=str(parametros.get('sincronizar', '')).lower() == 'true',
+            )
+            corpo = {
+                'success': not erro_leitura,
+                **resumo,
+                'issues': [i.to_dict() for i in issues],
+                'issues_count': len(issues),
+            }
+            if erro_leitura:
+                corpo['message'] = (
+                    f'Leitura interrompida após {resumo["total"]} registros (gravados conforme o resumo): '
+                    f'{erro_leitura[0]}'
+                )
+                return jsonify(corpo), 400
+            return jsonify(corpo)
+
+        # O upload/corpo é fechado junto com a requisição, antes de a resposta terminar de ser
+        # gerada; copia em blocos para um temporário próprio (disco, memória constante)
+        copia = tempfile.TemporaryFile()
+        shutil.copyfileobj(binario, copia, 1024 * 1024)
+        copia.seek(0)
+        itens = iter_feedback_stream_registros(codecs.getreader('utf-8-sig')(copia), layout=layout)
+
+        def _linhas():
+            total = issues_count = 0
+            try:
+                for index, registro, issues_item in itens:
+                    for issue in issues_item:
+                        issues_count += 1
+                        yield json.dumps({'tipo': 'issue', **issue.to_dict()}, ensure_ascii=False) + '\n'
+                    if registro is not None:
+                        total += 1
+                        yield json.dumps(
+                            {'tipo': 'registro', 'registro_index': index, 'registro': registro},
+                            ensure_ascii=False,
+                        ) + '\n'
+            except ConteudoJsonIncrementalError as e:
+                yield json.dumps({'tipo': 'erro', 'mensagem': str(e)}, ensure_ascii=False) + '\n'
+            finally:
+                copia.close()
+            yield json.dumps(
+                {'tipo': 'resumo', 'total_registros': total, 'issues_count': issues_count},
+                ensure_ascii=False,
+            ) + '\n'
+
+        return Response(
+            _linhas(),
+            mimetype='application/x-ndjson',
+            headers={'X-Accel-Buffering': 'no'},
+        )
+    except ConteudoJsonIncrementalError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @app.route('/api/intimacoes/<id>/editar', methods=['POST'])
 def editar_intimacao_api(id):
     """API para editar campo de intimação"""
-    print(f"=== DEBUG: EDITANDO INTIMAÇÃO ===")
-    print(f"ID da intimação: {id}")
+    logger.debug('EDITANDO INTIMAÇÃO')
+    logger.debug('ID da intimação: %s', id)
     
     try:
         data = request.get_json()
         campo = data.get('campo')
         valor = data.get('valor')
         
-        print(f"DEBUG: Campo: {campo}, Valor: {valor}")
+        logger.debug('Campo: %s, Valor: %s', campo, valor)
         
         if not campo:
             return jsonify({'success': False, 'error': 'Campo não especificado'}), 400
@@ -3242,44 +3386,44 @@ def editar_intimacao_api(id):
         # Salvar intimação atualizada
         data_service.save_intimacao(intimacao)
         
-        print(f"DEBUG: Campo {campo} atualizado com sucesso")
+        logger.debug('Campo %s atualizado com sucesso', campo)
         return jsonify({'success': True, 'message': 'Campo atualizado com sucesso'})
         
     except Exception as e:
-        print(f"DEBUG: Erro ao editar intimação: {e}")
+        logger.error('Erro ao editar intimação: %s', e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/intimacoes/<id>/excluir', methods=['DELETE'])
 def excluir_intimacao(id):
     """API para excluir uma intimação"""
-    print(f"=== DEBUG: EXCLUINDO INTIMAÇÃO ===")
-    print(f"ID da intimação: {id}")
+    logger.debug('EXCLUINDO INTIMAÇÃO')
+    logger.debug('ID da intimação: %s', id)
     
     try:
         # Verificar se a intimação existe antes de excluir
         intimacao = data_service.get_intimacao_by_id(id)
         if not intimacao:
-            print(f"DEBUG: Intimação {id} não encontrada")
+            logger.debug('Intimação %s não encontrada', id)
             return jsonify({'success': False, 'message': 'Intimação não encontrada'}), 404
         
-        print(f"DEBUG: Intimação encontrada: {intimacao.get('contexto', '')[:50]}...")
+        logger.debug('Intimação encontrada: %s...', intimacao.get('contexto', '')[:50])
         
         # Excluir análises relacionadas primeiro
         analises = data_service.get_analises_by_intimacao_id(id)
-        print(f"DEBUG: Excluindo {len(analises)} análises relacionadas")
+        logger.debug('Excluindo %s análises relacionadas', len(analises))
         for analise in analises:
             data_service.delete_analise(analise['id'])
         
         # Excluir a intimação
         sucesso = data_service.delete_intimacao(id)
         if sucesso:
-            print(f"DEBUG: Intimação {id} excluída com sucesso")
+            logger.debug('Intimação %s excluída com sucesso', id)
             return jsonify({'success': True, 'message': 'Intimação excluída com sucesso'})
         else:
-            print(f"DEBUG: Erro ao excluir intimação {id}")
+            logger.error('Erro ao excluir intimação %s', id)
             return jsonify({'success': False, 'message': 'Erro ao excluir intimação'}), 500
     except Exception as e:
-        print(f"DEBUG: Exceção ao excluir intimação: {e}")
+        logger.error('Exceção ao excluir intimação: %s', e)
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/intimacoes/<id>/destacar', methods=['POST'])
@@ -3327,7 +3471,7 @@ def excluir_analise():
         if not analise_ids:
             return jsonify({'error': 'IDs das análises são obrigatórios'}), 400
         
-        print(f"=== DEBUG: Excluindo {len(analise_ids)} análises: {analise_ids} ===")
+        logger.debug('Excluindo %s análises: %s', len(analise_ids), analise_ids)
         
         excluidas = 0
         erros = []
@@ -3363,34 +3507,34 @@ def excluir_analise():
 @app.route('/api/prompts/<id>/excluir', methods=['DELETE'])
 def excluir_prompt(id):
     """API para excluir um prompt"""
-    print(f"=== DEBUG: EXCLUINDO PROMPT ===")
-    print(f"ID do prompt: {id}")
+    logger.debug('EXCLUINDO PROMPT')
+    logger.debug('ID do prompt: %s', id)
     
     try:
         # Verificar se o prompt existe antes de excluir
         prompt = data_service.get_prompt_by_id(id)
         if not prompt:
-            print(f"DEBUG: Prompt {id} não encontrado")
+            logger.debug('Prompt %s não encontrado', id)
             return jsonify({'success': False, 'message': 'Prompt não encontrado'}), 404
         
-        print(f"DEBUG: Prompt encontrado: {prompt.get('nome', '')}")
+        logger.debug('Prompt encontrado: %s', prompt.get('nome', ''))
         
         # Excluir análises relacionadas primeiro
         analises = data_service.get_analises_by_prompt_id(id)
-        print(f"DEBUG: Excluindo {len(analises)} análises relacionadas")
+        logger.debug('Excluindo %s análises relacionadas', len(analises))
         for analise in analises:
             data_service.delete_analise(analise['id'])
         
         # Excluir o prompt
         sucesso = data_service.delete_prompt(id)
         if sucesso:
-            print(f"DEBUG: Prompt {id} excluído com sucesso")
+            logger.debug('Prompt %s excluído com sucesso', id)
             return jsonify({'success': True, 'message': 'Prompt excluído com sucesso'})
         else:
-            print(f"DEBUG: Erro ao excluir prompt {id}")
+            logger.error('Erro ao excluir prompt %s', id)
             return jsonify({'success': False, 'message': 'Erro ao excluir prompt'}), 500
     except Exception as e:
-        print(f"DEBUG: Exceção ao excluir prompt: {e}")
+        logger.error('Exceção ao excluir prompt: %s', e)
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/prompts/<id>/duplicar', methods=['POST'])
@@ -3803,21 +3947,122 @@ def salvar_precos_azure():
 
 @app.route('/api/backup/criar', methods=['POST'])
 def criar_backup():
-    """API para criar backup manual"""
+    """API para criar backup manual (cópia online do banco, comprimida, com retenção)"""
     try:
-        # Simular criação de backup
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_nome = f'backup_manual_{timestamp}.zip'
-        
+        backup = backup_service.criar_backup('manual')
         return jsonify({
             'success': True,
             'message': 'Backup criado com sucesso',
-            'arquivo': backup_nome,
-            'tamanho': '2.3 MB'
+            'arquivo': backup['arquivo'],
+            'tamanho': f"{backup['tamanho_bytes'] / (1024 * 1024):.1f} MB",
+            'backup': {k: v for k, v in backup.items() if k != 'caminho'},
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/backup/listar')
+def listar_backups():
+    """Backups existentes, do mais recente para o mais antigo"""
+    try:
+        backups = [{k: v for k, v in b.items() if k != 'caminho'} for b in backup_service.listar_backups()]
+        return jsonify({'success': True, 'backups': backups, 'diretorio': backup_service.diretorio})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+def _enviar_snapshot_banco(download_name):
+    """
+    Snapshot consistente do banco (API de backup do SQLite) enviado em streaming.
+
+    O temporário é removido no fechamento da resposta, não no gerador: um gerador que nunca começou
+    (HEAD, cliente que desconecta antes do primeiro bloco) não executa o próprio finally.
+    """
+    caminho = backup_service.criar_snapshot_temporario()
+    try:
+        arquivo = open(caminho, 'rb')
+    except BaseException:
+        remover_arquivo_silencioso(caminho)
+        raise
+
+    def _blocos():
+        while True:
+            bloco = arquivo.read(1024 * 1024)
+            if not bloco:
+                break
+            yield bloco
+
+    def _limpar():
+        arquivo.close()
+        remover_arquivo_silencioso(caminho)
+
+    response = Response(
+        _blocos(),
+        mimetype='application/octet-stream',
+        headers={
+            'Content-Disposition': f'attachment; filename="{download_name}"',
+            'Content-Length': str(os.path.getsize(caminho)),
+        },
+    )
+    response.call_on_close(_limpar)
+    return response
+
+def _trocar_banco_pelo_enviado(file, motivo_backup):
+    """
+    Troca o banco pelo arquivo enviado sem reiniciar: validação, quick_check e migração num
+    temporário, backup do atual e os.replace com as conexões em espera. Com ?progresso=1 a resposta
+    é NDJSON com as etapas (a verificação de um arquivo grande leva segundos); senão, JSON no fim.
+    """
+    # O upload é fechado junto com a requisição: grava antes de uma resposta em streaming começar
+    temp_path = caminho_temporario_ao_lado(data_service.db_path)
+    try:
+        file.save(temp_path)
+    except BaseException:
+        remover_arquivo_silencioso(temp_path)
+        raise
+
+    def _executar(emitir=None):
+        resultado = restaurar_banco_com_troca_segura(
+            data_service,
+            temp_path,
+            criar_backup=lambda: backup_service.criar_backup(motivo_backup),
+            emitir=emitir,
+        )
+        backup = resultado['backup']
+        return {
+            'success': True,
+            'message': f"Banco de dados substituído com sucesso! Backup do anterior: {backup['arquivo']}",
+            'backup': backup['arquivo'],
+            'versao_esquema': resultado['versao_esquema'],
+            'duracao_segundos': resultado['duracao_segundos'],
+        }
+
+    if request.args.get('progresso') != '1':
+        try:
+            return jsonify(_executar())
+        except BancoInvalidoError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except TrocaBancoTimeoutError as e:
+            return jsonify({'success': False, 'message': str(e)}), 409
+
+    eventos = queue.Queue()
+
+    def _trabalhar():
+        try:
+            eventos.put({'etapa': 'concluido', **_executar(eventos.put)})
+        except Exception as e:
+            eventos.put({'etapa': 'erro', 'success': False, 'message': str(e)})
+
+    threading.Thread(target=_trabalhar, name='troca-banco', daemon=True).start()
+
+    def _linhas():
+        while True:
+            evento = eventos.get()
+            yield json.dumps(evento, ensure_ascii=False) + '\n'
+            if evento['etapa'] in ('concluido', 'erro'):
+                break
+
+    return Response(_linhas(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
 @app.route('/api/extrair-informacoes', methods=['POST'])
 def extrair_informacoes():
     """Extrair informações do contexto da intimação usando IA"""
@@ -3828,8 +4073,8 @@ def extrair_informacoes():
         if not contexto:
             return jsonify({'success': False, 'error': 'Contexto não fornecido'})
         
-        print(f"=== DEBUG: Extraindo informações do contexto ===")
-        print(f"Contexto length: {len(contexto)}")
+        logger.debug('Extraindo informações do contexto')
+        logger.debug('Contexto length: %s', len(contexto))
         
         # Prompt para extrair informações
         prompt_extrair = f"""
@@ -3887,8 +4132,8 @@ Retorne APENAS o JSON, sem texto adicional.
             parametros=parametros
         )
         
-        print(f"=== DEBUG: Resposta da IA: {resposta}")
-        print(f"=== DEBUG: Tokens info: {tokens_info}")
+        logger.debug('Resposta da IA: %s', resposta)
+        logger.debug('Tokens info: %s', tokens_info)
         
         # Tentar extrair JSON da resposta
         try:
@@ -3902,7 +4147,7 @@ Retorne APENAS o JSON, sem texto adicional.
             import json
             informacoes = json.loads(json_str)
             
-            print(f"=== DEBUG: Informações extraídas: {informacoes}")
+            logger.debug('Informações extraídas: %s', informacoes)
             
             return jsonify({
                 'success': True,
@@ -3911,7 +4156,7 @@ Retorne APENAS o JSON, sem texto adicional.
             
         except json.JSONDecodeError as e:
             print(f"=== ERRO: JSON inválido: {e}")
-            print(f"Resposta da IA: {resposta}")
+            logger.debug('Resposta da IA: %s', resposta)
             return jsonify({
                 'success': False,
                 'error': 'Erro ao processar resposta da IA'
@@ -4038,6 +4283,100 @@ def obter_precos_modelos():
             'message': f'Erro ao obter preços dos modelos: {str(e)}'
         }), 500
 
+@app.route('/api/custos')
+def obter_custos_ledger():
+    """Lançamentos vigentes do ledger de custos (por sessão/provedor/modelo)"""
+    try:
+        session_id = request.args.get('session_id') or None
+        return jsonify({
+            'success': True,
+            'versao_precos': cost_service.versao_precos(),
+            'custos': data_service.obter_custos_consolidados(session_id)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao obter custos: {str(e)}'
+        }), 500
+
+@app.route('/api/custos/reprecificar', methods=['POST'])
+def reprecificar_custos_historico():
+    """Reprecifica todo o histórico de análises com os preços configurados"""
+    try:
+        data = request.get_json(silent=True) or {}
+        provider_padrao = data.get('provider_padrao') or ai_manager_service.get_current_provider()
+        resumo = cost_service.reprecificar_historico(data_service, provider_padrao)
+        return jsonify({
+            'success': True,
+            'message': f"{resumo['analises_reprecificadas']} análises reprecificadas",
+            'resumo': resumo
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao reprecificar histórico: {str(e)}'
+        }), 500
+
+@app.route('/api/exportacoes/jobs', methods=['GET', 'POST'])
+def jobs_exportacao_analises():
+    """Cria (POST) ou lista (GET) jobs de exportação assíncrona das análises"""
+    if request.method == 'GET':
+        return jsonify({'success': True, 'jobs': jobs_exportacao.listar_jobs()})
+    try:
+        data = request.get_json(silent=True) or {}
+        job = jobs_exportacao.criar_job(
+            formato=data.get('formato', 'csv'),
+            data_inicio=data.get('data_inicio', ''),
+            data_fim=data.get('data_fim', ''),
+            prompt_id=data.get('prompt_id', ''),
+            classificacao=data.get('classificacao', ''),
+            conteudos_completos=bool(data.get('conteudos_completos')),
+        )
+        return jsonify({
+            'success': True,
+            'job': job,
+            'status_url': url_for('status_job_exportacao', job_id=job['job_id']),
+            'download_url': url_for('download_job_exportacao', job_id=job['job_id']),
+        }), 202
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except ParquetIndisponivelError as e:
+        return jsonify({'success': False, 'message': str(e)}), 501
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao criar job de exportação: {str(e)}'
+        }), 500
+
+@app.route('/api/exportacoes/jobs/<job_id>')
+def status_job_exportacao(job_id):
+    """Progresso de um job de exportação"""
+    try:
+        return jsonify({'success': True, 'job': jobs_exportacao.obter_job(job_id)})
+    except JobExportacaoExpiradoError:
+        return jsonify({'success': False, 'message': 'Exportação expirada: o arquivo foi removido pela retenção'}), 410
+    except JobExportacaoNaoEncontradoError:
+        return jsonify({'success': False, 'message': 'Job de exportação não encontrado'}), 404
+
+@app.route('/api/exportacoes/jobs/<job_id>/download')
+def download_job_exportacao(job_id):
+    """Arquivo do job concluído; send_file condicional responde a Range/If-Range (download retomável)"""
+    try:
+        caminho = jobs_exportacao.caminho_arquivo_concluido(job_id)
+    except JobExportacaoExpiradoError:
+        return jsonify({'success': False, 'message': 'Exportação expirada: o arquivo foi removido pela retenção'}), 410
+    except JobExportacaoNaoEncontradoError:
+        return jsonify({'success': False, 'message': 'Exportação não encontrada ou ainda não concluída'}), 404
+    formato = os.path.splitext(caminho)[1].lstrip('.')
+    return send_file(
+        caminho,
+        mimetype=MIMETYPES_JOB_EXPORTACAO.get(formato),
+        as_attachment=True,
+        download_name=f'analises_{job_id[:8]}.{formato}',
+        conditional=True,
+        max_age=0,
+    )
+
 @app.route('/api/cancelar-analise', methods=['POST'])
 def cancelar_analise_api():
     """Cancela uma análise em andamento"""
@@ -4094,51 +4433,33 @@ def gerar_tooltip_custo():
 
 @app.route('/api/analise-progresso')
 def analise_progresso():
-    """Endpoint para Server-Sent Events do progresso da análise"""
-    # Capturar argumentos ANTES de criar a função generate
-    total_intimacoes = request.args.get('total', type=int, default=10)
-    
-    def generate():
-        try:
-            print(f"=== DEBUG: Iniciando progresso para {total_intimacoes} intimações ===")
-            
-            # Enviar início
-            yield f"data: {json.dumps({'tipo': 'inicio', 'total': total_intimacoes, 'atual': 0})}\n\n"
-            
-            # Simular progresso real (sem cache)
-            for i in range(1, total_intimacoes + 1):
-                # Simular tempo de processamento real
-                time.sleep(1)  # 1 segundo por intimação
-                
-                # Descrições realistas
-                descricoes = [
-                    f"Processando intimação {i} de {total_intimacoes}",
-                    f"Analisando contexto da intimação {i}",
-                    f"Classificando intimação {i} com IA",
-                    f"Salvando resultado da intimação {i}",
-                    f"Finalizando análise da intimação {i}"
-                ]
-                descricao = descricoes[i % len(descricoes)]
-                
-                yield f"data: {json.dumps({'tipo': 'progresso', 'total': total_intimacoes, 'atual': i, 'descricao': descricao})}\n\n"
-            
-            # Enviar conclusão
-            yield f"data: {json.dumps({'tipo': 'conclusao', 'total': total_intimacoes, 'atual': total_intimacoes, 'descricao': 'Análise concluída com sucesso!'})}\n\n"
-            
-        except Exception as e:
-            print(f"=== ERRO no progresso: {e} ===")
-            yield f"data: {json.dumps({'tipo': 'erro', 'mensagem': str(e)})}\n\n"
+    """
+    Server-Sent Events do progresso real de uma sessão de análise (?session_id=...).
+
+    Os eventos vêm da tabela eventos_progresso_analise, gravados por quem executa a análise (em
+    qualquer worker); a reconexão do EventSource retoma do cabeçalho Last-Event-ID (ou ?ultimo_id=).
+    """
+    session_id = request.args.get('session_id', '').strip()
+    if not session_id:
+        return jsonify({'error': 'session_id é obrigatório'}), 400
+    ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('ultimo_id') or 0
+    try:
+        ultimo_id = int(ultimo_id)
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID/ultimo_id inválido'}), 400
     
-    return Response(generate(), mimetype='text/event-stream')
+    return Response(
+        gerar_eventos_sse_sessao(data_service, session_id, ultimo_id=ultimo_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 # Rotas de Backup do Banco
 @app.route('/api/backup/banco')
 def download_backup_banco():
     """Endpoint para download do banco de dados"""
     try:
-        db_path = 'data/database.db'
-        
-        if not os.path.exists(db_path):
+        if not os.path.exists(data_service.db_path):
             return jsonify({
                 'success': False,
                 'message': 'Banco de dados não encontrado'
@@ -4148,12 +4469,7 @@ def download_backup_banco():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'database_backup_{timestamp}.db'
         
-        return send_file(
-            db_path,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/octet-stream'
-        )
+        return _enviar_snapshot_banco(filename)
         
     except Exception as e:
         return jsonify({
@@ -4161,43 +4477,26 @@ def download_backup_banco():
             'message': f'Erro ao fazer backup: {str(e)}'
         }), 500
 
+@app.route('/metrics')
+def metricas_prometheus():
+    """Métricas de desempenho no formato texto do Prometheus."""
+    return Response(registro_metricas.exportar_prometheus(),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/api/backup/stats')
 def stats_banco():
     """Endpoint para estatísticas do banco de dados"""
     try:
-        db_path = 'data/database.db'
-        
-        if not os.path.exists(db_path):
-            return jsonify({
-                'success': False,
-                'message': 'Banco de dados não encontrado'
-            })
-        
-        # Conectar ao banco
-        import sqlite3
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Contar registros em cada tabela
         stats = {}
-        
-        # Prompts
-        cursor.execute("SELECT COUNT(*) FROM prompts")
-        stats['prompts'] = cursor.fetchone()[0]
-        
-        # Intimações
-        cursor.execute("SELECT COUNT(*) FROM intimacoes")
-        stats['intimacoes'] = cursor.fetchone()[0]
-        
-        # Análises
-        cursor.execute("SELECT COUNT(*) FROM analises")
-        stats['analises'] = cursor.fetchone()[0]
-        
-        # Tamanho do arquivo
-        size_bytes = os.path.getsize(db_path)
-        stats['tamanho_mb'] = round(size_bytes / (1024 * 1024), 2)
-        
-        conn.close()
+        with data_service.get_connection() as conn:
+            for tabela in ('prompts', 'intimacoes', 'analises'):
+                stats[tabela] = conn.execute(f'SELECT COUNT(*) FROM {tabela}').fetchone()[0]
+
+        # Tamanho, WAL, fragmentação (páginas livres) e tendência das amostras da manutenção periódica
+        manutencao = manutencao_service.estatisticas()
+        stats['tamanho_mb'] = round(manutencao['tamanho_bytes'] / (1024 * 1024), 2)
+        stats['manutencao'] = manutencao
         
         return jsonify({
             'success': True,
@@ -4210,6 +4509,17 @@ def stats_banco():
             'message': f'Erro ao obter estatísticas: {str(e)}'
         }), 500
 
+@app.route('/api/backup/converter-auto-vacuum', methods=['POST'])
+def converter_auto_vacuum_banco():
+    """Conversão única do banco antigo para auto_vacuum incremental (VACUUM completo, bloqueia as requisições)"""
+    try:
+        amostra = manutencao_service.converter_auto_vacuum()
+    except TrocaBancoTimeoutError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Erro ao converter o banco: {str(e)}'}), 500
+    return jsonify({'success': True, 'manutencao': amostra})
+
 @app.route('/api/intimacoes/informacoes-adicionais', methods=['POST'])
 def obter_informacoes_adicionais_intimacoes():
     """Obter informações adicionais de múltiplas intimações"""
@@ -4580,72 +4890,7 @@ def restaurar_backup_banco():
                 'message': 'Arquivo muito grande. Máximo 300MB.'
             }), 400
         
-        # Caminhos dos arquivos
-        db_path = 'data/database.db'
-        backup_dir = 'data/backups'
-        
-        # Criar diretório de backup se não existir
-        os.makedirs(backup_dir, exist_ok=True)
-
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Fazer backup do banco atual antes de restaurar
-        if os.path.exists(db_path):
-            backup_path = os.path.join(backup_dir, f'backup_antes_restauracao_{timestamp}.db')
-            
-            import shutil
-            shutil.copy2(db_path, backup_path)
-            print(f"Backup do banco atual salvo em: {backup_path}")
-        
-        # Salvar o arquivo de backup enviado
-        filename = secure_filename(file.filename)
-        temp_path = os.path.join(backup_dir, f'restore_{timestamp}_{filename}')
-        file.save(temp_path)
-        
-        # Validar se o arquivo é um banco SQLite válido
-        try:
-            import sqlite3
-            conn = sqlite3.connect(temp_path)
-            cursor = conn.cursor()
-            
-            # Verificar se as tabelas necessárias existem
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            required_tables = ['prompts', 'intimacoes', 'analises']
-            missing_tables = [table for table in required_tables if table not in tables]
-            
-            if missing_tables:
-                conn.close()
-                os.remove(temp_path)
-                return jsonify({
-                    'success': False,
-                    'message': f'Banco inválido. Tabelas ausentes: {", ".join(missing_tables)}'
-                }), 400
-            
-            conn.close()
-            
-        except Exception as e:
-            # Limpar arquivo temporário
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            
-            return jsonify({
-                'success': False,
-                'message': f'Arquivo não é um banco SQLite válido: {str(e)}'
-            }), 400
-        
-        # Restaurar o banco
-        import shutil
-        shutil.copy2(temp_path, db_path)
-        
-        # Limpar arquivo temporário
-        os.remove(temp_path)
-        
-        return jsonify({
-            'success': True,
-            'message': 'Backup restaurado com sucesso'
-        })
+        return _trocar_banco_pelo_enviado(file, 'antes_restauracao')
         
     except Exception as e:
         return jsonify({
@@ -4758,8 +5003,8 @@ def comparar_prompts():
         prompt_ids = request.args.getlist('prompt_ids')
         # Obter ID da intimação da query string
         intimacao_id = request.args.get('intimacao_id')
-        print(f"Intimação ID recebido: {intimacao_id}")
-        print(f"Todos os parâmetros: {dict(request.args)}")
+        logger.debug('Intimação ID recebido: %s', intimacao_id)
+        logger.debug('Todos os parâmetros: %s', dict(request.args))
         
         if not prompt_ids:
             flash('Nenhum prompt selecionado para comparação', 'warning')
@@ -4786,13 +5031,13 @@ def comparar_prompts():
         intimacao = None
         prompts_acerto = {}
         if intimacao_id:
-            print(f" Buscando intimação com ID: {intimacao_id}")
+            logger.debug('Buscando intimação com ID: %s', intimacao_id)
             intimacao = data_service.get_intimacao_by_id(intimacao_id)
-            print(f" Intimação encontrada: {intimacao is not None}")
+            logger.debug('Intimação encontrada: %s', intimacao is not None)
             if intimacao:
-                print(f" Dados da intimação: {intimacao.get('id', 'N/A')}")
-                print(f" Processo: {intimacao.get('processo', 'N/A')}")
-                print(f" Classe: {intimacao.get('classe', 'N/A')}")
+                logger.debug('Dados da intimação: %s', intimacao.get('id', 'N/A'))
+                logger.debug('Processo: %s', intimacao.get('processo', 'N/A'))
+                logger.debug('Classe: %s', intimacao.get('classe', 'N/A'))
             else:
                 print(f" ERRO: Intimação não encontrada com ID: {intimacao_id}")
         else:
@@ -4820,10 +5065,10 @@ def comparar_prompts():
                         'total_analises': 0
                     }
         
-        print(f" Renderizando template com:")
-        print(f" - prompts: {len(prompts)}")
-        print(f" - intimacao: {intimacao is not None}")
-        print(f" - intimacao_id: {intimacao.get('id') if intimacao else 'None'}")
+        logger.debug('Renderizando template com:')
+        logger.debug('- prompts: %s', len(prompts))
+        logger.debug('- intimacao: %s', intimacao is not None)
+        logger.debug('- intimacao_id: %s', intimacao.get('id') if intimacao else 'None')
         
         return render_template('comparar_prompts.html', 
                              prompts=prompts,
@@ -5227,23 +5472,23 @@ def analisar_diferencas_prompts():
             intimacao_data = data_service.get_intimacao_by_id(intimacao_id)
         
         # Usar configuração personalizada se disponível, senão usar padrão
-        print(f" DEBUG - config_personalizada recebida: {config_personalizada}")
-        print(f" DEBUG - config_personalizada é None? {config_personalizada is None}")
-        print(f" DEBUG - config_personalizada é dict vazio? {config_personalizada == {}}")
+        logger.debug('- config_personalizada recebida: %s', config_personalizada)
+        logger.debug('- config_personalizada é None? %s', config_personalizada is None)
+        logger.debug('- config_personalizada é dict vazio? %s', config_personalizada == {})
         
         if config_personalizada and config_personalizada != {}:
-            print(f" DEBUG - Usando configuração personalizada!")
+            logger.debug('- Usando configuração personalizada!')
             persona = config_personalizada.get('persona', 'Você é um especialista em análise de prompts de IA para classificação jurídica.')
             instrucoes_resposta = config_personalizada.get('instrucoesResposta', 'Responda em formato JSON com as seguintes chaves:\n- "analise": análise geral (2-3 frases)\n- "diferencas": array com 3-5 diferenças específicas\n- "recomendacoes": array com 3-5 recomendações\n\nSeja objetivo, técnico e focado em eficácia para classificação jurídica.')
             incluir_contexto = config_personalizada.get('incluirContextoIntimacao', True)
             incluir_gabarito = config_personalizada.get('incluirInformacaoAdicional', True)
-            print(f" DEBUG - instrucoes_resposta: '{instrucoes_resposta}'")
-            print(f" DEBUG - instrucoes_resposta é vazia? {instrucoes_resposta == ''}")
+            logger.debug("- instrucoes_resposta: '%s'", instrucoes_resposta)
+            logger.debug('- instrucoes_resposta é vazia? %s', instrucoes_resposta == '')
             
             # Se instrucoes_resposta estiver vazia, não adicionar instruções de formato
             if not instrucoes_resposta or instrucoes_resposta.strip() == '':
                 instrucoes_resposta = ''  # Manter vazio - sem instruções de formato
-                print(f" DEBUG - Instruções de resposta mantidas vazias - IA responderá livremente")
+                logger.debug('- Instruções de resposta mantidas vazias - IA responderá livremente')
             
             # Construir contexto da intimação com dados reais
             contexto_intimacao = ''
@@ -5294,7 +5539,7 @@ CONJUNTO B - {nome_prompt_2.upper()} (Taxa de acerto: {taxa_prompt_2}):
 
 {instrucoes_resposta}"""
         else:
-            print(f" DEBUG - Usando prompt padrão (não há configuração personalizada)")
+            logger.debug('- Usando prompt padrão (não há configuração personalizada)')
             # Prompt padrão com dados da intimação se disponível
             contexto_intimacao = ''
             informacao_adicional = ''
@@ -5364,15 +5609,15 @@ Seja objetivo, técnico e focado em eficácia para classificação jurídica.
         
         # Usar o método analyze_text do serviço atual
         try:
-            print(f" Iniciando análise com IA...")
-            print(f" Provedor atual: {ai_service.get_current_provider()}")
-            print(f" Tamanho do prompt: {len(prompt_analise)} caracteres")
+            logger.debug('Iniciando análise com IA...')
+            logger.debug('Provedor atual: %s', ai_service.get_current_provider())
+            logger.debug('Tamanho do prompt: %s caracteres', len(prompt_analise))
             
             # Usar configurações baseadas no provider atual
             provider_atual = ai_service.get_current_provider()
             config = data_service.get_config() or {}
-            print(f" Provider atual: {provider_atual}")
-            print(f" Config carregada: {config}")
+            logger.debug('Provider atual: %s', provider_atual)
+            logger.debug('Config carregada: %s', config)
             
             # Buscar configurações específicas do provider
             if provider_atual == 'azure':
@@ -5416,7 +5661,7 @@ Seja objetivo, técnico e focado em eficácia para classificação jurídica.
                     'message': f'Max tokens não configurado para o provider {provider_atual}'
                 }), 400
             
-            print(f" Valores configurados: modelo={modelo_analise}, temp={temperatura_analise}, tokens={max_tokens_analise}")
+            logger.debug('Valores configurados: modelo=%s, temp=%s, tokens=%s', modelo_analise, temperatura_analise, max_tokens_analise)
             
             # Usar o mesmo método que funciona na análise de prompts
             parametros_analise = {
@@ -5431,7 +5676,7 @@ Seja objetivo, técnico e focado em eficácia para classificação jurídica.
                 parametros_analise
             )
             
-            print(f" Resposta da IA recebida: {len(resposta_texto)} caracteres, tokens: N/A")
+            logger.debug('Resposta da IA recebida: %s caracteres, tokens: N/A', len(resposta_texto))
             
             response = {'success': True, 'resultado': resposta_texto}
         except Exception as e:
@@ -5441,12 +5686,12 @@ Seja objetivo, técnico e focado em eficácia para classificação jurídica.
         if response['success']:
             # Verificar se deve tentar extrair JSON ou retornar resposta livre
             resposta_texto = response['resultado']
-            print(f" Processando resposta da IA...")
-            print(f" Primeiros 200 caracteres: {resposta_texto[:200]}")
+            logger.debug('Processando resposta da IA...')
+            logger.debug('Primeiros 200 caracteres: %s', resposta_texto[:200])
             
             # Se instrucoes_resposta estiver vazia, retornar resposta livre
             if not instrucoes_resposta or instrucoes_resposta.strip() == '':
-                print(f" Instruções vazias - retornando resposta livre da IA")
+                logger.debug('Instruções vazias - retornando resposta livre da IA')
                 analise_data = {
                     'analise': resposta_texto,
                     'diferencas': [],
@@ -5458,12 +5703,12 @@ Seja objetivo, técnico e focado em eficácia para classificação jurídica.
                     import re
                     json_match = re.search(r'\{.*\}', resposta_texto, re.DOTALL)
                     if json_match:
-                        print(f" JSON encontrado na resposta")
+                        logger.debug('JSON encontrado na resposta')
                         import json
                         analise_data = json.loads(json_match.group())
-                        print(f" JSON parseado com sucesso: {list(analise_data.keys())}")
+                        logger.debug('JSON parseado com sucesso: %s', list(analise_data.keys()))
                     else:
-                        print(f" JSON não encontrado, usando resposta da IA como está")
+                        logger.debug('JSON não encontrado, usando resposta da IA como está')
                         # Se não conseguir extrair JSON, usar resposta da IA como está
                         analise_data = {
                             'analise': resposta_texto,
@@ -5478,7 +5723,7 @@ Seja objetivo, técnico e focado em eficácia para classificação jurídica.
                         'recomendacoes': []
                     }
             
-            print(f" Retornando análise estruturada")
+            logger.debug('Retornando análise estruturada')
             return jsonify({
                 'success': True,
                 'analise': analise_data.get('analise', 'Análise não disponível'),
@@ -5726,4 +5971,5 @@ if __name__ == '__main__':
     os.makedirs('templates', exist_ok=True)
     os.makedirs('static/css', exist_ok=True)
     os.makedirs('static/js', exist_ok=True)
+    iniciar_agendadores_banco()
     app.run(debug=True, host='0.0.0.0', port=5000)
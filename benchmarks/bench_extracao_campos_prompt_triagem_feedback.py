@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark da extração de campos do prompt no export de feedback da triagem.
+
+Compara, sobre prompts sintéticos de 5 KB a 50 KB no formato do export (blocos SYSTEM/USER/AI,
+markdown com rótulos em negrito, regras do usuário e a frase do defensor):
+- a extração campo a campo (extract_field / extract_intimados / extract_defensor_name);
+- extrair_campos_prompt (passagem única com padrões pré-compilados);
+- transform_item completo nos dois layouts.
+
+A equivalência das saídas fica em
+tests/test_triagem_feedback_transformacao_extrator_campos_prompt_passagem_unica_equivalencia.py.
+
+Uso:
+    python benchmarks/bench_extracao_campos_prompt_triagem_feedback.py [--prompts 200] [--tamanhos 5000 20000 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.triagem_feedback_transformacao_json_para_importacao_intimacoes_service import (
+    CAMPOS_MARKDOWN_PROMPT,
+    LAYOUT_FEEDBACK_LEGACY,
+    LAYOUT_FEEDBACK_POS_2026_03_25,
+    extract_defensor_name,
+    extract_field,
+    extract_intimados,
+    extrair_campos_prompt,
+    transform_item,
+)
+
+_PALAVRAS = ["intimação", "prazo", "processo", "réu", "autos", "**nota**", "sentença", "- item", "## seção"]
+
+
+def gerar_prompt(tamanho: int, rng: random.Random) -> str:
+    """Prompt no formato do export com corpo aleatório até ~tamanho caracteres."""
+    corpo = " ".join(rng.choice(_PALAVRAS) for _ in range(tamanho // 8))[:tamanho]
+    terco = len(corpo) // 3
+    return (
+        "====== [INICIO: SYSTEM] ======\nVocê é um assistente de triagem.\n"
+        + corpo[:terco]
+        + "\n====== [FIM:  SYSTEM] ======\n====== [INICIO: USER] ======\n"
+        "Você está realizando a triagem para o defensor (a): **Dr. Fulano**\n"
+        "# Regras do Usuário (PRIORIDADE ALTA)\nPriorizar réu preso.\n# Informações da Intimação\n"
+        f"- **Processo** : {rng.randint(0, 9999999):07d}-22.2024.8.01.0001\n"
+        "- **Órgão Julgador** : 2ª Vara Cível\n- **Classe** : Apelação\n"
+        "- **Intimados**:\n- João Silva\n- Maria Souza\n## Texto da intimação\n"
+        + corpo[terco:]
+        + "\n- **Dias** : 15\n====== [FIM: USER] ======\n====== [INICIO: AI] ======\n"
+        '{"categoriaDaTriagem":"OCULTAR","informacaoAdicional":"sem providência"}\n'
+        "====== [FIM: AI] ======\nTriagem IA executada com sucesso para intimação 1"
+    )
+
+
+def _campo_a_campo(prompts):
+    for prompt in prompts:
+        for rotulos in CAMPOS_MARKDOWN_PROMPT.values():
+            extract_field(prompt, list(rotulos))
+        extract_intimados(prompt)
+        extract_defensor_name(prompt)
+
+
+def _passagem_unica(prompts):
+    for prompt in prompts:
+        extrair_campos_prompt(prompt)
+
+
+def medir(nome: str, fn, prompts: list) -> float:
+    inicio = time.perf_counter()
+    fn(prompts)
+    duracao = time.perf_counter() - inicio
+    print(
+        f"{nome:<32} {len(prompts):>6} prompts  {duracao:7.3f}s  "
+        f"{duracao / len(prompts) * 1e3:7.3f} ms/prompt"
+    )
+    return duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[5_000, 20_000, 50_000])
+    args = parser.parse_args()
+
+    for tamanho in args.tamanhos:
+        rng = random.Random(tamanho)
+        prompts = [gerar_prompt(tamanho, rng) for _ in range(args.prompts)]
+        print(f"--- prompts de {tamanho // 1000} KB")
+        medir("campo a campo", _campo_a_campo, prompts)
+        medir("extrair_campos_prompt", _passagem_unica, prompts)
+        for layout in (LAYOUT_FEEDBACK_LEGACY, LAYOUT_FEEDBACK_POS_2026_03_25):
+            itens = [
+                {"feedback": {"sucesso": True}, "triagem": {"intimacaoId": str(n), "prompt": p}}
+                for n, p in enumerate(prompts)
+            ]
+            medir(f"transform_item ({layout})", lambda _: [transform_item(item, layout) for item in itens], prompts)
+
+
+if __name__ == "__main__":
+    main()
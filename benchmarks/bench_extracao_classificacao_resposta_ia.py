@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark da extração de classificação (matcher pré-compilado).
+
+Simula a reclassificação de respostas armazenadas (ex.: após incluir um alias):
+mistura de respostas JSON com justificativa longa, texto livre com a classificação e
+respostas sem tipo reconhecível (caminho mais caro: passa por todas as etapas).
+
+Uso:
+    python benchmarks/bench_extracao_classificacao_resposta_ia.py [--linhas 100000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_service import (
+    extrair_classificacao_da_resposta_ia,
+    obter_matcher_classificacao,
+)
+
+
+def gerar_respostas(n: int, semente: int = 42) -> list:
+    rng = random.Random(semente)
+    tipos = Config.TIPOS_ACAO
+    justificativa = "A intimação trata de prazo processual e exige análise do defensor. " * 6
+    respostas = []
+    for _ in range(n):
+        forma = rng.random()
+        if forma < 0.6:
+            respostas.append(json.dumps(
+                {"triagem": rng.choice(tipos), "justificativa": justificativa},
+                ensure_ascii=False,
+            ))
+        elif forma < 0.9:
+            respostas.append(f"Classificação: {rng.choice(tipos)}.\n{justificativa}")
+        else:
+            respostas.append(f"Não foi possível concluir.\n{justificativa}")
+    return respostas
+
+
+def medir(nome: str, fn, respostas: list) -> float:
+    inicio = time.perf_counter()
+    fn(respostas)
+    duracao = time.perf_counter() - inicio
+    print(
+        f"{nome:<28} {len(respostas):>8} linhas  {duracao:7.3f}s  "
+        f"{duracao / len(respostas) * 1e6:7.2f} µs/linha"
+    )
+    return duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    args = parser.parse_args()
+
+    respostas = gerar_respostas(args.linhas)
+    tipos = list(Config.TIPOS_ACAO)
+
+    medir("extrair (chamada a chamada)", lambda rs: [extrair_classificacao_da_resposta_ia(r, tipos) for r in rs], respostas)
+    medir("matcher.extrair_lote", obter_matcher_classificacao(tipos).extrair_lote, respostas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Latência dos agregados da página de relatórios em função do tamanho do banco.
+
+Para cada tamanho, cria um banco temporário com N análises (12 meses, 8 prompts, 2.000
+intimações) e mede obter_agregados_relatorios_filtrados sem cache (o cache de consultas é
+limpo antes de cada repetição), sem filtro e com os filtros usuais da tela.
+
+Uso:
+    python benchmarks/bench_relatorios_agregados_filtrados_tamanho_banco.py [--tamanhos 10000 100000 1000000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.sqlite_service import SQLiteService
+
+NUM_PROMPTS = 8
+NUM_INTIMACOES = 2_000
+
+FILTROS = {
+    "sem filtro": {},
+    "último mês": {"data_inicio": "2025-12-01", "data_fim": "2025-12-31"},
+    "um prompt": {"prompt_id": "p3"},
+    "classificação manual": {"classificacao_manual": Config.TIPOS_ACAO[0]},
+}
+
+
+def popular_banco(db_path: str, n: int, semente: int = 42) -> SQLiteService:
+    """
+    Análises como as de sessões reais: em cada dia rodam um ou dois prompts (mesmo modelo), e o
+    resultado da IA coincide com a classificação manual quando acerta (70% das vezes).
+    """
+    svc = SQLiteService(db_path=db_path)
+    rng = random.Random(semente)
+    tipos = Config.TIPOS_ACAO
+    classificacoes = [rng.choice(tipos) for _ in range(NUM_INTIMACOES)]
+
+    def analises():
+        for k in range(n):
+            mes, dia = rng.randint(1, 12), rng.randint(1, 28)
+            prompt = (mes * 31 + dia + rng.randint(0, 1)) % NUM_PROMPTS
+            intimacao = rng.randrange(NUM_INTIMACOES)
+            acertou = rng.random() < 0.7
+            resultado = classificacoes[intimacao] if acertou else rng.choice(tipos)
+            yield (
+                f"a{k}",
+                f"i{intimacao}",
+                f"p{prompt}",
+                f"Prompt {prompt}",
+                "2025-%02d-%02dT%02d:00:00" % (mes, dia, rng.randint(8, 18)),
+                resultado,
+                resultado == classificacoes[intimacao],
+                rng.uniform(0.5, 4.0),
+                rng.uniform(0.0001, 0.01),
+            )
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO prompts (id, nome, conteudo, data_criacao) VALUES (?, ?, 'x', '2025-01-01')",
+            [(f"p{k}", f"Prompt {k}") for k in range(NUM_PROMPTS)],
+        )
+        conn.executemany(
+            "INSERT INTO intimacoes (id, contexto, classificacao_manual, data_criacao) VALUES (?, 'c', ?, '2025-01-01')",
+            [(f"i{k}", c) for k, c in enumerate(classificacoes)],
+        )
+        conn.executemany(
+            """
+            INSERT INTO analises (id, intimacao_id, prompt_id, prompt_nome, data_analise, resultado_ia,
+                                  acertou, tempo_processamento, custo_real, modelo, provider)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'gpt-4o-mini', 'openai')
+            """,
+            analises(),
+        )
+    return svc
+
+
+def medir(svc: SQLiteService, filtros: dict, repeticoes: int) -> float:
+    """Menor tempo (ms) entre as repetições, sempre com o cache de consultas vazio."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        svc.cache_consultas.limpar()
+        inicio = time.perf_counter()
+        svc.obter_agregados_relatorios_filtrados(**filtros)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'análises':>10}  " + "  ".join(f"{nome:>20}" for nome in FILTROS))
+    with tempfile.TemporaryDirectory() as diretorio:
+        for n in args.tamanhos:
+            svc = popular_banco(os.path.join(diretorio, f"relatorios_{n}.db"), n)
+            tempos = [medir(svc, filtros, args.repeticoes) for filtros in FILTROS.values()]
+            with sqlite3.connect(svc.db_path) as conn:
+                fatos = conn.execute("SELECT COUNT(*) FROM fatos_diarios").fetchone()[0]
+            print(f"{n:>10}  " + "  ".join(f"{t:>17.1f} ms" for t in tempos) + f"  ({fatos} fatos diários)")
+
+
+if __name__ == "__main__":
+    main()
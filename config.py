@@ -2,8 +2,8 @@ import os
 from datetime import timedelta
 from dotenv import load_dotenv
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+# Carregar variáveis de ambiente do arquivo .env (utf-8-sig: aceita .env salvo com BOM no Windows)
+load_dotenv(encoding='utf-8-sig')
 
 class Config:
     """Configurações base da aplicação"""
@@ -79,6 +79,16 @@ class Config:
     
     # Configurações de exportação
     EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports')
+    # Retenção dos arquivos gerados por jobs de exportação assíncrona (tamanho total e idade)
+    EXPORT_JOBS_RETENCAO_MAX_MB = int(os.environ.get('EXPORT_JOBS_RETENCAO_MAX_MB', '2048'))
+    EXPORT_JOBS_RETENCAO_MAX_HORAS = float(os.environ.get('EXPORT_JOBS_RETENCAO_MAX_HORAS', '72'))
+
+    # Log: LOG_LEVEL sobrepõe o log_level do config.json; instruções SQL acima de SLOW_QUERY_MS vão para o log com o plano
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', '').strip().upper() or None
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+
+    # Backup automático e manutenção do banco em segundo plano ao importar o app (gunicorn); `python app.py` sempre inicia
+    AGENDADORES_BANCO = os.environ.get('AGENDADORES_BANCO', 'false').lower() in ('1', 'true', 'yes', 'on')
     
     # Tipos de ação disponíveis
     TIPOS_ACAO = [
@@ -1,30 +1,88 @@
+import importlib
+import threading
 from typing import Dict, Any, List, Tuple, Optional
 from services.ai_service_interface import AIServiceInterface
-from services.openai_service import OpenAIService
-from services.azure_service import AzureService
-from services.litellm_service import LiteLLMService
-from services.sqlite_service import SQLiteService
+from services.sqlite_service import obter_sqlite_service
+
+# Provedores por caminho "módulo:Classe": o SDK de cada um (openai, httpx) só é importado
+# quando o provedor é usado pela primeira vez
+PROVEDORES_IA = {
+    'openai': 'services.openai_service:OpenAIService',
+    'azure': 'services.azure_service:AzureService',
+    'litellm': 'services.litellm_service:LiteLLMService',
+}
+
+# Chaves do config.json que entram na criação do cliente de cada provedor
+CHAVES_CONFIG_CLIENTE_PROVEDOR = {
+    'openai': frozenset({'openai_api_key'}),
+    'azure': frozenset({'azure_api_key', 'azure_endpoint', 'azure_api_version'}),
+    'litellm': frozenset({'litellm_api_key', 'litellm_endpoint'}),
+}
 
 class AIManagerService:
     """Gerenciador de serviços de IA que permite alternar entre diferentes provedores"""
     
     def __init__(self):
-        """Inicializar o gerenciador de IA"""
-        self.data_service = SQLiteService()
-        self.providers = {
-            'openai': OpenAIService,
-            'azure': AzureService,
-            'litellm': LiteLLMService,
-        }
+        """Inicializar o gerenciador de IA (o cliente do provedor é criado no primeiro uso)"""
+        self.data_service = obter_sqlite_service()
+        self.providers = dict(PROVEDORES_IA)
         self.current_provider = None
-        self.current_service = None
+        self._current_service = None
+        self._inicializacao_pendente = False
+        self._lock_inicializacao = threading.Lock()
         self._initialize_current_provider()
+        self.data_service.armazenamento_config.registrar_observador(self._ao_alterar_config)
     
     def _initialize_current_provider(self):
-        """Inicializar o provedor atual baseado na configuração"""
+        """Registrar o provedor configurado, sem instanciá-lo ainda"""
         config = self.data_service.get_config()
         provider_name = config.get('ai_provider', 'openai')
-        self.set_provider(provider_name)
+        if provider_name in self.providers:
+            self.current_provider = provider_name
+            self._inicializacao_pendente = True
+        else:
+            print(f"ERRO: Provedor '{provider_name}' não disponível")
+    
+    @property
+    def current_service(self) -> Optional[AIServiceInterface]:
+        """Serviço do provedor atual, instanciado (com o cliente) no primeiro acesso"""
+        if self._inicializacao_pendente:
+            with self._lock_inicializacao:  # análises paralelas podem chegar juntas no primeiro uso
+                if self._inicializacao_pendente:
+                    if not self._ativar_provedor(self.current_provider, salvar_config=False):
+                        self.current_provider = None
+                    self._inicializacao_pendente = False
+        return self._current_service
+    
+    @current_service.setter
+    def current_service(self, service: Optional[AIServiceInterface]) -> None:
+        self._current_service = service
+        self._inicializacao_pendente = False
+    
+    def _ao_alterar_config(self, config: Dict[str, Any], alteradas: set) -> None:
+        """
+        Observador do config.json (gravação por qualquer worker ou edição manual): troca de
+        provedor ou recria o cliente só se mudou algo que o afeta
+        """
+        novo_provider = config.get('ai_provider') or 'openai'
+        if 'ai_provider' in alteradas and novo_provider != self.current_provider and novo_provider in self.providers:
+            if self._inicializacao_pendente:
+                self.current_provider = novo_provider
+            else:
+                self._ativar_provedor(novo_provider, salvar_config=False)
+            return
+        if self._inicializacao_pendente or self._current_service is None:
+            return
+        if alteradas & CHAVES_CONFIG_CLIENTE_PROVEDOR.get(self.current_provider, frozenset()):
+            print(f"Credenciais de '{self.current_provider}' alteradas no config.json; recriando o cliente")
+            self._current_service.initialize_client()
+    
+    def _classe_provedor(self, provider_name: str):
+        classe = self.providers[provider_name]
+        if isinstance(classe, str):
+            modulo, nome = classe.split(':')
+            classe = self.providers[provider_name] = getattr(importlib.import_module(modulo), nome)
+        return classe
     
     def get_available_providers(self) -> List[str]:
         """Obter lista de provedores disponíveis"""
@@ -46,19 +104,23 @@ class AIManagerService:
         if provider_name not in self.providers:
             print(f"ERRO: Provedor '{provider_name}' não disponível")
             return False
-        
+        return self._ativar_provedor(provider_name, salvar_config=True)
+    
+    def _ativar_provedor(self, provider_name: str, salvar_config: bool) -> bool:
         try:
             # Instanciar o serviço do provedor
-            service_class = self.providers[provider_name]
-            self.current_service = service_class()
+            service_class = self._classe_provedor(provider_name)
+            service = service_class()
             
             # Tentar inicializar o cliente
-            if self.current_service.initialize_client():
+            if service.initialize_client():
+                self.current_service = service
                 self.current_provider = provider_name
                 print(f"SUCESSO: Provedor '{provider_name}' definido com sucesso")
                 
                 # Salvar configuração
-                self._save_provider_config(provider_name)
+                if salvar_config:
+                    self._save_provider_config(provider_name)
                 return True
             else:
                 print(f"Falha ao inicializar provedor '{provider_name}'")
@@ -98,6 +160,13 @@ class AIManagerService:
         
         return self.current_service.analisar_intimacao(contexto, prompt_template, parametros)
     
+    def construir_prompt_provedor(self, prompt_template: str, contexto: str) -> str:
+        """Prompt final como o provedor atual o montaria em analisar_intimacao (sem chamar a API)"""
+        construir = getattr(self.current_service, '_construir_prompt', None)
+        if construir is None:
+            return prompt_template
+        return construir(prompt_template, contexto)
+    
     def get_available_models(self) -> List[str]:
         """Obter modelos disponíveis do provedor atual"""
         if not self.current_service:
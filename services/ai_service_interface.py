@@ -1,9 +1,23 @@
 from abc import ABC, abstractmethod
 from typing import Tuple, Dict, Any, List
 
+from services.instrumentacao_metricas_latencia_consultas_lentas_prometheus_service import (
+    cronometrar_chamadas_provedor,
+)
+
+# Métodos que chamam a API do provedor: cronometrados em toda subclasse (rótulo provedor = nome da
+# classe sem o sufixo Service, ex.: OpenAIService -> openai)
+CHAMADAS_API_INSTRUMENTADAS = ('test_connection', 'analisar_intimacao', 'analyze_text')
+
+
 class AIServiceInterface(ABC):
     """Interface abstrata para serviços de IA"""
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        provedor = cls.__name__[:-len('Service')] if cls.__name__.endswith('Service') else cls.__name__
+        cronometrar_chamadas_provedor(cls, provedor.lower(), CHAMADAS_API_INSTRUMENTADAS)
+    
     @abstractmethod
     def __init__(self):
         """Inicializar o serviço de IA"""
@@ -37,7 +51,11 @@ class AIServiceInterface(ABC):
         Args:
             contexto: Contexto da intimação
             prompt_template: Template do prompt
-            parametros: Parâmetros específicos do provedor
+            parametros: Parâmetros específicos do provedor. Chaves opcionais comuns:
+                raw_user_prompt_only (envia o template sem montagem),
+                stream (consome a resposta em streaming) e
+                parar_apos_classificacao (implica stream; corta a geração assim que o
+                campo `triagem` é reconhecido — resposta_completa fica parcial)
             
         Returns:
             Tuple[str, str, Dict[str, int]]: (classificação, resposta_completa, tokens_info)
@@ -0,0 +1,116 @@
+"""
+Armazenamento compartilhado do data/config.json, com cache invalidado pelo mtime.
+
+get_config é chamado várias vezes por requisição (rotas, provedores de IA, preços do cost_service);
+em vez de abrir e fazer parse do arquivo a cada chamada, o conteúdo fica em memória e só é relido
+quando o arquivo muda (mtime ou tamanho diferentes — edição manual ou outro worker) ou após uma
+gravação por aqui. A gravação é atômica (arquivo temporário no mesmo diretório + os.replace).
+
+Observadores (registrar_observador) são chamados só quando o conteúdo de fato mudou, com o config
+novo e o conjunto de chaves alteradas; é assim que provedores e cost_service se atualizam.
+"""
+import copy
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+ObservadorConfig = Callable[[Dict[str, Any], Set[str]], None]
+
+_AUSENTE = object()
+
+
+def chaves_alteradas(anterior: Dict[str, Any], novo: Dict[str, Any]) -> Set[str]:
+    return {c for c in set(anterior) | set(novo) if anterior.get(c, _AUSENTE) != novo.get(c, _AUSENTE)}
+
+
+class ArmazenamentoConfigJson:
+    """Config JSON em cache; ler() devolve uma cópia, que o chamador pode alterar à vontade."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._config: Optional[Dict[str, Any]] = None
+        self._assinatura: Optional[Tuple[int, int]] = None
+        self._observadores: List[ObservadorConfig] = []
+        self.versao = 0  # incrementada a cada mudança de conteúdo
+
+    def ler(self) -> Dict[str, Any]:
+        """Config atual ({} se o arquivo não existe ou é inválido)."""
+        return copy.deepcopy(self.verificar())
+
+    def verificar(self) -> Dict[str, Any]:
+        """Relê o arquivo se ele mudou desde a última leitura; devolve o dict em cache (não alterar)."""
+        assinatura = self._assinatura_arquivo()
+        with self._lock:
+            if self._config is not None and assinatura == self._assinatura:
+                return self._config
+            try:
+                with open(self.caminho, 'r', encoding='utf-8') as f:
+                    novo = json.load(f)
+            except (OSError, ValueError):
+                novo = {}
+            self._assinatura = assinatura
+            return self._substituir(novo if isinstance(novo, dict) else {})
+
+    def gravar(self, config: Dict[str, Any]) -> None:
+        """Grava atomicamente; leitores nunca veem o arquivo pela metade."""
+        diretorio = os.path.dirname(os.path.abspath(self.caminho))
+        os.makedirs(diretorio, exist_ok=True)
+        with self._lock:
+            fd, temporario = tempfile.mkstemp(prefix='.config-', suffix='.json.tmp', dir=diretorio)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(config, f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporario, self.caminho)
+            except BaseException:
+                try:
+                    os.unlink(temporario)
+                except OSError:
+                    pass
+                raise
+            self._assinatura = self._assinatura_arquivo()
+            self._substituir(copy.deepcopy(config))
+
+    def registrar_observador(self, observador: ObservadorConfig) -> None:
+        with self._lock:
+            self._observadores.append(observador)
+
+    def _substituir(self, novo: Dict[str, Any]) -> Dict[str, Any]:
+        anterior, self._config = self._config, novo
+        if anterior is None:
+            self.versao += 1
+            return novo
+        alteradas = chaves_alteradas(anterior, novo)
+        if alteradas:
+            self.versao += 1
+            for observador in list(self._observadores):
+                try:
+                    observador(novo, alteradas)
+                except Exception as e:
+                    print(f"Aviso: observador de config.json falhou: {e}")
+        return novo
+
+    def _assinatura_arquivo(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.caminho)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+_armazenamentos: Dict[str, ArmazenamentoConfigJson] = {}
+_lock_armazenamentos = threading.Lock()
+
+
+def obter_armazenamento_config(caminho: str) -> ArmazenamentoConfigJson:
+    """Instância compartilhada no processo, uma por arquivo."""
+    chave = os.path.realpath(caminho)
+    with _lock_armazenamentos:
+        armazenamento = _armazenamentos.get(chave)
+        if armazenamento is None:
+            armazenamento = _armazenamentos[chave] = ArmazenamentoConfigJson(chave)
+        return armazenamento
@@ -3,7 +3,7 @@ import re
 from typing import Tuple, Dict, Any, Optional, List
 from openai import AzureOpenAI
 from config import Config
-from services.sqlite_service import SQLiteService
+from services.sqlite_service import obter_sqlite_service
 from services.ai_service_interface import AIServiceInterface
 from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_service import (
     classificacao_extracao_indica_falha_nucleo,
@@ -12,13 +12,29 @@ from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_servic
 from services.extracao_texto_resposta_chat_completions_openai_compat import (
     texto_mensagem_assistente,
 )
+from services.classificacao_ia_extracao_incremental_streaming_chat_completions_service import (
+    ExtratorIncrementalClassificacaoTriagem,
+    consumir_stream_chat_completions,
+)
+
+# Compilados uma vez (antes eram montados a cada resposta não resolvida pelo núcleo)
+_PADROES_FALLBACK_CLASSIFICACAO_AZURE = tuple(
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"(?:CLASSIFICAÇÃO|AÇÃO):\s*([A-ZÁÊÇÕ\s]+)",
+        r"(?:Classificação|Ação):\s*([A-Záêçõ\s]+)",
+        r"\*\*(?:CLASSIFICAÇÃO|AÇÃO)\*\*:\s*([A-ZÁÊÇÕ\s]+)",
+        r"\*\*(?:Classificação|Ação)\*\*:\s*([A-Záêçõ\s]+)",
+    )
+)
+
 
 class AzureService(AIServiceInterface):
     """Serviço para integração com a API do Azure OpenAI"""
     
     def __init__(self):
         """Inicializar o serviço Azure OpenAI"""
-        self.data_service = SQLiteService()
+        self.data_service = obter_sqlite_service()
         self.config = Config()
         self.client = None
         self._initialize_client()
@@ -111,6 +127,8 @@ class AzureService(AIServiceInterface):
         try:
             p = dict(parametros)
             raw_user_only = bool(p.pop("raw_user_prompt_only", False))
+            parar_apos_classificacao = bool(p.pop("parar_apos_classificacao", False))
+            stream = bool(p.pop("stream", False)) or parar_apos_classificacao
             prompt = (
                 prompt_template
                 if raw_user_only
@@ -119,6 +137,14 @@ class AzureService(AIServiceInterface):
             parametros_validados = self._validar_parametros(p)
             parametros_validados["_raw_user_only"] = raw_user_only
 
+            if stream:
+                resposta_completa, tokens_info, classificacao = self._fazer_chamada_streaming_com_retry(
+                    prompt, parametros_validados, parar_apos_classificacao
+                )
+                if classificacao is None:
+                    classificacao = self._extrair_classificacao(resposta_completa)
+                return classificacao, resposta_completa, tokens_info
+
             resposta_completa, tokens_info = self._fazer_chamada_com_retry(
                 prompt, parametros_validados
             )
@@ -220,6 +246,49 @@ class AzureService(AIServiceInterface):
         
         raise Exception("Falha ao completar chamada Azure OpenAI após múltiplas tentativas")
     
+    def _fazer_chamada_streaming_com_retry(self,
+                                           prompt: str,
+                                           parametros: Dict[str, Any],
+                                           parar_apos_classificacao: bool,
+                                           max_retries: int = 3) -> Tuple[str, Dict[str, int], Optional[str]]:
+        """Chamada em streaming para Azure OpenAI.
+
+        Sem stream_options (depende da api-version do recurso): tokens são estimados
+        quando o chunk de usage não vem.
+        """
+        for tentativa in range(max_retries):
+            try:
+                stream = self.client.chat.completions.create(
+                    model=parametros['model'],
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=parametros['temperature'],
+                    max_tokens=parametros['max_tokens'],
+                    stream=True,
+                )
+                extrator = ExtratorIncrementalClassificacaoTriagem(self.config.TIPOS_ACAO)
+                texto, tokens_info, interrompido = consumir_stream_chat_completions(
+                    stream,
+                    extrator,
+                    parar_apos_classificacao=parar_apos_classificacao,
+                    prompt=prompt,
+                )
+                return texto, tokens_info, extrator.classificacao if interrompido else None
+                
+            except Exception as e:
+                if tentativa < max_retries - 1:
+                    wait_time = 2 ** tentativa
+                    print(f"Erro no streaming Azure OpenAI: {e}. Tentando novamente em {wait_time}s...")
+                    time.sleep(wait_time)
+                else:
+                    raise Exception(f"Erro da API Azure OpenAI (streaming) após múltiplas tentativas: {str(e)}")
+        
+        raise Exception("Falha ao completar chamada Azure OpenAI (streaming) após múltiplas tentativas")
+    
     def _extrair_classificacao(self, resposta: str) -> str:
         """Extrair classificação da resposta (núcleo compartilhado + fallbacks específicos Azure)."""
         tipos = self.config.TIPOS_ACAO
@@ -233,14 +302,8 @@ class AzureService(AIServiceInterface):
         self, resposta: str, tipos_validos: List[str]
     ) -> Optional[str]:
         """Regex e heurísticas que existiam só no Azure quando o núcleo não resolve."""
-        padroes = [
-            r"(?:CLASSIFICAÇÃO|AÇÃO):\s*([A-ZÁÊÇÕ\s]+)",
-            r"(?:Classificação|Ação):\s*([A-Záêçõ\s]+)",
-            r"\*\*(?:CLASSIFICAÇÃO|AÇÃO)\*\*:\s*([A-ZÁÊÇÕ\s]+)",
-            r"\*\*(?:Classificação|Ação)\*\*:\s*([A-Záêçõ\s]+)",
-        ]
-        for padrao in padroes:
-            match = re.search(padrao, resposta, re.IGNORECASE)
+        for padrao in _PADROES_FALLBACK_CLASSIFICACAO_AZURE:
+            match = padrao.search(resposta)
             if match:
                 classificacao = match.group(1).strip().upper()
                 for tipo in tipos_validos:
@@ -0,0 +1,256 @@
+"""
+Backups do banco SQLite sem parar o sistema: cópia online, compressão, retenção e agendamento.
+
+A cópia usa a API de backup do SQLite (sqlite3.Connection.backup) em passos de poucas páginas:
+entre um passo e outro o bloqueio de leitura é solto e as escritas seguem normalmente. Se outra
+conexão grava durante a cópia, o SQLite recomeça do início para manter o snapshot consistente;
+depois de MAX_REINICIOS_BACKUP recomeços a cópia é feita num passo só (escritas esperam só esse
+trecho). O snapshot é então comprimido em streaming (gzip ou zip, conforme compressao_backup) e
+publicado com os.replace, então nunca fica um backup pela metade com o nome final.
+
+Configurações usadas (config.json): backup_automatico (disabled/daily/weekly/monthly), max_backups,
+diretorio_backup (relativo à pasta do banco) e compressao_backup (none/gzip/zip).
+"""
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from services.troca_segura_arquivo_banco_sqlite_hot_swap_service import obter_portao_conexoes
+
+PREFIXO_ARQUIVO_BACKUP = 'database_backup_'
+EXTENSOES_BACKUP = {'none': '.db', 'gzip': '.db.gz', 'zip': '.zip'}
+NOME_BANCO_NO_ZIP = 'database.db'
+
+FREQUENCIAS_BACKUP_AUTOMATICO = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(days=7),
+    'monthly': timedelta(days=30),
+}
+
+PAGINAS_POR_PASSO_BACKUP = 256
+MAX_REINICIOS_BACKUP = 3
+TAMANHO_BLOCO_COMPRESSAO = 1024 * 1024
+INTERVALO_VERIFICACAO_AGENDADOR_SEGUNDOS = 600
+
+_PADRAO_ARQUIVO_BACKUP = re.compile(
+    rf'^{PREFIXO_ARQUIVO_BACKUP}(?P<motivo>[a-z_]+)_(?P<data>\d{{8}}_\d{{6}}_\d{{3}})'
+    rf'(?P<extensao>\.db\.gz|\.db|\.zip)$'
+)
+
+
+class _ReiniciosExcessivos(Exception):
+    pass
+
+
+def copiar_banco_online(origem: str,
+                        destino: str,
+                        paginas_por_passo: int = PAGINAS_POR_PASSO_BACKUP,
+                        max_reinicios: int = MAX_REINICIOS_BACKUP) -> int:
+    """Snapshot consistente de `origem` em `destino`; retorna quantos recomeços houve."""
+    reinicios = 0
+
+    def _copiar(paginas: int, progresso=None) -> None:
+        conn_origem = sqlite3.connect(origem, timeout=30)
+        conn_destino = sqlite3.connect(destino)
+        try:
+            conn_origem.backup(conn_destino, pages=paginas, progress=progresso)
+        finally:
+            conn_destino.close()
+            conn_origem.close()
+
+    restante_anterior = None
+
+    def _progresso(status, restante, total):
+        nonlocal restante_anterior, reinicios
+        if restante_anterior is not None and restante > restante_anterior:
+            reinicios += 1
+            if reinicios > max_reinicios:
+                raise _ReiniciosExcessivos()
+        restante_anterior = restante
+
+    try:
+        _copiar(paginas_por_passo, _progresso)
+    except _ReiniciosExcessivos:
+        _copiar(-1)
+    return reinicios
+
+
+def _comprimir(origem: str, destino: str, compressao: str) -> None:
+    if compressao == 'gzip':
+        with open(origem, 'rb') as entrada, gzip.open(destino, 'wb', compresslevel=6) as saida:
+            shutil.copyfileobj(entrada, saida, TAMANHO_BLOCO_COMPRESSAO)
+    elif compressao == 'zip':
+        with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            with open(origem, 'rb') as entrada, zf.open(NOME_BANCO_NO_ZIP, 'w', force_zip64=True) as saida:
+                shutil.copyfileobj(entrada, saida, TAMANHO_BLOCO_COMPRESSAO)
+    else:
+        shutil.copyfile(origem, destino)
+
+
+def extrair_backup(caminho_backup: str, destino: str) -> None:
+    """Grava em `destino` o banco contido no backup (.db, .db.gz ou .zip), em streaming."""
+    with ExitStack() as pilha:
+        if caminho_backup.endswith('.gz'):
+            entrada = pilha.enter_context(gzip.open(caminho_backup, 'rb'))
+        elif caminho_backup.endswith('.zip'):
+            zf = pilha.enter_context(zipfile.ZipFile(caminho_backup))
+            entrada = pilha.enter_context(zf.open(NOME_BANCO_NO_ZIP))
+        else:
+            entrada = pilha.enter_context(open(caminho_backup, 'rb'))
+        with open(destino, 'wb') as saida:
+            shutil.copyfileobj(entrada, saida, TAMANHO_BLOCO_COMPRESSAO)
+
+
+def remover_arquivo_silencioso(caminho: str) -> None:
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+class ServicoBackupBanco:
+    """Cria, lista e poda backups do banco; opcionalmente agenda backups automáticos."""
+
+    def __init__(self, db_path: str, obter_config: Callable[[], Dict[str, Any]]):
+        self.db_path = db_path
+        self.obter_config = obter_config
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread_agendador: Optional[threading.Thread] = None
+
+    @property
+    def diretorio(self) -> str:
+        diretorio = str(self.obter_config().get('diretorio_backup') or './backups')
+        if not os.path.isabs(diretorio):
+            diretorio = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), diretorio)
+        return os.path.normpath(diretorio)
+
+    def _compressao(self) -> str:
+        compressao = str(self.obter_config().get('compressao_backup') or 'zip')
+        return compressao if compressao in EXTENSOES_BACKUP else 'zip'
+
+    def _max_backups(self) -> int:
+        try:
+            return max(1, int(self.obter_config().get('max_backups', 10)))
+        except (TypeError, ValueError):
+            return 10
+
+    def criar_snapshot_temporario(self, diretorio: Optional[str] = None) -> str:
+        """Cópia consistente (.db, sem compressão) num arquivo temporário; o chamador remove."""
+        diretorio = diretorio or self.diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        fd, caminho = tempfile.mkstemp(prefix='.snapshot-', suffix='.db', dir=diretorio)
+        os.close(fd)
+        try:
+            # pelo portão: a cópia não começa no meio de uma troca do arquivo do banco
+            with obter_portao_conexoes(self.db_path).compartilhado():
+                copiar_banco_online(self.db_path, caminho)
+        except BaseException:
+            remover_arquivo_silencioso(caminho)
+            raise
+        return caminho
+
+    def criar_backup(self, motivo: str = 'manual') -> Dict[str, Any]:
+        """Snapshot online, comprimido e publicado atomicamente; aplica a retenção em seguida."""
+        if not re.fullmatch(r'[a-z_]+', motivo):
+            raise ValueError(f'Motivo de backup inválido: {motivo!r}')
+        with self._lock:
+            inicio = time.perf_counter()
+            diretorio = self.diretorio
+            compressao = self._compressao()
+            carimbo = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+            nome = f'{PREFIXO_ARQUIVO_BACKUP}{motivo}_{carimbo}{EXTENSOES_BACKUP[compressao]}'
+            destino = os.path.join(diretorio, nome)
+            parcial = destino + '.parcial'
+            snapshot = self.criar_snapshot_temporario(diretorio)
+            try:
+                _comprimir(snapshot, parcial, compressao)
+                os.replace(parcial, destino)
+            finally:
+                remover_arquivo_silencioso(snapshot)
+                remover_arquivo_silencioso(parcial)
+            removidos = self.aplicar_retencao()
+        duracao = time.perf_counter() - inicio
+        print(f"Backup do banco criado: {nome} ({os.path.getsize(destino) / 1024 / 1024:.1f} MB, {duracao:.1f}s)")
+        return {
+            **self._descrever(destino),
+            'duracao_segundos': round(duracao, 3),
+            'removidos_pela_retencao': removidos,
+        }
+
+    def listar_backups(self) -> List[Dict[str, Any]]:
+        """Backups do diretório, do mais recente para o mais antigo."""
+        try:
+            nomes = os.listdir(self.diretorio)
+        except OSError:
+            return []
+        backups = [
+            self._descrever(os.path.join(self.diretorio, nome))
+            for nome in nomes if _PADRAO_ARQUIVO_BACKUP.match(nome)
+        ]
+        return sorted(backups, key=lambda b: b['criado_em'], reverse=True)
+
+    def aplicar_retencao(self) -> List[str]:
+        """Mantém só os max_backups mais recentes; retorna os nomes removidos."""
+        removidos = []
+        for backup in self.listar_backups()[self._max_backups():]:
+            remover_arquivo_silencioso(backup['caminho'])
+            removidos.append(backup['arquivo'])
+        return removidos
+
+    def backup_automatico_pendente(self, agora: Optional[datetime] = None) -> bool:
+        frequencia = FREQUENCIAS_BACKUP_AUTOMATICO.get(str(self.obter_config().get('backup_automatico', 'weekly')))
+        if frequencia is None:
+            return False
+        backups = self.listar_backups()
+        if not backups:
+            return True
+        ultimo = datetime.fromisoformat(backups[0]['criado_em'])
+        return (agora or datetime.now()) - ultimo >= frequencia
+
+    def iniciar_agendador(self, intervalo_segundos: float = INTERVALO_VERIFICACAO_AGENDADOR_SEGUNDOS) -> None:
+        """Thread em segundo plano que, a cada intervalo, cria o backup automático se estiver pendente."""
+        if self._thread_agendador is not None and self._thread_agendador.is_alive():
+            return
+        self._parar.clear()
+
+        def _laco():
+            while not self._parar.wait(intervalo_segundos):
+                try:
+                    if self.backup_automatico_pendente():
+                        self.criar_backup('automatico')
+                except Exception as e:
+                    print(f"Erro no backup automático do banco: {e}")
+
+        self._thread_agendador = threading.Thread(target=_laco, name='backup-automatico', daemon=True)
+        self._thread_agendador.start()
+
+    def encerrar_agendador(self) -> None:
+        self._parar.set()
+        if self._thread_agendador is not None:
+            self._thread_agendador.join(timeout=5)
+
+    @staticmethod
+    def _descrever(caminho: str) -> Dict[str, Any]:
+        nome = os.path.basename(caminho)
+        m = _PADRAO_ARQUIVO_BACKUP.match(nome)
+        criado_em = datetime.strptime(m.group('data'), '%Y%m%d_%H%M%S_%f') if m else datetime.fromtimestamp(
+            os.path.getmtime(caminho))
+        extensao = m.group('extensao') if m else ''
+        return {
+            'arquivo': nome,
+            'caminho': caminho,
+            'motivo': m.group('motivo') if m else '',
+            'compressao': next((c for c, e in EXTENSOES_BACKUP.items() if e == extensao), 'none'),
+            'criado_em': criado_em.isoformat(),
+            'tamanho_bytes': os.path.getsize(caminho),
+        }
@@ -0,0 +1,206 @@
+"""
+Barramento de progresso das sessões de análise, publicado por SSE por session_id.
+
+Quem executa a análise registra os eventos (início, resultado de cada intimação, fim) na tabela
+eventos_progresso_analise e mantém os contadores da sessão em sessoes_analise. A rota SSE só lê
+eventos do banco a partir do último id entregue: nada fica na memória do processo, então o stream
+funciona com vários workers do gunicorn (a análise num, o SSE noutro) e pode ser retomado pelo
+cabeçalho Last-Event-ID.
+
+Cada evento leva os agregados correntes: processadas, acurácia até o momento, vazão, ETA e custo.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+TIPO_EVENTO_INICIO = 'inicio'
+TIPO_EVENTO_ITEM = 'item'
+TIPO_EVENTO_CONCLUSAO = 'conclusao'
+TIPO_EVENTO_CANCELADO = 'cancelado'
+TIPO_EVENTO_ERRO = 'erro'
+TIPOS_EVENTO_TERMINAIS = frozenset({TIPO_EVENTO_CONCLUSAO, TIPO_EVENTO_CANCELADO, TIPO_EVENTO_ERRO})
+
+DIAS_RETENCAO_EVENTOS_PROGRESSO = 7
+
+# Stream SSE: intervalo entre consultas ao banco, comentário de keep-alive e limites de espera
+INTERVALO_CONSULTA_EVENTOS_SEGUNDOS = 0.5
+INTERVALO_KEEPALIVE_SSE_SEGUNDOS = 15.0
+ESPERA_MAX_INICIO_SESSAO_SEGUNDOS = 60.0
+ESPERA_MAX_SEM_EVENTOS_SEGUNDOS = 600.0
+
+
+class ProgressoSessaoAnalise:
+    """
+    Agregados correntes de uma sessão e publicação dos eventos.
+
+    Seguro para chamadas de várias threads (análise paralela): os contadores são atualizados e o
+    evento e os contadores da sessão são gravados sob o mesmo lock, então os ids dos eventos seguem
+    a ordem dos agregados e uma thread atrasada não sobrescreve a sessão com valores antigos.
+    """
+
+    def __init__(self, data_service, session_id: str, total: int,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.data_service = data_service
+        self.session_id = session_id
+        self.total = int(total)
+        self._relogio = relogio
+        self._inicio: Optional[float] = None
+        self._lock = threading.Lock()
+        self.processadas = 0
+        self.analisadas = 0
+        self.falhas = 0
+        self.acertos = 0
+        self.erros = 0
+        self.custo_total = 0.0
+        self.tokens_total = 0
+        self.tempo_total = 0.0
+        self.finalizado = False
+
+    def iniciar(self) -> None:
+        """Publica o início (e aproveita para descartar eventos de sessões antigas)."""
+        limite = (datetime.now() - timedelta(days=DIAS_RETENCAO_EVENTOS_PROGRESSO)).isoformat()
+        self.data_service.limpar_eventos_progresso_analise(limite)
+        with self._lock:
+            self._inicio = self._relogio()
+            self._publicar(TIPO_EVENTO_INICIO, {})
+
+    def registrar_item(self, resultado: Optional[Dict[str, Any]],
+                       intimacao_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Contabiliza o resultado de uma intimação (dict da análise, com 'erro' se falhou, ou None)
+        e publica o evento 'item' com o resumo dele e os agregados. Retorna os agregados.
+        """
+        resultado = resultado or {'intimacao_id': intimacao_id, 'erro': 'Análise não concluída.'}
+        item = {
+            'intimacao_id': resultado.get('intimacao_id', intimacao_id),
+            'resultado_ia': resultado.get('resultado_ia'),
+            'classificacao_manual': resultado.get('classificacao_manual'),
+            'acertou': resultado.get('acertou'),
+            'tempo_processamento': resultado.get('tempo_processamento'),
+            'custo_real': resultado.get('custo_real'),
+            'tokens_input': resultado.get('tokens_input'),
+            'tokens_output': resultado.get('tokens_output'),
+        }
+        if 'erro' in resultado:
+            item['erro'] = resultado['erro']
+
+        with self._lock:
+            self.processadas += 1
+            if 'erro' in resultado:
+                self.falhas += 1
+            else:
+                self.analisadas += 1
+                if resultado.get('acertou') is True:
+                    self.acertos += 1
+                elif resultado.get('acertou') is False:
+                    self.erros += 1
+                self.custo_total += resultado.get('custo_real') or 0.0
+                self.tokens_total += (resultado.get('tokens_input') or 0) + (resultado.get('tokens_output') or 0)
+                self.tempo_total += resultado.get('tempo_processamento') or 0.0
+            agregados = self.agregados()
+            try:
+                self.data_service.registrar_evento_progresso_analise(
+                    self.session_id, TIPO_EVENTO_ITEM, {**agregados, 'item': item}
+                )
+                self.data_service.atualizar_sessao_analise(
+                    self.session_id,
+                    intimações_processadas=agregados['analisadas'],
+                    acertos=agregados['acertos'],
+                    erros=agregados['erros'],
+                    tempo_total=self.tempo_total,
+                    custo_total=self.custo_total,
+                    tokens_total=self.tokens_total,
+                )
+            except Exception as e:
+                # Progresso é acessório: uma falha ao gravá-lo não pode interromper a análise
+                logger.warning('Falha ao gravar o progresso da sessão %s: %s', self.session_id, e)
+        return agregados
+
+    def concluir(self, tipo: str = TIPO_EVENTO_CONCLUSAO, mensagem: Optional[str] = None) -> None:
+        """Publica o evento final (conclusão, cancelamento ou erro); chamadas repetidas são ignoradas."""
+        if tipo not in TIPOS_EVENTO_TERMINAIS:
+            raise ValueError(f'Tipo de evento final inválido: {tipo!r}')
+        with self._lock:
+            if self.finalizado:
+                return
+            self.finalizado = True
+            self._publicar(tipo, {'mensagem': mensagem} if mensagem else {})
+
+    def agregados(self) -> Dict[str, Any]:
+        decorrido = self._relogio() - self._inicio if self._inicio is not None else 0.0
+        vazao = self.processadas / decorrido if decorrido > 0 else 0.0
+        restantes = max(self.total - self.processadas, 0)
+        return {
+            'total': self.total,
+            'atual': self.processadas,
+            'analisadas': self.analisadas,
+            'falhas': self.falhas,
+            'acertos': self.acertos,
+            'erros': self.erros,
+            'acuracia': round(self.acertos / self.analisadas * 100, 1) if self.analisadas else 0,
+            'custo_total': round(self.custo_total, 6),
+            'tokens_total': self.tokens_total,
+            'decorrido_segundos': round(decorrido, 1),
+            'vazao_por_minuto': round(vazao * 60, 2),
+            'eta_segundos': round(restantes / vazao, 1) if vazao > 0 else None,
+        }
+
+    def _publicar(self, tipo: str, dados: Dict[str, Any]) -> Dict[str, Any]:
+        agregados = self.agregados()
+        self.data_service.registrar_evento_progresso_analise(
+            self.session_id, tipo, {**agregados, **dados}
+        )
+        return agregados
+
+
+def formatar_evento_sse(evento_id: Optional[int], dados: Dict[str, Any]) -> str:
+    linha_id = f'id: {evento_id}\n' if evento_id is not None else ''
+    return f'{linha_id}data: {json.dumps(dados, ensure_ascii=False, default=str)}\n\n'
+
+
+def gerar_eventos_sse_sessao(data_service,
+                             session_id: str,
+                             ultimo_id: int = 0,
+                             intervalo_consulta: float = INTERVALO_CONSULTA_EVENTOS_SEGUNDOS,
+                             intervalo_keepalive: float = INTERVALO_KEEPALIVE_SSE_SEGUNDOS,
+                             espera_max_inicio: float = ESPERA_MAX_INICIO_SESSAO_SEGUNDOS,
+                             espera_max_sem_eventos: float = ESPERA_MAX_SEM_EVENTOS_SEGUNDOS,
+                             dormir: Callable[[float], None] = time.sleep,
+                             relogio: Callable[[], float] = time.monotonic) -> Iterator[str]:
+    """
+    Gera as mensagens SSE da sessão a partir de ultimo_id, até o evento final.
+
+    O navegador pode abrir o stream antes de a análise começar: espera até espera_max_inicio pelo
+    primeiro evento. Sem eventos novos por espera_max_sem_eventos (worker que caiu no meio da
+    análise), encerra com um evento de erro não gravado.
+    """
+    ultimo_evento_em = ultimo_envio_em = relogio()
+    while True:
+        eventos = data_service.listar_eventos_progresso_analise(session_id, apos_id=ultimo_id)
+        agora = relogio()
+        for evento in eventos:
+            ultimo_id = evento['id']
+            yield formatar_evento_sse(ultimo_id, {'tipo': evento['tipo'], **evento['dados']})
+            if evento['tipo'] in TIPOS_EVENTO_TERMINAIS:
+                return
+        if eventos:
+            ultimo_evento_em = ultimo_envio_em = agora
+            continue
+
+        espera_max = espera_max_inicio if ultimo_id == 0 else espera_max_sem_eventos
+        if agora - ultimo_evento_em >= espera_max:
+            mensagem = (
+                'Sessão de análise não iniciada.' if ultimo_id == 0
+                else 'Sem notícias da análise há muito tempo; consulte o histórico da sessão.'
+            )
+            yield formatar_evento_sse(None, {'tipo': TIPO_EVENTO_ERRO, 'mensagem': mensagem})
+            return
+        if agora - ultimo_envio_em >= intervalo_keepalive:
+            ultimo_envio_em = agora
+            yield ': keep-alive\n\n'
+        dormir(intervalo_consulta)
@@ -0,0 +1,75 @@
+"""
+Cache de resultados de consultas agregadas (dashboard, relatórios), validado por geração.
+
+Cada entrada guarda a geração dos dados em que foi calculada; quem escreve no banco avança a
+geração e as entradas antigas deixam de valer na próxima leitura, sem varrer o cache. A chave
+é a assinatura da consulta (método + filtros). Despejo LRU por número de entradas e pelo
+tamanho estimado dos resultados; resultados maiores que o limite por entrada não são guardados.
+"""
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+MAX_ENTRADAS_CACHE_CONSULTAS = 256
+MAX_BYTES_CACHE_CONSULTAS = 16 * 1024 * 1024
+
+
+def _tamanho_estimado(valor: Any) -> int:
+    """Aproximação barata (tamanho do repr), suficiente para limitar a memória do cache."""
+    return len(repr(valor))
+
+
+class CacheConsultasAgregadas:
+    """LRU thread-safe de resultados; obter_ou_calcular devolve sempre uma cópia."""
+
+    def __init__(self,
+                 max_entradas: int = MAX_ENTRADAS_CACHE_CONSULTAS,
+                 max_bytes: int = MAX_BYTES_CACHE_CONSULTAS):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # chave -> (geração, valor, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter_ou_calcular(self, chave: Hashable, geracao: Hashable, calcular: Callable[[], Any]) -> Any:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] == geracao:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return copy.deepcopy(entrada[1])
+            self.faltas += 1
+
+        # Calculado fora do lock: consultas diferentes não esperam umas pelas outras
+        valor = calcular()
+        tamanho = _tamanho_estimado(valor)
+        if tamanho <= self.max_bytes // 4:
+            with self._lock:
+                self._remover(chave)
+                self._entradas[chave] = (geracao, copy.deepcopy(valor), tamanho)
+                self._bytes += tamanho
+                while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                    self._remover(next(iter(self._entradas)))
+        return valor
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes_estimados': self._bytes,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+            }
+
+    def _remover(self, chave: Hashable) -> None:
+        entrada = self._entradas.pop(chave, None)
+        if entrada is not None:
+            self._bytes -= entrada[2]
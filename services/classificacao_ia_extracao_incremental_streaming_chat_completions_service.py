@@ -0,0 +1,135 @@
+"""
+Streaming de chat.completions com reconhecimento incremental da classificação (triagem).
+
+Prompts que pedem JSON com `triagem` + `justificativa` longa deixam a classificação pronta
+muito antes do fim da resposta. O extrator incremental recebe os deltas do stream e devolve o
+rótulo canônico (Config.TIPOS_ACAO / ALIASES_TRIAGEM_IA_PARA_CANONICO) assim que o valor do campo
+`triagem` fecha aspas; opcionalmente o consumo do stream é interrompido nesse ponto.
+"""
+import json
+import math
+import re
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_service import (
+    resolver_rotulo_canonico_triagem,
+)
+
+# Valor string completo do campo "triagem" (aceita escapes JSON dentro do valor)
+_RE_CAMPO_TRIAGEM_JSON_COMPLETO = re.compile(r'"triagem"\s*:\s*"((?:[^"\\]|\\.)*)"', re.IGNORECASE)
+
+# Quanto do fim do buffer é re-examinado a cada delta (chave + espaços + maior rótulo cabem folgados)
+_JANELA_REVARREDURA_CHARS = 256
+
+# Heurística de tokens quando o stream é interrompido antes do chunk de usage
+CHARS_POR_TOKEN_ESTIMADO = 4
+
+
+class ExtratorIncrementalClassificacaoTriagem:
+    """Acumula deltas de texto e reconhece o rótulo canônico assim que `triagem` estiver completo."""
+
+    def __init__(self, tipos_acao: Sequence[str]):
+        self.tipos_acao = list(tipos_acao)
+        self.texto = ""
+        self._inicio_busca = 0
+        self.classificacao: Optional[str] = None
+
+    def alimentar(self, delta: Optional[str]) -> Optional[str]:
+        """Adiciona um delta; retorna o rótulo canônico quando reconhecido (uma vez reconhecido, fixo)."""
+        if delta:
+            self.texto += delta
+        if self.classificacao is not None or not delta:
+            return self.classificacao
+
+        match = _RE_CAMPO_TRIAGEM_JSON_COMPLETO.search(self.texto, self._inicio_busca)
+        if match:
+            try:
+                valor = json.loads(f'"{match.group(1)}"')
+            except (json.JSONDecodeError, ValueError):
+                valor = match.group(1)
+            self.classificacao = resolver_rotulo_canonico_triagem(valor, self.tipos_acao)
+            # Valor não reconhecido: segue até o fim e deixa o extrator completo decidir
+            self._inicio_busca = match.end()
+        else:
+            self._inicio_busca = max(self._inicio_busca, len(self.texto) - _JANELA_REVARREDURA_CHARS)
+        return self.classificacao
+
+
+def estimar_tokens_texto(texto: Optional[str]) -> int:
+    """Estimativa grosseira (~4 caracteres por token) para quando a API não informa usage."""
+    if not texto:
+        return 0
+    return max(1, math.ceil(len(texto) / CHARS_POR_TOKEN_ESTIMADO))
+
+
+def _texto_delta_chunk(chunk: Any) -> str:
+    choices = getattr(chunk, "choices", None) or []
+    if not choices:
+        return ""
+    delta = getattr(choices[0], "delta", None)
+    if delta is None:
+        return ""
+    conteudo = getattr(delta, "content", None)
+    if isinstance(conteudo, str):
+        return conteudo
+    if isinstance(conteudo, list):
+        return "".join(
+            str(b.get("text", "")) if isinstance(b, dict) else str(getattr(b, "text", "") or "")
+            for b in conteudo
+        )
+    refusal = getattr(delta, "refusal", None)
+    return str(refusal) if refusal else ""
+
+
+def consumir_stream_chat_completions(
+    stream: Iterable[Any],
+    extrator: ExtratorIncrementalClassificacaoTriagem,
+    *,
+    parar_apos_classificacao: bool,
+    prompt: str,
+) -> Tuple[str, Dict[str, int], bool]:
+    """
+    Consome o stream do SDK OpenAI alimentando o extrator.
+
+    Returns:
+        (texto acumulado, tokens_info, interrompido). Sem chunk de usage (stream cortado ou
+        provedor sem include_usage), tokens são estimados e tokens_info['estimado'] = True.
+    """
+    usage = None
+    chunks_conteudo = 0
+    interrompido = False
+    try:
+        for chunk in stream:
+            chunk_usage = getattr(chunk, "usage", None)
+            if chunk_usage is not None:
+                usage = chunk_usage
+            delta = _texto_delta_chunk(chunk)
+            if delta:
+                chunks_conteudo += 1
+            if extrator.alimentar(delta) is not None and parar_apos_classificacao:
+                interrompido = True
+                break
+    finally:
+        fechar = getattr(stream, "close", None)
+        if interrompido and callable(fechar):
+            # Fecha a conexão HTTP: o provedor para de gerar (e de cobrar) tokens de saída
+            fechar()
+
+    texto = extrator.texto.strip()
+    if usage is not None:
+        tokens_info: Dict[str, int] = {
+            "input": getattr(usage, "prompt_tokens", 0) or 0,
+            "output": getattr(usage, "completion_tokens", 0) or 0,
+            "total": getattr(usage, "total_tokens", 0) or 0,
+        }
+    else:
+        tokens_input = estimar_tokens_texto(prompt)
+        # Cada delta de conteúdo corresponde, na prática, a ~1 token de saída
+        tokens_output = max(chunks_conteudo, estimar_tokens_texto(texto))
+        tokens_info = {
+            "input": tokens_input,
+            "output": tokens_output,
+            "total": tokens_input + tokens_output,
+            "estimado": True,
+        }
+    return texto, tokens_info, interrompido
@@ -7,7 +7,7 @@ Para novo tipo: (1) adicione em TIPOS_ACAO; (2) se a IA devolver token diferente
 """
 import json
 import re
-from typing import List, Sequence
+from typing import Iterable, List, Optional, Sequence
 
 # Variações comuns na saída da IA (UPPER) → rótulo exatamente como em Config.TIPOS_ACAO
 ALIASES_TRIAGEM_IA_PARA_CANONICO: dict[str, str] = {
@@ -31,64 +31,124 @@ ALIASES_TRIAGEM_IA_PARA_CANONICO: dict[str, str] = {
 
 ERRO_CLASSIFICACAO_NAO_RECONHECIDA_PREFIX = "ERRO: Classificação não reconhecida"
 
+# Padrões da última etapa, aplicados (em ordem) sobre a resposta já em UPPER.
+# Equivalem aos antigos padrões minúsculos com re.IGNORECASE: sobre texto em UPPER o único
+# caractere extra aceito pelo IGNORECASE é "İ" (U+0130) no lugar de "i" — daí o [Iİ].
+# Sem IGNORECASE o sre usa o prefixo literal e não testa cada posição (~10x mais rápido).
+_PADROES_TRIAGEM_TEXTO_UPPER = tuple(
+    re.compile(p)
+    for p in (
+        r'"TR[Iİ]AGEM":\s*"([^"]+)"',
+        r"TR[Iİ]AGEM[:\s]*([^\n\.]+)",
+        r"CLASS[Iİ]F[Iİ]CAÇÃO[:\s]*([^\n\.]+)",
+        r"RESPOSTA[:\s]*([^\n\.]+)",
+        r"AÇÃO[:\s]*([^\n\.]+)",
+        r"^([^\n\.]+)$",
+    )
+)
+
+
+class MatcherClassificacaoTriagem:
+    """
+    Tabelas pré-compiladas (uma vez por lista de tipos + aliases) para a extração.
+
+    Precedência idêntica ao fluxo original:
+      1. JSON com chave `triagem` (alias, depois tipo em UPPER);
+      2. tipo canônico como substring (ordem de tipos_acao);
+      3. alias como substring (ordem do dict);
+      4. todas as palavras de um tipo presentes (ordem de tipos_acao);
+      5. primeiro match de cada padrão textual, se for alias/tipo exato.
+    As etapas 2-3 continuam como varreduras `in` em ordem de prioridade: no CPython elas
+    rodam em C e ficaram mais rápidas que regex combinada/autômato em Python.
+    """
+
+    def __init__(self, tipos_acao: Sequence[str], aliases: dict):
+        self.tipos_acao = tuple(tipos_acao)
+        self.aliases = dict(aliases)
+        # alias tem prioridade; entre tipos repetidos vale o primeiro
+        self._rotulo_por_token_exato = {t.upper(): t for t in reversed(self.tipos_acao)}
+        self._rotulo_por_token_exato.update(self.aliases)
+        # etapas 2-3 em uma única tabela na ordem de prioridade
+        self._substrings = tuple(
+            [(t.upper(), t) for t in self.tipos_acao]
+            + [(variacao, canonico) for variacao, canonico in self.aliases.items()]
+        )
+        self._palavras_por_tipo = tuple(
+            (tuple(t.upper().split()), t) for t in self.tipos_acao if t.upper().split()
+        )
+        self._palavras_unicas = tuple(
+            dict.fromkeys(p for palavras, _ in self._palavras_por_tipo for p in palavras)
+        )
+
+    def resolver_token(self, valor: str) -> Optional[str]:
+        return self._rotulo_por_token_exato.get(str(valor).upper().strip())
+
+    def extrair(self, resposta: Optional[str]) -> str:
+        if resposta is None or not str(resposta).strip():
+            return "ERRO: Resposta vazia"
+
+        resposta_limpa = resposta.strip().upper()
+
+        # json.loads só devolve algo útil para objeto (dict); qualquer outra coisa falha igual
+        if resposta.lstrip().startswith("{"):
+            try:
+                dados_json = json.loads(resposta)
+                if "triagem" in dados_json:
+                    rotulo = self.resolver_token(dados_json["triagem"])
+                    if rotulo is not None:
+                        return rotulo
+            except (json.JSONDecodeError, TypeError, AttributeError):
+                pass
+
+        for variacao, rotulo in self._substrings:
+            if variacao in resposta_limpa:
+                return rotulo
+
+        presentes = {p for p in self._palavras_unicas if p in resposta_limpa}
+        if presentes:
+            for palavras, tipo_acao in self._palavras_por_tipo:
+                if presentes.issuperset(palavras):
+                    return tipo_acao
+
+        for padrao in _PADROES_TRIAGEM_TEXTO_UPPER:
+            match = padrao.search(resposta_limpa)
+            if match:
+                rotulo = self._rotulo_por_token_exato.get(match.group(1).strip())
+                if rotulo is not None:
+                    return rotulo
+
+        return f"{ERRO_CLASSIFICACAO_NAO_RECONHECIDA_PREFIX} - {resposta[:100]}"
+
+    def extrair_lote(self, respostas: Iterable[Optional[str]]) -> List[str]:
+        """Reclassificação em massa de respostas armazenadas (mesmas regras de extrair)."""
+        extrair = self.extrair
+        return [extrair(r) for r in respostas]
+
+
+_matcher_cache: dict = {}
+
+
+def obter_matcher_classificacao(tipos_acao: Sequence[str]) -> MatcherClassificacaoTriagem:
+    """Matcher compilado por lista de tipos; recompila se ALIASES_TRIAGEM_IA_PARA_CANONICO mudar."""
+    chave = tuple(tipos_acao)
+    matcher = _matcher_cache.get(chave)
+    if matcher is None or matcher.aliases != ALIASES_TRIAGEM_IA_PARA_CANONICO:
+        matcher = MatcherClassificacaoTriagem(chave, ALIASES_TRIAGEM_IA_PARA_CANONICO)
+        _matcher_cache[chave] = matcher
+    return matcher
+
+
+def resolver_rotulo_canonico_triagem(valor: str, tipos_acao: Sequence[str]) -> Optional[str]:
+    """Valor do campo `triagem` → rótulo canônico (alias primeiro, depois igualdade em UPPER)."""
+    return obter_matcher_classificacao(tipos_acao).resolver_token(valor)
+
 
 def extrair_classificacao_da_resposta_ia(resposta: str, tipos_acao: Sequence[str]) -> str:
     """
     Núcleo compartilhado (equivalente ao fluxo completo do antigo openai_service._extrair_classificacao).
     Usa apenas tipos_acao e ALIASES_TRIAGEM_IA_PARA_CANONICO — sem lista fixa de tipos.
     """
-    if resposta is None or not str(resposta).strip():
-        return "ERRO: Resposta vazia"
-
-    tipos: List[str] = list(tipos_acao)
-    resposta_limpa = resposta.strip().upper()
-    aliases = ALIASES_TRIAGEM_IA_PARA_CANONICO
-
-    try:
-        dados_json = json.loads(resposta)
-        if "triagem" in dados_json:
-            triagem_ia = str(dados_json["triagem"]).upper().strip()
-            if triagem_ia in aliases:
-                return aliases[triagem_ia]
-            for tipo_acao in tipos:
-                if tipo_acao.upper() == triagem_ia:
-                    return tipo_acao
-    except (json.JSONDecodeError, TypeError, AttributeError):
-        pass
-
-    for tipo_acao in tipos:
-        if tipo_acao.upper() in resposta_limpa:
-            return tipo_acao
-
-    for variacao, classificacao_padrao in aliases.items():
-        if variacao in resposta_limpa:
-            return classificacao_padrao
-
-    for tipo_acao in tipos:
-        palavras_chave = tipo_acao.upper().split()
-        if palavras_chave and all(p in resposta_limpa for p in palavras_chave):
-            return tipo_acao
-
-    patterns = [
-        r'"triagem":\s*"([^"]+)"',
-        r"triagem[:\s]*([^\n\.]+)",
-        r"classificação[:\s]*([^\n\.]+)",
-        r"resposta[:\s]*([^\n\.]+)",
-        r"ação[:\s]*([^\n\.]+)",
-        r"^([^\n\.]+)$",
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, resposta_limpa, re.IGNORECASE)
-        if match:
-            possivel = match.group(1).strip()
-            if possivel in aliases:
-                return aliases[possivel]
-            for tipo_acao in tipos:
-                if tipo_acao.upper() == possivel:
-                    return tipo_acao
-
-    return f"{ERRO_CLASSIFICACAO_NAO_RECONHECIDA_PREFIX} - {resposta[:100]}"
+    return obter_matcher_classificacao(tipos_acao).extrair(resposta)
 
 
 def classificacao_extracao_indica_falha_nucleo(resultado: str) -> bool:
@@ -2,77 +2,128 @@
 Serviço dedicado para cálculo e exibição de custos de IA
 Isola toda a lógica de custos para evitar quebras em outras funcionalidades
 """
+from __future__ import annotations
 
+import hashlib
 import json
-import os
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
 from datetime import datetime
 
+from services.armazenamento_config_json_cache_mtime_service import obter_armazenamento_config
+
+if TYPE_CHECKING:  # numpy só é importado no primeiro cálculo em lote (fora do boot do app)
+    import numpy as np
+
+# Chaves do config.json que formam a tabela de preços
+CHAVES_CONFIG_PRECOS = frozenset({'precos_azure', 'precos_openai'})
+
+# Preços padrão (USD por 1M tokens) quando config.json não define a tabela do provedor
+PRECOS_PADRAO_AZURE = {
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+PRECOS_PADRAO_OPENAI = dict(PRECOS_PADRAO_AZURE)
+
+
+def _normalizar_precos_provedor(precos: Optional[Dict]) -> Dict[str, Tuple[float, float]]:
+    """{'modelo': {'input': x, 'output': y}} -> {'modelo': (x, y)}; ignora chaves como data_atualizacao."""
+    if not isinstance(precos, dict):
+        return {}
+    normalizados = {}
+    for modelo, valores in precos.items():
+        if not isinstance(valores, dict):
+            continue
+        try:
+            normalizados[modelo] = (float(valores.get('input', 0) or 0), float(valores.get('output', 0) or 0))
+        except (TypeError, ValueError):
+            continue
+    return normalizados
+
+
+def _chave_tabela_provedor(provider: Optional[str]) -> str:
+    provider_key = (provider or '').lower()
+    # LiteLLM usa tabela OpenAI como aproximação
+    return 'openai' if provider_key == 'litellm' else provider_key
+
+
 class CostCalculationService:
     """Serviço para cálculo e exibição de custos de IA"""
     
     def __init__(self, config_path: str = "data/config.json"):
         self.config_path = config_path
+        self._armazenamento_config = obter_armazenamento_config(config_path)
+        self._armazenamento_config.registrar_observador(self._ao_alterar_config)
         self._precos_cache = None
-        self._last_config_check = None
+        self._versao_precos = ''
+        self._avisos_emitidos = set()
     
     def _load_config(self) -> Dict:
-        """Carrega configurações do arquivo config.json"""
-        try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            print(f"Erro ao carregar config.json: {e}")
-            return {}
+        """Configurações do config.json (cache compartilhado com o SQLiteService)"""
+        return self._armazenamento_config.verificar()
+    
+    def _ao_alterar_config(self, config: Dict, alteradas: set) -> None:
+        """Observador do config.json: só descarta a tabela se algum preço mudou"""
+        if alteradas & CHAVES_CONFIG_PRECOS:
+            self._precos_cache = None
     
     def _get_precos_modelos(self) -> Dict:
-        """Obtém preços dos modelos com cache"""
-        config = self._load_config()
+        """
+        Obtém preços dos modelos com cache
         
-        # Verificar se o cache ainda é válido
-        if self._precos_cache and self._last_config_check:
-            try:
-                current_mtime = os.path.getmtime(self.config_path)
-                if current_mtime <= self._last_config_check:
-                    return self._precos_cache
-            except OSError:
-                pass
-        
-        # Carregar preços do Azure
-        precos_azure = config.get('precos_azure', {})
-        if not precos_azure:
-            # Preços padrão do Azure se não configurados
-            precos_azure = {
-                "gpt-4o": {"input": 2.5, "output": 10.0},
-                "gpt-4o-mini": {"input": 0.15, "output": 0.6},
-                "gpt-4": {"input": 30.0, "output": 60.0},
-                "gpt-4-turbo": {"input": 10.0, "output": 30.0},
-                "gpt-3.5-turbo": {"input": 0.5, "output": 1.5}
-            }
+        A tabela é remontada só quando as chaves de preço do config.json mudam (o armazenamento
+        relê o arquivo pelo mtime e avisa o observador); sem arquivo, a padrão é montada uma vez.
+        """
+        self._armazenamento_config.verificar()
+        if self._precos_cache is not None:
+            return self._precos_cache
         
-        # Carregar preços do OpenAI
-        precos_openai = config.get('precos_openai', {})
-        if not precos_openai:
-            # Preços padrão do OpenAI se não configurados
-            precos_openai = {
-                "gpt-4o": {"input": 2.5, "output": 10.0},
-                "gpt-4o-mini": {"input": 0.15, "output": 0.6},
-                "gpt-4": {"input": 30.0, "output": 60.0},
-                "gpt-4-turbo": {"input": 10.0, "output": 30.0},
-                "gpt-3.5-turbo": {"input": 0.5, "output": 1.5}
-            }
+        config = self._load_config()
         
         precos = {
-            'azure': precos_azure,
-            'openai': precos_openai
+            'azure': _normalizar_precos_provedor(config.get('precos_azure')) or dict(PRECOS_PADRAO_AZURE),
+            'openai': _normalizar_precos_provedor(config.get('precos_openai')) or dict(PRECOS_PADRAO_OPENAI),
         }
         
         # Atualizar cache
         self._precos_cache = precos
-        self._last_config_check = datetime.now().timestamp()
+        self._versao_precos = hashlib.sha1(
+            json.dumps(precos, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
         
         return precos
     
+    def _precos_do_modelo(self, modelo: str, provider: str) -> Optional[Tuple[float, float]]:
+        """(input, output) por 1M tokens ou None; avisa uma única vez por provedor/modelo desconhecido."""
+        precos = self._get_precos_modelos()
+        provider_key = _chave_tabela_provedor(provider)
+        provider_precos = precos.get(provider_key)
+        if not provider_precos:
+            self._avisar_preco_ausente(provider, None)
+            return None
+        modelo_precos = provider_precos.get(modelo)
+        if modelo_precos is None:
+            self._avisar_preco_ausente(provider, modelo)
+            return None
+        return modelo_precos
+    
+    def _avisar_preco_ausente(self, provider: str, modelo: Optional[str]) -> None:
+        chave = (provider, modelo)
+        if chave in self._avisos_emitidos:
+            return
+        self._avisos_emitidos.add(chave)
+        if modelo is None:
+            print(f"Provedor '{provider}' não encontrado nos preços")
+        else:
+            print(f"Modelo '{modelo}' não encontrado nos preços do {provider}")
+    
+    def versao_precos(self) -> str:
+        """Identificador curto da tabela de preços vigente (muda quando qualquer preço muda)."""
+        self._get_precos_modelos()
+        return self._versao_precos
+    
     def calculate_real_cost(self, 
                           tokens_input: int, 
                           tokens_output: int, 
@@ -91,25 +142,11 @@ class CostCalculationService:
             Custo total calculado
         """
         try:
-            precos = self._get_precos_modelos()
-            
-            # Obter preços do provedor (LiteLLM usa tabela OpenAI como aproximação)
-            provider_key = provider.lower()
-            if provider_key == 'litellm':
-                provider_key = 'openai'
-            provider_precos = precos.get(provider_key, {})
-            if not provider_precos:
-                print(f"Provedor '{provider}' não encontrado nos preços")
+            modelo_precos = self._precos_do_modelo(modelo, provider)
+            if modelo_precos is None:
                 return 0.0
             
-            # Obter preços do modelo
-            modelo_precos = provider_precos.get(modelo, {})
-            if not modelo_precos:
-                print(f"Modelo '{modelo}' não encontrado nos preços do {provider}")
-                return 0.0
-            
-            preco_input = modelo_precos.get('input', 0)
-            preco_output = modelo_precos.get('output', 0)
+            preco_input, preco_output = modelo_precos
             
             # Calcular custos (preços são por 1M tokens)
             custo_input = (tokens_input / 1000000) * preco_input
@@ -124,6 +161,135 @@ class CostCalculationService:
             print(f"Erro ao calcular custo: {e}")
             return 0.0
     
+    def calcular_custos_lote(self,
+                             tokens_input: Sequence[int],
+                             tokens_output: Sequence[int],
+                             modelos: Union[str, Sequence[str]],
+                             provider: str) -> np.ndarray:
+        """
+        Calcula o custo de vários itens numa passada vetorizada
+        
+        Args:
+            tokens_input: Tokens de entrada por item
+            tokens_output: Tokens de saída por item
+            modelos: Um modelo para todos os itens ou um modelo por item
+            provider: Provedor (azure, openai ou litellm)
+        
+        Returns:
+            Array float64 com o custo de cada item (mesma fórmula de calculate_real_cost, arredondada
+            a 6 casas com np.round, que pode diferir de round() em 1e-6 nos empates; modelo sem
+            preço custa 0)
+        """
+        import numpy as np
+        entrada = np.asarray(tokens_input, dtype=np.float64).ravel()
+        saida = np.asarray(tokens_output, dtype=np.float64).ravel()
+        if entrada.shape != saida.shape:
+            raise ValueError("tokens_input e tokens_output devem ter o mesmo tamanho")
+        
+        if isinstance(modelos, str):
+            precos = self._precos_do_modelo(modelos, provider) or (0.0, 0.0)
+            preco_input = np.float64(precos[0])
+            preco_output = np.float64(precos[1])
+        else:
+            nomes = np.asarray(modelos, dtype=object).ravel()
+            if nomes.shape != entrada.shape:
+                raise ValueError("modelos deve ter um item por par de tokens")
+            unicos, indices = np.unique(nomes.astype(str), return_inverse=True)
+            tabela = np.array(
+                [self._precos_do_modelo(m, provider) or (0.0, 0.0) for m in unicos],
+                dtype=np.float64,
+            ).reshape(-1, 2)
+            preco_input = tabela[indices, 0]
+            preco_output = tabela[indices, 1]
+        
+        custos = (entrada / 1000000) * preco_input + (saida / 1000000) * preco_output
+        return np.round(custos, 6)
+    
+    def lancamentos_custos_sessao(self,
+                                  session_id: str,
+                                  provider: str,
+                                  resultados: List[Dict]) -> List[Dict]:
+        """
+        Agrega os resultados de uma sessão em lançamentos do ledger `custos`
+        
+        Um lançamento por modelo, com tokens somados e custo recalculado em lote com a tabela vigente.
+        Resultados com 'erro' ficam de fora.
+        """
+        validos = [r for r in resultados if 'erro' not in r]
+        if not validos:
+            return []
+        
+        import numpy as np
+        modelos = np.array([str(r.get('modelo') or '') for r in validos], dtype=object)
+        entrada = np.array([r.get('tokens_input') or 0 for r in validos], dtype=np.int64)
+        saida = np.array([r.get('tokens_output') or 0 for r in validos], dtype=np.int64)
+        custos = self.calcular_custos_lote(entrada, saida, modelos, provider)
+        
+        unicos, indices = np.unique(modelos.astype(str), return_inverse=True)
+        quantidade = np.bincount(indices, minlength=len(unicos))
+        soma_entrada = np.bincount(indices, weights=entrada, minlength=len(unicos))
+        soma_saida = np.bincount(indices, weights=saida, minlength=len(unicos))
+        soma_custos = np.bincount(indices, weights=custos, minlength=len(unicos))
+        
+        versao = self.versao_precos()
+        data_registro = datetime.now().isoformat()
+        lancamentos = []
+        for i, modelo in enumerate(unicos):
+            precos = self._precos_do_modelo(modelo, provider) or (0.0, 0.0)
+            lancamentos.append({
+                'session_id': session_id,
+                'provider': provider,
+                'modelo': modelo,
+                'versao_precos': versao,
+                'preco_input': precos[0],
+                'preco_output': precos[1],
+                'quantidade_analises': int(quantidade[i]),
+                'tokens_input': int(soma_entrada[i]),
+                'tokens_output': int(soma_saida[i]),
+                'custo': round(float(soma_custos[i]), 6),
+                'origem': 'execucao',
+                'data_registro': data_registro,
+            })
+        return lancamentos
+    
+    def registrar_custos_sessao(self, data_service, session_id: str, provider: str,
+                                resultados: List[Dict]) -> int:
+        """Grava no ledger `custos` os lançamentos da sessão; retorna quantos foram gravados."""
+        try:
+            lancamentos = self.lancamentos_custos_sessao(session_id, provider, resultados)
+            if not lancamentos:
+                return 0
+            return data_service.registrar_lancamentos_custos(lancamentos)
+        except Exception as e:
+            print(f"Erro ao registrar custos da sessão: {e}")
+            return 0
+    
+    def reprecificar_historico(self, data_service, provider_padrao: str = 'openai') -> Dict:
+        """
+        Reprecifica todo o histórico de análises com a tabela vigente numa única operação SQL
+        
+        Args:
+            data_service: SQLiteService
+            provider_padrao: Provedor assumido para análises gravadas sem provider
+        
+        Returns:
+            Resumo retornado por SQLiteService.reprecificar_custos_historico
+        """
+        precos = self._get_precos_modelos()
+        tabela = [
+            (provider, modelo, preco_input, preco_output)
+            for provider, modelos in precos.items()
+            for modelo, (preco_input, preco_output) in modelos.items()
+        ]
+        # LiteLLM usa a tabela OpenAI como aproximação (mesma regra de calculate_real_cost)
+        tabela.extend(
+            ('litellm', modelo, preco_input, preco_output)
+            for modelo, (preco_input, preco_output) in precos.get('openai', {}).items()
+        )
+        return data_service.reprecificar_custos_historico(
+            tabela, self.versao_precos(), provider_padrao=provider_padrao.lower()
+        )
+    
     def get_model_prices(self, modelo: str, provider: str) -> Dict[str, float]:
         """
         Obtém preços de um modelo específico
@@ -138,11 +304,11 @@ class CostCalculationService:
         try:
             precos = self._get_precos_modelos()
             provider_precos = precos.get(provider.lower(), {})
-            modelo_precos = provider_precos.get(modelo, {})
+            preco_input, preco_output = provider_precos.get(modelo, (0, 0))
             
             return {
-                'input': modelo_precos.get('input', 0),
-                'output': modelo_precos.get('output', 0)
+                'input': preco_input,
+                'output': preco_output
             }
         except Exception as e:
             print(f"Erro ao obter preços do modelo: {e}")
@@ -0,0 +1,234 @@
+"""
+Estimativa prévia de tokens e custo de uma execução de análise em lote (antes do /executar-analise).
+
+Monta, para cada intimação selecionada, o mesmo prompt que a execução enviaria (substituição de
+{REGRADENEGOCIO}/{CONTEXTO} + montagem do provedor), conta os tokens com tokenizador local (tiktoken,
+dependência opcional, em lote e com threads) ou, na falta dele, com a heurística de ~4 caracteres por
+token, e projeta o custo pela tabela de preços do cost_service. tiktoken e NumPy só são importados na
+primeira estimativa (fora do boot do app).
+
+Também sinaliza itens em que prompt + max_tokens não cabem na janela de contexto do modelo.
+"""
+from __future__ import annotations
+
+import importlib.util
+import math
+import os
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.classificacao_ia_extracao_incremental_streaming_chat_completions_service import (
+    CHARS_POR_TOKEN_ESTIMADO,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# tokenizador local é opcional
+TIKTOKEN_DISPONIVEL = importlib.util.find_spec('tiktoken') is not None
+tiktoken = None
+
+# Janela de contexto (tokens) por prefixo de modelo; o prefixo mais longo que casar vence.
+# config.json pode sobrescrever/acrescentar via "janelas_contexto_modelos".
+JANELAS_CONTEXTO_MODELOS = {
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+    'gpt-4.1': 1047576,
+    'gpt-4-turbo': 128000,
+    'gpt-4-32k': 32768,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 16385,
+    'o1': 200000,
+    'o3': 200000,
+    'o4-mini': 200000,
+    'gpt-5': 400000,
+    'claude': 200000,
+    'azure_ai/claude': 200000,
+}
+
+# Mensagem de sistema enviada pelos provedores (exceto com raw_user_prompt_only) e overhead do
+# formato chat (papéis/separadores) por requisição
+MENSAGEM_SISTEMA_PADRAO = (
+    "Você é um assistente especializado em análise de intimações jurídicas. "
+    "Responda sempre com uma das classificações solicitadas."
+)
+_TOKENS_OVERHEAD_MENSAGENS_CHAT = 7
+
+# Saída assumida por item quando não há max_tokens nem histórico do prompt com o modelo
+_TOKENS_SAIDA_PADRAO_SEM_HISTORICO = 150
+
+_MAX_ITENS_PIOR_CASO = 10
+
+
+def montar_prompt_analise_intimacao(prompt: Dict[str, Any], contexto_intimacao: str) -> Tuple[str, str]:
+    """
+    Contexto e prompt final de uma intimação, como enviados ao ai_manager_service.analisar_intimacao.
+
+    Returns:
+        (contexto, prompt_final)
+    """
+    contexto = f"""
+Contexto da Intimação:
+{contexto_intimacao or ''}
+"""
+    prompt_final = prompt['conteudo']
+    if prompt.get('regra_negocio') and '{REGRADENEGOCIO}' in prompt_final:
+        prompt_final = prompt_final.replace('{REGRADENEGOCIO}', prompt['regra_negocio'])
+    prompt_final = prompt_final.replace('{CONTEXTO}', contexto)
+    return contexto, prompt_final
+
+
+def janela_contexto_modelo(modelo: str, sobrescritas: Optional[Dict[str, int]] = None) -> Optional[int]:
+    """Janela de contexto do modelo (prefixo mais longo) ou None quando desconhecida."""
+    tabela = dict(JANELAS_CONTEXTO_MODELOS)
+    tabela.update(sobrescritas or {})
+    nome = (modelo or '').lower()
+    candidatos = [p for p in tabela if nome.startswith(p.lower())]
+    if not candidatos:
+        return None
+    return int(tabela[max(candidatos, key=len)])
+
+
+def _encoding_tiktoken(modelo: str):
+    global tiktoken
+    if not TIKTOKEN_DISPONIVEL:
+        return None
+    if tiktoken is None:
+        import tiktoken
+    nome = (modelo or '').split('/')[-1]
+    try:
+        return tiktoken.encoding_for_model(nome)
+    except KeyError:
+        pass
+    try:
+        return tiktoken.get_encoding('o200k_base')
+    except Exception:
+        return None
+
+
+def contar_tokens_textos(textos: Sequence[str], modelo: str,
+                         threads: Optional[int] = None) -> Tuple[np.ndarray, str]:
+    """
+    Conta tokens de cada texto.
+
+    Returns:
+        (array int64 com a contagem por texto, nome do método: 'tiktoken:<encoding>' ou 'heuristica')
+    """
+    import numpy as np
+    encoding = _encoding_tiktoken(modelo)
+    if encoding is not None:
+        try:
+            tokens = encoding.encode_ordinary_batch(
+                list(textos), num_threads=threads or min(8, os.cpu_count() or 1)
+            )
+            return np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens)), f'tiktoken:{encoding.name}'
+        except Exception as e:
+            print(f"Tokenizador local falhou, usando heurística: {e}")
+
+    tamanhos = np.fromiter((len(t) for t in textos), dtype=np.int64, count=len(textos))
+    return np.ceil(tamanhos / CHARS_POR_TOKEN_ESTIMADO).astype(np.int64), 'heuristica'
+
+
+def _distribuicao(valores: np.ndarray) -> Dict[str, float]:
+    import numpy as np
+    if valores.size == 0:
+        return {'min': 0, 'media': 0, 'p50': 0, 'p90': 0, 'p99': 0, 'max': 0}
+    p50, p90, p99 = np.percentile(valores, [50, 90, 99])
+    return {
+        'min': int(valores.min()),
+        'media': round(float(valores.mean()), 1),
+        'p50': round(float(p50), 1),
+        'p90': round(float(p90), 1),
+        'p99': round(float(p99), 1),
+        'max': int(valores.max()),
+    }
+
+
+class EstimadorExecucaoAnaliseLote:
+    """Estimativa de tokens/custo de rodar um prompt sobre uma lista de intimações."""
+
+    def __init__(self, data_service, cost_service, provider: str,
+                 construir_prompt_provedor: Optional[Callable[[str, str], str]] = None):
+        self.data_service = data_service
+        self.cost_service = cost_service
+        self.provider = provider
+        # Montagem final feita pelo provedor ({contexto}, {tipos_acao}, instruções anexadas)
+        self.construir_prompt_provedor = construir_prompt_provedor or (lambda template, contexto: template)
+
+    def estimar(self, prompt: Dict[str, Any], intimacao_ids: List[str], modelo: str,
+                max_tokens: Optional[int] = None, raw_user_prompt_only: bool = False) -> Dict[str, Any]:
+        import numpy as np
+        inicio = time.perf_counter()
+        contextos = self.data_service.get_contextos_por_intimacao_ids(intimacao_ids)
+        ids_encontrados = [i for i in intimacao_ids if i in contextos]
+
+        textos = []
+        for intimacao_id in ids_encontrados:
+            contexto, prompt_final = montar_prompt_analise_intimacao(prompt, contextos[intimacao_id])
+            textos.append(self.construir_prompt_provedor(prompt_final, contexto))
+
+        tokens_prompt, metodo = contar_tokens_textos(textos, modelo)
+        overhead = _TOKENS_OVERHEAD_MENSAGENS_CHAT
+        if not raw_user_prompt_only:
+            overhead += int(contar_tokens_textos([MENSAGEM_SISTEMA_PADRAO], modelo)[0][0])
+        tokens_input = tokens_prompt + overhead
+
+        media_historica = self.data_service.get_media_tokens_saida_prompt_modelo(prompt.get('id'), modelo)
+        if media_historica is not None:
+            saida_prevista = math.ceil(media_historica)
+            origem_saida = 'historico'
+        else:
+            saida_prevista = _TOKENS_SAIDA_PADRAO_SEM_HISTORICO
+            origem_saida = 'padrao'
+        if max_tokens:
+            saida_prevista = min(saida_prevista, int(max_tokens))
+        saida_maxima = int(max_tokens) if max_tokens else saida_prevista
+
+        n = len(ids_encontrados)
+        custos_previstos = self.cost_service.calcular_custos_lote(
+            tokens_input, np.full(n, saida_prevista, dtype=np.int64), modelo, self.provider
+        )
+        custos_maximos = self.cost_service.calcular_custos_lote(
+            tokens_input, np.full(n, saida_maxima, dtype=np.int64), modelo, self.provider
+        )
+
+        janela = janela_contexto_modelo(
+            modelo, (self.data_service.get_config() or {}).get('janelas_contexto_modelos')
+        )
+        if janela is not None:
+            excede = tokens_input + saida_maxima > janela
+        else:
+            excede = np.zeros(n, dtype=bool)
+
+        ordem = np.argsort(tokens_input, kind='stable')[::-1][:_MAX_ITENS_PIOR_CASO]
+        piores = [
+            {
+                'intimacao_id': ids_encontrados[i],
+                'tokens_input': int(tokens_input[i]),
+                'caracteres': len(textos[i]),
+                'custo_maximo': round(float(custos_maximos[i]), 6),
+                'excede_janela_contexto': bool(excede[i]),
+            }
+            for i in ordem
+        ]
+
+        return {
+            'modelo': modelo,
+            'provider': self.provider,
+            'tokenizador': metodo,
+            'total_itens': n,
+            'intimacoes_nao_encontradas': [i for i in intimacao_ids if i not in contextos],
+            'tokens_input_total': int(tokens_input.sum()),
+            'tokens_output_previstos_por_item': saida_prevista,
+            'origem_tokens_output': origem_saida,
+            'tokens_output_maximos_por_item': saida_maxima,
+            'custo_previsto': round(float(custos_previstos.sum()), 6),
+            'custo_maximo': round(float(custos_maximos.sum()), 6),
+            'versao_precos': self.cost_service.versao_precos(),
+            'distribuicao_tokens_input': _distribuicao(tokens_input),
+            'janela_contexto': janela,
+            'max_tokens': int(max_tokens) if max_tokens else None,
+            'itens_excedendo_janela': int(excede.sum()),
+            'piores_itens': piores,
+            'tempo_estimativa_ms': round((time.perf_counter() - inicio) * 1000, 1),
+        }
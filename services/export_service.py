@@ -1,65 +1,83 @@
-import pandas as pd
+import csv
+import json
 import os
+import tempfile
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Tuple, Union
 from flask import Response, make_response
 from io import StringIO
 from config import Config
-from services.sqlite_service import SQLiteService
+# pandas é importado dentro dos métodos que o usam: só no import ele custa ~0,4 s do boot do app
+from services.exportacao_parquet_analises_colunar_service import exportar_analises_parquet
+from services.matriz_confusao_metricas_classificacao_analises_service import (
+    ROTULO_SEM_CLASSIFICACAO_MANUAL,
+    contar_sem_classificacao_manual,
+    matrizes_por_grupo,
+    metricas_por_classe,
+    montar_matriz_confusao,
+)
+from services.sqlite_service import obter_sqlite_service
+
+# Cabeçalho do CSV de análises de /exportar (layout mantido da geração em memória)
+CABECALHO_CSV_ANALISES = [
+    'Data', 'Intimação ID', 'Contexto', 'Prompt', 'Classificação Manual',
+    'Resultado IA', 'Acertou', 'Modelo', 'Temperatura', 'Tempo (s)', 'Custo ($)'
+]
+
+# Linhas acumuladas antes de cada yield no streaming (evita um chunk HTTP por linha)
+_LINHAS_POR_BLOCO_STREAMING = 500
+
+# Sufixo do arquivo em gravação (renomeado para o nome final só quando completo)
+SUFIXO_ARQUIVO_PARCIAL = '.parcial'
+
+FORMATOS_EXPORTACAO_STREAMING = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
 
 class ExportService:
     """Serviço para exportação de dados"""
     
     def __init__(self):
         """Inicializar o serviço de exportação"""
-        self.data_service = SQLiteService()
+        self.data_service = obter_sqlite_service()
         self.config = Config()
     
     def exportar_csv(self, 
                     filtro_periodo: Optional[Dict[str, str]] = None,
                     filtro_prompt: Optional[str] = None,
                     filtro_classificacao: Optional[str] = None) -> Response:
-        """Exportar análises para CSV"""
+        """Exportar análises para CSV (filtros aplicados no SQL)"""
+        import pandas as pd
         try:
-            # Obter dados
-            analises = self.data_service.get_all_analises()
-            intimacoes = self.data_service.get_all_intimacoes()
-            prompts = self.data_service.get_all_prompts()
-            
-            # Criar dicionários para lookup rápido
-            intimacoes_dict = {i['id']: i for i in intimacoes}
-            prompts_dict = {p['id']: p for p in prompts}
-            
-            # Aplicar filtros
-            analises_filtradas = self._aplicar_filtros(
-                analises, filtro_periodo, filtro_prompt, filtro_classificacao
+            filtro_periodo = filtro_periodo or {}
+            analises = self.data_service.iterar_analises_exportacao(
+                data_inicio=(filtro_periodo.get('data_inicio') or '')[:10],
+                data_fim=(filtro_periodo.get('data_fim') or '')[:10],
+                prompt_id=filtro_prompt or '',
+                classificacao_manual=filtro_classificacao or '',
+                incluir_conteudos_completos=True,
             )
             
             # Preparar dados para CSV
             dados_csv = []
-            for analise in analises_filtradas:
-                intimacao = intimacoes_dict.get(analise.get('intimacao_id'), {})
-                prompt = prompts_dict.get(analise.get('prompt_id'), {})
-                
-                # Truncar contexto para CSV
-                contexto_truncado = self._truncar_texto(intimacao.get('contexto', ''), 200)
-                resposta_truncada = self._truncar_texto(analise.get('resposta_completa_ia', ''), 300)
-                
+            for analise in analises:
                 dados_csv.append({
                     'ID_Analise': analise.get('id', ''),
                     'ID_Intimacao': analise.get('intimacao_id', ''),
-                    'Contexto_Intimacao': contexto_truncado,
+                    'Contexto_Intimacao': self._truncar_texto(analise.get('contexto', ''), 200),
                     'Classificacao_Manual': analise.get('classificacao_manual', ''),
-                    'Nome_Prompt': prompt.get('nome', 'Prompt não encontrado'),
+                    'Nome_Prompt': analise.get('prompt_nome') or 'Prompt não encontrado',
                     'Classificacao_IA': analise.get('resultado_ia', ''),
                     'Acertou': 'Sim' if analise.get('acertou', False) else 'Não',
                     'Tempo_Processamento_s': analise.get('tempo_processamento', 0),
-                    'Modelo_IA': analise.get('parametros_openai', {}).get('model', ''),
-                    'Temperature': analise.get('parametros_openai', {}).get('temperature', ''),
-                    'Max_Tokens': analise.get('parametros_openai', {}).get('max_tokens', ''),
+                    'Modelo_IA': analise.get('modelo', ''),
+                    'Temperature': analise.get('temperatura', ''),
+                    'Max_Tokens': '',
                     'Data_Analise': self._formatar_data(analise.get('data_analise', '')),
-                    'Resposta_Completa_IA': resposta_truncada,
-                    'Informacao_Adicional': intimacao.get('informacao_adicional', '')
+                    'Resposta_Completa_IA': self._truncar_texto(analise.get('resposta_completa', ''), 300),
+                    'Informacao_Adicional': analise.get('informacao_adicional', '')
                 })
             
             # Criar DataFrame
@@ -94,10 +112,146 @@ class ExportService:
         except Exception as e:
             raise Exception(f"Erro ao exportar CSV: {str(e)}")
     
-    def exportar_relatorio_resumo_csv(self) -> Response:
-        """Exportar relatório resumo em CSV"""
+    def exportar_analises_streaming(self,
+                                    formato: str = 'csv',
+                                    data_inicio: str = '',
+                                    data_fim: str = '',
+                                    prompt_id: str = '',
+                                    classificacao: str = '',
+                                    conteudos_completos: bool = False) -> Response:
+        """
+        Exportar análises em CSV ou JSONL por streaming (memória constante)
+        
+        Filtros vão para o SQL e as linhas saem do cursor direto para um Response com gerador
+        (transferência chunked, download começa de imediato).
+        """
+        if formato not in FORMATOS_EXPORTACAO_STREAMING:
+            raise ValueError(f"Formato de exportação em streaming inválido: {formato}")
+        
+        linhas = self.data_service.iterar_analises_exportacao(
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            prompt_id=prompt_id,
+            classificacao_manual=classificacao,
+            incluir_conteudos_completos=conteudos_completos and formato == 'jsonl',
+        )
+        gerador = self.gerar_csv_analises(linhas) if formato == 'csv' else self.gerar_jsonl_analises(linhas)
+        
+        filename = f'analises_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{formato}'
+        return Response(
+            gerador,
+            mimetype=FORMATOS_EXPORTACAO_STREAMING[formato],
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-Accel-Buffering': 'no',
+            },
+        )
+    
+    def gerar_analises_parquet_temporario(self,
+                                          data_inicio: str = '',
+                                          data_fim: str = '',
+                                          prompt_id: str = '',
+                                          classificacao: str = '',
+                                          compressao: str = 'zstd',
+                                          incluir_contexto: bool = False) -> Tuple[BinaryIO, str]:
+        """
+        Gravar análises filtradas em Parquet num arquivo temporário anônimo
+        
+        Returns:
+            (arquivo aberto e posicionado no início, nome sugerido para download). O arquivo some
+            ao ser fechado; ParquetIndisponivelError sem pyarrow.
+        """
+        arquivo = tempfile.TemporaryFile(suffix='.parquet')
+        try:
+            exportar_analises_parquet(
+                self.data_service,
+                arquivo,
+                compressao=compressao,
+                incluir_contexto=incluir_contexto,
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                prompt_id=prompt_id,
+                classificacao_manual=classificacao,
+            )
+            arquivo.seek(0)
+        except Exception:
+            arquivo.close()
+            raise
+        filename = f'analises_{datetime.now().strftime("%Y%m%d_%H%M%S")}.parquet'
+        return arquivo, filename
+    
+    def gerar_csv_analises(self, analises: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """Blocos de texto CSV (cabeçalho + linhas) a partir de um iterável de análises"""
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CABECALHO_CSV_ANALISES)
+        pendentes = 0
+        for analise in analises:
+            writer.writerow(self._linha_csv_analise(analise))
+            pendentes += 1
+            if pendentes >= _LINHAS_POR_BLOCO_STREAMING:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pendentes = 0
+        yield buffer.getvalue()
+    
+    def gerar_jsonl_analises(self, analises: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """Blocos JSONL (um objeto por linha, tipos preservados) a partir de um iterável de análises"""
+        bloco: List[str] = []
+        for analise in analises:
+            registro = dict(analise)
+            if registro.get('acertou') is not None:
+                registro['acertou'] = bool(registro['acertou'])
+            bloco.append(json.dumps(registro, ensure_ascii=False))
+            if len(bloco) >= _LINHAS_POR_BLOCO_STREAMING:
+                yield '\n'.join(bloco) + '\n'
+                bloco = []
+        if bloco:
+            yield '\n'.join(bloco) + '\n'
+    
+    def _linha_csv_analise(self, analise: Dict[str, Any]) -> List[str]:
+        data_formatada = ''
+        if analise.get('data_analise'):
+            try:
+                data = datetime.fromisoformat(analise['data_analise'].replace('Z', '+00:00'))
+                data_formatada = data.strftime('%d/%m/%Y %H:%M:%S')
+            except (ValueError, TypeError, AttributeError):
+                data_formatada = analise['data_analise']
+        contexto = analise.get('contexto') or ''
+        temperatura = analise.get('temperatura')
+        return [
+            data_formatada,
+            (analise.get('intimacao_id') or '')[:8] + '...',
+            contexto[:100] + ('...' if len(contexto) > 100 else ''),
+            analise.get('prompt_nome') or '',
+            analise.get('classificacao_manual') or '',
+            analise.get('resultado_ia') or '',
+            'Sim' if analise.get('acertou') else 'Não',
+            analise.get('modelo') or '',
+            f"{temperatura:.1f}" if temperatura is not None else 'N/A',
+            f"{analise.get('tempo_processamento') or 0:.3f}",
+            "N/A"  # Custo removido - simulação desabilitada
+        ]
+    
+    def exportar_relatorio_resumo_csv(self,
+                                      data_inicio: str = '',
+                                      data_fim: str = '',
+                                      prompt_id: str = '',
+                                      classificacao: str = '') -> Response:
+        """Exportar relatório resumo em CSV (agregações no SQL, filtros nas seções de análises)"""
+        import pandas as pd
         try:
+            filtros = {
+                'data_inicio': data_inicio,
+                'data_fim': data_fim,
+                'prompt_id': prompt_id,
+                'classificacao_manual': classificacao,
+            }
             stats = self.data_service.get_statistics()
+            resumo_prompts = self.data_service.obter_resumo_analises_por_prompt(**filtros)
+            total_filtrado = sum(r['total'] for r in resumo_prompts)
+            acertos_filtrados = sum(r['acertos'] or 0 for r in resumo_prompts)
             
             # Dados gerais
             dados_gerais = [{
@@ -105,58 +259,64 @@ class ExportService:
                 'Valor': stats['total_intimacoes']
             }, {
                 'Metrica': 'Total de Análises',
-                'Valor': stats['total_analises']
+                'Valor': total_filtrado
             }, {
                 'Metrica': 'Total de Prompts',
                 'Valor': stats['total_prompts']
             }, {
                 'Metrica': 'Taxa de Acurácia Geral (%)',
-                'Valor': stats['taxa_acuracia_geral']
+                'Valor': round(acertos_filtrados / total_filtrado * 100, 2) if total_filtrado else 0
             }]
             
             # Estatísticas por prompt
-            prompts = self.data_service.get_all_prompts()
-            prompts_dict = {p['id']: p for p in prompts}
-            
-            dados_prompts = []
-            for prompt_id, stats_prompt in stats['stats_por_prompt'].items():
-                prompt = prompts_dict.get(prompt_id, {})
-                dados_prompts.append({
-                    'ID_Prompt': prompt_id,
-                    'Nome_Prompt': prompt.get('nome', 'Prompt não encontrado'),
-                    'Total_Analises': stats_prompt['total'],
-                    'Acertos': stats_prompt['acertos'],
-                    'Taxa_Acuracia_Percent': round(stats_prompt['taxa_acuracia'], 2)
-                })
+            dados_prompts = [{
+                'ID_Prompt': r['prompt_id'],
+                'Nome_Prompt': r['prompt_nome'],
+                'Total_Analises': r['total'],
+                'Acertos': r['acertos'] or 0,
+                'Taxa_Acuracia_Percent': r['taxa_acuracia'],
+                'Tempo_Medio_s': round(r['tempo_medio'] or 0, 3),
+                'Custo_Total': round(r['custo_total'] or 0, 6),
+            } for r in resumo_prompts]
             
             # Distribuição por classificação
-            dados_classificacao = []
-            for classificacao, count in stats['distribuicao_classificacao'].items():
-                dados_classificacao.append({
-                    'Classificacao': classificacao,
-                    'Quantidade': count,
-                    'Percentual': round((count / stats['total_intimacoes'] * 100), 2) if stats['total_intimacoes'] > 0 else 0
-                })
+            total_intimacoes = stats['total_intimacoes']
+            dados_classificacao = [{
+                'Classificacao': d['classificacao'],
+                'Quantidade': d['quantidade'],
+                'Percentual': round((d['quantidade'] / total_intimacoes * 100), 2) if total_intimacoes > 0 else 0
+            } for d in self.data_service.obter_distribuicao_classificacao_manual_intimacoes()]
+            
+            # Métricas por classe a partir da matriz de confusão
+            contagens = self._contagens_matriz(self.data_service.contar_analises_matriz_confusao(**filtros))
+            matriz, rotulos = montar_matriz_confusao(contagens, self.config.TIPOS_ACAO)
+            sem_classificacao = contar_sem_classificacao_manual(contagens)
             
             # Criar arquivo Excel com múltiplas abas (usando CSV concatenado)
             output = StringIO()
             
             # Escrever seção de dados gerais
             output.write("=== ESTATISTICAS GERAIS ===\n")
-            df_gerais = pd.DataFrame(dados_gerais)
-            df_gerais.to_csv(output, index=False)
+            pd.DataFrame(dados_gerais).to_csv(output, index=False)
             output.write("\n")
             
             # Escrever seção de prompts
             output.write("=== ESTATISTICAS POR PROMPT ===\n")
-            df_prompts = pd.DataFrame(dados_prompts)
-            df_prompts.to_csv(output, index=False)
+            pd.DataFrame(dados_prompts, columns=[
+                'ID_Prompt', 'Nome_Prompt', 'Total_Analises', 'Acertos',
+                'Taxa_Acuracia_Percent', 'Tempo_Medio_s', 'Custo_Total'
+            ]).to_csv(output, index=False)
             output.write("\n")
             
             # Escrever seção de classificações
             output.write("=== DISTRIBUICAO POR CLASSIFICACAO ===\n")
-            df_classificacao = pd.DataFrame(dados_classificacao)
-            df_classificacao.to_csv(output, index=False)
+            pd.DataFrame(dados_classificacao, columns=['Classificacao', 'Quantidade', 'Percentual']).to_csv(
+                output, index=False
+            )
+            output.write("\n")
+            
+            output.write("=== METRICAS POR CLASSE ===\n")
+            self._escrever_metricas_csv(output, metricas_por_classe(matriz, rotulos, sem_classificacao))
             
             csv_content = output.getvalue()
             output.close()
@@ -174,52 +334,65 @@ class ExportService:
         except Exception as e:
             raise Exception(f"Erro ao exportar relatório resumo: {str(e)}")
     
-    def exportar_matriz_confusao_csv(self) -> Response:
-        """Exportar matriz de confusão em CSV"""
+    def exportar_matriz_confusao_csv(self,
+                                     data_inicio: str = '',
+                                     data_fim: str = '',
+                                     prompt_id: str = '',
+                                     classificacao: str = '',
+                                     agrupar_por: Optional[str] = None) -> Response:
+        """
+        Exportar matriz de confusão em CSV
+        
+        Contagens agrupadas no SQL por (manual, IA[, prompt|modelo]); com agrupar_por, uma matriz e
+        um bloco de métricas por prompt ou modelo depois da matriz geral.
+        """
         try:
-            analises = self.data_service.get_all_analises()
-            
-            # Criar matriz de confusão
-            tipos_acao = self.config.TIPOS_ACAO
-            matriz = {}
-            
-            # Inicializar matriz
-            for manual in tipos_acao:
-                matriz[manual] = {}
-                for ia in tipos_acao:
-                    matriz[manual][ia] = 0
-            
-            # Preencher matriz
-            for analise in analises:
-                manual = analise.get('classificacao_manual', '')
-                ia = analise.get('resultado_ia', '')
-                
-                # Limpar classificação da IA se contém erro
-                if ia.startswith('ERRO:'):
-                    ia = 'ERRO_CLASSIFICACAO'
-                
-                if manual in matriz:
-                    if ia in matriz[manual]:
-                        matriz[manual][ia] += 1
-                    else:
-                        # Adicionar categoria para erros
-                        if 'ERRO_CLASSIFICACAO' not in matriz[manual]:
-                            matriz[manual]['ERRO_CLASSIFICACAO'] = 0
-                        matriz[manual]['ERRO_CLASSIFICACAO'] += 1
-            
-            # Converter para DataFrame
-            df_matriz = pd.DataFrame(matriz).fillna(0)
-            df_matriz = df_matriz.astype(int)
+            filtros = {
+                'data_inicio': data_inicio,
+                'data_fim': data_fim,
+                'prompt_id': prompt_id,
+                'classificacao_manual': classificacao,
+            }
+            output = StringIO()
             
-            # Adicionar totais
-            df_matriz['Total_Manual'] = df_matriz.sum(axis=1)
-            df_matriz.loc['Total_IA'] = df_matriz.sum(axis=0)
+            if agrupar_por:
+                linhas = self.data_service.contar_analises_matriz_confusao(agrupar_por=agrupar_por, **filtros)
+                nomes = {l['grupo']: l['grupo_nome'] for l in linhas}
+                sem_classificacao_grupo = {
+                    grupo: contar_sem_classificacao_manual(self._contagens_matriz(
+                        [l for l in linhas if l['grupo'] == grupo]))
+                    for grupo in nomes
+                }
+                sem_classificacao = sum(sem_classificacao_grupo.values())
+                por_grupo = matrizes_por_grupo(
+                    [(l['grupo'], l['classificacao_manual'], l['resultado_ia'], l['quantidade']) for l in linhas],
+                    self.config.TIPOS_ACAO,
+                )
+                # Matriz geral = soma das matrizes dos grupos (mesmos rótulos)
+                if por_grupo:
+                    rotulos = next(iter(por_grupo.values()))[1]
+                    matriz = sum(m for m, _ in por_grupo.values())
+                else:
+                    matriz, rotulos = montar_matriz_confusao([], self.config.TIPOS_ACAO)
+            else:
+                contagens = self._contagens_matriz(self.data_service.contar_analises_matriz_confusao(**filtros))
+                matriz, rotulos = montar_matriz_confusao(contagens, self.config.TIPOS_ACAO)
+                sem_classificacao = contar_sem_classificacao_manual(contagens)
+                por_grupo = {}
             
-            # Gerar CSV
-            output = StringIO()
             output.write("=== MATRIZ DE CONFUSAO ===\n")
             output.write("Linhas: Classificacao Manual | Colunas: Classificacao IA\n\n")
-            df_matriz.to_csv(output)
+            self._escrever_matriz_csv(output, matriz, rotulos)
+            output.write("\n=== METRICAS POR CLASSE ===\n")
+            self._escrever_metricas_csv(output, metricas_por_classe(matriz, rotulos, sem_classificacao))
+            
+            rotulo_grupo = 'PROMPT' if agrupar_por == 'prompt' else 'MODELO'
+            for grupo, (matriz_grupo, rotulos_grupo) in sorted(por_grupo.items(), key=lambda g: nomes[g[0]]):
+                output.write(f"\n=== MATRIZ DE CONFUSAO - {rotulo_grupo}: {nomes[grupo] or '(sem modelo)'} ===\n")
+                self._escrever_matriz_csv(output, matriz_grupo, rotulos_grupo)
+                output.write("\n")
+                self._escrever_metricas_csv(output, metricas_por_classe(
+                    matriz_grupo, rotulos_grupo, sem_classificacao_grupo.get(grupo, 0)))
             
             csv_content = output.getvalue()
             output.close()
@@ -237,56 +410,42 @@ class ExportService:
         except Exception as e:
             raise Exception(f"Erro ao exportar matriz de confusão: {str(e)}")
     
-    def _aplicar_filtros(self, 
-                        analises: List[Dict[str, Any]],
-                        filtro_periodo: Optional[Dict[str, str]] = None,
-                        filtro_prompt: Optional[str] = None,
-                        filtro_classificacao: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Aplicar filtros às análises"""
-        analises_filtradas = analises.copy()
-        
-        # Filtro por período
-        if filtro_periodo and filtro_periodo.get('data_inicio') and filtro_periodo.get('data_fim'):
-            try:
-                data_inicio = datetime.fromisoformat(filtro_periodo['data_inicio'])
-                data_fim = datetime.fromisoformat(filtro_periodo['data_fim'])
-                
-                analises_filtradas = [
-                    a for a in analises_filtradas
-                    if self._data_esta_no_periodo(
-                        a.get('data_analise', ''), data_inicio, data_fim
-                    )
-                ]
-            except ValueError:
-                pass  # Ignorar filtro se datas inválidas
-        
-        # Filtro por prompt
-        if filtro_prompt:
-            analises_filtradas = [
-                a for a in analises_filtradas
-                if a.get('prompt_id') == filtro_prompt
-            ]
-        
-        # Filtro por classificação
-        if filtro_classificacao:
-            analises_filtradas = [
-                a for a in analises_filtradas
-                if a.get('classificacao_manual') == filtro_classificacao
-            ]
-        
-        return analises_filtradas
+    def _contagens_matriz(self, linhas: List[Dict[str, Any]]) -> List[tuple]:
+        return [(l['classificacao_manual'], l['resultado_ia'], l['quantidade']) for l in linhas]
     
-    def _data_esta_no_periodo(self, data_str: str, data_inicio: datetime, data_fim: datetime) -> bool:
-        """Verificar se data está no período especificado"""
-        try:
-            if isinstance(data_str, str):
-                data = datetime.fromisoformat(data_str.replace('Z', '+00:00'))
-            else:
-                return False
-            
-            return data_inicio <= data <= data_fim
-        except (ValueError, TypeError):
-            return False
+    def _escrever_matriz_csv(self, output: StringIO, matriz, rotulos: List[str]) -> None:
+        """Matriz com totais (linhas sem nenhuma ocorrência omitidas, colunas mantidas)"""
+        import pandas as pd
+        df_matriz = pd.DataFrame(matriz, index=rotulos, columns=rotulos)
+        df_matriz = df_matriz[(df_matriz.sum(axis=1) > 0) | df_matriz.index.isin(self.config.TIPOS_ACAO)]
+        df_matriz['Total_Manual'] = df_matriz.sum(axis=1)
+        df_matriz.loc['Total_IA'] = df_matriz.sum(axis=0)
+        df_matriz.to_csv(output)
+    
+    def _escrever_metricas_csv(self, output: StringIO, metricas: Dict[str, Any]) -> None:
+        import pandas as pd
+        linhas = [{
+            'Classe': c['classe'],
+            'Precisao': c['precisao'],
+            'Recall': c['recall'],
+            'F1': c['f1'],
+            'Suporte': c['suporte'],
+        } for c in metricas['classes']]
+        for nome, media in (('MEDIA_MACRO', metricas['macro']), ('MEDIA_PONDERADA', metricas['ponderada'])):
+            linhas.append({
+                'Classe': nome,
+                'Precisao': media['precisao'],
+                'Recall': media['recall'],
+                'F1': media['f1'],
+                'Suporte': metricas['total'],
+            })
+        linhas.append({'Classe': 'ACURACIA', 'Precisao': '', 'Recall': '', 'F1': metricas['acuracia'],
+                       'Suporte': metricas['total']})
+        if metricas.get('sem_classificacao_manual'):
+            # Fora da matriz e das métricas: sem classe verdadeira para comparar
+            linhas.append({'Classe': ROTULO_SEM_CLASSIFICACAO_MANUAL, 'Precisao': '', 'Recall': '', 'F1': '',
+                           'Suporte': metricas['sem_classificacao_manual']})
+        pd.DataFrame(linhas, columns=['Classe', 'Precisao', 'Recall', 'F1', 'Suporte']).to_csv(output, index=False)
     
     def _truncar_texto(self, texto: str, max_length: int) -> str:
         """Truncar texto para CSV"""
@@ -309,22 +468,44 @@ class ExportService:
             return str(data_str)
     
     def salvar_arquivo_local(self, 
-                           dados: str, 
+                           dados: Union[str, Iterable[str]], 
                            nome_arquivo: str, 
-                           formato: str = 'csv') -> str:
-        """Salvar arquivo localmente na pasta de exports"""
+                           formato: str = 'csv',
+                           encoding: str = 'utf-8-sig',
+                           com_timestamp: bool = True) -> str:
+        """
+        Salvar arquivo localmente na pasta de exports
+        
+        dados pode ser o texto inteiro ou um iterável de blocos (ex.: gerar_csv_analises), gravado
+        bloco a bloco. O conteúdo vai primeiro para um '.parcial' e só é renomeado para o nome
+        final ao terminar, então um arquivo com o nome final está sempre completo.
+        """
         try:
             # Garantir que o diretório existe
             os.makedirs(self.config.EXPORT_DIR, exist_ok=True)
             
             # Criar nome do arquivo com timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            nome_completo = f"{timestamp}_{nome_arquivo}.{formato}"
+            if com_timestamp:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                nome_completo = f"{timestamp}_{nome_arquivo}.{formato}"
+            else:
+                nome_completo = f"{nome_arquivo}.{formato}"
             caminho_arquivo = os.path.join(self.config.EXPORT_DIR, nome_completo)
+            caminho_parcial = caminho_arquivo + SUFIXO_ARQUIVO_PARCIAL
             
             # Salvar arquivo
-            with open(caminho_arquivo, 'w', encoding='utf-8-sig') as f:
-                f.write(dados)
+            try:
+                with open(caminho_parcial, 'w', encoding=encoding, newline='') as f:
+                    if isinstance(dados, str):
+                        f.write(dados)
+                    else:
+                        for bloco in dados:
+                            f.write(bloco)
+                os.replace(caminho_parcial, caminho_arquivo)
+            except BaseException:
+                if os.path.exists(caminho_parcial):
+                    os.remove(caminho_parcial)
+                raise
             
             return caminho_arquivo
             
@@ -333,6 +514,7 @@ class ExportService:
     
     def export_to_csv(self, dados: List[Dict[str, Any]], nome_arquivo: str) -> str:
         """Exportar dados para CSV"""
+        import pandas as pd
         try:
             # Criar DataFrame
             df = pd.DataFrame(dados)
@@ -353,6 +535,7 @@ class ExportService:
     
     def export_to_excel(self, dados: List[Dict[str, Any]], nome_arquivo: str, sheet_name: str = 'Dados') -> str:
         """Exportar dados para Excel"""
+        import pandas as pd
         try:
             # Criar DataFrame
             df = pd.DataFrame(dados)
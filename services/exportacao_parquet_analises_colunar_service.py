@@ -0,0 +1,177 @@
+"""
+Exportação colunar (Parquet) das análises para análise offline.
+
+Lê as análises pelo mesmo cursor filtrado da exportação em streaming
+(SQLiteService.iterar_analises_exportacao) e grava record batches tipados, em blocos, num
+ParquetWriter: inteiros/floats/booleanos nativos, data_analise como timestamp e colunas repetitivas
+(prompt, modelo, classificação manual, resultado da IA...) com dictionary encoding.
+
+pyarrow está no requirements.txt, mas só é importado na primeira exportação (o import não entra
+no boot do app). Numa instalação sem ele, PYARROW_DISPONIVEL é False e a exportação levanta
+ParquetIndisponivelError.
+"""
+import importlib.util
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+PYARROW_DISPONIVEL = importlib.util.find_spec('pyarrow') is not None
+pa = pc = pq = None
+
+TAMANHO_LOTE_PARQUET_PADRAO = 50000
+
+COMPRESSOES_PARQUET = ('zstd', 'snappy', 'gzip', 'none')
+
+# Colunas com poucos valores distintos (dictionary encoding no arquivo e no schema Arrow)
+COLUNAS_DICIONARIO = (
+    'prompt_id', 'prompt_nome', 'modelo', 'classificacao_manual', 'resultado_ia',
+    'modo_avaliacao', 'tipo_alvo_focado', 'session_id',
+)
+
+# (coluna, tipo) na ordem do arquivo; 'dict' = string com dictionary encoding
+_COLUNAS_ANALISES = (
+    ('id', 'string'),
+    ('intimacao_id', 'string'),
+    ('prompt_id', 'dict'),
+    ('prompt_nome', 'dict'),
+    ('data_analise', 'timestamp'),
+    ('resultado_ia', 'dict'),
+    ('classificacao_manual', 'dict'),
+    ('acertou', 'bool'),
+    ('tempo_processamento', 'float64'),
+    ('modelo', 'dict'),
+    ('temperatura', 'float64'),
+    ('tokens_input', 'int64'),
+    ('tokens_output', 'int64'),
+    ('custo_real', 'float64'),
+    ('session_id', 'dict'),
+    ('modo_avaliacao', 'dict'),
+    ('tipo_alvo_focado', 'dict'),
+)
+_COLUNA_CONTEXTO = ('contexto', 'string')
+
+
+class ParquetIndisponivelError(RuntimeError):
+    """pyarrow não está instalado."""
+
+
+def _carregar_pyarrow() -> None:
+    global pa, pc, pq
+    if not PYARROW_DISPONIVEL:
+        raise ParquetIndisponivelError("Exportação Parquet requer o pacote pyarrow")
+    if pq is None:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+        pa, pc, pq = pyarrow, pyarrow.compute, pyarrow.parquet
+
+
+def _tipo_arrow(tipo: str):
+    return {
+        'string': pa.string(),
+        'dict': pa.dictionary(pa.int32(), pa.string()),
+        'timestamp': pa.timestamp('us'),
+        'bool': pa.bool_(),
+        'float64': pa.float64(),
+        'int64': pa.int64(),
+    }[tipo]
+
+
+def esquema_parquet_analises(incluir_contexto: bool = False):
+    """Schema Arrow das análises exportadas."""
+    _carregar_pyarrow()
+    colunas = _COLUNAS_ANALISES + ((_COLUNA_CONTEXTO,) if incluir_contexto else ())
+    return pa.schema([pa.field(nome, _tipo_arrow(tipo)) for nome, tipo in colunas])
+
+
+def _array_coluna(valores: List[Any], tipo: str):
+    if tipo == 'dict':
+        return pa.array(valores, type=pa.string()).dictionary_encode()
+    if tipo == 'timestamp':
+        texto = pa.array(valores, type=pa.string())
+        try:
+            return pc.cast(texto, pa.timestamp('us'))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            # Formatos fora do ISO 8601 estrito: converte item a item e deixa nulo o que falhar
+            return pa.array([_timestamp_ou_none(v) for v in valores], type=pa.timestamp('us'))
+    if tipo == 'bool':
+        return pa.array([None if v is None else bool(v) for v in valores], type=pa.bool_())
+    return pa.array(valores, type=_tipo_arrow(tipo))
+
+
+def _timestamp_ou_none(valor: Optional[str]):
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(str(valor).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def escrever_parquet_analises(destino,
+                              analises: Iterable[Dict[str, Any]],
+                              compressao: str = 'zstd',
+                              tamanho_lote: int = TAMANHO_LOTE_PARQUET_PADRAO,
+                              incluir_contexto: bool = False) -> Dict[str, Any]:
+    """
+    Grava as análises em Parquet, um record batch (e row group) a cada `tamanho_lote` linhas.
+
+    Args:
+        destino: Caminho ou arquivo binário aberto
+        analises: Iterável de dicts (ex.: SQLiteService.iterar_analises_exportacao)
+        compressao: zstd, snappy, gzip ou none
+
+    Returns:
+        {'linhas': int, 'lotes': int}
+    """
+    if compressao not in COMPRESSOES_PARQUET:
+        raise ValueError(f"Compressão inválida: {compressao}")
+    schema = esquema_parquet_analises(incluir_contexto)
+    colunas = _COLUNAS_ANALISES + ((_COLUNA_CONTEXTO,) if incluir_contexto else ())
+
+    linhas = lotes = 0
+    buffers: Dict[str, List[Any]] = {nome: [] for nome, _ in colunas}
+    with pq.ParquetWriter(
+        destino,
+        schema,
+        compression=None if compressao == 'none' else compressao,
+        use_dictionary=list(COLUNAS_DICIONARIO),
+    ) as writer:
+
+        def descarregar():
+            nonlocal lotes
+            batch = pa.RecordBatch.from_arrays(
+                [_array_coluna(buffers[nome], tipo) for nome, tipo in colunas], schema=schema
+            )
+            writer.write_batch(batch)
+            lotes += 1
+            for valores in buffers.values():
+                valores.clear()
+
+        for analise in analises:
+            for nome, _ in colunas:
+                buffers[nome].append(analise.get(nome))
+            linhas += 1
+            if linhas % tamanho_lote == 0:
+                descarregar()
+        if linhas % tamanho_lote or linhas == 0:
+            descarregar()
+
+    return {'linhas': linhas, 'lotes': lotes}
+
+
+def exportar_analises_parquet(data_service,
+                              destino,
+                              compressao: str = 'zstd',
+                              tamanho_lote: int = TAMANHO_LOTE_PARQUET_PADRAO,
+                              incluir_contexto: bool = False,
+                              **filtros) -> Dict[str, Any]:
+    """Exporta as análises filtradas (data_inicio, data_fim, prompt_id, classificacao_manual)."""
+    if not PYARROW_DISPONIVEL:
+        raise ParquetIndisponivelError("Exportação Parquet requer o pacote pyarrow")
+    analises = data_service.iterar_analises_exportacao(
+        incluir_contexto=incluir_contexto, tamanho_lote=min(tamanho_lote, 5000), **filtros
+    )
+    return escrever_parquet_analises(
+        destino, analises, compressao=compressao, tamanho_lote=tamanho_lote,
+        incluir_contexto=incluir_contexto,
+    )
@@ -0,0 +1,186 @@
+"""
+Tabela de fatos diários das análises (fatos_diarios), mantida por gatilhos do SQLite.
+
+Uma linha por (dia, prompt, nome do prompt, modelo, provider, classificação manual, resultado da IA)
+com contagem, acertos, tempo, custo e tokens somados. Relatórios, acurácia por período e totais do
+dashboard leem daqui: um ano de dados vira algumas centenas de linhas em vez de milhões de análises.
+
+A manutenção é incremental e feita por gatilhos, para valer para qualquer escrita (serviço, scripts,
+sqlite3 direto): inserção, REPLACE, UPDATE e DELETE em analises, e mudança da classificação manual
+de uma intimação (que move as análises dela de uma linha para outra). Colunas da chave nunca são
+NULL (NULL vira ''), senão o ON CONFLICT não agruparia.
+
+O INSERT OR REPLACE é tratado por um gatilho BEFORE INSERT, que desconta a linha antiga; por isso
+INSERT OR IGNORE e INSERT … ON CONFLICT DO UPDATE em analises/intimacoes não devem ser usados, nem
+PRAGMA recursive_triggers. Se os fatos divergirem (ex.: gatilhos desligados numa carga manual),
+reconstruir_fatos_diarios refaz a tabela a partir de analises.
+"""
+from typing import List
+
+COLUNAS_CHAVE_FATOS_DIARIOS = (
+    'dia', 'prompt_id', 'prompt_nome', 'modelo', 'provider', 'classificacao_manual', 'resultado_ia',
+)
+COLUNAS_MEDIDAS_FATOS_DIARIOS = (
+    'total', 'acertos', 'tempo_total', 'custo_total', 'tokens_input', 'tokens_output', 'tokens_usados',
+)
+# Colunas de analises que alteram algum fato (UPDATE de prompt_completo etc. não dispara o gatilho)
+_COLUNAS_ANALISES_FATOS = (
+    'data_analise', 'prompt_id', 'prompt_nome', 'modelo', 'provider', 'intimacao_id', 'resultado_ia',
+    'acertou', 'tempo_processamento', 'custo_real', 'tokens_input', 'tokens_output', 'tokens_usados',
+)
+
+_CLASSIFICACAO_ATUAL = "COALESCE(i.classificacao_manual, '')"
+
+_UPSERT = (
+    f"ON CONFLICT ({', '.join(COLUNAS_CHAVE_FATOS_DIARIOS)}) DO UPDATE SET "
+    + ', '.join(f'{m} = {m} + excluded.{m}' for m in COLUNAS_MEDIDAS_FATOS_DIARIOS)
+)
+_INSERT = (
+    f"INSERT INTO fatos_diarios ({', '.join(COLUNAS_CHAVE_FATOS_DIARIOS + COLUNAS_MEDIDAS_FATOS_DIARIOS)})"
+)
+
+
+def _chave(a: str, classificacao: str) -> List[str]:
+    return [
+        f"substr({a}.data_analise, 1, 10)",
+        f"COALESCE({a}.prompt_id, '')",
+        f"COALESCE({a}.prompt_nome, '')",
+        f"COALESCE({a}.modelo, '')",
+        f"COALESCE({a}.provider, '')",
+        classificacao,
+        f"COALESCE({a}.resultado_ia, '')",
+    ]
+
+
+def _sql_somar_linha(a: str, sinal: int) -> str:
+    """Soma (sinal=1) ou desconta (sinal=-1) uma linha do gatilho (NEW/OLD)."""
+    classificacao = f"COALESCE((SELECT classificacao_manual FROM intimacoes WHERE id = {a}.intimacao_id), '')"
+    medidas = [
+        f"{sinal}",
+        f"{sinal} * (CASE WHEN {a}.acertou = 1 THEN 1 ELSE 0 END)",
+        f"{sinal} * COALESCE({a}.tempo_processamento, 0.0)",
+        f"{sinal} * COALESCE({a}.custo_real, 0.0)",
+        f"{sinal} * COALESCE({a}.tokens_input, 0)",
+        f"{sinal} * COALESCE({a}.tokens_output, 0)",
+        f"{sinal} * COALESCE({a}.tokens_usados, 0)",
+    ]
+    return f"{_INSERT} VALUES ({', '.join(_chave(a, classificacao) + medidas)}) {_UPSERT};"
+
+
+def _sql_somar_agrupado(sinal: int, where: str, classificacao: str = _CLASSIFICACAO_ATUAL) -> str:
+    """Soma ou desconta, agrupadas, as análises de `where` (alias a; intimação em i)."""
+    medidas = [
+        f"{sinal} * COUNT(*)",
+        f"{sinal} * SUM(CASE WHEN a.acertou = 1 THEN 1 ELSE 0 END)",
+        f"{sinal} * COALESCE(SUM(a.tempo_processamento), 0.0)",
+        f"{sinal} * COALESCE(SUM(a.custo_real), 0.0)",
+        f"{sinal} * COALESCE(SUM(a.tokens_input), 0)",
+        f"{sinal} * COALESCE(SUM(a.tokens_output), 0)",
+        f"{sinal} * COALESCE(SUM(a.tokens_usados), 0)",
+    ]
+    return (
+        f"{_INSERT} SELECT {', '.join(_chave('a', classificacao) + medidas)} "
+        f"FROM analises a LEFT JOIN intimacoes i ON i.id = a.intimacao_id "
+        f"WHERE {where} GROUP BY 1, 2, 3, 4, 5, 6, 7 {_UPSERT};"
+    )
+
+
+def _sql_limpar_dia(a: str) -> str:
+    return f"DELETE FROM fatos_diarios WHERE dia = substr({a}.data_analise, 1, 10) AND total <= 0;"
+
+
+_SQL_LIMPAR_VAZIOS = "DELETE FROM fatos_diarios WHERE total <= 0;"
+
+
+def _gatilhos() -> List[str]:
+    colunas_analises = ', '.join(_COLUNAS_ANALISES_FATOS)
+    tem_analises = "EXISTS (SELECT 1 FROM analises WHERE intimacao_id = {id})"
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS fatos_diarios_analises_antes_insert BEFORE INSERT ON analises
+        WHEN EXISTS (SELECT 1 FROM analises WHERE id = NEW.id)
+        BEGIN
+            {_sql_somar_agrupado(-1, 'a.id = NEW.id')}
+            DELETE FROM fatos_diarios
+            WHERE dia = (SELECT substr(data_analise, 1, 10) FROM analises WHERE id = NEW.id) AND total <= 0;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS fatos_diarios_analises_insert AFTER INSERT ON analises
+        BEGIN
+            {_sql_somar_linha('NEW', 1)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS fatos_diarios_analises_update AFTER UPDATE OF {colunas_analises} ON analises
+        BEGIN
+            {_sql_somar_linha('OLD', -1)}
+            {_sql_somar_linha('NEW', 1)}
+            {_sql_limpar_dia('OLD')}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS fatos_diarios_analises_delete AFTER DELETE ON analises
+        BEGIN
+            {_sql_somar_linha('OLD', -1)}
+            {_sql_limpar_dia('OLD')}
+        END
+        ''',
+        # Intimação nova (ou REPLACE) com análises já gravadas: antes do insert, i ainda é a linha antiga
+        f'''
+        CREATE TRIGGER IF NOT EXISTS fatos_diarios_intimacoes_antes_insert BEFORE INSERT ON intimacoes
+        WHEN COALESCE((SELECT classificacao_manual FROM intimacoes WHERE id = NEW.id), '')
+                 <> COALESCE(NEW.classificacao_manual, '')
+             AND {tem_analises.format(id='NEW.id')}
+        BEGIN
+            {_sql_somar_agrupado(-1, 'a.intimacao_id = NEW.id')}
+            {_sql_somar_agrupado(1, 'a.intimacao_id = NEW.id', "COALESCE(NEW.classificacao_manual, '')")}
+            {_SQL_LIMPAR_VAZIOS}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS fatos_diarios_intimacoes_update AFTER UPDATE OF classificacao_manual ON intimacoes
+        WHEN COALESCE(OLD.classificacao_manual, '') <> COALESCE(NEW.classificacao_manual, '')
+             AND {tem_analises.format(id='NEW.id')}
+        BEGIN
+            {_sql_somar_agrupado(-1, 'a.intimacao_id = NEW.id', "COALESCE(OLD.classificacao_manual, '')")}
+            {_sql_somar_agrupado(1, 'a.intimacao_id = NEW.id')}
+            {_SQL_LIMPAR_VAZIOS}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS fatos_diarios_intimacoes_delete AFTER DELETE ON intimacoes
+        WHEN COALESCE(OLD.classificacao_manual, '') <> '' AND {tem_analises.format(id='OLD.id')}
+        BEGIN
+            {_sql_somar_agrupado(-1, 'a.intimacao_id = OLD.id', "COALESCE(OLD.classificacao_manual, '')")}
+            {_sql_somar_agrupado(1, 'a.intimacao_id = OLD.id')}
+            {_SQL_LIMPAR_VAZIOS}
+        END
+        ''',
+    ]
+
+
+def criar_fatos_diarios(conn) -> None:
+    """Cria tabela e gatilhos (idempotente) e preenche a partir das análises existentes."""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS fatos_diarios (
+            {', '.join(f"{c} TEXT NOT NULL DEFAULT ''" for c in COLUNAS_CHAVE_FATOS_DIARIOS)},
+            total INTEGER NOT NULL DEFAULT 0,
+            acertos INTEGER NOT NULL DEFAULT 0,
+            tempo_total REAL NOT NULL DEFAULT 0,
+            custo_total REAL NOT NULL DEFAULT 0,
+            tokens_input INTEGER NOT NULL DEFAULT 0,
+            tokens_output INTEGER NOT NULL DEFAULT 0,
+            tokens_usados INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY ({', '.join(COLUNAS_CHAVE_FATOS_DIARIOS)})
+        ) WITHOUT ROWID
+    ''')
+    for gatilho in _gatilhos():
+        conn.execute(gatilho)
+    reconstruir_fatos_diarios(conn)
+
+
+def reconstruir_fatos_diarios(conn) -> None:
+    """Refaz fatos_diarios do zero a partir de analises (na transação do chamador)."""
+    conn.execute('DELETE FROM fatos_diarios')
+    conn.execute(_sql_somar_agrupado(1, '1 = 1'))
@@ -0,0 +1,269 @@
+"""
+Importação em lote de intimações (rota /api/intimacoes/importar-lote).
+
+Três fases, em vez de uma gravação completa (conexão, SELECT de duplicidade, INSERT, commit)
+por registro:
+
+1. validação/normalização de todos os registros em memória (sem acesso ao banco por registro);
+2. duplicidade de intimacaoId resolvida numa consulta só (IN em blocos) e dentro do próprio lote;
+3. inserção com executemany em blocos (SQLiteService.inserir_intimacoes_lote).
+
+O resultado traz o desfecho de cada registro (índice original). No modo tudo_ou_nada, qualquer
+falha — de validação ou de gravação — faz com que nada seja gravado.
+
+A sincronização (sincronizar_registros_intimacoes_lote) é a variante para reimportar exports que
+se sobrepõem: intimacaoId já cadastrado não é erro, o registro é comparado pelo hash do conteúdo e
+só o que mudou é gravado (SQLiteService.sincronizar_intimacoes_lote).
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+TAMANHO_LOTE_IMPORTACAO_PADRAO = 1000
+
+# Importação em blocos: só as falhas são detalhadas, até este limite (as contagens seguem completas)
+MAX_FALHAS_DETALHADAS_EM_BLOCOS = 1000
+MENSAGEM_NAO_GRAVADO_TUDO_OU_NADA = 'Não gravado: importação tudo ou nada cancelada por falhas em outros registros.'
+
+
+def importar_registros_intimacoes_lote(data_service,
+                                       registros: List[Any],
+                                       montar_intimacao: Callable[[dict], Dict[str, Any]],
+                                       dry_run: bool = False,
+                                       tudo_ou_nada: bool = False,
+                                       tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO_PADRAO,
+                                       indice_inicial: int = 0,
+                                       vistos_externos: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Valida e importa os registros.
+
+    Args:
+        data_service: SQLiteService
+        registros: Objetos JSON recebidos
+        montar_intimacao: Valida/normaliza um registro (ValueError se inválido); não deve
+            consultar duplicidade no banco, feita aqui para o lote inteiro
+        dry_run: Só valida (inclusive duplicidade), sem gravar
+        tudo_ou_nada: Grava somente se todos os registros forem válidos e gravados
+        indice_inicial: Deslocamento do 'indice' reportado (importação em blocos)
+        vistos_externos: intimacaoId -> índice já vistos em blocos anteriores (atualizado aqui)
+
+    Returns:
+        Resumo no formato da resposta da rota (total, importados, validados, falhas, resultados)
+    """
+    resultados: List[Dict[str, Any]] = [None] * len(registros)
+    validos = _validar_registros(registros, montar_intimacao, resultados, indice_inicial)
+    validos = _descartar_duplicados(
+        data_service, validos, resultados, indice_inicial, {} if vistos_externos is None else vistos_externos
+    )
+
+    falhas_validacao = len(registros) - len(validos)
+    abortado = tudo_ou_nada and falhas_validacao > 0
+    if dry_run or abortado:
+        for idx, dados in validos:
+            if abortado and not dry_run:
+                resultados[idx] = {'indice': indice_inicial + idx, 'sucesso': False, 'erro': MENSAGEM_NAO_GRAVADO_TUDO_OU_NADA}
+            else:
+                resultados[idx] = {
+                    'indice': indice_inicial + idx,
+                    'sucesso': True,
+                    'dry_run': True,
+                    'preview_processo': dados.get('processo'),
+                }
+    elif validos:
+        gravados = data_service.inserir_intimacoes_lote(
+            [dados for _, dados in validos], tudo_ou_nada=tudo_ou_nada, tamanho_lote=tamanho_lote
+        )
+        for (idx, _), gravado in zip(validos, gravados):
+            if 'erro' in gravado:
+                resultados[idx] = {'indice': indice_inicial + idx, 'sucesso': False, 'erro': gravado['erro']}
+            else:
+                resultados[idx] = {'indice': indice_inicial + idx, 'sucesso': True, 'id': gravado['id']}
+
+    ok_count = sum(1 for r in resultados if r['sucesso'])
+    if tudo_ou_nada and not dry_run and ok_count < len(validos):
+        abortado = True  # falha na gravação: a transação inteira foi desfeita
+    return {
+        'dry_run': dry_run,
+        'tudo_ou_nada': tudo_ou_nada,
+        'abortado': abortado,
+        'total': len(registros),
+        'importados': ok_count if not dry_run else 0,
+        'validados': ok_count if dry_run else 0,
+        'falhas': len(registros) - ok_count,
+        'resultados': resultados,
+    }
+
+
+def _validar_registros(registros: List[Any],
+                       montar_intimacao: Callable[[dict], Dict[str, Any]],
+                       resultados: List[Dict[str, Any]],
+                       indice_inicial: int) -> List[tuple]:
+    """Normaliza cada registro; os inválidos viram falha em resultados. Devolve [(indice, dados)]."""
+    validos: List[tuple] = []
+    for idx, reg in enumerate(registros):
+        if not isinstance(reg, dict):
+            resultados[idx] = {'indice': indice_inicial + idx, 'sucesso': False, 'erro': 'Item não é um objeto JSON.'}
+            continue
+        try:
+            validos.append((idx, montar_intimacao(reg)))
+        except Exception as e:
+            resultados[idx] = {'indice': indice_inicial + idx, 'sucesso': False, 'erro': str(e)}
+    return validos
+
+
+def _descartar_duplicados(data_service,
+                          validos: List[tuple],
+                          resultados: List[Dict[str, Any]],
+                          indice_inicial: int,
+                          vistos: Dict[str, int],
+                          verificar_cadastrados: bool = True) -> List[tuple]:
+    """Marca como falha os intimacaoId já cadastrados ou repetidos no lote; devolve os restantes."""
+    ids_externos = [d['intimacao_id_externo'] for _, d in validos if d.get('intimacao_id_externo')]
+    existentes = (
+        data_service.get_ids_por_intimacao_ids_externos(ids_externos)
+        if ids_externos and verificar_cadastrados else {}
+    )
+
+    restantes = []
+    for idx, dados in validos:
+        externo = dados.get('intimacao_id_externo')
+        if externo and externo in existentes:
+            resultados[idx] = {
+                'indice': indice_inicial + idx,
+                'sucesso': False,
+                'erro': (
+                    f'Intimação já cadastrada com intimacaoId={externo!r} '
+                    f'(id interno: {existentes[externo]}).'
+                ),
+            }
+        elif externo and externo in vistos:
+            resultados[idx] = {
+                'indice': indice_inicial + idx,
+                'sucesso': False,
+                'erro': f'intimacaoId={externo!r} repetido no lote (já usado no índice {vistos[externo]}).',
+            }
+        else:
+            if externo:
+                vistos[externo] = indice_inicial + idx
+            restantes.append((idx, dados))
+    return restantes
+
+
+def sincronizar_registros_intimacoes_lote(data_service,
+                                         registros: List[Any],
+                                         montar_intimacao: Callable[[dict], Dict[str, Any]],
+                                         dry_run: bool = False,
+                                         tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO_PADRAO,
+                                         indice_inicial: int = 0,
+                                         vistos_externos: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Sincroniza os registros com o cadastro pelo intimacaoId (reimportação incremental).
+
+    Mesma validação da importação; intimacaoId já cadastrado não é falha: o registro é inserido,
+    atualizado (só as colunas alteradas) ou mantido sem escrita quando o conteúdo não mudou.
+    Registros sem intimacaoId falham, pois não há como reconhecê-los numa reimportação.
+
+    Returns:
+        Resumo com total, inseridos, atualizados, inalterados, falhas e resultados por registro
+        ('acao' e 'colunas_alteradas'); em dry_run, o que seria feito, sem gravar
+    """
+    resultados: List[Dict[str, Any]] = [None] * len(registros)
+    validos = _validar_registros(registros, montar_intimacao, resultados, indice_inicial)
+    validos = _descartar_duplicados(
+        data_service, validos, resultados, indice_inicial,
+        {} if vistos_externos is None else vistos_externos, verificar_cadastrados=False,
+    )
+
+    contagem = {'inserida': 0, 'atualizada': 0, 'inalterada': 0}
+    if validos:
+        sincronizados = data_service.sincronizar_intimacoes_lote(
+            [dados for _, dados in validos], tamanho_lote=tamanho_lote, dry_run=dry_run
+        )
+        for (idx, _), sincronizado in zip(validos, sincronizados):
+            if 'erro' in sincronizado:
+                resultados[idx] = {'indice': indice_inicial + idx, 'sucesso': False, 'erro': sincronizado['erro']}
+            else:
+                contagem[sincronizado['acao']] += 1
+                resultados[idx] = {'indice': indice_inicial + idx, 'sucesso': True, **sincronizado}
+                if dry_run:
+                    resultados[idx]['dry_run'] = True
+
+    return {
+        'modo': 'sincronizar',
+        'dry_run': dry_run,
+        'total': len(registros),
+        'inseridos': contagem['inserida'],
+        'atualizados': contagem['atualizada'],
+        'inalterados': contagem['inalterada'],
+        'falhas': len(registros) - sum(contagem.values()),
+        'resultados': resultados,
+    }
+
+
+def importar_registros_intimacoes_lote_em_blocos(data_service,
+                                                 registros: Iterable[Any],
+                                                 montar_intimacao: Callable[[dict], Dict[str, Any]],
+                                                 dry_run: bool = False,
+                                                 tamanho_bloco: int = 5 * TAMANHO_LOTE_IMPORTACAO_PADRAO,
+                                                 sincronizar: bool = False) -> Dict[str, Any]:
+    """
+    Importa registros vindos de um iterável (ex.: transformação em streaming), um bloco por vez.
+
+    Cada bloco passa pelas mesmas fases de importar_registros_intimacoes_lote (ou de
+    sincronizar_registros_intimacoes_lote, com sincronizar=True); índices e intimacaoId repetidos
+    são acompanhados entre blocos. Não há modo tudo ou nada aqui: blocos já gravados permanecem
+    se um bloco posterior falhar.
+
+    Para a memória não crescer com o arquivo, o resumo traz só contagens e os resultados com falha
+    (até MAX_FALHAS_DETALHADAS_EM_BLOCOS; as demais entram em falhas_omitidas).
+    """
+    if sincronizar:
+        resumo = {
+            'modo': 'sincronizar',
+            'dry_run': dry_run,
+            'total': 0,
+            'inseridos': 0,
+            'atualizados': 0,
+            'inalterados': 0,
+            'falhas': 0,
+            'resultados_com_falha': [],
+            'falhas_omitidas': 0,
+        }
+    else:
+        resumo = {
+            'dry_run': dry_run,
+            'tudo_ou_nada': False,
+            'abortado': False,
+            'total': 0,
+            'importados': 0,
+            'validados': 0,
+            'falhas': 0,
+            'resultados_com_falha': [],
+            'falhas_omitidas': 0,
+        }
+    processar = sincronizar_registros_intimacoes_lote if sincronizar else importar_registros_intimacoes_lote
+    vistos: Dict[str, int] = {}
+
+    def _importar(bloco):
+        parcial = processar(
+            data_service, bloco, montar_intimacao, dry_run=dry_run,
+            indice_inicial=resumo['total'], vistos_externos=vistos,
+        )
+        for campo, valor in parcial.items():
+            if isinstance(valor, int) and not isinstance(valor, bool):
+                resumo[campo] += valor
+        for resultado in parcial['resultados']:
+            if resultado['sucesso']:
+                continue
+            if len(resumo['resultados_com_falha']) < MAX_FALHAS_DETALHADAS_EM_BLOCOS:
+                resumo['resultados_com_falha'].append(resultado)
+            else:
+                resumo['falhas_omitidas'] += 1
+
+    bloco: List[Any] = []
+    for registro in registros:
+        bloco.append(registro)
+        if len(bloco) >= tamanho_bloco:
+            _importar(bloco)
+            bloco = []
+    if bloco:
+        _importar(bloco)
+    return resumo
@@ -0,0 +1,289 @@
+"""
+Instrumentação de desempenho: latência de rotas, métodos do SQLiteService e chamadas aos
+provedores de IA, consultas SQL lentas com o plano de execução, e exportação no formato texto do
+Prometheus (rota /metrics).
+
+As durações vão para resumos (contagem, soma e quantis p50/p95/p99 sobre as últimas
+TAMANHO_JANELA_AMOSTRAS observações de cada série); contadores acumulam totais como bytes
+trafegados. Tudo fica em memória, por processo; registrar uma observação custa um lock e um
+append, então pode rodar em todo request.
+
+Consultas: get_connection abre as conexões com ConexaoInstrumentada, que cronometra cada
+execute até a primeira linha (para SELECT com agregação é quase todo o trabalho; a leitura das
+demais linhas não entra). Acima de limite_consulta_lenta_ms a instrução é registrada no log
+'instrumentacao.sql' junto com o EXPLAIN QUERY PLAN.
+"""
+import functools
+import inspect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+QUANTIS = (0.5, 0.95, 0.99)
+TAMANHO_JANELA_AMOSTRAS = 1024
+LIMITE_CONSULTA_LENTA_MS_PADRAO = 200.0
+MAX_CARACTERES_SQL_NO_LOG = 2000
+
+METRICA_ROTAS = 'http_requisicao_duracao_segundos'
+METRICA_BYTES_REQUISICAO = 'http_requisicao_bytes_total'
+METRICA_BYTES_RESPOSTA = 'http_resposta_bytes_total'
+METRICA_METODOS_SQLITE = 'sqlite_metodo_duracao_segundos'
+METRICA_CONSULTAS_LENTAS = 'sqlite_consultas_lentas_total'
+METRICA_PROVEDORES_IA = 'provedor_ia_chamada_duracao_segundos'
+
+DESCRICOES_METRICAS = {
+    METRICA_ROTAS: 'Duração das requisições HTTP até a resposta (em streaming, até os cabeçalhos).',
+    METRICA_BYTES_REQUISICAO: 'Bytes recebidos no corpo das requisições.',
+    METRICA_BYTES_RESPOSTA: 'Bytes enviados nas respostas de tamanho conhecido.',
+    METRICA_METODOS_SQLITE: 'Duração dos métodos públicos do SQLiteService.',
+    METRICA_CONSULTAS_LENTAS: 'Instruções SQL acima do limite de consulta lenta.',
+    METRICA_PROVEDORES_IA: 'Duração das chamadas aos provedores de IA.',
+}
+
+logger_sql = logging.getLogger('instrumentacao.sql')
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+class _Resumo:
+    __slots__ = ('contagem', 'soma', 'amostras')
+
+    def __init__(self, janela: int):
+        self.contagem = 0
+        self.soma = 0.0
+        self.amostras: Deque[float] = deque(maxlen=janela)
+
+
+def _quantil(ordenadas: List[float], q: float) -> float:
+    if not ordenadas:
+        return float('nan')
+    return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+
+def _escapar_rotulo(valor: str) -> str:
+    return valor.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _formatar_rotulos(rotulos: Rotulos, extra: Optional[Tuple[str, str]] = None) -> str:
+    pares = list(rotulos) + ([extra] if extra else [])
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar_rotulo(str(valor))}"' for nome, valor in pares) + '}'
+
+
+def _formatar_valor(valor: float) -> str:
+    if valor != valor:
+        return 'NaN'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class RegistroMetricas:
+    """Resumos, contadores e medidores por (nome, rótulos), exportáveis no formato do Prometheus."""
+
+    def __init__(self, janela: int = TAMANHO_JANELA_AMOSTRAS):
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._resumos: Dict[str, Dict[Rotulos, _Resumo]] = {}
+        self._contadores: Dict[str, Dict[Rotulos, float]] = {}
+        self._coletores: List[Callable[[], Dict[str, Any]]] = []
+
+    def observar(self, nome: str, valor: float, /, **rotulos: str) -> None:
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            series = self._resumos.setdefault(nome, {})
+            resumo = series.get(chave)
+            if resumo is None:
+                resumo = series[chave] = _Resumo(self.janela)
+            resumo.contagem += 1
+            resumo.soma += valor
+            resumo.amostras.append(valor)
+
+    def incrementar(self, nome: str, valor: float = 1, /, **rotulos: str) -> None:
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            series = self._contadores.setdefault(nome, {})
+            series[chave] = series.get(chave, 0) + valor
+
+    @contextmanager
+    def cronometrar(self, nome: str, /, **rotulos: str) -> Iterator[None]:
+        """Observa a duração do bloco; com exceção, o rótulo resultado vira 'erro'."""
+        inicio = time.perf_counter()
+        resultado = 'ok'
+        try:
+            yield
+        except BaseException:
+            resultado = 'erro'
+            raise
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, resultado=resultado, **rotulos)
+
+    def registrar_coletor(self, coletor: Callable[[], Dict[str, Any]]) -> None:
+        """Função chamada a cada exportação que devolve medidores {nome: valor} (ex.: estado de um cache)."""
+        with self._lock:
+            self._coletores.append(coletor)
+
+    def resumo(self, nome: str, /, **rotulos: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            serie = self._resumos.get(nome, {}).get(tuple(sorted(rotulos.items())))
+            if serie is None:
+                return None
+            ordenadas = sorted(serie.amostras)
+            return {
+                'contagem': serie.contagem,
+                'soma': serie.soma,
+                **{f'p{int(q * 100)}': _quantil(ordenadas, q) for q in QUANTIS},
+            }
+
+    def contador(self, nome: str, /, **rotulos: str) -> float:
+        with self._lock:
+            return self._contadores.get(nome, {}).get(tuple(sorted(rotulos.items())), 0)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._resumos.clear()
+            self._contadores.clear()
+
+    def exportar_prometheus(self) -> str:
+        """Formato texto de exposição do Prometheus (0.0.4)."""
+        with self._lock:
+            resumos = {nome: {r: (s.contagem, s.soma, sorted(s.amostras)) for r, s in series.items()}
+                       for nome, series in self._resumos.items()}
+            contadores = {nome: dict(series) for nome, series in self._contadores.items()}
+            coletores = list(self._coletores)
+
+        linhas: List[str] = []
+        for nome in sorted(resumos):
+            linhas.append(f'# HELP {nome} {DESCRICOES_METRICAS.get(nome, nome)}')
+            linhas.append(f'# TYPE {nome} summary')
+            for rotulos, (contagem, soma, ordenadas) in sorted(resumos[nome].items()):
+                for q in QUANTIS:
+                    linhas.append(f'{nome}{_formatar_rotulos(rotulos, ("quantile", str(q)))} '
+                                  f'{_formatar_valor(_quantil(ordenadas, q))}')
+                linhas.append(f'{nome}_sum{_formatar_rotulos(rotulos)} {_formatar_valor(soma)}')
+                linhas.append(f'{nome}_count{_formatar_rotulos(rotulos)} {contagem}')
+        for nome in sorted(contadores):
+            linhas.append(f'# HELP {nome} {DESCRICOES_METRICAS.get(nome, nome)}')
+            linhas.append(f'# TYPE {nome} counter')
+            for rotulos, valor in sorted(contadores[nome].items()):
+                linhas.append(f'{nome}{_formatar_rotulos(rotulos)} {_formatar_valor(valor)}')
+        for coletor in coletores:
+            try:
+                medidores = coletor()
+            except Exception as e:
+                logging.getLogger(__name__).warning('Coletor de métricas falhou: %s', e)
+                continue
+            for nome, valor in sorted(medidores.items()):
+                linhas.append(f'# TYPE {nome} gauge')
+                linhas.append(f'{nome} {_formatar_valor(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+
+registro_metricas = RegistroMetricas()
+
+
+def instrumentar_metodos(metrica: str, exceto: Tuple[str, ...] = ()):
+    """
+    Decorador de classe: cronometra cada método público (rótulo metodo) em `metrica`. Ficam de fora
+    os privados, os de `exceto`, os estáticos/de classe e os geradores e context managers (só
+    mediriam a criação do iterador).
+    """
+    def decorar(cls):
+        for nome, atributo in list(vars(cls).items()):
+            if nome.startswith('_') or nome in exceto or not inspect.isfunction(atributo):
+                continue
+            original = inspect.unwrap(atributo)
+            if inspect.isgeneratorfunction(original) or inspect.isgeneratorfunction(getattr(atributo, '__wrapped__', None)):
+                continue
+            setattr(cls, nome, _cronometrado(atributo, metrica, nome))
+        return cls
+    return decorar
+
+
+def _cronometrado(funcao, metrica: str, nome: str):
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        with registro_metricas.cronometrar(metrica, metodo=nome):
+            return funcao(*args, **kwargs)
+    return envoltorio
+
+
+def cronometrar_chamadas_provedor(cls, provedor: str, metodos: Tuple[str, ...]) -> None:
+    """Envolve os métodos de chamada à API de um provedor de IA (rótulos provedor e operacao)."""
+    for nome in metodos:
+        funcao = vars(cls).get(nome)
+        if funcao is None or not inspect.isfunction(funcao):
+            continue
+
+        def _fabricar(funcao=funcao, nome=nome):
+            @functools.wraps(funcao)
+            def envoltorio(*args, **kwargs):
+                with registro_metricas.cronometrar(METRICA_PROVEDORES_IA, provedor=provedor, operacao=nome):
+                    return funcao(*args, **kwargs)
+            return envoltorio
+
+        setattr(cls, nome, _fabricar())
+
+
+# --- Consultas lentas ---------------------------------------------------------------------------
+
+_limite_consulta_lenta_segundos = LIMITE_CONSULTA_LENTA_MS_PADRAO / 1000
+_PADRAO_INSTRUCAO_COM_PLANO = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+_PADRAO_ESPACOS = re.compile(r'\s+')
+
+
+def definir_limite_consulta_lenta(milissegundos: float) -> None:
+    global _limite_consulta_lenta_segundos
+    _limite_consulta_lenta_segundos = max(0.0, float(milissegundos)) / 1000
+
+
+def _registrar_consulta_lenta(conexao: sqlite3.Connection, sql: str, parametros: Any,
+                              duracao: float, em_lote: bool) -> None:
+    texto = _PADRAO_ESPACOS.sub(' ', sql).strip()
+    operacao = texto.split(' ', 1)[0].upper() if texto else ''
+    registro_metricas.incrementar(METRICA_CONSULTAS_LENTAS, operacao=operacao)
+    plano = ''
+    if not em_lote and _PADRAO_INSTRUCAO_COM_PLANO.match(sql):
+        try:
+            # Cursor base (não instrumentado): o EXPLAIN não entra nas medições
+            linhas = sqlite3.Cursor(conexao).execute('EXPLAIN QUERY PLAN ' + sql, parametros).fetchall()
+            plano = ''.join(f'\n    {tuple(linha)[-1]}' for linha in linhas)
+        except sqlite3.Error as e:
+            plano = f'\n    (plano indisponível: {e})'
+    logger_sql.warning('Consulta lenta (%.0f ms%s): %s%s', duracao * 1000, ', em lote' if em_lote else '',
+                       texto[:MAX_CARACTERES_SQL_NO_LOG], plano)
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    def execute(self, sql, parametros=(), /):
+        inicio = time.perf_counter()
+        resultado = super().execute(sql, parametros)
+        duracao = time.perf_counter() - inicio
+        if duracao >= _limite_consulta_lenta_segundos:
+            _registrar_consulta_lenta(self.connection, sql, parametros, duracao, em_lote=False)
+        return resultado
+
+    def executemany(self, sql, sequencia_parametros, /):
+        inicio = time.perf_counter()
+        resultado = super().executemany(sql, sequencia_parametros)
+        duracao = time.perf_counter() - inicio
+        if duracao >= _limite_consulta_lenta_segundos:
+            _registrar_consulta_lenta(self.connection, sql, (), duracao, em_lote=True)
+        return resultado
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de conn.execute) registram as instruções lentas."""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=(), /):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia_parametros, /):
+        return self.cursor().executemany(sql, sequencia_parametros)
@@ -0,0 +1,331 @@
+"""
+Jobs de exportação assíncrona das análises (CSV, JSONL ou Parquet) para a pasta exports/.
+
+A exportação roda num worker em segundo plano (ThreadPoolExecutor), grava o arquivo por
+ExportService.salvar_arquivo_local (ou pelo writer Parquet) e expõe o progresso em linhas. O
+arquivo pronto é servido pela rota de download com suporte a HTTP Range, então um download
+interrompido pelo proxy pode ser retomado sem refazer a exportação.
+
+O nome do arquivo carrega o id do job (PREFIXO_ARQUIVO_JOB + id), o que permite localizar
+exportações concluídas mesmo após reiniciar o servidor e limita a retenção (idade e tamanho
+total) aos arquivos gerados por jobs — os demais arquivos de exports/ não são tocados. Jobs cujo
+arquivo a retenção remove saem da tabela em memória; seus ids ficam numa lista curta de expirados
+(JobExportacaoExpiradoError, HTTP 410).
+"""
+import glob
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from services.export_service import FORMATOS_EXPORTACAO_STREAMING, SUFIXO_ARQUIVO_PARCIAL
+from services.exportacao_parquet_analises_colunar_service import (
+    PYARROW_DISPONIVEL,
+    ParquetIndisponivelError,
+    escrever_parquet_analises,
+)
+
+PREFIXO_ARQUIVO_JOB = 'exportacao_job_'
+
+FORMATOS_JOB_EXPORTACAO = ('csv', 'jsonl', 'parquet')
+
+MIMETYPES_JOB_EXPORTACAO = {
+    **FORMATOS_EXPORTACAO_STREAMING,
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+STATUS_PENDENTE = 'pendente'
+STATUS_EXECUTANDO = 'executando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_ERRO = 'erro'
+
+# Retenção padrão dos arquivos de jobs
+RETENCAO_MAX_BYTES_PADRAO = 2 * 1024 ** 3
+RETENCAO_MAX_IDADE_HORAS_PADRAO = 72
+# Ids de jobs expirados lembrados para responder 410 em vez de 404
+MAX_JOBS_EXPIRADOS_LEMBRADOS = 1000
+
+
+class JobExportacaoNaoEncontradoError(KeyError):
+    """Job de exportação inexistente (ou arquivo já removido pela retenção)."""
+
+
+class JobExportacaoExpiradoError(JobExportacaoNaoEncontradoError):
+    """O arquivo do job foi removido pela retenção."""
+
+
+class GerenciadorJobsExportacao:
+    """Fila de jobs de exportação, progresso em memória e retenção dos arquivos gerados."""
+
+    def __init__(self,
+                 export_service,
+                 max_workers: int = 1,
+                 retencao_max_bytes: int = RETENCAO_MAX_BYTES_PADRAO,
+                 retencao_max_idade_horas: float = RETENCAO_MAX_IDADE_HORAS_PADRAO):
+        self.export_service = export_service
+        self.retencao_max_bytes = retencao_max_bytes
+        self.retencao_max_idade_horas = retencao_max_idade_horas
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='exportacao-job')
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._expirados: 'OrderedDict[str, None]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def diretorio(self) -> str:
+        return self.export_service.config.EXPORT_DIR
+
+    def criar_job(self,
+                  formato: str = 'csv',
+                  data_inicio: str = '',
+                  data_fim: str = '',
+                  prompt_id: str = '',
+                  classificacao: str = '',
+                  conteudos_completos: bool = False) -> Dict[str, Any]:
+        """Enfileira uma exportação e devolve o estado inicial do job."""
+        if formato not in FORMATOS_JOB_EXPORTACAO:
+            raise ValueError(f"Formato de exportação inválido: {formato}")
+        if formato == 'parquet' and not PYARROW_DISPONIVEL:
+            raise ParquetIndisponivelError("Exportação Parquet requer o pacote pyarrow")
+
+        filtros = {
+            'data_inicio': data_inicio,
+            'data_fim': data_fim,
+            'prompt_id': prompt_id,
+            'classificacao_manual': classificacao,
+        }
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'formato': formato,
+            'filtros': filtros,
+            'conteudos_completos': bool(conteudos_completos),
+            'status': STATUS_PENDENTE,
+            'linhas_processadas': 0,
+            'total_estimado': None,
+            'progresso': 0.0,
+            'arquivo': None,
+            'tamanho_bytes': None,
+            'erro': None,
+            'criado_em': datetime.now().isoformat(),
+            'concluido_em': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._executor.submit(self._executar, job_id)
+        return self.obter_job(job_id)
+
+    def obter_job(self, job_id: str) -> Dict[str, Any]:
+        """
+        Estado do job. Jobs de execuções anteriores do servidor são reconstruídos a partir do
+        arquivo em exports/ (somente os concluídos, já que o progresso não é persistido).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job, filtros=dict(job['filtros']))
+            if job_id in self._expirados:
+                raise JobExportacaoExpiradoError(job_id)
+        caminho = self._localizar_arquivo_job(job_id)
+        if not caminho:
+            raise JobExportacaoNaoEncontradoError(job_id)
+        return {
+            'job_id': job_id,
+            'formato': os.path.splitext(caminho)[1].lstrip('.'),
+            'status': STATUS_CONCLUIDO,
+            'progresso': 100.0,
+            'arquivo': os.path.basename(caminho),
+            'tamanho_bytes': os.path.getsize(caminho),
+            'concluido_em': datetime.fromtimestamp(os.path.getmtime(caminho)).isoformat(),
+        }
+
+    def listar_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = [dict(j, filtros=dict(j['filtros'])) for j in self._jobs.values()]
+        return sorted(jobs, key=lambda j: j['criado_em'], reverse=True)
+
+    def caminho_arquivo_concluido(self, job_id: str) -> str:
+        """Caminho do arquivo pronto para download (JobExportacaoNaoEncontradoError se não houver)."""
+        job = self.obter_job(job_id)
+        if job['status'] != STATUS_CONCLUIDO:
+            raise JobExportacaoNaoEncontradoError(job_id)
+        caminho = os.path.join(self.diretorio, job['arquivo'])
+        if not os.path.exists(caminho):
+            self._expirar([job_id])
+            raise JobExportacaoExpiradoError(job_id)
+        return caminho
+
+    def aplicar_retencao(self, agora: Optional[float] = None) -> List[str]:
+        """
+        Remove arquivos de jobs mais antigos que o limite de idade e, se o total ainda passar do
+        limite de tamanho, os mais antigos até caber. Arquivos de jobs em execução são preservados.
+        Os jobs desses arquivos, e os com erro mais antigos que o limite de idade, saem da tabela
+        em memória.
+
+        Returns:
+            Nomes dos arquivos removidos
+        """
+        agora = time.time() if agora is None else agora
+        with self._lock:
+            em_execucao = {
+                j['job_id'] for j in self._jobs.values()
+                if j['status'] in (STATUS_PENDENTE, STATUS_EXECUTANDO)
+            }
+        arquivos = []
+        for caminho in glob.glob(os.path.join(self.diretorio, f'{PREFIXO_ARQUIVO_JOB}*')):
+            nome = os.path.basename(caminho)
+            if self._job_id_do_arquivo(nome) in em_execucao:
+                continue
+            try:
+                estado = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            arquivos.append((estado.st_mtime, estado.st_size, caminho))
+        arquivos.sort()
+
+        limite_idade = agora - self.retencao_max_idade_horas * 3600
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        removidos = []
+        for mtime, tamanho, caminho in arquivos:
+            if mtime >= limite_idade and total <= self.retencao_max_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+            removidos.append(os.path.basename(caminho))
+
+        limite_idade_iso = datetime.fromtimestamp(limite_idade).isoformat()
+        with self._lock:
+            com_erro_antigos = [
+                j['job_id'] for j in self._jobs.values()
+                if j['status'] == STATUS_ERRO and (j['concluido_em'] or '') < limite_idade_iso
+            ]
+        self._expirar([self._job_id_do_arquivo(nome) for nome in removidos] + com_erro_antigos)
+        return removidos
+
+    def aguardar(self, job_id: str, timeout: float = 30.0) -> Dict[str, Any]:
+        """Espera o job terminar (uso em scripts e testes)."""
+        limite = time.monotonic() + timeout
+        while True:
+            job = self.obter_job(job_id)
+            if job['status'] in (STATUS_CONCLUIDO, STATUS_ERRO) or time.monotonic() > limite:
+                return job
+            time.sleep(0.02)
+
+    def encerrar(self, aguardar: bool = True) -> None:
+        self._executor.shutdown(wait=aguardar)
+
+    def _executar(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job['status'] = STATUS_EXECUTANDO
+            filtros = dict(job['filtros'])
+            formato = job['formato']
+            conteudos_completos = job['conteudos_completos']
+        try:
+            data_service = self.export_service.data_service
+            total = data_service.contar_analises_relatorios_filtradas(**filtros)
+            self._atualizar(job_id, total_estimado=total)
+
+            nome = f'{PREFIXO_ARQUIVO_JOB}{job_id}'
+            if formato == 'parquet':
+                caminho = self._gravar_parquet(job_id, nome, filtros)
+            else:
+                linhas = self._contar_progresso(job_id, data_service.iterar_analises_exportacao(
+                    incluir_conteudos_completos=conteudos_completos and formato == 'jsonl',
+                    **filtros,
+                ))
+                if formato == 'csv':
+                    blocos = self.export_service.gerar_csv_analises(linhas)
+                    encoding = 'utf-8-sig'
+                else:
+                    blocos = self.export_service.gerar_jsonl_analises(linhas)
+                    encoding = 'utf-8'
+                caminho = self.export_service.salvar_arquivo_local(
+                    blocos, nome, formato, encoding=encoding, com_timestamp=False
+                )
+
+            self._atualizar(
+                job_id,
+                status=STATUS_CONCLUIDO,
+                progresso=100.0,
+                arquivo=os.path.basename(caminho),
+                tamanho_bytes=os.path.getsize(caminho),
+                concluido_em=datetime.now().isoformat(),
+            )
+        except Exception as e:
+            print(f"Erro no job de exportação {job_id}: {e}")
+            self._atualizar(job_id, status=STATUS_ERRO, erro=str(e), concluido_em=datetime.now().isoformat())
+        finally:
+            try:
+                self.aplicar_retencao()
+            except OSError as e:
+                print(f"Erro ao aplicar retenção das exportações: {e}")
+
+    def _gravar_parquet(self, job_id: str, nome: str, filtros: Dict[str, str]) -> str:
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = os.path.join(self.diretorio, f'{nome}.parquet')
+        caminho_parcial = caminho + SUFIXO_ARQUIVO_PARCIAL
+        analises = self._contar_progresso(
+            job_id,
+            self.export_service.data_service.iterar_analises_exportacao(
+                incluir_contexto=False, tamanho_lote=5000, **filtros
+            ),
+        )
+        try:
+            escrever_parquet_analises(caminho_parcial, analises)
+            os.replace(caminho_parcial, caminho)
+        except BaseException:
+            if os.path.exists(caminho_parcial):
+                os.remove(caminho_parcial)
+            raise
+        return caminho
+
+    def _contar_progresso(self, job_id: str, analises: Iterable[Dict[str, Any]],
+                          intervalo: int = 1000) -> Iterator[Dict[str, Any]]:
+        processadas = 0
+        for analise in analises:
+            yield analise
+            processadas += 1
+            if processadas % intervalo == 0:
+                self._registrar_linhas(job_id, processadas)
+        self._registrar_linhas(job_id, processadas)
+
+    def _registrar_linhas(self, job_id: str, processadas: int) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job['linhas_processadas'] = processadas
+            total = job['total_estimado']
+            if total:
+                job['progresso'] = round(min(processadas / total, 1.0) * 100, 1)
+
+    def _atualizar(self, job_id: str, **campos) -> None:
+        with self._lock:
+            self._jobs[job_id].update(campos)
+
+    def _expirar(self, job_ids: Iterable[str]) -> None:
+        with self._lock:
+            for job_id in job_ids:
+                self._jobs.pop(job_id, None)
+                self._expirados[job_id] = None
+                self._expirados.move_to_end(job_id)
+            while len(self._expirados) > MAX_JOBS_EXPIRADOS_LEMBRADOS:
+                self._expirados.popitem(last=False)
+
+    def _localizar_arquivo_job(self, job_id: str) -> Optional[str]:
+        if not job_id or not job_id.isalnum():
+            return None
+        for formato in FORMATOS_JOB_EXPORTACAO:
+            caminho = os.path.join(self.diretorio, f'{PREFIXO_ARQUIVO_JOB}{job_id}.{formato}')
+            if os.path.exists(caminho):
+                return caminho
+        return None
+
+    @staticmethod
+    def _job_id_do_arquivo(nome: str) -> str:
+        return nome[len(PREFIXO_ARQUIVO_JOB):].split('.', 1)[0]
@@ -0,0 +1,161 @@
+"""
+Leitura incremental (estilo ijson) dos itens do array "content" de um JSON grande.
+
+O arquivo é lido em blocos de um objeto de texto (arquivo aberto, upload em spool...) e cada item
+de content[] é devolvido como o trecho de texto JSON correspondente, sem carregar o documento
+inteiro: só o item corrente fica no buffer. A varredura pula direto para o próximo caractere
+estrutural com regex ({ } [ ] " e, dentro de strings, " ou \\), então o custo em Python é por
+token estrutural, não por caractere.
+
+Os limites de cada item são achados pela própria varredura (aspas e profundidade). Aspas não
+escapadas que aparecem em pares dentro de uma string (o caso típico de prompt exportado com
+trechos entre aspas) não desalinham os limites; o reparo desse item fica a cargo de quem consome.
+"""
+import re
+from typing import Iterator, Optional, TextIO, Tuple
+
+TAMANHO_BLOCO_LEITURA_PADRAO = 1024 * 1024
+
+_RE_ESTRUTURA = re.compile(r'[{}\[\]"]')
+_RE_STRING = re.compile(r'["\\]')
+_RE_CHAVE_CONTENT = re.compile(r'\s*:\s*\[')
+
+
+class ConteudoJsonIncrementalError(ValueError):
+    """Documento sem a chave 'content' com lista, ou truncado."""
+
+
+class _Leitor:
+    """Buffer de texto que descarta o que já foi consumido (antes da âncora)."""
+
+    def __init__(self, fp: TextIO, tamanho_bloco: int):
+        self.fp = fp
+        self.tamanho_bloco = tamanho_bloco
+        self.buf = ''
+        self.pos = 0
+        self.ancora = 0
+        self.eof = False
+
+    def ler_mais(self) -> bool:
+        if self.eof:
+            return False
+        bloco = self.fp.read(self.tamanho_bloco)
+        if not bloco:
+            self.eof = True
+            return False
+        if self.ancora:
+            self.buf = self.buf[self.ancora:]
+            self.pos -= self.ancora
+            self.ancora = 0
+        self.buf += bloco
+        return True
+
+    def procurar(self, regex) -> Optional[int]:
+        """Índice do próximo casamento a partir de pos (lendo mais se preciso) ou None no fim."""
+        while True:
+            m = regex.search(self.buf, self.pos)
+            if m:
+                return m.start()
+            self.pos = len(self.buf)
+            if not self.ler_mais():
+                return None
+
+    def pular_string(self) -> None:
+        """pos está logo após a aspa de abertura; avança até depois da aspa de fechamento."""
+        while True:
+            i = self.procurar(_RE_STRING)
+            if i is None:
+                raise ConteudoJsonIncrementalError('JSON truncado: string não terminada.')
+            if self.buf[i] == '"':
+                self.pos = i + 1
+                return
+            # Barra invertida: o caractere seguinte é escapado (pos acompanha a compactação do buffer)
+            self.pos = i
+            while self.pos + 1 >= len(self.buf):
+                if not self.ler_mais():
+                    raise ConteudoJsonIncrementalError('JSON truncado: escape no fim do arquivo.')
+            self.pos += 2
+
+
+def iterar_itens_content(fp: TextIO,
+                         chave: str = 'content',
+                         tamanho_bloco: int = TAMANHO_BLOCO_LEITURA_PADRAO) -> Iterator[Tuple[int, str]]:
+    """
+    Gera (índice a partir de 1, texto JSON do item) para cada elemento de documento[chave].
+
+    A chave é procurada no objeto raiz; valores de outras chaves do topo são pulados.
+    """
+    leitor = _Leitor(fp, tamanho_bloco)
+    leitor.ler_mais()
+    _posicionar_no_array(leitor, chave)
+
+    # leitor.ancora marca o fim do item anterior (entre itens) ou o início do item corrente;
+    # é o ponto a partir do qual o buffer é preservado quando mais texto é lido
+    indice = 0
+    profundidade = 0  # relativa ao array: 0 = entre itens
+    while True:
+        i = leitor.procurar(_RE_ESTRUTURA)
+        if i is None:
+            raise ConteudoJsonIncrementalError(f"JSON truncado dentro de '{chave}'.")
+        c = leitor.buf[i]
+        if profundidade == 0:
+            # Escalares soltos (número, true, null...) entre itens também são itens
+            for escalar in _escalares_entre(leitor.buf[leitor.ancora:i]):
+                indice += 1
+                yield indice, escalar
+            if c == ']':
+                return
+            if c == '}':
+                raise ConteudoJsonIncrementalError(f"JSON inválido dentro de '{chave}'.")
+            leitor.ancora = i
+        leitor.pos = i + 1
+        if c == '"':
+            leitor.pular_string()
+        elif c in '{[':
+            profundidade += 1
+        else:
+            profundidade -= 1
+        if profundidade == 0:
+            indice += 1
+            yield indice, leitor.buf[leitor.ancora:leitor.pos]
+            leitor.ancora = leitor.pos
+
+
+def _posicionar_no_array(leitor: _Leitor, chave: str) -> None:
+    """Avança até logo depois do '[' de documento[chave]."""
+    profundidade = 0
+    while True:
+        i = leitor.procurar(_RE_ESTRUTURA)
+        if i is None:
+            raise ConteudoJsonIncrementalError(
+                f"O JSON precisa ter a chave '{chave}' com uma lista de registros."
+            )
+        c = leitor.buf[i]
+        leitor.ancora = i
+        leitor.pos = i + 1
+        if c == '"':
+            leitor.pular_string()
+            if profundidade == 1 and leitor.buf[leitor.ancora + 1:leitor.pos - 1] == chave:
+                while len(leitor.buf) - leitor.pos < 64 and leitor.ler_mais():
+                    pass
+                m = _RE_CHAVE_CONTENT.match(leitor.buf, leitor.pos)
+                if m:
+                    leitor.pos = m.end()
+                    leitor.ancora = leitor.pos
+                    return
+        elif c in '{[':
+            profundidade += 1
+        else:
+            profundidade -= 1
+            if profundidade <= 0:
+                raise ConteudoJsonIncrementalError(
+                    f"O JSON precisa ter a chave '{chave}' com uma lista de registros."
+                )
+
+
+def _escalares_entre(trecho: str):
+    for parte in trecho.split(','):
+        parte = parte.strip()
+        if parte:
+            yield parte
+
@@ -8,7 +8,7 @@ import httpx
 import openai
 
 from config import Config
-from services.sqlite_service import SQLiteService
+from services.sqlite_service import obter_sqlite_service
 from services.ai_service_interface import AIServiceInterface
 from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_service import (
     extrair_classificacao_da_resposta_ia,
@@ -16,6 +16,10 @@ from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_servic
 from services.extracao_texto_resposta_chat_completions_openai_compat import (
     texto_mensagem_assistente,
 )
+from services.classificacao_ia_extracao_incremental_streaming_chat_completions_service import (
+    ExtratorIncrementalClassificacaoTriagem,
+    consumir_stream_chat_completions,
+)
 
 
 def _normalize_litellm_base_url(url: str) -> str:
@@ -109,7 +113,7 @@ class LiteLLMService(AIServiceInterface):
     """Proxy LiteLLM exposto como OpenAI-compatible chat completions."""
 
     def __init__(self):
-        self.data_service = SQLiteService()
+        self.data_service = obter_sqlite_service()
         self.config = Config()
         self.client = None
         self._http_client: Optional[httpx.Client] = None
@@ -216,6 +220,8 @@ class LiteLLMService(AIServiceInterface):
 
         p = dict(parametros)
         raw_user_only = bool(p.pop("raw_user_prompt_only", False))
+        parar_apos_classificacao = bool(p.pop("parar_apos_classificacao", False))
+        stream = bool(p.pop("stream", False)) or parar_apos_classificacao
         prompt_completo = (
             prompt_template
             if raw_user_only
@@ -223,6 +229,13 @@ class LiteLLMService(AIServiceInterface):
         )
         parametros_validados = self._validar_parametros(p)
         parametros_validados["_raw_user_only"] = raw_user_only
+        if stream:
+            resposta_completa, tokens_info, classificacao = self._fazer_chamada_streaming_com_retry(
+                prompt_completo, parametros_validados, parar_apos_classificacao
+            )
+            if classificacao is None:
+                classificacao = self._extrair_classificacao(resposta_completa)
+            return classificacao, resposta_completa, tokens_info
         resposta_completa, tokens_info = self._fazer_chamada_com_retry(
             prompt_completo, parametros_validados
         )
@@ -255,23 +268,9 @@ class LiteLLMService(AIServiceInterface):
     ) -> Tuple[str, Dict[str, int]]:
         for tentativa in range(max_retries):
             try:
-                raw_only = bool(parametros.get("_raw_user_only"))
-                if raw_only:
-                    messages: List[Dict[str, str]] = [{"role": "user", "content": prompt}]
-                else:
-                    messages = [
-                        {
-                            "role": "system",
-                            "content": (
-                                "Você é um assistente especializado em análise de intimações jurídicas. "
-                                "Responda sempre com uma das classificações solicitadas."
-                            ),
-                        },
-                        {"role": "user", "content": prompt},
-                    ]
                 response = self.client.chat.completions.create(
                     model=parametros["model"],
-                    messages=messages,
+                    messages=self._montar_mensagens(prompt, parametros),
                     temperature=parametros["temperature"],
                     max_tokens=parametros["max_tokens"],
                 )
@@ -304,6 +303,55 @@ class LiteLLMService(AIServiceInterface):
                 raise Exception(f"Erro na chamada LiteLLM: {str(e)}")
         raise Exception("Falha ao completar chamada LiteLLM")
 
+    def _montar_mensagens(self, prompt: str, parametros: Dict[str, Any]) -> List[Dict[str, str]]:
+        if parametros.get("_raw_user_only"):
+            return [{"role": "user", "content": prompt}]
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "Você é um assistente especializado em análise de intimações jurídicas. "
+                    "Responda sempre com uma das classificações solicitadas."
+                ),
+            },
+            {"role": "user", "content": prompt},
+        ]
+
+    def _fazer_chamada_streaming_com_retry(
+        self,
+        prompt: str,
+        parametros: Dict[str, Any],
+        parar_apos_classificacao: bool,
+        max_retries: int = 3,
+    ) -> Tuple[str, Dict[str, int], Optional[str]]:
+        """Streaming; classificação incremental só é retornada se o stream foi cortado nela."""
+        for tentativa in range(max_retries):
+            try:
+                stream = self.client.chat.completions.create(
+                    model=parametros["model"],
+                    messages=self._montar_mensagens(prompt, parametros),
+                    temperature=parametros["temperature"],
+                    max_tokens=parametros["max_tokens"],
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                extrator = ExtratorIncrementalClassificacaoTriagem(self.config.TIPOS_ACAO)
+                texto, tokens_info, interrompido = consumir_stream_chat_completions(
+                    stream,
+                    extrator,
+                    parar_apos_classificacao=parar_apos_classificacao,
+                    prompt=prompt,
+                )
+                return texto, tokens_info, extrator.classificacao if interrompido else None
+            except (openai.RateLimitError, openai.APIError) as e:
+                if tentativa < max_retries - 1:
+                    time.sleep(2**tentativa)
+                else:
+                    raise Exception(f"Erro da API LiteLLM (streaming) após várias tentativas: {str(e)}")
+            except Exception as e:
+                raise Exception(f"Erro na chamada LiteLLM (streaming): {str(e)}")
+        raise Exception("Falha ao completar chamada LiteLLM (streaming)")
+
     def _extrair_classificacao(self, resposta: str) -> str:
         return extrair_classificacao_da_resposta_ia(resposta, self.config.TIPOS_ACAO)
 
@@ -0,0 +1,321 @@
+"""
+Manutenção periódica do banco SQLite: VACUUM incremental, estatísticas do planejador e checkpoint do WAL.
+
+Excluir sessões e intimações deixa páginas livres que nunca voltavam ao sistema de arquivos, e sem
+ANALYZE o planejador escolhia mal os índices dos filtros de data e prompt. Uma thread em segundo
+plano (ServicoManutencaoBanco.iniciar_agendador) verifica o WAL a cada INTERVALO_VERIFICACAO e,
+a cada INTERVALO_MANUTENCAO, roda a manutenção dentro de um orçamento de tempo:
+
+1. devolve as páginas livres com PRAGMA incremental_vacuum, em transações curtas;
+2. ANALYZE (com analysis_limit) a cada INTERVALO_ANALYZE, ou só PRAGMA optimize nas demais;
+3. checkpoint TRUNCATE do WAL (encolhe o arquivo depois do vacuum).
+
+Banco antigo com auto_vacuum=NONE não tem vacuum incremental: a conversão para INCREMENTAL exige
+um VACUUM completo, que segura todas as conexões durante a cópia do arquivo inteiro. Por isso ela
+nunca roda sozinha: é uma ação do operador (ServicoManutencaoBanco.converter_auto_vacuum, botão na
+página de configurações), que espera no máximo PRAZO_PORTAO_CONVERSAO_SEGUNDOS pelas conexões abertas.
+
+O orçamento é imposto por um progress handler que interrompe o passo em andamento (o SQLite
+desfaz o passo interrompido). Cada execução grava uma amostra em manutencao_banco_historico, de
+onde saem a fragmentação e a tendência de tamanho exibidas em /api/backup/stats.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_VERIFICACAO_SEGUNDOS = 300
+INTERVALO_MANUTENCAO = timedelta(hours=6)
+INTERVALO_ANALYZE = timedelta(days=1)
+ORCAMENTO_MANUTENCAO_SEGUNDOS = 30.0
+# Espera máxima pelas conexões abertas antes do VACUUM da conversão (novas conexões ficam barradas)
+PRAZO_PORTAO_CONVERSAO_SEGUNDOS = 2.0
+
+LIMITE_WAL_BYTES = 64 * 1024 * 1024
+PAGINAS_POR_TRANSACAO_VACUUM = 1024
+LIMITE_ANALISE_LINHAS = 1000
+VELOCIDADE_ESTIMADA_VACUUM_BYTES_POR_SEGUNDO = 20 * 1024 * 1024
+INSTRUCOES_POR_VERIFICACAO_ORCAMENTO = 10_000
+AMOSTRAS_HISTORICO_MANTIDAS = 500
+AMOSTRAS_TENDENCIA = 30
+
+MODOS_AUTO_VACUUM = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def configurar_arquivo_banco(conn: sqlite3.Connection) -> None:
+    """
+    WAL (leituras não esperam escritas; checkpoint feito pela manutenção) e, em banco ainda vazio,
+    auto_vacuum=INCREMENTAL, que só pode ser definido antes da primeira tabela sem um VACUUM.
+    """
+    try:
+        if conn.execute('PRAGMA page_count').fetchone()[0] == 0:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode = WAL')
+    except sqlite3.OperationalError as e:
+        # outro processo com o banco aberto: fica para a próxima abertura
+        logger.warning('Configuração do arquivo do banco adiada: %s', e)
+
+
+def criar_historico_manutencao(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS manutencao_banco_historico (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            executada_em TEXT NOT NULL,
+            tamanho_bytes INTEGER NOT NULL,
+            wal_bytes INTEGER NOT NULL,
+            tamanho_pagina INTEGER NOT NULL,
+            paginas INTEGER NOT NULL,
+            paginas_livres INTEGER NOT NULL,
+            com_analyze INTEGER NOT NULL DEFAULT 0,
+            acoes TEXT NOT NULL,
+            duracao_segundos REAL NOT NULL
+        )
+    ''')
+
+
+class _OrcamentoEsgotado(Exception):
+    pass
+
+
+def _tamanho_arquivo(caminho: str) -> int:
+    try:
+        return os.path.getsize(caminho)
+    except OSError:
+        return 0
+
+
+class ServicoManutencaoBanco:
+    """Manutenção do banco de um SQLiteService, sob demanda ou agendada numa thread."""
+
+    def __init__(self, data_service,
+                 orcamento_segundos: float = ORCAMENTO_MANUTENCAO_SEGUNDOS,
+                 limite_wal_bytes: int = LIMITE_WAL_BYTES):
+        self.data_service = data_service
+        self.orcamento_segundos = orcamento_segundos
+        self.limite_wal_bytes = limite_wal_bytes
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread_agendador: Optional[threading.Thread] = None
+
+    @property
+    def db_path(self) -> str:
+        return self.data_service.db_path
+
+    def medir(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        paginas = conn.execute('PRAGMA page_count').fetchone()[0]
+        paginas_livres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return {
+            'tamanho_bytes': _tamanho_arquivo(self.db_path),
+            'wal_bytes': _tamanho_arquivo(self.db_path + '-wal'),
+            'tamanho_pagina': conn.execute('PRAGMA page_size').fetchone()[0],
+            'paginas': paginas,
+            'paginas_livres': paginas_livres,
+            'fragmentacao_percentual': round(100.0 * paginas_livres / paginas, 2) if paginas else 0.0,
+            'auto_vacuum': MODOS_AUTO_VACUUM.get(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 'none'),
+            'journal_mode': conn.execute('PRAGMA journal_mode').fetchone()[0],
+        }
+
+    def checkpoint_wal(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """Checkpoint TRUNCATE: copia o WAL para o banco e zera o arquivo (se nenhum leitor o segurar)."""
+        ocupado, paginas_wal, copiadas = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        return {'ocupado': ocupado, 'paginas_wal': paginas_wal, 'paginas_copiadas': copiadas}
+
+    def verificar_wal(self) -> Optional[Dict[str, int]]:
+        """Checkpoint só quando o WAL passou de limite_wal_bytes (leitores longos o fazem crescer)."""
+        if _tamanho_arquivo(self.db_path + '-wal') <= self.limite_wal_bytes:
+            return None
+        with self.data_service.get_connection() as conn:
+            return self.checkpoint_wal(conn)
+
+    def _ultima_execucao(self, conn: sqlite3.Connection, so_analyze: bool = False) -> Optional[datetime]:
+        linha = conn.execute(
+            'SELECT MAX(executada_em) FROM manutencao_banco_historico' + (' WHERE com_analyze = 1' if so_analyze else '')
+        ).fetchone()
+        return datetime.fromisoformat(linha[0]) if linha and linha[0] else None
+
+    def manutencao_pendente(self, agora: Optional[datetime] = None) -> bool:
+        with self.data_service.get_connection() as conn:
+            ultima = self._ultima_execucao(conn)
+        return ultima is None or (agora or datetime.now()) - ultima >= INTERVALO_MANUTENCAO
+
+    def executar(self, orcamento_segundos: Optional[float] = None, forcar_analyze: bool = False) -> Dict[str, Any]:
+        """Roda os passos da manutenção até o orçamento acabar; retorna a amostra gravada no histórico."""
+        orcamento = self.orcamento_segundos if orcamento_segundos is None else orcamento_segundos
+        with self._lock:
+            inicio = time.monotonic()
+            limite = inicio + orcamento
+            acoes: Dict[str, Any] = {}
+
+            def _restante() -> float:
+                return limite - time.monotonic()
+
+            def _interromper() -> int:
+                return 1 if time.monotonic() > limite else 0
+
+            def _passo(nome, funcao, *args):
+                if _restante() <= 0:
+                    raise _OrcamentoEsgotado(nome)
+                try:
+                    return funcao(*args)
+                except sqlite3.OperationalError as e:
+                    if 'interrupted' in str(e):
+                        raise _OrcamentoEsgotado(nome) from e
+                    raise
+
+            try:
+                with self.data_service.get_connection() as conn:
+                    conn.set_progress_handler(_interromper, INSTRUCOES_POR_VERIFICACAO_ORCAMENTO)
+                    estado = self.medir(conn)
+                    if estado['auto_vacuum'] == 'incremental':
+                        acoes['paginas_liberadas'] = _passo('incremental_vacuum', self._vacuum_incremental,
+                                                            conn, _restante)
+                    ultimo_analyze = self._ultima_execucao(conn, so_analyze=True)
+                    if forcar_analyze or ultimo_analyze is None or datetime.now() - ultimo_analyze >= INTERVALO_ANALYZE:
+                        conn.execute(f'PRAGMA analysis_limit = {LIMITE_ANALISE_LINHAS}')
+                        _passo('analyze', conn.execute, 'ANALYZE')
+                        conn.commit()
+                        acoes['analyze'] = True
+                    else:
+                        _passo('optimize', conn.execute, 'PRAGMA optimize')
+                        acoes['optimize'] = True
+                    if estado['journal_mode'] == 'wal':
+                        acoes['checkpoint'] = _passo('checkpoint', self.checkpoint_wal, conn)
+            except _OrcamentoEsgotado as e:
+                acoes['interrompida_no_passo'] = str(e)
+                logger.warning('Manutenção do banco interrompida pelo orçamento de %.0fs no passo %s', orcamento, e)
+            return self._registrar(acoes, time.monotonic() - inicio)
+
+    def converter_auto_vacuum(self, prazo_portao_segundos: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Conversão única de auto_vacuum para INCREMENTAL com um VACUUM completo, sob conexão exclusiva.
+
+        Ação do operador, sem orçamento: as requisições esperam no portão até o fim da cópia. Se as
+        conexões abertas não fecharem em prazo_portao_segundos (padrão PRAZO_PORTAO_CONVERSAO_SEGUNDOS), sobe TrocaBancoTimeoutError e nada
+        muda. Retorna a amostra gravada no histórico (banco já incremental: só a medição).
+        """
+        with self._lock:
+            with self.data_service.get_connection() as conn:
+                estado = self.medir(conn)
+            if estado['auto_vacuum'] == 'incremental':
+                return {**estado, 'acoes': {}, 'duracao_segundos': 0.0}
+            if prazo_portao_segundos is None:
+                prazo_portao_segundos = PRAZO_PORTAO_CONVERSAO_SEGUNDOS
+            inicio = time.monotonic()
+            with self.data_service.conexao_exclusiva(prazo_segundos=prazo_portao_segundos) as conn:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+            return self._registrar({'auto_vacuum': 'incremental'}, time.monotonic() - inicio)
+
+    @staticmethod
+    def _vacuum_incremental(conn: sqlite3.Connection, restante) -> int:
+        """
+        Devolve as páginas livres em transações de PAGINAS_POR_TRANSACAO_VACUUM páginas, para não
+        segurar a escrita por muito tempo. O sqlite3 do Python executa uma instrução sem colunas de
+        resultado um passo só, e cada passo de incremental_vacuum libera uma página.
+        """
+        liberadas = 0
+        while restante() > 0:
+            livres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if livres == 0:
+                break
+            lote = min(livres, PAGINAS_POR_TRANSACAO_VACUUM)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for _ in range(lote):
+                    conn.execute('PRAGMA incremental_vacuum')
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            liberadas += lote
+        return liberadas
+
+    def _registrar(self, acoes: Dict[str, Any], duracao: float) -> Dict[str, Any]:
+        with self.data_service.get_connection() as conn:
+            amostra = self.medir(conn)
+            conn.execute(
+                '''
+                INSERT INTO manutencao_banco_historico (executada_em, tamanho_bytes, wal_bytes, tamanho_pagina,
+                                                        paginas, paginas_livres, com_analyze, acoes, duracao_segundos)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (datetime.now().isoformat(), amostra['tamanho_bytes'], amostra['wal_bytes'],
+                 amostra['tamanho_pagina'], amostra['paginas'], amostra['paginas_livres'],
+                 1 if acoes.get('analyze') else 0, json.dumps(acoes, ensure_ascii=False), round(duracao, 3)),
+            )
+            conn.execute(
+                'DELETE FROM manutencao_banco_historico WHERE id <= '
+                '(SELECT MAX(id) FROM manutencao_banco_historico) - ?',
+                (AMOSTRAS_HISTORICO_MANTIDAS,),
+            )
+            conn.commit()
+        logger.info('Manutenção do banco em %.1fs: %s', duracao, acoes)
+        return {**amostra, 'acoes': acoes, 'duracao_segundos': round(duracao, 3)}
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Estado atual (tamanho, WAL, fragmentação) e tendência de tamanho pelas amostras do histórico."""
+        with self.data_service.get_connection() as conn:
+            atual = self.medir(conn)
+            linhas = conn.execute(
+                '''
+                SELECT executada_em, tamanho_bytes, paginas, paginas_livres, acoes
+                FROM manutencao_banco_historico ORDER BY id DESC LIMIT ?
+                ''',
+                (AMOSTRAS_TENDENCIA,),
+            ).fetchall()
+        tendencia: List[Dict[str, Any]] = [
+            {
+                'executada_em': linha['executada_em'],
+                'tamanho_mb': round(linha['tamanho_bytes'] / (1024 * 1024), 2),
+                'paginas_livres': linha['paginas_livres'],
+                'fragmentacao_percentual': round(100.0 * linha['paginas_livres'] / linha['paginas'], 2)
+                if linha['paginas'] else 0.0,
+            }
+            for linha in reversed(linhas)
+        ]
+        crescimento = None
+        if len(tendencia) >= 2:
+            dias = (datetime.fromisoformat(tendencia[-1]['executada_em'])
+                    - datetime.fromisoformat(tendencia[0]['executada_em'])).total_seconds() / 86400
+            if dias > 0:
+                crescimento = round((tendencia[-1]['tamanho_mb'] - tendencia[0]['tamanho_mb']) / dias, 3)
+        return {
+            **atual,
+            'conversao_auto_vacuum_pendente': atual['auto_vacuum'] != 'incremental',
+            'conversao_auto_vacuum_estimada_segundos': round(
+                atual['tamanho_bytes'] / VELOCIDADE_ESTIMADA_VACUUM_BYTES_POR_SEGUNDO, 1),
+            'ultima_manutencao': tendencia[-1]['executada_em'] if tendencia else None,
+            'ultimas_acoes': json.loads(linhas[0]['acoes']) if linhas else None,
+            'crescimento_mb_por_dia': crescimento,
+            'tendencia': tendencia,
+        }
+
+    def iniciar_agendador(self, intervalo_segundos: float = INTERVALO_VERIFICACAO_SEGUNDOS) -> None:
+        """Thread em segundo plano: checkpoint do WAL por tamanho e manutenção completa quando pendente."""
+        if self._thread_agendador is not None and self._thread_agendador.is_alive():
+            return
+        self._parar.clear()
+
+        def _laco():
+            while not self._parar.wait(intervalo_segundos):
+                try:
+                    if self.manutencao_pendente():
+                        self.executar()
+                    else:
+                        self.verificar_wal()
+                except Exception:
+                    logger.exception('Erro na manutenção do banco')
+
+        self._thread_agendador = threading.Thread(target=_laco, name='manutencao-banco', daemon=True)
+        self._thread_agendador.start()
+
+    def encerrar_agendador(self) -> None:
+        self._parar.set()
+        if self._thread_agendador is not None:
+            self._thread_agendador.join(timeout=5)
@@ -0,0 +1,138 @@
+"""
+Matriz de confusão (classificação manual x resultado da IA) e métricas por classe.
+
+A matriz é montada a partir de contagens já agregadas no SQL (uma linha por par
+manual/IA), então o custo aqui depende só do número de classes. Análises de intimações sem
+classificação manual não têm classe verdadeira: ficam fora da matriz e das métricas e são
+informadas à parte (contar_sem_classificacao_manual). Precisão, recall e F1 por classe,
+acurácia e médias macro/ponderada saem da matriz com NumPy, importado na primeira chamada
+(fora do boot do app).
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Resultado da IA que não é um tipo reconhecido (gravado como "ERRO: ...")
+ROTULO_ERRO_CLASSIFICACAO = 'ERRO_CLASSIFICACAO'
+# Intimação sem classificação manual
+ROTULO_SEM_CLASSIFICACAO_MANUAL = 'SEM_CLASSIFICACAO_MANUAL'
+
+
+def _sem_classificacao_manual(manual) -> bool:
+    return not manual or manual == ROTULO_SEM_CLASSIFICACAO_MANUAL
+
+
+def contar_sem_classificacao_manual(contagens: Iterable[Tuple[str, str, int]]) -> int:
+    """Quantidade de análises cuja intimação não tem classificação manual (fora da matriz)."""
+    return sum(int(qtd) for manual, _, qtd in contagens if _sem_classificacao_manual(manual))
+
+
+def montar_matriz_confusao(contagens: Iterable[Tuple[str, str, int]],
+                           rotulos_base: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Matriz quadrada (linhas = manual, colunas = IA) sobre os mesmos rótulos.
+
+    Args:
+        contagens: (classificacao_manual, resultado_ia, quantidade); pares sem classificação
+            manual são ignorados
+        rotulos_base: Ordem preferida (ex.: Config.TIPOS_ACAO); rótulos extras vistos nas
+            contagens são acrescentados no fim, em ordem alfabética
+
+    Returns:
+        (matriz int64, rótulos)
+    """
+    import numpy as np
+    contagens = [
+        (manual or ROTULO_SEM_CLASSIFICACAO_MANUAL, ia or ROTULO_ERRO_CLASSIFICACAO, int(qtd))
+        for manual, ia, qtd in contagens
+        if not _sem_classificacao_manual(manual)
+    ]
+    rotulos = list(rotulos_base)
+    conhecidos = set(rotulos)
+    extras = sorted({r for manual, ia, _ in contagens for r in (manual, ia)} - conhecidos)
+    rotulos.extend(extras)
+    indice = {r: i for i, r in enumerate(rotulos)}
+
+    matriz = np.zeros((len(rotulos), len(rotulos)), dtype=np.int64)
+    if contagens:
+        linhas = np.fromiter((indice[m] for m, _, _ in contagens), dtype=np.int64, count=len(contagens))
+        colunas = np.fromiter((indice[i] for _, i, _ in contagens), dtype=np.int64, count=len(contagens))
+        valores = np.fromiter((q for _, _, q in contagens), dtype=np.int64, count=len(contagens))
+        np.add.at(matriz, (linhas, colunas), valores)
+    return matriz, rotulos
+
+
+def metricas_por_classe(matriz: np.ndarray, rotulos: Sequence[str],
+                        sem_classificacao_manual: int = 0) -> Dict[str, Any]:
+    """
+    Precisão, recall, F1 e suporte por classe, acurácia e médias macro/ponderada.
+
+    Classes sem suporte (nenhuma linha manual) ficam fora das médias; divisões por zero valem 0.
+    sem_classificacao_manual só é repassado ao resultado (essas análises não entram no total).
+    """
+    import numpy as np
+    matriz = np.asarray(matriz, dtype=np.float64)
+    verdadeiros = np.diag(matriz)
+    suporte = matriz.sum(axis=1)
+    previstos = matriz.sum(axis=0)
+    total = matriz.sum()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precisao = np.where(previstos > 0, verdadeiros / previstos, 0.0)
+        recall = np.where(suporte > 0, verdadeiros / suporte, 0.0)
+        f1 = np.where(precisao + recall > 0, 2 * precisao * recall / (precisao + recall), 0.0)
+
+    com_suporte = suporte > 0
+    classes = [
+        {
+            'classe': rotulos[i],
+            'precisao': round(float(precisao[i]), 4),
+            'recall': round(float(recall[i]), 4),
+            'f1': round(float(f1[i]), 4),
+            'suporte': int(suporte[i]),
+            'previstos': int(previstos[i]),
+        }
+        for i in range(len(rotulos))
+        if suporte[i] > 0 or previstos[i] > 0
+    ]
+
+    def _media(valores, pesos=None):
+        if not com_suporte.any():
+            return 0.0
+        return round(float(np.average(valores[com_suporte], weights=None if pesos is None else pesos[com_suporte])), 4)
+
+    return {
+        'total': int(total),
+        'sem_classificacao_manual': int(sem_classificacao_manual),
+        'acuracia': round(float(verdadeiros.sum() / total), 4) if total else 0.0,
+        'classes': classes,
+        'macro': {
+            'precisao': _media(precisao),
+            'recall': _media(recall),
+            'f1': _media(f1),
+        },
+        'ponderada': {
+            'precisao': _media(precisao, suporte),
+            'recall': _media(recall, suporte),
+            'f1': _media(f1, suporte),
+        },
+    }
+
+
+def matrizes_por_grupo(contagens_agrupadas: Iterable[Tuple[str, str, str, int]],
+                       rotulos_base: Sequence[str]) -> Dict[str, Tuple[np.ndarray, List[str]]]:
+    """
+    Uma matriz por grupo (prompt, modelo...) a partir de (grupo, manual, ia, quantidade).
+
+    Todas as matrizes compartilham os mesmos rótulos, para ficarem comparáveis lado a lado.
+    """
+    por_grupo: Dict[str, List[Tuple[str, str, int]]] = {}
+    for grupo, manual, ia, qtd in contagens_agrupadas:
+        por_grupo.setdefault(grupo or '', []).append((manual, ia, qtd))
+    _, rotulos = montar_matriz_confusao(
+        [c for lista in por_grupo.values() for c in lista], rotulos_base
+    )
+    return {grupo: montar_matriz_confusao(lista, rotulos) for grupo, lista in por_grupo.items()}
@@ -0,0 +1,51 @@
+"""
+Migrações numeradas do esquema SQLite, controladas por PRAGMA user_version.
+
+Cada migração é (número, descrição, função(conn)); os números crescem de 1 em 1 e o banco guarda
+em user_version a última aplicada. Abrir o banco já atualizado custa só a leitura do pragma; as
+pendentes rodam numa transação BEGIN IMMEDIATE, com a versão relida dentro dela, para que vários
+processos (workers do gunicorn) subindo juntos não apliquem a mesma migração duas vezes.
+"""
+import sqlite3
+from typing import Callable, List, Sequence, Tuple
+
+Migracao = Tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+
+def versao_esquema(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def validar_sequencia_migracoes(migracoes: Sequence[Migracao]) -> None:
+    """Os números devem ser 1, 2, 3... sem lacunas nem repetição."""
+    numeros = [numero for numero, _, _ in migracoes]
+    if numeros != list(range(1, len(numeros) + 1)):
+        raise ValueError(f'Migrações fora de sequência: {numeros}')
+
+
+def aplicar_migracoes_pendentes(conn: sqlite3.Connection, migracoes: Sequence[Migracao]) -> List[int]:
+    """
+    Aplica as migrações com número acima de user_version e retorna os números aplicados.
+
+    Tudo numa transação: se uma migração falhar, nada é gravado e a exceção sobe. Banco com versão
+    acima da última migração conhecida (código mais antigo que o banco) é deixado como está.
+    """
+    if not migracoes or versao_esquema(conn) >= migracoes[-1][0]:
+        return []
+
+    aplicadas: List[int] = []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        atual = versao_esquema(conn)
+        for numero, descricao, migrar in migracoes:
+            if numero <= atual:
+                continue
+            print(f"Migração do banco {numero}: {descricao}")
+            migrar(conn)
+            conn.execute(f'PRAGMA user_version = {int(numero)}')
+            aplicadas.append(numero)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return aplicadas
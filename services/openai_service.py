@@ -2,7 +2,7 @@ import openai
 import time
 from typing import Tuple, Dict, Any, Optional, List
 from config import Config
-from services.sqlite_service import SQLiteService
+from services.sqlite_service import obter_sqlite_service
 from services.ai_service_interface import AIServiceInterface
 from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_service import (
     extrair_classificacao_da_resposta_ia,
@@ -10,13 +10,17 @@ from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_servic
 from services.extracao_texto_resposta_chat_completions_openai_compat import (
     texto_mensagem_assistente,
 )
+from services.classificacao_ia_extracao_incremental_streaming_chat_completions_service import (
+    ExtratorIncrementalClassificacaoTriagem,
+    consumir_stream_chat_completions,
+)
 
 class OpenAIService(AIServiceInterface):
     """Serviço para integração com a API da OpenAI"""
     
     def __init__(self):
         """Inicializar o serviço OpenAI"""
-        self.data_service = SQLiteService()
+        self.data_service = obter_sqlite_service()
         self.config = Config()
         self.client = None
         self._initialize_client()
@@ -98,6 +102,8 @@ class OpenAIService(AIServiceInterface):
 
         p = dict(parametros)
         raw_user_only = bool(p.pop("raw_user_prompt_only", False))
+        parar_apos_classificacao = bool(p.pop("parar_apos_classificacao", False))
+        stream = bool(p.pop("stream", False)) or parar_apos_classificacao
         prompt_completo = (
             prompt_template
             if raw_user_only
@@ -106,6 +112,16 @@ class OpenAIService(AIServiceInterface):
         parametros_validados = self._validar_parametros(p)
         parametros_validados["_raw_user_only"] = raw_user_only
 
+        if stream:
+            resposta_completa, tokens_info, classificacao = self._fazer_chamada_streaming_com_retry(
+                prompt_completo,
+                parametros_validados,
+                parar_apos_classificacao,
+            )
+            if classificacao is None:
+                classificacao = self._extrair_classificacao(resposta_completa)
+            return classificacao, resposta_completa, tokens_info
+
         resposta_completa, tokens_info = self._fazer_chamada_com_retry(
             prompt_completo,
             parametros_validados,
@@ -161,23 +177,9 @@ class OpenAIService(AIServiceInterface):
         """Fazer chamada para OpenAI com retry e backoff exponencial"""
         for tentativa in range(max_retries):
             try:
-                raw_only = bool(parametros.get("_raw_user_only"))
-                if raw_only:
-                    messages: List[Dict[str, str]] = [{"role": "user", "content": prompt}]
-                else:
-                    messages = [
-                        {
-                            "role": "system",
-                            "content": (
-                                "Você é um assistente especializado em análise de intimações jurídicas. "
-                                "Responda sempre com uma das classificações solicitadas."
-                            ),
-                        },
-                        {"role": "user", "content": prompt},
-                    ]
                 response = self.client.chat.completions.create(
                     model=parametros['model'],
-                    messages=messages,
+                    messages=self._montar_mensagens(prompt, parametros),
                     temperature=parametros['temperature'],
                     max_tokens=parametros['max_tokens'],
                 )
@@ -220,6 +222,59 @@ class OpenAIService(AIServiceInterface):
         
         raise Exception("Falha ao completar chamada OpenAI após múltiplas tentativas")
     
+    def _montar_mensagens(self, prompt: str, parametros: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Mensagens do chat (com ou sem system prompt, conforme raw_user_prompt_only)"""
+        if parametros.get("_raw_user_only"):
+            return [{"role": "user", "content": prompt}]
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "Você é um assistente especializado em análise de intimações jurídicas. "
+                    "Responda sempre com uma das classificações solicitadas."
+                ),
+            },
+            {"role": "user", "content": prompt},
+        ]
+    
+    def _fazer_chamada_streaming_com_retry(self,
+                                           prompt: str,
+                                           parametros: Dict[str, Any],
+                                           parar_apos_classificacao: bool,
+                                           max_retries: int = 3) -> Tuple[str, Dict[str, int], Optional[str]]:
+        """Chamada em streaming; retorna a classificação incremental se o stream foi interrompido nela"""
+        for tentativa in range(max_retries):
+            try:
+                stream = self.client.chat.completions.create(
+                    model=parametros['model'],
+                    messages=self._montar_mensagens(prompt, parametros),
+                    temperature=parametros['temperature'],
+                    max_tokens=parametros['max_tokens'],
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                extrator = ExtratorIncrementalClassificacaoTriagem(self.config.TIPOS_ACAO)
+                texto, tokens_info, interrompido = consumir_stream_chat_completions(
+                    stream,
+                    extrator,
+                    parar_apos_classificacao=parar_apos_classificacao,
+                    prompt=prompt,
+                )
+                return texto, tokens_info, extrator.classificacao if interrompido else None
+            
+            except (openai.RateLimitError, openai.APIError) as e:
+                if tentativa < max_retries - 1:
+                    wait_time = 2 ** tentativa
+                    print(f"Erro no streaming OpenAI: {e}. Tentando novamente em {wait_time}s...")
+                    time.sleep(wait_time)
+                else:
+                    raise Exception(f"Erro da API OpenAI (streaming) após múltiplas tentativas: {str(e)}")
+            
+            except Exception as e:
+                raise Exception(f"Erro inesperado na chamada OpenAI (streaming): {str(e)}")
+        
+        raise Exception("Falha ao completar chamada OpenAI (streaming) após múltiplas tentativas")
+    
     def _extrair_classificacao(self, resposta: str) -> str:
         """Extrair classificação da resposta da IA"""
         return extrair_classificacao_da_resposta_ia(resposta, self.config.TIPOS_ACAO)
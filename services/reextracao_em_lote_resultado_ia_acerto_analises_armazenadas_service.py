@@ -0,0 +1,318 @@
+"""
+Reextração offline de `resultado_ia` e `acertou` a partir de `analises.resposta_completa`.
+
+Depois de incluir um alias em ALIASES_TRIAGEM_IA_PARA_CANONICO (ou corrigir a extração), as análises
+antigas ficam com classificação/acerto desatualizados. Este job percorre `analises` em lotes (keyset por
+id), reextrai em um pool de processos, grava só as linhas alteradas (executemany, uma transação por lote
+junto com o checkpoint) e, no fim, recalcula os agregados dependentes:
+prompts (update_prompt_statistics), historico_acuracia e acertos/erros de sessoes_analise.
+
+Retomável: o checkpoint (último id + resumo parcial, com todas as transições) fica na tabela
+`reextracao_analises_jobs` (migração 7 do SQLiteService); rodar de novo com o mesmo job_id continua
+de onde parou. A simulação grava o checkpoint sob job_id + SUFIXO_CHECKPOINT_SIMULACAO, então uma
+simulação concluída não impede a execução real com o mesmo id.
+
+Regras de preservação:
+- resposta vazia ou extração sem tipo reconhecido mantém o `resultado_ia` gravado (pode ter vindo do
+  fallback específico do Azure, que depende do provedor e não é reproduzido aqui);
+- `acertou` é sempre recalculado com o resultado final, a classificação manual atual da intimação e
+  o modo de avaliação gravado na linha (calcular_acuracia vem da configuração da sessão; padrão True).
+"""
+import json
+import os
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import Config
+from services.calcular_acerto_classificacao_analise_intimacao_service import (
+    MODO_FOCADO,
+    MODO_PADRAO,
+    calcular_acerto_classificacao,
+)
+from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_service import (
+    ALIASES_TRIAGEM_IA_PARA_CANONICO,
+    MatcherClassificacaoTriagem,
+    classificacao_extracao_indica_falha_nucleo,
+)
+from services.sqlite_service import SQLiteService, obter_sqlite_service
+
+TAMANHO_LOTE_PADRAO = 2000
+SUFIXO_CHECKPOINT_SIMULACAO = ':simulacao'
+
+STATUS_EM_ANDAMENTO = 'em_andamento'
+STATUS_CONCLUIDO = 'concluido'
+
+# (id, resposta_completa, resultado_ia, acertou, modo_avaliacao, tipo_alvo_focado,
+#  classificacao_manual, calcular_acuracia, prompt_id, session_id)
+LinhaReextracao = Tuple[str, Optional[str], Optional[str], Optional[int], Optional[str],
+                        Optional[str], Optional[str], int, Optional[str], Optional[str]]
+
+_SQL_LOTE = '''
+    SELECT a.id, a.resposta_completa, a.resultado_ia, a.acertou,
+           a.modo_avaliacao, a.tipo_alvo_focado,
+           i.classificacao_manual,
+           COALESCE(
+               CASE WHEN json_valid(s.configuracoes)
+                    THEN json_extract(s.configuracoes, '$.calcular_acuracia') END,
+               1
+           ) AS calcular_acuracia,
+           a.prompt_id, a.session_id
+    FROM analises a
+    LEFT JOIN intimacoes i ON i.id = a.intimacao_id
+    LEFT JOIN sessoes_analise s ON s.session_id = a.session_id
+    WHERE a.id > ?
+    ORDER BY a.id
+    LIMIT ?
+'''
+
+
+def _bool_ou_none(valor: Any) -> Optional[bool]:
+    if valor is None:
+        return None
+    return bool(valor)
+
+
+def reextrair_linhas(
+    linhas: Sequence[LinhaReextracao],
+    tipos_acao: Sequence[str],
+    aliases: Dict[str, str],
+) -> List[Tuple]:
+    """
+    Núcleo executado nos workers: devolve apenas as linhas alteradas como
+    (id, resultado_novo, acertou_novo, resultado_antigo, acertou_antigo, prompt_id, session_id).
+    Tipos e aliases chegam por argumento: o worker não depende do estado do processo pai.
+    """
+    matcher = MatcherClassificacaoTriagem(tipos_acao, aliases)
+    alteradas = []
+    for (analise_id, resposta, resultado_antigo, acertou_antigo, modo, alvo,
+         manual, calcular, prompt_id, session_id) in linhas:
+        resultado_novo = resultado_antigo
+        if resposta is not None and str(resposta).strip():
+            extraido = matcher.extrair(resposta)
+            if not classificacao_extracao_indica_falha_nucleo(extraido):
+                resultado_novo = extraido
+        modo_norm = (modo or MODO_PADRAO).strip().lower()
+        acertou_novo = calcular_acerto_classificacao(
+            manual,
+            resultado_novo,
+            modo_avaliacao=modo_norm,
+            tipo_alvo_focado=alvo if modo_norm == MODO_FOCADO else None,
+            calcular_acuracia=bool(calcular),
+        )
+        acertou_antigo_b = _bool_ou_none(acertou_antigo)
+        if resultado_novo != resultado_antigo or acertou_novo != acertou_antigo_b:
+            alteradas.append((
+                analise_id, resultado_novo, acertou_novo,
+                resultado_antigo, acertou_antigo_b, prompt_id, session_id,
+            ))
+    return alteradas
+
+
+class ReextracaoAnalisesJob:
+    """Job retomável de reextração; use executar() e leia o resumo retornado."""
+
+    def __init__(
+        self,
+        data_service: Optional[SQLiteService] = None,
+        job_id: Optional[str] = None,
+        tamanho_lote: int = TAMANHO_LOTE_PADRAO,
+        workers: Optional[int] = None,
+        simular: bool = False,
+        tipos_acao: Optional[Sequence[str]] = None,
+    ):
+        self.data_service = data_service or obter_sqlite_service()
+        self.job_id = job_id or datetime.now().strftime('reextracao_%Y%m%d_%H%M%S_') + uuid.uuid4().hex[:6]
+        self.tamanho_lote = max(1, int(tamanho_lote))
+        self.workers = max(1, int(workers if workers is not None else (os.cpu_count() or 1)))
+        self.simular = simular
+        self.tipos_acao = list(tipos_acao if tipos_acao is not None else Config.TIPOS_ACAO)
+        self.aliases = dict(ALIASES_TRIAGEM_IA_PARA_CANONICO)
+
+    # ---- checkpoint ----
+    @property
+    def chave_checkpoint(self) -> str:
+        return self.job_id + SUFIXO_CHECKPOINT_SIMULACAO if self.simular else self.job_id
+
+    def _carregar_checkpoint(self) -> Tuple[str, Dict[str, Any]]:
+        with self.data_service.get_connection() as conn:
+            row = conn.execute(
+                'SELECT ultimo_id, status, resumo FROM reextracao_analises_jobs WHERE job_id = ?',
+                (self.chave_checkpoint,),
+            ).fetchone()
+        if not row:
+            return '', self._resumo_vazio()
+        resumo = json.loads(row['resumo']) if row['resumo'] else self._resumo_vazio()
+        return row['ultimo_id'] or '', resumo
+
+    def _resumo_vazio(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'linhas_lidas': 0,
+            'linhas_alteradas': 0,
+            'resultado_ia_alterado': 0,
+            'acertou_alterado': 0,
+            'transicoes_resultado_ia': {},
+            'transicoes_acertou': {},
+            'prompts_afetados': [],
+            'sessoes_afetadas': [],
+            'agregados': {},
+            'simulacao': self.simular,
+            'status': STATUS_EM_ANDAMENTO,
+        }
+
+    def _gravar_checkpoint(self, conn, ultimo_id: str, resumo: Dict[str, Any], status: str) -> None:
+        agora = datetime.now().isoformat()
+        conn.execute(
+            '''
+            INSERT INTO reextracao_analises_jobs (job_id, ultimo_id, status, resumo, data_inicio, data_atualizacao)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                ultimo_id = excluded.ultimo_id,
+                status = excluded.status,
+                resumo = excluded.resumo,
+                data_atualizacao = excluded.data_atualizacao
+            ''',
+            (self.chave_checkpoint, ultimo_id, status, json.dumps(resumo, ensure_ascii=False), agora, agora),
+        )
+
+    # ---- leitura em lotes ----
+    def _iterar_lotes(self, ultimo_id: str) -> Iterator[List[LinhaReextracao]]:
+        while True:
+            with self.data_service.get_connection() as conn:
+                linhas = [tuple(r) for r in conn.execute(_SQL_LOTE, (ultimo_id, self.tamanho_lote))]
+            if not linhas:
+                return
+            yield linhas
+            ultimo_id = linhas[-1][0]
+
+    def _resultados_em_ordem(self, lotes: Iterator[List[LinhaReextracao]]):
+        """(lote, alteradas) na ordem de leitura; no máximo 2 lotes por worker em voo."""
+        if self.workers == 1:
+            for lote in lotes:
+                yield lote, reextrair_linhas(lote, self.tipos_acao, self.aliases)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            em_voo = deque()
+            for lote in lotes:
+                em_voo.append((lote, pool.submit(reextrair_linhas, lote, self.tipos_acao, self.aliases)))
+                if len(em_voo) >= self.workers * 2:
+                    lote_pronto, fut = em_voo.popleft()
+                    yield lote_pronto, fut.result()
+            while em_voo:
+                lote_pronto, fut = em_voo.popleft()
+                yield lote_pronto, fut.result()
+
+    # ---- execução ----
+    def executar(self) -> Dict[str, Any]:
+        ultimo_id, resumo = self._carregar_checkpoint()
+        if resumo.get('status') == STATUS_CONCLUIDO:
+            return resumo
+
+        trans_resultado = Counter(resumo['transicoes_resultado_ia'])
+        trans_acertou = Counter(resumo['transicoes_acertou'])
+        prompts = set(resumo['prompts_afetados'])
+        sessoes = set(resumo['sessoes_afetadas'])
+
+        for lote, alteradas in self._resultados_em_ordem(self._iterar_lotes(ultimo_id)):
+            resumo['linhas_lidas'] += len(lote)
+            resumo['linhas_alteradas'] += len(alteradas)
+            for (_, res_novo, ac_novo, res_antigo, ac_antigo, prompt_id, session_id) in alteradas:
+                if res_novo != res_antigo:
+                    resumo['resultado_ia_alterado'] += 1
+                    trans_resultado[f'{res_antigo} -> {res_novo}'] += 1
+                if ac_novo != ac_antigo:
+                    resumo['acertou_alterado'] += 1
+                    trans_acertou[f'{ac_antigo} -> {ac_novo}'] += 1
+                if prompt_id:
+                    prompts.add(prompt_id)
+                if session_id:
+                    sessoes.add(session_id)
+            resumo['transicoes_resultado_ia'] = dict(trans_resultado.most_common())
+            resumo['transicoes_acertou'] = dict(trans_acertou)
+            resumo['prompts_afetados'] = sorted(prompts)
+            resumo['sessoes_afetadas'] = sorted(sessoes)
+
+            with self.data_service.get_connection() as conn:
+                if alteradas and not self.simular:
+                    conn.executemany(
+                        'UPDATE analises SET resultado_ia = ?, acertou = ? WHERE id = ?',
+                        [(res, ac, aid) for (aid, res, ac, _, _, _, _) in alteradas],
+                    )
+                ultimo_id = lote[-1][0]
+                self._gravar_checkpoint(conn, ultimo_id, resumo, STATUS_EM_ANDAMENTO)
+                conn.commit()
+
+        if not self.simular:
+            resumo['agregados'] = self._recalcular_agregados(sorted(prompts), sorted(sessoes))
+        resumo['status'] = STATUS_CONCLUIDO
+        with self.data_service.get_connection() as conn:
+            self._gravar_checkpoint(conn, ultimo_id, resumo, STATUS_CONCLUIDO)
+            conn.commit()
+        return resumo
+
+    def _recalcular_agregados(self, prompt_ids: List[str], session_ids: List[str]) -> Dict[str, Any]:
+        """Prompts, historico_acuracia e sessões afetados; devolve acurácia antes/depois por prompt."""
+        acuracia_prompts: Dict[str, Dict[str, float]] = {}
+        with self.data_service.get_connection() as conn:
+            for pid in prompt_ids:
+                row = conn.execute('SELECT acuracia_media FROM prompts WHERE id = ?', (pid,)).fetchone()
+                acuracia_prompts[pid] = {'antes': round(row['acuracia_media'] or 0.0, 2) if row else None}
+
+        for pid in prompt_ids:
+            self.data_service.update_prompt_statistics(pid)
+
+        historico_atualizado = 0
+        with self.data_service.get_connection() as conn:
+            for pid in prompt_ids:
+                row = conn.execute('SELECT acuracia_media FROM prompts WHERE id = ?', (pid,)).fetchone()
+                acuracia_prompts[pid]['depois'] = round(row['acuracia_media'] or 0.0, 2) if row else None
+
+            for i in range(0, len(session_ids), 500):
+                bloco = session_ids[i:i + 500]
+                marcadores = ','.join('?' * len(bloco))
+                # Mesmas regras de executar_analise: acertos = acertou verdadeiro, erros = acertou falso
+                conn.execute(
+                    f'''
+                    UPDATE sessoes_analise
+                    SET acertos = (
+                            SELECT COUNT(*) FROM analises a
+                            WHERE a.session_id = sessoes_analise.session_id AND a.acertou = 1
+                        ),
+                        erros = (
+                            SELECT COUNT(*) FROM analises a
+                            WHERE a.session_id = sessoes_analise.session_id AND a.acertou = 0
+                        )
+                    WHERE session_id IN ({marcadores})
+                    ''',
+                    bloco,
+                )
+                cur = conn.execute(
+                    f'''
+                    UPDATE historico_acuracia
+                    SET acuracia = (
+                        SELECT ROUND(SUM(CASE WHEN a.acertou = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1)
+                        FROM analises a
+                        WHERE a.session_id = historico_acuracia.session_id
+                          AND a.prompt_id = historico_acuracia.prompt_id
+                    )
+                    WHERE session_id IN ({marcadores})
+                      AND EXISTS (
+                          SELECT 1 FROM analises a
+                          WHERE a.session_id = historico_acuracia.session_id
+                            AND a.prompt_id = historico_acuracia.prompt_id
+                      )
+                    ''',
+                    bloco,
+                )
+                historico_atualizado += cur.rowcount
+            conn.commit()
+
+        return {
+            'prompts_recalculados': len(prompt_ids),
+            'sessoes_recalculadas': len(session_ids),
+            'historico_acuracia_atualizado': historico_atualizado,
+            'acuracia_media_prompts': acuracia_prompts,
+        }
@@ -0,0 +1,86 @@
+"""
+CLI: exporta as análises (com filtros opcionais) para um arquivo Parquet tipado.
+A lógica principal está em exportacao_parquet_analises_colunar_service.py (requer pyarrow).
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from services.exportacao_parquet_analises_colunar_service import (
+    COMPRESSOES_PARQUET,
+    TAMANHO_LOTE_PARQUET_PADRAO,
+    ParquetIndisponivelError,
+    exportar_analises_parquet,
+)
+from services.sqlite_service import SQLiteService
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Exporta a tabela de análises (com a classificação manual da intimação) para Parquet."
+    )
+    parser.add_argument("saida", type=Path, help="Arquivo .parquet de destino.")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=None,
+        help="Caminho do banco SQLite (padrão: data/database.db).",
+    )
+    parser.add_argument("--data-inicio", default="", help="Data inicial (YYYY-MM-DD), inclusiva.")
+    parser.add_argument("--data-fim", default="", help="Data final (YYYY-MM-DD), inclusiva.")
+    parser.add_argument("--prompt-id", default="", help="Somente análises deste prompt.")
+    parser.add_argument("--classificacao", default="", help="Somente intimações com esta classificação manual.")
+    parser.add_argument(
+        "--compressao",
+        choices=COMPRESSOES_PARQUET,
+        default="zstd",
+        help="Codec de compressão das páginas.",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=TAMANHO_LOTE_PARQUET_PADRAO,
+        help="Linhas por record batch / row group.",
+    )
+    parser.add_argument(
+        "--incluir-contexto",
+        action="store_true",
+        help="Inclui o texto completo do contexto da intimação.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    data_service = SQLiteService(db_path=str(args.db)) if args.db else SQLiteService()
+    inicio = time.perf_counter()
+    try:
+        resumo = exportar_analises_parquet(
+            data_service,
+            str(args.saida),
+            compressao=args.compressao,
+            tamanho_lote=args.lote,
+            incluir_contexto=args.incluir_contexto,
+            data_inicio=args.data_inicio,
+            data_fim=args.data_fim,
+            prompt_id=args.prompt_id,
+            classificacao_manual=args.classificacao,
+        )
+    except ParquetIndisponivelError as e:
+        print(f"ERRO: {e}", file=sys.stderr)
+        return 1
+    resumo["arquivo"] = str(args.saida)
+    resumo["bytes"] = args.saida.stat().st_size
+    resumo["segundos"] = round(time.perf_counter() - inicio, 2)
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+"""
+CLI: reextrai resultado_ia/acertou das análises gravadas (sem chamar a IA) e recalcula os agregados.
+A lógica principal está em reextracao_em_lote_resultado_ia_acerto_analises_armazenadas_service.py
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parent.parent
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from services.reextracao_em_lote_resultado_ia_acerto_analises_armazenadas_service import (
+    TAMANHO_LOTE_PADRAO,
+    ReextracaoAnalisesJob,
+)
+from services.sqlite_service import SQLiteService
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Reextrai a classificação da IA a partir de resposta_completa e recalcula "
+            "acertou, estatísticas de prompts, histórico de acurácia e totais das sessões."
+        )
+    )
+    parser.add_argument(
+        "--job-id",
+        default=None,
+        help="Identificador do job; repita o mesmo id para retomar uma execução interrompida.",
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=None,
+        help="Caminho do banco SQLite (padrão: data/database.db).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processos no pool (padrão: número de núcleos).",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=TAMANHO_LOTE_PADRAO,
+        help="Linhas lidas e gravadas por transação.",
+    )
+    parser.add_argument(
+        "--simular",
+        action="store_true",
+        help="Só calcula o resumo de diferenças, sem gravar.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    data_service = SQLiteService(db_path=str(args.db)) if args.db else SQLiteService()
+    job = ReextracaoAnalisesJob(
+        data_service=data_service,
+        job_id=args.job_id,
+        tamanho_lote=args.lote,
+        workers=args.workers,
+        simular=args.simular,
+    )
+    print(f"Job: {job.job_id} (workers={job.workers}, lote={job.tamanho_lote})")
+    resumo = job.executar()
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,7 @@ CLI: transforma JSONs de feedback de triagem para o formato de importação do s
 A lógica principal está em triagem_feedback_transformacao_json_para_importacao_intimacoes_service.py
 """
 import argparse
+import os
 import sys
 from pathlib import Path
 
@@ -34,12 +35,30 @@ def parse_args() -> argparse.Namespace:
         default=Path("feedbacksSaida"),
         help="Diretório para salvar os arquivos JSON transformados.",
     )
+    parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        help=(
+            "Lê cada arquivo incrementalmente e grava um registro por linha (.ndjson), "
+            "sem carregar o export inteiro em memória."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Processos em paralelo (0 = número de CPUs). Arquivos são distribuídos entre os "
+            "processos e os itens de arquivos muito grandes também; a saída não muda."
+        ),
+    )
     return parser.parse_args()
 
 
 def main() -> int:
     args = parse_args()
-    return run_batch(args.input_dir, args.output_dir)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    return run_batch(args.input_dir, args.output_dir, ndjson=args.ndjson, workers=workers)
 
 
 if __name__ == "__main__":
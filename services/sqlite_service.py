@@ -1,18 +1,49 @@
 import sqlite3
+import functools
+import hashlib
+import threading
 import json
+import logging
 import os
 import uuid
 from collections import defaultdict
 from datetime import datetime
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Iterator, Tuple
 from contextlib import contextmanager
 
+from services.armazenamento_config_json_cache_mtime_service import (
+    ArmazenamentoConfigJson,
+    obter_armazenamento_config,
+)
+from services.cache_consultas_agregadas_geracao_lru_service import CacheConsultasAgregadas
+from services.troca_segura_arquivo_banco_sqlite_hot_swap_service import (
+    PRAZO_QUIESCENCIA_SEGUNDOS,
+    obter_portao_conexoes,
+    substituir_arquivo_banco,
+)
+from services.fatos_diarios_analises_agregados_gatilhos_service import criar_fatos_diarios
+from services.instrumentacao_metricas_latencia_consultas_lentas_prometheus_service import (
+    METRICA_METODOS_SQLITE,
+    ConexaoInstrumentada,
+    instrumentar_metodos,
+)
+from services.manutencao_periodica_banco_sqlite_vacuum_analyze_checkpoint_service import (
+    configurar_arquivo_banco,
+    criar_historico_manutencao,
+)
+from services.migracoes_esquema_sqlite_user_version_service import aplicar_migracoes_pendentes, versao_esquema
+from services.matriz_confusao_metricas_classificacao_analises_service import (
+    ROTULO_ERRO_CLASSIFICACAO,
+    ROTULO_SEM_CLASSIFICACAO_MANUAL,
+)
 from services.texto_template_novo_prompt_padrao_triagem_json_instrucoes_dpe_rs_semente_banco_sqlite import (
     DESCRICAO_TEMPLATE_NOVO_PROMPT_PADRAO,
     NOME_TEMPLATE_NOVO_PROMPT_PADRAO,
     TEXTO_TEMPLATE_NOVO_PROMPT_PADRAO_TRIAGEM_JSON,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def _seed_prompt_templates_padrao_sqlite(conn) -> None:
     """Se não houver templates, insere o padrão de triagem JSON (Novo prompt)."""
@@ -74,298 +105,506 @@ def _seed_areas_padrao_sqlite(conn) -> None:
         )
 
 
-class SQLiteService:
-    """Serviço para gerenciar dados em SQLite"""
-    
-    def __init__(self, db_path: str = None):
-        """Inicializar o serviço SQLite"""
-        if db_path is None:
-            db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'database.db')
-        
-        self.db_path = db_path
-        self._ensure_database_exists()
-    
-    @contextmanager
-    def get_connection(self):
-        """Context manager para conexões SQLite"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Para acessar colunas por nome
-        try:
-            yield conn
-        finally:
-            conn.close()
+# Colunas gravadas por save_intimacao e pela importação em lote (inserir_intimacoes_lote)
+_COLUNAS_GRAVACAO_INTIMACAO = (
+    'id', 'contexto', 'classificacao_manual', 'informacao_adicional', 'processo',
+    'orgao_julgador', 'classe', 'disponibilizacao', 'intimado', 'status', 'prazo',
+    'defensor', 'id_tarefa', 'cor_etiqueta', 'smart_context', 'data_criacao',
+    'intimacao_id_externo', 'regras_usuario_prioridade_alta', 'observacoes', 'hash_conteudo',
+)
+# Colunas vindas da fonte externa, comparadas na sincronização pelo intimacao_id_externo
+# (observacoes é anotação local; id e data_criacao são do cadastro)
+_COLUNAS_SINCRONIZADAS_INTIMACAO = (
+    'contexto', 'classificacao_manual', 'informacao_adicional', 'processo', 'orgao_julgador',
+    'classe', 'disponibilizacao', 'intimado', 'status', 'prazo', 'defensor', 'id_tarefa',
+    'cor_etiqueta', 'smart_context', 'regras_usuario_prioridade_alta',
+)
 
-    def _backfill_historico_acuracia_modelo_desde_sessao_e_analises(self, conn) -> None:
-        """Preenche `historico_acuracia.modelo` vazio a partir da sessão ou das análises."""
-        try:
-            row = conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='sessoes_analise'"
-            ).fetchone()
-            if row:
-                conn.execute(
-                    """
-                    UPDATE historico_acuracia
-                    SET modelo = (
-                        SELECT TRIM(s.modelo) FROM sessoes_analise s
-                        WHERE s.session_id = historico_acuracia.session_id
-                          AND s.modelo IS NOT NULL AND TRIM(s.modelo) != ''
-                        LIMIT 1
-                    )
-                    WHERE (historico_acuracia.modelo IS NULL OR TRIM(historico_acuracia.modelo) = '')
-                      AND historico_acuracia.session_id IS NOT NULL
-                    """
-                )
-        except Exception as e:
-            print(f"Aviso: backfill historico_acuracia.modelo (sessão): {e}")
-        try:
+
+def _hash_conteudo_intimacao(valores: Dict[str, Any]) -> str:
+    """SHA-256 das colunas sincronizadas, com os valores como gravados no banco."""
+    bruto = json.dumps([valores[c] for c in _COLUNAS_SINCRONIZADAS_INTIMACAO], ensure_ascii=False, default=str)
+    return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+
+def _migracao_esquema_base(conn) -> None:
+    """
+    Tabelas e índices do esquema, com as colunas acrescentadas ao longo do tempo.
+
+    Idempotente: bancos anteriores ao controle por user_version (versão 0) já têm parte do esquema,
+    por isso CREATE ... IF NOT EXISTS e ALTER TABLE tolerando coluna existente.
+    """
+    # Criar tabela de prompts
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prompts (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            descricao TEXT,
+            regra_negocio TEXT,
+            conteudo TEXT NOT NULL,
+            categoria TEXT,
+            tags TEXT, -- JSON array
+            ativo BOOLEAN DEFAULT 1,
+            data_criacao TEXT NOT NULL,
+            total_usos INTEGER DEFAULT 0,
+            acuracia_media REAL DEFAULT 0.0,
+            tempo_medio REAL DEFAULT 0.0,
+            custo_total REAL DEFAULT 0.0
+        )
+    ''')
+
+    # Criar tabela de intimações
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS intimacoes (
+            id TEXT PRIMARY KEY,
+            contexto TEXT NOT NULL,
+            classificacao_manual TEXT NOT NULL,
+            informacao_adicional TEXT,
+            processo TEXT,
+            orgao_julgador TEXT,
+            classe TEXT,
+            disponibilizacao TEXT,
+            intimado TEXT,
+            status TEXT,
+            prazo TEXT,
+            defensor TEXT,
+            id_tarefa TEXT,
+            cor_etiqueta TEXT,
+            smart_context BOOLEAN DEFAULT 0,
+            data_criacao TEXT NOT NULL
+        )
+    ''')
+
+    # Adicionar coluna smart_context se não existir (para bancos já criados)
+    try:
+        conn.execute('ALTER TABLE intimacoes ADD COLUMN smart_context BOOLEAN DEFAULT 0')
+    except sqlite3.OperationalError:
+        # Coluna já existe, ignorar erro
+        pass
+
+    # ID externo do portal (ex.: intimacaoId do eProc) — deduplicação na importação
+    try:
+        conn.execute(
+            'ALTER TABLE intimacoes ADD COLUMN intimacao_id_externo TEXT'
+        )
+    except sqlite3.OperationalError:
+        pass
+    try:
+        conn.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_intimacoes_id_externo '
+            'ON intimacoes(intimacao_id_externo)'
+        )
+    except sqlite3.OperationalError:
+        pass
+
+    try:
+        conn.execute(
+            'ALTER TABLE intimacoes ADD COLUMN regras_usuario_prioridade_alta TEXT'
+        )
+    except sqlite3.OperationalError:
+        pass
+
+    try:
+        conn.execute('ALTER TABLE intimacoes ADD COLUMN observacoes TEXT')
+    except sqlite3.OperationalError:
+        pass
+
+    try:
+        conn.execute(
+            'ALTER TABLE intimacoes ADD COLUMN destacada BOOLEAN DEFAULT 0'
+        )
+    except sqlite3.OperationalError:
+        pass
+
+    # Hash do conteúdo gravado (sincronização incremental pelo ID externo)
+    try:
+        conn.execute('ALTER TABLE intimacoes ADD COLUMN hash_conteudo TEXT')
+    except sqlite3.OperationalError:
+        pass
+
+    # Criar tabela de análises
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analises (
+            id TEXT PRIMARY KEY,
+            intimacao_id TEXT NOT NULL,
+            prompt_id TEXT NOT NULL,
+            prompt_nome TEXT,
+            data_analise TEXT NOT NULL,
+            resultado_ia TEXT,
+            acertou BOOLEAN,
+            tempo_processamento REAL,
+            modelo TEXT,
+            temperatura REAL,
+            tokens_usados INTEGER,
+            tokens_input INTEGER,
+            tokens_output INTEGER,
+            custo_real REAL,
+            prompt_completo TEXT,
+            resposta_completa TEXT,
+            session_id TEXT,
+            FOREIGN KEY (intimacao_id) REFERENCES intimacoes (id),
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id)
+        )
+    ''')
+
+    # Criar tabela de histórico de acurácia
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS historico_acuracia (
+            id TEXT PRIMARY KEY,
+            prompt_id TEXT NOT NULL,
+            numero_intimacoes INTEGER NOT NULL,
+            modelo TEXT,
+            temperatura REAL NOT NULL,
+            acuracia REAL NOT NULL,
+            data_analise TEXT NOT NULL,
+            session_id TEXT,
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id)
+        )
+    ''')
+
+    # Sessões de análise (modelo/temp da execução em lote — usado para enriquecer histórico de acurácia)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessoes_analise (
+            session_id TEXT PRIMARY KEY,
+            data_inicio TEXT NOT NULL,
+            data_fim TEXT,
+            prompt_id TEXT NOT NULL,
+            prompt_nome TEXT,
+            modelo TEXT,
+            temperatura REAL,
+            max_tokens INTEGER,
+            timeout INTEGER,
+            total_intimacoes INTEGER,
+            intimações_processadas INTEGER DEFAULT 0,
+            acertos INTEGER DEFAULT 0,
+            erros INTEGER DEFAULT 0,
+            tempo_total REAL DEFAULT 0.0,
+            custo_total REAL DEFAULT 0.0,
+            tokens_total INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'em_andamento',
+            configuracoes TEXT,
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessoes_data ON sessoes_analise(data_inicio)')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessoes_prompt ON sessoes_analise(prompt_id)')
+
+    # Tabela de defensores (cadastro administrativo)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS defensores (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            ativo INTEGER DEFAULT 1,
+            data_criacao TEXT NOT NULL
+        )
+    ''')
+
+    # Criar índices para performance
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analises_intimacao ON analises(intimacao_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analises_prompt ON analises(prompt_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_acuracia_prompt ON historico_acuracia(prompt_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_acuracia_condicoes ON historico_acuracia(prompt_id, numero_intimacoes, temperatura)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analises_data ON analises(data_analise)')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_defensores_nome_lower ON defensores(LOWER(nome))')
+
+    try:
+        conn.execute('ALTER TABLE analises ADD COLUMN session_id TEXT')
+    except sqlite3.OperationalError:
+        pass
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analises_session ON analises(session_id)')
+    try:
+        conn.execute(
+            "ALTER TABLE analises ADD COLUMN modo_avaliacao TEXT DEFAULT 'padrao'"
+        )
+    except sqlite3.OperationalError:
+        pass
+    try:
+        conn.execute('ALTER TABLE analises ADD COLUMN tipo_alvo_focado TEXT')
+    except sqlite3.OperationalError:
+        pass
+    try:
+        conn.execute('ALTER TABLE analises ADD COLUMN provider TEXT')
+    except sqlite3.OperationalError:
+        pass
+    try:
+        conn.execute('ALTER TABLE historico_acuracia ADD COLUMN session_id TEXT')
+    except sqlite3.OperationalError:
+        pass
+    try:
+        conn.execute('ALTER TABLE historico_acuracia ADD COLUMN modelo TEXT')
+    except sqlite3.OperationalError:
+        pass
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_acuracia_condicoes_modelo ON historico_acuracia(prompt_id, numero_intimacoes, temperatura, modelo)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS areas (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            ordem INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS area_classe (
+            classe TEXT PRIMARY KEY,
+            area_id TEXT NOT NULL,
+            FOREIGN KEY (area_id) REFERENCES areas (id) ON DELETE CASCADE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_templates (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            descricao TEXT,
+            conteudo TEXT NOT NULL,
+            ordem INTEGER NOT NULL DEFAULT 0,
+            data_criacao TEXT NOT NULL,
+            data_atualizacao TEXT
+        )
+    ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_prompt_templates_ordem ON prompt_templates(ordem, nome)'
+    )
+
+    # Ledger de custos (somente inserção): um lançamento por sessão/provedor/modelo a cada
+    # execução ou reprecificação; o vigente é o de maior id para a chave
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS custos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            provider TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            versao_precos TEXT,
+            preco_input REAL DEFAULT 0.0,
+            preco_output REAL DEFAULT 0.0,
+            quantidade_analises INTEGER DEFAULT 0,
+            tokens_input INTEGER DEFAULT 0,
+            tokens_output INTEGER DEFAULT 0,
+            custo REAL DEFAULT 0.0,
+            origem TEXT NOT NULL,
+            data_registro TEXT NOT NULL
+        )
+    ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_custos_chave ON custos(session_id, provider, modelo, id)'
+    )
+
+
+def _backfill_historico_acuracia_modelo_desde_sessao_e_analises(conn) -> None:
+    """Preenche `historico_acuracia.modelo` vazio a partir da sessão ou das análises."""
+    try:
+        row = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='sessoes_analise'"
+        ).fetchone()
+        if row:
             conn.execute(
                 """
                 UPDATE historico_acuracia
                 SET modelo = (
-                    SELECT TRIM(a.modelo) FROM analises a
-                    WHERE a.session_id = historico_acuracia.session_id
-                      AND a.prompt_id = historico_acuracia.prompt_id
-                      AND a.modelo IS NOT NULL AND TRIM(a.modelo) != ''
-                    ORDER BY a.data_analise DESC
+                    SELECT TRIM(s.modelo) FROM sessoes_analise s
+                    WHERE s.session_id = historico_acuracia.session_id
+                      AND s.modelo IS NOT NULL AND TRIM(s.modelo) != ''
                     LIMIT 1
                 )
                 WHERE (historico_acuracia.modelo IS NULL OR TRIM(historico_acuracia.modelo) = '')
                   AND historico_acuracia.session_id IS NOT NULL
                 """
             )
-        except Exception as e:
-            print(f"Aviso: backfill historico_acuracia.modelo (analises): {e}")
-    
-    def _ensure_database_exists(self):
-        """Garantir que o banco de dados e tabelas existam"""
-        with self.get_connection() as conn:
-            # Criar tabela de prompts
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS prompts (
-                    id TEXT PRIMARY KEY,
-                    nome TEXT NOT NULL,
-                    descricao TEXT,
-                    regra_negocio TEXT,
-                    conteudo TEXT NOT NULL,
-                    categoria TEXT,
-                    tags TEXT, -- JSON array
-                    ativo BOOLEAN DEFAULT 1,
-                    data_criacao TEXT NOT NULL,
-                    total_usos INTEGER DEFAULT 0,
-                    acuracia_media REAL DEFAULT 0.0,
-                    tempo_medio REAL DEFAULT 0.0,
-                    custo_total REAL DEFAULT 0.0
-                )
-            ''')
-            
-            # Criar tabela de intimações
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS intimacoes (
-                    id TEXT PRIMARY KEY,
-                    contexto TEXT NOT NULL,
-                    classificacao_manual TEXT NOT NULL,
-                    informacao_adicional TEXT,
-                    processo TEXT,
-                    orgao_julgador TEXT,
-                    classe TEXT,
-                    disponibilizacao TEXT,
-                    intimado TEXT,
-                    status TEXT,
-                    prazo TEXT,
-                    defensor TEXT,
-                    id_tarefa TEXT,
-                    cor_etiqueta TEXT,
-                    smart_context BOOLEAN DEFAULT 0,
-                    data_criacao TEXT NOT NULL
-                )
-            ''')
-            
-            # Adicionar coluna smart_context se não existir (para bancos já criados)
-            try:
-                conn.execute('ALTER TABLE intimacoes ADD COLUMN smart_context BOOLEAN DEFAULT 0')
-            except sqlite3.OperationalError:
-                # Coluna já existe, ignorar erro
-                pass
+    except Exception as e:
+        print(f"Aviso: backfill historico_acuracia.modelo (sessão): {e}")
+    try:
+        conn.execute(
+            """
+            UPDATE historico_acuracia
+            SET modelo = (
+                SELECT TRIM(a.modelo) FROM analises a
+                WHERE a.session_id = historico_acuracia.session_id
+                  AND a.prompt_id = historico_acuracia.prompt_id
+                  AND a.modelo IS NOT NULL AND TRIM(a.modelo) != ''
+                ORDER BY a.data_analise DESC
+                LIMIT 1
+            )
+            WHERE (historico_acuracia.modelo IS NULL OR TRIM(historico_acuracia.modelo) = '')
+              AND historico_acuracia.session_id IS NOT NULL
+            """
+        )
+    except Exception as e:
+        print(f"Aviso: backfill historico_acuracia.modelo (analises): {e}")
 
-            # ID externo do portal (ex.: intimacaoId do eProc) — deduplicação na importação
-            try:
-                conn.execute(
-                    'ALTER TABLE intimacoes ADD COLUMN intimacao_id_externo TEXT'
-                )
-            except sqlite3.OperationalError:
-                pass
-            try:
-                conn.execute(
-                    'CREATE UNIQUE INDEX IF NOT EXISTS idx_intimacoes_id_externo '
-                    'ON intimacoes(intimacao_id_externo)'
-                )
-            except sqlite3.OperationalError:
-                pass
 
-            try:
-                conn.execute(
-                    'ALTER TABLE intimacoes ADD COLUMN regras_usuario_prioridade_alta TEXT'
-                )
-            except sqlite3.OperationalError:
-                pass
+def _migracao_sementes_padrao(conn) -> None:
+    """Áreas padrão e o template de prompt inicial."""
+    _seed_areas_padrao_sqlite(conn)
+    _seed_prompt_templates_padrao_sqlite(conn)
 
-            try:
-                conn.execute('ALTER TABLE intimacoes ADD COLUMN observacoes TEXT')
-            except sqlite3.OperationalError:
-                pass
 
-            try:
-                conn.execute(
-                    'ALTER TABLE intimacoes ADD COLUMN destacada BOOLEAN DEFAULT 0'
-                )
-            except sqlite3.OperationalError:
-                pass
-            
-            # Criar tabela de análises
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS analises (
-                    id TEXT PRIMARY KEY,
-                    intimacao_id TEXT NOT NULL,
-                    prompt_id TEXT NOT NULL,
-                    prompt_nome TEXT,
-                    data_analise TEXT NOT NULL,
-                    resultado_ia TEXT,
-                    acertou BOOLEAN,
-                    tempo_processamento REAL,
-                    modelo TEXT,
-                    temperatura REAL,
-                    tokens_usados INTEGER,
-                    tokens_input INTEGER,
-                    tokens_output INTEGER,
-                    custo_real REAL,
-                    prompt_completo TEXT,
-                    resposta_completa TEXT,
-                    session_id TEXT,
-                    FOREIGN KEY (intimacao_id) REFERENCES intimacoes (id),
-                    FOREIGN KEY (prompt_id) REFERENCES prompts (id)
-                )
-            ''')
-            
-            # Criar tabela de histórico de acurácia
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS historico_acuracia (
-                    id TEXT PRIMARY KEY,
-                    prompt_id TEXT NOT NULL,
-                    numero_intimacoes INTEGER NOT NULL,
-                    modelo TEXT,
-                    temperatura REAL NOT NULL,
-                    acuracia REAL NOT NULL,
-                    data_analise TEXT NOT NULL,
-                    session_id TEXT,
-                    FOREIGN KEY (prompt_id) REFERENCES prompts (id)
-                )
-            ''')
+def _migracao_eventos_progresso_analise(conn) -> None:
+    """Eventos de progresso das sessões (SSE lido do banco: funciona entre workers)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS eventos_progresso_analise (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            dados TEXT NOT NULL,
+            criado_em TEXT NOT NULL
+        )
+    ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_eventos_progresso_sessao '
+        'ON eventos_progresso_analise(session_id, id)'
+    )
 
-            # Sessões de análise (modelo/temp da execução em lote — usado para enriquecer histórico de acurácia)
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS sessoes_analise (
-                    session_id TEXT PRIMARY KEY,
-                    data_inicio TEXT NOT NULL,
-                    data_fim TEXT,
-                    prompt_id TEXT NOT NULL,
-                    prompt_nome TEXT,
-                    modelo TEXT,
-                    temperatura REAL,
-                    max_tokens INTEGER,
-                    timeout INTEGER,
-                    total_intimacoes INTEGER,
-                    intimações_processadas INTEGER DEFAULT 0,
-                    acertos INTEGER DEFAULT 0,
-                    erros INTEGER DEFAULT 0,
-                    tempo_total REAL DEFAULT 0.0,
-                    custo_total REAL DEFAULT 0.0,
-                    tokens_total INTEGER DEFAULT 0,
-                    status TEXT DEFAULT 'em_andamento',
-                    configuracoes TEXT,
-                    FOREIGN KEY (prompt_id) REFERENCES prompts (id)
-                )
-            ''')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessoes_data ON sessoes_analise(data_inicio)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessoes_prompt ON sessoes_analise(prompt_id)')
 
-            # Tabela de defensores (cadastro administrativo)
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS defensores (
-                    id TEXT PRIMARY KEY,
-                    nome TEXT NOT NULL,
-                    ativo INTEGER DEFAULT 1,
-                    data_criacao TEXT NOT NULL
-                )
-            ''')
-            
-            # Criar índices para performance
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_analises_intimacao ON analises(intimacao_id)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_analises_prompt ON analises(prompt_id)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_acuracia_prompt ON historico_acuracia(prompt_id)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_acuracia_condicoes ON historico_acuracia(prompt_id, numero_intimacoes, temperatura)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_analises_data ON analises(data_analise)')
-            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_defensores_nome_lower ON defensores(LOWER(nome))')
+def _migracao_checkpoint_reextracao_analises(conn) -> None:
+    """Checkpoint dos jobs de reextração de resultado_ia/acertou (ReextracaoAnalisesJob)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reextracao_analises_jobs (
+            job_id TEXT PRIMARY KEY,
+            ultimo_id TEXT NOT NULL DEFAULT '',
+            status TEXT NOT NULL,
+            resumo TEXT,
+            data_inicio TEXT NOT NULL,
+            data_atualizacao TEXT NOT NULL
+        )
+    ''')
+
+
+# Migrações do esquema (PRAGMA user_version): acrescente sempre no fim, com o próximo número;
+# uma migração já publicada não deve ser alterada.
+_MIGRACOES_ESQUEMA = (
+    (1, 'esquema base', _migracao_esquema_base),
+    (2, 'historico_acuracia.modelo a partir das sessões e análises', _backfill_historico_acuracia_modelo_desde_sessao_e_analises),
+    (3, 'áreas e template de prompt padrão', _migracao_sementes_padrao),
+    (4, 'eventos de progresso das sessões de análise', _migracao_eventos_progresso_analise),
+    (5, 'fatos diários das análises (tabela agregada e gatilhos)', criar_fatos_diarios),
+    (6, 'histórico da manutenção periódica do banco', criar_historico_manutencao),
+    (7, 'checkpoint dos jobs de reextração das análises', _migracao_checkpoint_reextracao_analises),
+)
 
+
+def _em_cache_por_geracao(metodo):
+    """Memoriza o resultado da consulta por (método, argumentos) enquanto a geração dos dados não muda."""
+    @functools.wraps(metodo)
+    def envoltorio(self, *args, **kwargs):
+        chave = (metodo.__name__, args, tuple(sorted(kwargs.items())))
+        return self.cache_consultas.obter_ou_calcular(
+            chave, self.geracao_dados(), lambda: metodo(self, *args, **kwargs)
+        )
+    return envoltorio
+
+
+def _invalida_cache_consultas(metodo):
+    """Escrita em tabelas lidas pelas consultas em cache: avança a geração ao terminar (mesmo com erro)."""
+    @functools.wraps(metodo)
+    def envoltorio(self, *args, **kwargs):
+        try:
+            return metodo(self, *args, **kwargs)
+        finally:
+            self.invalidar_cache_consultas()
+    return envoltorio
+
+
+def _caminho_banco_padrao() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'database.db')
+
+
+@instrumentar_metodos(METRICA_METODOS_SQLITE, exceto=('geracao_dados', 'invalidar_cache_consultas'))
+class SQLiteService:
+    """Serviço para gerenciar dados em SQLite"""
+    
+    def __init__(self, db_path: str = None):
+        """Inicializar o serviço SQLite (prefira obter_sqlite_service, que compartilha a instância)"""
+        if db_path is None:
+            db_path = _caminho_banco_padrao()
+        
+        self.db_path = db_path
+        self.cache_consultas = CacheConsultasAgregadas()
+        self._geracao_local = 0
+        self._conexao_versao_dados: Optional[sqlite3.Connection] = None
+        self._versao_arquivo_conexao_dados = 0
+        self._lock_geracao = threading.Lock()
+        self._portao = obter_portao_conexoes(db_path)
+        self._ensure_database_exists()
+    
+    @contextmanager
+    def get_connection(self):
+        """Context manager para conexões SQLite (espera, se o arquivo do banco estiver sendo trocado)"""
+        with self._portao.compartilhado():
+            conn = sqlite3.connect(self.db_path, factory=ConexaoInstrumentada)
+            conn.row_factory = sqlite3.Row  # Para acessar colunas por nome
             try:
-                conn.execute('ALTER TABLE analises ADD COLUMN session_id TEXT')
-            except sqlite3.OperationalError:
-                pass
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_analises_session ON analises(session_id)')
-            try:
-                conn.execute(
-                    "ALTER TABLE analises ADD COLUMN modo_avaliacao TEXT DEFAULT 'padrao'"
-                )
-            except sqlite3.OperationalError:
-                pass
-            try:
-                conn.execute('ALTER TABLE analises ADD COLUMN tipo_alvo_focado TEXT')
-            except sqlite3.OperationalError:
-                pass
-            try:
-                conn.execute('ALTER TABLE historico_acuracia ADD COLUMN session_id TEXT')
-            except sqlite3.OperationalError:
-                pass
-            try:
-                conn.execute('ALTER TABLE historico_acuracia ADD COLUMN modelo TEXT')
-            except sqlite3.OperationalError:
-                pass
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_acuracia_condicoes_modelo ON historico_acuracia(prompt_id, numero_intimacoes, temperatura, modelo)')
+                yield conn
+            finally:
+                conn.close()
 
-            self._backfill_historico_acuracia_modelo_desde_sessao_e_analises(conn)
+    @contextmanager
+    def conexao_exclusiva(self, prazo_segundos: float = PRAZO_QUIESCENCIA_SEGUNDOS):
+        """Conexão única com o banco: espera as demais fecharem e barra novas até sair (ex.: VACUUM)"""
+        with self._portao.exclusivo(prazo_segundos):
+            conn = sqlite3.connect(self.db_path, factory=ConexaoInstrumentada)
+            conn.row_factory = sqlite3.Row
+            try:
+                yield conn
+            finally:
+                conn.close()
 
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS areas (
-                    id TEXT PRIMARY KEY,
-                    nome TEXT NOT NULL,
-                    ordem INTEGER NOT NULL DEFAULT 0
-                )
-            ''')
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS area_classe (
-                    classe TEXT PRIMARY KEY,
-                    area_id TEXT NOT NULL,
-                    FOREIGN KEY (area_id) REFERENCES areas (id) ON DELETE CASCADE
-                )
-            ''')
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS prompt_templates (
-                    id TEXT PRIMARY KEY,
-                    nome TEXT NOT NULL,
-                    descricao TEXT,
-                    conteudo TEXT NOT NULL,
-                    ordem INTEGER NOT NULL DEFAULT 0,
-                    data_criacao TEXT NOT NULL,
-                    data_atualizacao TEXT
-                )
-            ''')
-            conn.execute(
-                'CREATE INDEX IF NOT EXISTS idx_prompt_templates_ordem ON prompt_templates(ordem, nome)'
-            )
-            _seed_areas_padrao_sqlite(conn)
-            _seed_prompt_templates_padrao_sqlite(conn)
-            
-            conn.commit()
+    def _ensure_database_exists(self):
+        """Criar o banco ou atualizar o esquema, aplicando só as migrações ainda não aplicadas"""
+        with self.get_connection() as conn:
+            configurar_arquivo_banco(conn)
+            aplicar_migracoes_pendentes(conn, _MIGRACOES_ESQUEMA)
     
+    def geracao_dados(self) -> Tuple[int, int]:
+        """
+        Geração dos dados para o cache de consultas: contador local, avançado pelas escritas deste
+        serviço, e PRAGMA data_version de uma conexão dedicada, que muda a cada commit feito por
+        qualquer outra conexão (outro worker, script de linha de comando, escrita sem decorador).
+        """
+        with self._lock_geracao:
+            versao_arquivo = self._portao.versao_arquivo
+            if versao_arquivo != self._versao_arquivo_conexao_dados:
+                # o arquivo foi trocado (por esta ou outra instância): a conexão antiga vê o arquivo velho
+                self._fechar_conexao_versao_dados()
+                self._versao_arquivo_conexao_dados = versao_arquivo
+                self._geracao_local += 1
+            if self._conexao_versao_dados is None:
+                self._conexao_versao_dados = sqlite3.connect(self.db_path, check_same_thread=False)
+            versao = self._conexao_versao_dados.execute('PRAGMA data_version').fetchone()[0]
+            return self._geracao_local, versao
+
+    def invalidar_cache_consultas(self) -> None:
+        with self._lock_geracao:
+            self._geracao_local += 1
+
+    def _fechar_conexao_versao_dados(self) -> None:
+        if self._conexao_versao_dados is not None:
+            self._conexao_versao_dados.close()
+            self._conexao_versao_dados = None
+
+    @staticmethod
+    def migrar_arquivo_banco(caminho: str) -> int:
+        """Aplica as migrações pendentes num arquivo avulso (ex.: banco enviado) e retorna a versão do esquema"""
+        conn = sqlite3.connect(caminho)
+        conn.row_factory = sqlite3.Row
+        try:
+            configurar_arquivo_banco(conn)
+            aplicar_migracoes_pendentes(conn, _MIGRACOES_ESQUEMA)
+            return versao_esquema(conn)
+        finally:
+            conn.close()
+
+    def trocar_arquivo_banco(self, caminho_novo: str, prazo_segundos: float = PRAZO_QUIESCENCIA_SEGUNDOS) -> None:
+        """
+        Põe `caminho_novo` (já validado e migrado, na mesma pasta do banco) no lugar do banco sem
+        reiniciar o processo: espera as conexões abertas fecharem, barra novas durante o os.replace
+        e descarta o cache de consultas. Ver troca_segura_arquivo_banco_sqlite_hot_swap_service.
+        """
+        with self._portao.exclusivo(prazo_segundos):
+            with self._lock_geracao:
+                self._fechar_conexao_versao_dados()
+            substituir_arquivo_banco(self.db_path, caminho_novo)
+        self.cache_consultas.limpar()
+        self.invalidar_cache_consultas()
+
     # Métodos para Prompts
     def get_all_prompts(self) -> List[Dict[str, Any]]:
         """Obter todos os prompts"""
@@ -403,6 +642,7 @@ class SQLiteService:
                 return prompt
             return None
     
+    @_invalida_cache_consultas
     def save_prompt(self, prompt: Dict[str, Any]) -> str:
         """Salvar um prompt"""
         with self.get_connection() as conn:
@@ -441,6 +681,7 @@ class SQLiteService:
             conn.commit()
             return prompt['id']
     
+    @_invalida_cache_consultas
     def delete_prompt(self, prompt_id: str) -> bool:
         """Deletar um prompt"""
         with self.get_connection() as conn:
@@ -519,6 +760,24 @@ class SQLiteService:
                     out[d['intimacao_id']].append(d)
         return dict(out)
 
+    def get_contextos_por_intimacao_ids(self, intimacao_ids: List[str]) -> Dict[str, str]:
+        """Somente id -> contexto, em lotes (sem analises nem demais colunas)."""
+        if not intimacao_ids:
+            return {}
+        out: Dict[str, str] = {}
+        chunk_size = 400
+        with self.get_connection() as conn:
+            for start in range(0, len(intimacao_ids), chunk_size):
+                chunk = intimacao_ids[start : start + chunk_size]
+                placeholders = ','.join('?' * len(chunk))
+                cursor = conn.execute(
+                    f'SELECT id, contexto FROM intimacoes WHERE id IN ({placeholders})',
+                    chunk,
+                )
+                for row in cursor.fetchall():
+                    out[row['id']] = row['contexto'] or ''
+        return out
+
     def get_all_intimacoes(self) -> List[Dict[str, Any]]:
         """Obter todas as intimações com suas análises (2 queries em lote, sem N+1)."""
         with self.get_connection() as conn:
@@ -789,6 +1048,7 @@ class SQLiteService:
             ).fetchone()
             return row[0] if row else None
 
+    @_invalida_cache_consultas
     def save_intimacao(self, intimacao: Dict[str, Any]) -> str:
         """Salvar uma intimação"""
         with self.get_connection() as conn:
@@ -814,44 +1074,236 @@ class SQLiteService:
                     )
             
             # Inserir ou atualizar intimação (SEM salvar análises aninhadas)
-            conn.execute('''
-                INSERT OR REPLACE INTO intimacoes 
-                (id, contexto, classificacao_manual, informacao_adicional, processo,
-                 orgao_julgador, classe, disponibilizacao, intimado, status, prazo,
-                 defensor, id_tarefa, cor_etiqueta, smart_context, data_criacao,
-                 intimacao_id_externo, regras_usuario_prioridade_alta, observacoes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                intimacao['id'],
-                intimacao.get('contexto', ''),
-                intimacao.get('classificacao_manual', ''),
-                intimacao.get('informacoes_adicionais', intimacao.get('informacao_adicional', '')),
-                intimacao.get('processo', ''),
-                intimacao.get('orgao_julgador', ''),
-                intimacao.get('classe', ''),
-                intimacao.get('disponibilizacao', ''),
-                intimacao.get('intimado', ''),
-                intimacao.get('status', ''),
-                intimacao.get('prazo', ''),
-                intimacao.get('defensor', ''),
-                intimacao.get('id_tarefa', ''),
-                intimacao.get('cor_etiqueta', ''),
-                1 if intimacao.get('smart_context', False) else 0,  # Converter boolean para int (0/1)
-                intimacao['data_criacao'],
-                (str(ext_raw).strip() if ext_raw is not None and str(ext_raw).strip() != '' else None),
-                intimacao.get('regras_usuario_prioridade_alta') or '',
-                intimacao.get('observacoes') or '',
-            ))
+            conn.execute(
+                f'INSERT OR REPLACE INTO intimacoes ({", ".join(_COLUNAS_GRAVACAO_INTIMACAO)}) '
+                f'VALUES ({", ".join("?" * len(_COLUNAS_GRAVACAO_INTIMACAO))})',
+                self._valores_gravacao_intimacao(intimacao),
+            )
             
             # NÃO salvar análises aninhadas aqui - elas são salvas separadamente via adicionar_analise_intimacao()
             
             conn.commit()
             return intimacao['id']
     
+    def _valores_gravacao_intimacao(self, intimacao: Dict[str, Any]) -> tuple:
+        """Valores na ordem de _COLUNAS_GRAVACAO_INTIMACAO (id e data_criacao já preenchidos)."""
+        ext_raw = intimacao.get('intimacao_id_externo')
+        valores = (
+            intimacao['id'],
+            intimacao.get('contexto', ''),
+            intimacao.get('classificacao_manual', ''),
+            intimacao.get('informacoes_adicionais', intimacao.get('informacao_adicional', '')),
+            intimacao.get('processo', ''),
+            intimacao.get('orgao_julgador', ''),
+            intimacao.get('classe', ''),
+            intimacao.get('disponibilizacao', ''),
+            intimacao.get('intimado', ''),
+            intimacao.get('status', ''),
+            intimacao.get('prazo', ''),
+            intimacao.get('defensor', ''),
+            intimacao.get('id_tarefa', ''),
+            intimacao.get('cor_etiqueta', ''),
+            1 if intimacao.get('smart_context', False) else 0,  # Converter boolean para int (0/1)
+            intimacao['data_criacao'],
+            (str(ext_raw).strip() if ext_raw is not None and str(ext_raw).strip() != '' else None),
+            intimacao.get('regras_usuario_prioridade_alta') or '',
+            intimacao.get('observacoes') or '',
+        )
+        return valores + (_hash_conteudo_intimacao(dict(zip(_COLUNAS_GRAVACAO_INTIMACAO, valores))),)
+    
+    def get_ids_por_intimacao_ids_externos(self, ids_externos: List[str]) -> Dict[str, str]:
+        """{intimacao_id_externo: id interno} dos IDs externos já cadastrados (consulta em blocos)."""
+        chaves = sorted({str(e).strip() for e in ids_externos if e is not None and str(e).strip()})
+        encontrados: Dict[str, str] = {}
+        if not chaves:
+            return encontrados
+        with self.get_connection() as conn:
+            for inicio in range(0, len(chaves), 400):
+                bloco = chaves[inicio:inicio + 400]
+                rows = conn.execute(
+                    f'SELECT intimacao_id_externo, id FROM intimacoes '
+                    f'WHERE intimacao_id_externo IN ({",".join("?" * len(bloco))})',
+                    bloco,
+                ).fetchall()
+                encontrados.update({r[0]: r[1] for r in rows})
+        return encontrados
+    
+    @_invalida_cache_consultas
+    def inserir_intimacoes_lote(
+        self,
+        intimacoes: List[Dict[str, Any]],
+        tudo_ou_nada: bool = False,
+        tamanho_lote: int = 1000,
+    ) -> List[Dict[str, Any]]:
+        """
+        Insere intimações novas com executemany, em blocos de `tamanho_lote`.
+        
+        Sem tudo_ou_nada, cada bloco é uma transação; se um bloco violar alguma restrição, ele é
+        regravado linha a linha para isolar os registros com problema. Com tudo_ou_nada, todos os
+        blocos estão numa transação só e qualquer erro desfaz a importação inteira.
+        
+        Returns:
+            Um resultado por intimação, na mesma ordem: {'id': ...} ou {'erro': ...}
+        """
+        for intimacao in intimacoes:
+            if not intimacao.get('id'):
+                intimacao['id'] = str(uuid.uuid4())
+            if 'data_criacao' not in intimacao:
+                intimacao['data_criacao'] = datetime.now().isoformat()
+        sql = (
+            f'INSERT INTO intimacoes ({", ".join(_COLUNAS_GRAVACAO_INTIMACAO)}) '
+            f'VALUES ({", ".join("?" * len(_COLUNAS_GRAVACAO_INTIMACAO))})'
+        )
+        resultados: List[Dict[str, Any]] = [{'id': i['id']} for i in intimacoes]
+        
+        with self.get_connection() as conn:
+            if tudo_ou_nada:
+                try:
+                    for inicio in range(0, len(intimacoes), tamanho_lote):
+                        conn.executemany(sql, [
+                            self._valores_gravacao_intimacao(i)
+                            for i in intimacoes[inicio:inicio + tamanho_lote]
+                        ])
+                    conn.commit()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    erro = f'Importação desfeita (tudo ou nada): {e}'
+                    return [{'erro': erro} for _ in intimacoes]
+                return resultados
+            
+            for inicio in range(0, len(intimacoes), tamanho_lote):
+                bloco = intimacoes[inicio:inicio + tamanho_lote]
+                try:
+                    conn.executemany(sql, [self._valores_gravacao_intimacao(i) for i in bloco])
+                    conn.commit()
+                except sqlite3.IntegrityError:
+                    conn.rollback()
+                    for deslocamento, intimacao in enumerate(bloco):
+                        try:
+                            conn.execute(sql, self._valores_gravacao_intimacao(intimacao))
+                        except sqlite3.IntegrityError as e:
+                            resultados[inicio + deslocamento] = {'erro': str(e)}
+                    conn.commit()
+        return resultados
+    
+    @_invalida_cache_consultas
+    def sincronizar_intimacoes_lote(
+        self,
+        intimacoes: List[Dict[str, Any]],
+        tamanho_lote: int = 1000,
+        dry_run: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Sincroniza intimações pela chave intimacao_id_externo (upsert incremental e idempotente).
+        
+        Por intimação: ID externo não cadastrado → INSERT; cadastrado com o mesmo hash_conteudo →
+        inalterada, sem escrita; hash diferente → UPDATE só das colunas sincronizadas que mudaram
+        (id, data_criacao e observacoes do cadastro são preservados). Cada bloco de `tamanho_lote`
+        é uma transação; um erro de gravação desfaz e reporta o bloco inteiro.
+        
+        Returns:
+            Um resultado por intimação, na mesma ordem:
+            {'id', 'acao': 'inserida' | 'atualizada' | 'inalterada', 'colunas_alteradas'} ou {'erro': ...}
+        """
+        resultados: List[Dict[str, Any]] = [None] * len(intimacoes)
+        colunas_update = ', '.join(_COLUNAS_SINCRONIZADAS_INTIMACAO)
+        sql_insert = (
+            f'INSERT INTO intimacoes ({", ".join(_COLUNAS_GRAVACAO_INTIMACAO)}) '
+            f'VALUES ({", ".join("?" * len(_COLUNAS_GRAVACAO_INTIMACAO))})'
+        )
+        
+        with self.get_connection() as conn:
+            for inicio in range(0, len(intimacoes), tamanho_lote):
+                bloco = list(enumerate(intimacoes[inicio:inicio + tamanho_lote], start=inicio))
+                chaves: Dict[int, str] = {}
+                usadas = set()
+                for idx, intimacao in bloco:
+                    ext_raw = intimacao.get('intimacao_id_externo')
+                    if ext_raw is None or not str(ext_raw).strip():
+                        resultados[idx] = {'erro': 'intimacaoId obrigatório na sincronização.'}
+                    elif str(ext_raw).strip() in usadas:
+                        resultados[idx] = {'erro': f'intimacaoId={str(ext_raw).strip()!r} repetido no bloco.'}
+                    else:
+                        chaves[idx] = str(ext_raw).strip()
+                        usadas.add(chaves[idx])
+                
+                cadastrados: Dict[str, Tuple[str, Optional[str]]] = {}
+                lista_chaves = sorted(set(chaves.values()))
+                for i in range(0, len(lista_chaves), 400):
+                    parte = lista_chaves[i:i + 400]
+                    cadastrados.update({
+                        r[0]: (r[1], r[2]) for r in conn.execute(
+                            f'SELECT intimacao_id_externo, id, hash_conteudo FROM intimacoes '
+                            f'WHERE intimacao_id_externo IN ({",".join("?" * len(parte))})',
+                            parte,
+                        )
+                    })
+                
+                inserir: List[tuple] = []
+                divergentes: Dict[str, Tuple[int, Dict[str, Any]]] = {}  # id -> (idx, valores novos)
+                for idx, ext in chaves.items():
+                    intimacao = intimacoes[idx]
+                    if ext not in cadastrados:
+                        if not intimacao.get('id'):
+                            intimacao['id'] = str(uuid.uuid4())
+                        if 'data_criacao' not in intimacao:
+                            intimacao['data_criacao'] = datetime.now().isoformat()
+                        inserir.append(self._valores_gravacao_intimacao(intimacao))
+                        resultados[idx] = {'id': intimacao['id'], 'acao': 'inserida', 'colunas_alteradas': []}
+                        continue
+                    id_interno, hash_atual = cadastrados[ext]
+                    valores = dict(zip(
+                        _COLUNAS_GRAVACAO_INTIMACAO,
+                        self._valores_gravacao_intimacao({'data_criacao': '', **intimacao, 'id': id_interno}),
+                    ))
+                    if valores['hash_conteudo'] == hash_atual:
+                        resultados[idx] = {'id': id_interno, 'acao': 'inalterada', 'colunas_alteradas': []}
+                    else:
+                        divergentes[id_interno] = (idx, valores)
+                
+                # Hash diferente (ou ausente, em registros anteriores à coluna): compara coluna a coluna
+                atualizacoes: Dict[Tuple[str, ...], List[tuple]] = defaultdict(list)
+                ids_divergentes = list(divergentes)
+                for i in range(0, len(ids_divergentes), 400):
+                    parte = ids_divergentes[i:i + 400]
+                    for row in conn.execute(
+                        f'SELECT id, {colunas_update} FROM intimacoes WHERE id IN ({",".join("?" * len(parte))})',
+                        parte,
+                    ):
+                        idx, valores = divergentes[row[0]]
+                        alteradas = tuple(
+                            c for c, atual in zip(_COLUNAS_SINCRONIZADAS_INTIMACAO, row[1:]) if atual != valores[c]
+                        )
+                        atualizacoes[alteradas].append(
+                            tuple(valores[c] for c in alteradas) + (valores['hash_conteudo'], row[0])
+                        )
+                        resultados[idx] = {
+                            'id': row[0],
+                            'acao': 'atualizada' if alteradas else 'inalterada',
+                            'colunas_alteradas': list(alteradas),
+                        }
+                
+                if dry_run:
+                    continue
+                try:
+                    if inserir:
+                        conn.executemany(sql_insert, inserir)
+                    for alteradas, parametros in atualizacoes.items():
+                        sets = ', '.join(f'{c} = ?' for c in alteradas + ('hash_conteudo',))
+                        conn.executemany(f'UPDATE intimacoes SET {sets} WHERE id = ?', parametros)
+                    conn.commit()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    for idx, _ in bloco:
+                        if 'erro' not in resultados[idx]:
+                            resultados[idx] = {'erro': f'Bloco de sincronização desfeito: {e}'}
+        return resultados
+    
     def criar_intimacao(self, intimacao_data: Dict[str, Any]) -> str:
         """Criar uma nova intimação (compatibilidade com DataService)"""
         return self.save_intimacao(intimacao_data)
     
+    @_invalida_cache_consultas
     def delete_intimacao(self, intimacao_id: str) -> bool:
         """Deletar uma intimação e suas análises"""
         with self.get_connection() as conn:
@@ -912,12 +1364,14 @@ class SQLiteService:
     ) -> Tuple[str, List[Any]]:
         clauses: List[str] = ["1=1"]
         params: List[Any] = []
+        # Comparações diretas com data_analise (equivalentes a substr(data_analise, 1, 10) para
+        # datas ISO) para o SQLite poder usar idx_analises_data
         if data_inicio and str(data_inicio).strip():
-            clauses.append("substr(a.data_analise, 1, 10) >= ?")
+            clauses.append("a.data_analise >= ?")
             params.append(str(data_inicio).strip())
         if data_fim and str(data_fim).strip():
-            clauses.append("substr(a.data_analise, 1, 10) <= ?")
-            params.append(str(data_fim).strip())
+            clauses.append("a.data_analise < ?")
+            params.append(str(data_fim).strip() + "\uffff")
         if prompt_id and str(prompt_id).strip():
             clauses.append("a.prompt_id = ?")
             params.append(str(prompt_id).strip())
@@ -926,6 +1380,182 @@ class SQLiteService:
             params.append(str(classificacao_manual).strip())
         return " AND ".join(clauses), params
 
+    def iterar_analises_exportacao(
+        self,
+        data_inicio: str = "",
+        data_fim: str = "",
+        prompt_id: str = "",
+        classificacao_manual: str = "",
+        incluir_conteudos_completos: bool = False,
+        tamanho_lote: int = 1000,
+        incluir_contexto: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Análises filtradas (mesmos filtros dos relatórios) linha a linha, sem materializar o resultado.
+
+        Paginação por chave (data_analise, id), da mais recente para a mais antiga, com uma conexão
+        nova por página de tamanho_lote linhas: nenhuma conexão fica aberta entre um yield e outro,
+        então um download lento não segura o portão (troca do arquivo, manutenção exclusiva) nem
+        impede o checkpoint do WAL. prompt_completo/resposta_completa só são lidos com
+        incluir_conteudos_completos.
+        """
+        where_sql, params = self._where_relatorios_analises(
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            prompt_id=prompt_id,
+            classificacao_manual=classificacao_manual,
+        )
+        colunas_completas = (
+            ", a.prompt_completo, a.resposta_completa" if incluir_conteudos_completos else ""
+        )
+        coluna_contexto = ",\n                    i.contexto" if incluir_contexto else ""
+        sql_pagina = f"""
+            SELECT
+                a.id,
+                a.intimacao_id,
+                a.prompt_id,
+                COALESCE(a.prompt_nome, p.nome, '') AS prompt_nome,
+                a.data_analise,
+                a.resultado_ia,
+                a.acertou,
+                a.tempo_processamento,
+                a.modelo,
+                a.temperatura,
+                a.tokens_input,
+                a.tokens_output,
+                a.custo_real,
+                a.session_id,
+                a.modo_avaliacao,
+                a.tipo_alvo_focado,
+                i.classificacao_manual,
+                i.informacao_adicional{coluna_contexto}{colunas_completas}
+            FROM analises a
+            LEFT JOIN intimacoes i ON i.id = a.intimacao_id
+            LEFT JOIN prompts p ON p.id = a.prompt_id
+            WHERE {where_sql}{{depois_da_chave}}
+            ORDER BY a.data_analise DESC, a.id DESC
+            LIMIT ?
+        """
+        chave: Optional[Tuple[str, str]] = None
+        while True:
+            if chave is None:
+                sql, parametros = sql_pagina.format(depois_da_chave=""), [*params, tamanho_lote]
+            else:
+                sql = sql_pagina.format(depois_da_chave=" AND (a.data_analise, a.id) < (?, ?)")
+                parametros = [*params, *chave, tamanho_lote]
+            with self.get_connection() as conn:
+                rows = conn.execute(sql, parametros).fetchall()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < tamanho_lote:
+                break
+            chave = (rows[-1]["data_analise"], rows[-1]["id"])
+
+    def contar_analises_matriz_confusao(
+        self,
+        data_inicio: str = "",
+        data_fim: str = "",
+        prompt_id: str = "",
+        classificacao_manual: str = "",
+        agrupar_por: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Contagens (classificação manual, resultado da IA) agregadas no SQL, com os filtros dos relatórios.
+
+        agrupar_por: None, 'prompt' ou 'modelo' (acrescenta grupo/grupo_nome a cada linha).
+        Resultados "ERRO: ..." viram ERRO_CLASSIFICACAO; intimação sem classificação manual,
+        SEM_CLASSIFICACAO_MANUAL (fica fora da matriz e é contada à parte).
+        """
+        # Colunas 1-2 do SELECT; o GROUP BY usa as posições 1, 3 e 4 (grupo, manual, IA)
+        colunas_grupo = {
+            None: "'' AS grupo, '' AS grupo_nome",
+            'prompt': "a.prompt_id AS grupo, COALESCE(MAX(p.nome), MAX(a.prompt_nome), a.prompt_id) AS grupo_nome",
+            'modelo': "COALESCE(a.modelo, '') AS grupo, COALESCE(a.modelo, '') AS grupo_nome",
+        }
+        if agrupar_por not in colunas_grupo:
+            raise ValueError(f"agrupar_por inválido: {agrupar_por}")
+        select_grupo = colunas_grupo[agrupar_por]
+        where_sql, params = self._where_relatorios_analises(
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            prompt_id=prompt_id,
+            classificacao_manual=classificacao_manual,
+        )
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT
+                    {select_grupo},
+                    COALESCE(NULLIF(i.classificacao_manual, ''), ?) AS classificacao_manual,
+                    CASE
+                        WHEN a.resultado_ia IS NULL OR a.resultado_ia = '' OR a.resultado_ia LIKE 'ERRO%'
+                        THEN ? ELSE a.resultado_ia
+                    END AS resultado_ia,
+                    COUNT(*) AS quantidade
+                FROM analises a
+                LEFT JOIN intimacoes i ON i.id = a.intimacao_id
+                LEFT JOIN prompts p ON p.id = a.prompt_id
+                WHERE {where_sql}
+                GROUP BY 1, 3, 4
+                """,
+                [ROTULO_SEM_CLASSIFICACAO_MANUAL, ROTULO_ERRO_CLASSIFICACAO, *params],
+            ).fetchall()
+            return [dict(r) for r in rows]
+
+    def obter_resumo_analises_por_prompt(
+        self,
+        data_inicio: str = "",
+        data_fim: str = "",
+        prompt_id: str = "",
+        classificacao_manual: str = "",
+    ) -> List[Dict[str, Any]]:
+        """Total, acertos, taxa, tempo médio e custo por prompt (GROUP BY no SQL, filtros dos relatórios)."""
+        where_sql, params = self._where_relatorios_analises(
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            prompt_id=prompt_id,
+            classificacao_manual=classificacao_manual,
+        )
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT
+                    a.prompt_id,
+                    COALESCE(MAX(p.nome), MAX(a.prompt_nome), 'Prompt não encontrado') AS prompt_nome,
+                    COUNT(*) AS total,
+                    SUM(CASE WHEN a.acertou THEN 1 ELSE 0 END) AS acertos,
+                    AVG(a.tempo_processamento) AS tempo_medio,
+                    SUM(COALESCE(a.custo_real, 0)) AS custo_total
+                FROM analises a
+                LEFT JOIN intimacoes i ON i.id = a.intimacao_id
+                LEFT JOIN prompts p ON p.id = a.prompt_id
+                WHERE {where_sql}
+                GROUP BY a.prompt_id
+                ORDER BY total DESC
+                """,
+                params,
+            ).fetchall()
+        resumo = []
+        for r in rows:
+            d = dict(r)
+            d['taxa_acuracia'] = round(d['acertos'] / d['total'] * 100, 2) if d['total'] else 0.0
+            resumo.append(d)
+        return resumo
+
+    def obter_distribuicao_classificacao_manual_intimacoes(self) -> List[Dict[str, Any]]:
+        """Quantidade de intimações por classificação manual (GROUP BY no SQL)."""
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT COALESCE(NULLIF(classificacao_manual, ''), ?) AS classificacao, COUNT(*) AS quantidade
+                FROM intimacoes
+                GROUP BY 1
+                ORDER BY quantidade DESC
+                """,
+                (ROTULO_SEM_CLASSIFICACAO_MANUAL,),
+            ).fetchall()
+            return [dict(r) for r in rows]
+
     def contar_analises_relatorios_filtradas(
         self,
         data_inicio: str = "",
@@ -1019,158 +1649,142 @@ class SQLiteService:
         prompt_id: str = "",
         classificacao_manual: str = "",
     ) -> Dict[str, Any]:
-        where_sql, params = self._where_relatorios_analises(
-            data_inicio=data_inicio,
-            data_fim=data_fim,
-            prompt_id=prompt_id,
-            classificacao_manual=classificacao_manual,
+        # "hoje" entra na chave do cache: analises_hoje não pode atravessar a meia-noite
+        return self._agregados_relatorios_filtrados(
+            data_inicio, data_fim, prompt_id, classificacao_manual, datetime.now().date().isoformat()
         )
-        with self.get_connection() as conn:
-            row_geral = conn.execute(
-                f"""
-                SELECT
-                    COUNT(*) AS total_analises,
-                    SUM(CASE WHEN a.acertou = 1 THEN 1 ELSE 0 END) AS acertos,
-                    COALESCE(SUM(COALESCE(a.tempo_processamento, 0.0)), 0.0) AS tempo_total,
-                    COALESCE(SUM(COALESCE(a.custo_real, 0.0)), 0.0) AS custo_total,
-                    SUM(
-                        CASE WHEN substr(a.data_analise, 1, 10) = date('now', 'localtime')
-                        THEN 1 ELSE 0 END
-                    ) AS analises_hoje
-                FROM analises a
-                LEFT JOIN intimacoes i ON i.id = a.intimacao_id
-                WHERE {where_sql}
-                """,
-                params,
-            ).fetchone()
-
-            total_analises = int((row_geral["total_analises"] or 0) if row_geral else 0)
-            acertos = int((row_geral["acertos"] or 0) if row_geral else 0)
-            tempo_total = float((row_geral["tempo_total"] or 0.0) if row_geral else 0.0)
-            custo_total = float((row_geral["custo_total"] or 0.0) if row_geral else 0.0)
-            analises_hoje = int((row_geral["analises_hoje"] or 0) if row_geral else 0)
 
-            dist_manual: Dict[str, int] = {}
-            cur_manual = conn.execute(
-                f"""
-                SELECT
-                    COALESCE(NULLIF(TRIM(COALESCE(i.classificacao_manual, '')), ''), 'Não classificado') AS label,
-                    COUNT(*) AS c
-                FROM analises a
-                LEFT JOIN intimacoes i ON i.id = a.intimacao_id
-                WHERE {where_sql}
-                GROUP BY 1
-                ORDER BY c DESC
-                """,
-                params,
-            )
-            for r in cur_manual.fetchall():
-                dist_manual[str(r["label"])] = int(r["c"])
-
-            dist_ia: Dict[str, int] = {}
-            cur_ia = conn.execute(
-                f"""
-                SELECT
-                    COALESCE(NULLIF(TRIM(COALESCE(a.resultado_ia, '')), ''), 'Não classificado') AS label,
-                    COUNT(*) AS c
-                FROM analises a
-                LEFT JOIN intimacoes i ON i.id = a.intimacao_id
-                WHERE {where_sql}
-                GROUP BY 1
-                ORDER BY c DESC
-                """,
-                params,
-            )
-            for r in cur_ia.fetchall():
-                dist_ia[str(r["label"])] = int(r["c"])
-
-            performance_prompts: Dict[str, Dict[str, Any]] = {}
-            cur_perf = conn.execute(
-                f"""
-                SELECT
-                    COALESCE(NULLIF(TRIM(COALESCE(a.prompt_nome, p.nome, '')), ''), 'Desconhecido') AS prompt_nome,
-                    COUNT(*) AS total,
-                    SUM(CASE WHEN a.acertou = 1 THEN 1 ELSE 0 END) AS acertos,
-                    COALESCE(SUM(COALESCE(a.tempo_processamento, 0.0)), 0.0) AS tempo_total
-                FROM analises a
-                LEFT JOIN intimacoes i ON i.id = a.intimacao_id
-                LEFT JOIN prompts p ON p.id = a.prompt_id
-                WHERE {where_sql}
-                GROUP BY 1
-                ORDER BY total DESC
-                """,
-                params,
-            )
-            for r in cur_perf.fetchall():
-                nome = str(r["prompt_nome"])
-                total = int(r["total"] or 0)
-                ac = int(r["acertos"] or 0)
-                t_total = float(r["tempo_total"] or 0.0)
-                performance_prompts[nome] = {
-                    "total": total,
-                    "acertos": ac,
-                    "tempo_total": t_total,
-                    "acuracia": round((ac / total) * 100, 1) if total > 0 else 0,
-                    "tempo_medio": round(t_total / total, 3) if total > 0 else 0,
-                }
-
-            meses_ordem = []
-            cur_meses = conn.execute(
-                f"""
-                SELECT
-                    substr(a.data_analise, 1, 7) AS mes_iso,
-                    COUNT(*) AS total,
-                    SUM(CASE WHEN a.acertou = 1 THEN 1 ELSE 0 END) AS acertos
-                FROM analises a
-                LEFT JOIN intimacoes i ON i.id = a.intimacao_id
-                WHERE {where_sql}
-                GROUP BY mes_iso
-                ORDER BY mes_iso DESC
-                LIMIT 6
-                """,
-                params,
-            )
-            meses_raw = [dict(r) for r in cur_meses.fetchall()]
-            meses_raw.reverse()
-            acuracia_labels: List[str] = []
-            acuracia_data: List[float] = []
-            for r in meses_raw:
-                mes_iso = str(r.get("mes_iso") or "")
-                if not mes_iso:
-                    continue
-                y, m = mes_iso.split("-")
-                acuracia_labels.append(f"{m}/{y}")
-                total_mes = int(r.get("total") or 0)
-                ac_mes = int(r.get("acertos") or 0)
-                acuracia_data.append(round((ac_mes / total_mes) * 100, 1) if total_mes > 0 else 0)
-                meses_ordem.append(mes_iso)
+    @_em_cache_por_geracao
+    def _agregados_relatorios_filtrados(
+        self,
+        data_inicio: str,
+        data_fim: str,
+        prompt_id: str,
+        classificacao_manual: str,
+        hoje: str,
+    ) -> Dict[str, Any]:
+        """
+        Totais, distribuições (manual e IA), desempenho por prompt e acurácia mensal a partir de
+        fatos_diarios (já agregada por dia), numa consulta só: um GROUP BY por visão, unidos com
+        UNION ALL (como um GROUPING SETS). Os totais saem da visão por mês, que cobre todas as linhas.
+        """
+        clauses: List[str] = ["1=1"]
+        params: List[Any] = []
+        if data_inicio and str(data_inicio).strip():
+            clauses.append("f.dia >= ?")
+            params.append(str(data_inicio).strip())
+        if data_fim and str(data_fim).strip():
+            clauses.append("f.dia <= ?")
+            params.append(str(data_fim).strip())
+        if prompt_id and str(prompt_id).strip():
+            clauses.append("f.prompt_id = ?")
+            params.append(str(prompt_id).strip())
+        if classificacao_manual and str(classificacao_manual).strip():
+            clauses.append("f.classificacao_manual = ?")
+            params.append(str(classificacao_manual).strip())
+        where_sql = " AND ".join(clauses)
+        visoes = {
+            "manual": "COALESCE(NULLIF(TRIM(f.classificacao_manual), ''), 'Não classificado')",
+            "ia": "COALESCE(NULLIF(TRIM(f.resultado_ia), ''), 'Não classificado')",
+            "prompt": "COALESCE(NULLIF(TRIM(COALESCE(NULLIF(f.prompt_nome, ''), p.nome, '')), ''), 'Desconhecido')",
+            "mes": "substr(f.dia, 1, 7)",
+        }
+        sql = " UNION ALL ".join(
+            f"""
+            SELECT
+                '{visao}' AS visao,
+                {expressao} AS label,
+                SUM(f.total) AS total,
+                SUM(f.acertos) AS acertos,
+                SUM(f.tempo_total) AS tempo_total,
+                SUM(f.custo_total) AS custo_total,
+                SUM(CASE WHEN f.dia = ? THEN f.total ELSE 0 END) AS analises_hoje
+            FROM fatos_diarios f
+            {"LEFT JOIN prompts p ON p.id = f.prompt_id" if visao == "prompt" else ""}
+            WHERE {where_sql}
+            GROUP BY 2
+            """
+            for visao, expressao in visoes.items()
+        )
+        with self.get_connection() as conn:
+            grupos = conn.execute(sql, [hoje, *params] * len(visoes)).fetchall()
+
+        total_analises = acertos = analises_hoje = 0
+        tempo_total = custo_total = 0.0
+        contagem_manual: Dict[str, int] = {}
+        contagem_ia: Dict[str, int] = {}
+        por_prompt: Dict[str, tuple] = {}  # total, acertos, tempo
+        por_mes: Dict[str, tuple] = {}  # total, acertos
+        for r in grupos:
+            visao, label = r["visao"], str(r["label"] or "")
+            total, ac, t_total = int(r["total"] or 0), int(r["acertos"] or 0), float(r["tempo_total"] or 0.0)
+            if visao == "manual":
+                contagem_manual[label] = total
+            elif visao == "ia":
+                contagem_ia[label] = total
+            elif visao == "prompt":
+                por_prompt[label] = (total, ac, t_total)
+            else:
+                por_mes[label] = (total, ac)
+                total_analises += total
+                acertos += ac
+                tempo_total += t_total
+                custo_total += float(r["custo_total"] or 0.0)
+                analises_hoje += int(r["analises_hoje"] or 0)
+
+        def _por_contagem(contagem: Dict[str, int]) -> Dict[str, int]:
+            return dict(sorted(contagem.items(), key=lambda kv: (-kv[1], kv[0])))
+
+        dist_manual = _por_contagem(contagem_manual)
+        dist_ia = _por_contagem(contagem_ia)
+
+        performance_prompts: Dict[str, Dict[str, Any]] = {}
+        for nome, (total, ac, t_total) in sorted(por_prompt.items(), key=lambda kv: (-kv[1][0], kv[0])):
+            performance_prompts[nome] = {
+                "total": total,
+                "acertos": ac,
+                "tempo_total": t_total,
+                "acuracia": round((ac / total) * 100, 1) if total > 0 else 0,
+                "tempo_medio": round(t_total / total, 3) if total > 0 else 0,
+            }
 
-            return {
-                "total_analises": total_analises,
-                "acertos": acertos,
-                "tempo_total": tempo_total,
-                "custo_total": custo_total,
-                "analises_hoje": analises_hoje,
-                "distribuicao_manual": dist_manual,
-                "distribuicao_ia": dist_ia,
-                "performance_prompts": performance_prompts,
-                "dados_graficos": {
-                    "acuracia_periodo": {"labels": acuracia_labels, "data": acuracia_data},
-                    "classificacoes_manuais": {
-                        "labels": list(dist_manual.keys()),
-                        "data": list(dist_manual.values()),
-                    },
-                    "resultados_ia": {
-                        "labels": list(dist_ia.keys()),
-                        "data": list(dist_ia.values()),
-                    },
-                    "performance_prompts": {
-                        "labels": list(performance_prompts.keys()),
-                        "acuracia": [v["acuracia"] for v in performance_prompts.values()],
-                        "usos": [v["total"] for v in performance_prompts.values()],
-                    },
+        # Últimos 6 meses com análise, do mais antigo para o mais recente
+        acuracia_labels: List[str] = []
+        acuracia_data: List[float] = []
+        for mes_iso in sorted(por_mes, reverse=True)[:6][::-1]:
+            if not mes_iso:
+                continue
+            y, m = mes_iso.split("-")
+            total_mes, ac_mes = por_mes[mes_iso]
+            acuracia_labels.append(f"{m}/{y}")
+            acuracia_data.append(round((ac_mes / total_mes) * 100, 1) if total_mes > 0 else 0)
+
+        return {
+            "total_analises": total_analises,
+            "acertos": acertos,
+            "tempo_total": tempo_total,
+            "custo_total": custo_total,
+            "analises_hoje": analises_hoje,
+            "distribuicao_manual": dist_manual,
+            "distribuicao_ia": dist_ia,
+            "performance_prompts": performance_prompts,
+            "dados_graficos": {
+                "acuracia_periodo": {"labels": acuracia_labels, "data": acuracia_data},
+                "classificacoes_manuais": {
+                    "labels": list(dist_manual.keys()),
+                    "data": list(dist_manual.values()),
                 },
-            }
+                "resultados_ia": {
+                    "labels": list(dist_ia.keys()),
+                    "data": list(dist_ia.values()),
+                },
+                "performance_prompts": {
+                    "labels": list(performance_prompts.keys()),
+                    "acuracia": [v["acuracia"] for v in performance_prompts.values()],
+                    "usos": [v["total"] for v in performance_prompts.values()],
+                },
+            },
+        }
 
     def get_analise_prompt_resposta_completa_por_id(
         self,
@@ -1419,6 +2033,7 @@ class SQLiteService:
                     )
             return result
 
+    @_invalida_cache_consultas
     def save_analise(self, analise: Dict[str, Any]) -> str:
         """Salvar uma análise"""
         with self.get_connection() as conn:
@@ -1436,8 +2051,8 @@ class SQLiteService:
                 (id, intimacao_id, prompt_id, prompt_nome, data_analise, resultado_ia,
                  acertou, tempo_processamento, modelo, temperatura, tokens_usados,
                  tokens_input, tokens_output, custo_real, prompt_completo, resposta_completa, session_id,
-                 modo_avaliacao, tipo_alvo_focado)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 modo_avaliacao, tipo_alvo_focado, provider)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 analise['id'],
                 analise.get('intimacao_id', ''),
@@ -1458,10 +2073,12 @@ class SQLiteService:
                 analise.get('session_id', None),
                 analise.get('modo_avaliacao', 'padrao'),
                 analise.get('tipo_alvo_focado'),
+                analise.get('provider'),
             ))
             conn.commit()
             return analise['id']
     
+    @_invalida_cache_consultas
     def delete_analise(self, analise_id: str) -> bool:
         """Deletar uma análise"""
         with self.get_connection() as conn:
@@ -1509,19 +2126,19 @@ class SQLiteService:
                 conn.commit()
     
     # Métodos de estatísticas
+    @_em_cache_por_geracao
     def get_statistics(self) -> Dict[str, Any]:
         """Obter estatísticas gerais"""
         with self.get_connection() as conn:
             # Contar registros
             intimacoes_count = conn.execute('SELECT COUNT(*) FROM intimacoes').fetchone()[0]
             prompts_count = conn.execute('SELECT COUNT(*) FROM prompts').fetchone()[0]
-            analises_count = conn.execute('SELECT COUNT(*) FROM analises').fetchone()[0]
-            
-            # Calcular acurácia geral
-            cursor = conn.execute('SELECT AVG(CASE WHEN acertou THEN 1.0 ELSE 0.0 END) FROM analises')
-            acuracia_geral = cursor.fetchone()[0] or 0.0
+            # Análises e acurácia geral pelos fatos diários (sem varrer analises)
+            analises_count, acertos = conn.execute(
+                'SELECT COALESCE(SUM(total), 0), COALESCE(SUM(acertos), 0) FROM fatos_diarios'
+            ).fetchone()
             
-            acuracia_pct = acuracia_geral * 100
+            acuracia_pct = (acertos / analises_count * 100) if analises_count else 0.0
             return {
                 'total_intimacoes': intimacoes_count,
                 'total_prompts': prompts_count,
@@ -1530,6 +2147,7 @@ class SQLiteService:
                 'taxa_acuracia_geral': acuracia_pct,
             }
 
+    @_em_cache_por_geracao
     def get_dashboard_resumo_graficos(self) -> Dict[str, Any]:
         """
         Agregações só com SQL para o dashboard — evita carregar todas as intimações (contexto)
@@ -1555,7 +2173,7 @@ class SQLiteService:
             for row in cur.fetchall():
                 distribuicao[row['cls']] = row['cnt']
 
-            total_analises = conn.execute('SELECT COUNT(*) AS c FROM analises').fetchone()['c']
+            total_analises = conn.execute('SELECT COALESCE(SUM(total), 0) AS c FROM fatos_diarios').fetchone()['c']
             pendente = conn.execute(
                 '''
                 SELECT COUNT(*) AS c FROM intimacoes i
@@ -1575,28 +2193,24 @@ class SQLiteService:
             }
 
     # Métodos de configuração (mantém compatibilidade)
+    @property
+    def armazenamento_config(self) -> ArmazenamentoConfigJson:
+        """config.json ao lado do banco, em cache compartilhado no processo"""
+        return obter_armazenamento_config(os.path.join(os.path.dirname(self.db_path), 'config.json'))
+    
     def get_config(self) -> Dict[str, Any]:
-        """Obter configurações (ainda usa JSON por simplicidade)"""
-        config_file = os.path.join(os.path.dirname(self.db_path), 'config.json')
-        try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                
-            # Substituir variáveis de ambiente
-            if config and 'openai_api_key' in config:
-                api_key = config['openai_api_key']
-                if api_key.startswith('${') and api_key.endswith('}'):
-                    env_var = api_key[2:-1]
-                    config['openai_api_key'] = os.environ.get(env_var, '')
-            
-            return config
-        except:
-            return {}
+        """Obter configurações (ainda usa JSON por simplicidade; relido só quando o arquivo muda)"""
+        config = self.armazenamento_config.ler()
+        
+        # Substituir variáveis de ambiente
+        api_key = config.get('openai_api_key')
+        if isinstance(api_key, str) and api_key.startswith('${') and api_key.endswith('}'):
+            config['openai_api_key'] = os.environ.get(api_key[2:-1], '')
+        
+        return config
     
     def save_config(self, config: Dict[str, Any]):
-        """Salvar configurações (ainda usa JSON por simplicidade)"""
-        config_file = os.path.join(os.path.dirname(self.db_path), 'config.json')
-        
+        """Salvar configurações (gravação atômica; observadores avisados se algo mudou)"""
         # Proteger contra salvamento da chave da API
         if 'openai_api_key' in config:
             api_key = config['openai_api_key']
@@ -1605,8 +2219,7 @@ class SQLiteService:
             elif not (api_key.startswith('${') and api_key.endswith('}')):
                 config['openai_api_key'] = '${OPENAI_API_KEY}'
         
-        with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        self.armazenamento_config.gravar(config)
     
     # Métodos para Sessões de Análise
     def get_sessoes_analise(self, limit: int = 50, offset: int = 0,
@@ -1846,6 +2459,7 @@ class SQLiteService:
             conn.commit()
             return defensor
 
+    @_invalida_cache_consultas
     def atualizar_defensor(self, defensor_id: str, nome: str) -> Dict[str, Any]:
         """Atualiza o nome de um defensor e propaga para intimações"""
         nome_limpo = (nome or '').strip()
@@ -2608,21 +3222,22 @@ class SQLiteService:
                 analises.append(analise)
             return analises
     
+    @_invalida_cache_consultas
     def criar_sessao_analise(self, session_id: str, prompt_id: str, prompt_nome: str, 
                            modelo: str, temperatura: float, max_tokens: int, 
                            timeout: int, total_intimacoes: int, configuracoes: Dict[str, Any] = None) -> bool:
         """Criar uma nova sessão de análise"""
         try:
-            print(f"=== DEBUG: criar_sessao_analise chamada ===")
-            print(f"=== DEBUG: session_id: {session_id} (tipo: {type(session_id)}) ===")
-            print(f"=== DEBUG: prompt_id: {prompt_id} (tipo: {type(prompt_id)}) ===")
-            print(f"=== DEBUG: prompt_nome: {prompt_nome} (tipo: {type(prompt_nome)}) ===")
-            print(f"=== DEBUG: modelo: {modelo} (tipo: {type(modelo)}) ===")
-            print(f"=== DEBUG: temperatura: {temperatura} (tipo: {type(temperatura)}) ===")
-            print(f"=== DEBUG: max_tokens: {max_tokens} (tipo: {type(max_tokens)}) ===")
-            print(f"=== DEBUG: timeout: {timeout} (tipo: {type(timeout)}) ===")
-            print(f"=== DEBUG: total_intimacoes: {total_intimacoes} (tipo: {type(total_intimacoes)}) ===")
-            print(f"=== DEBUG: configuracoes: {configuracoes} (tipo: {type(configuracoes)}) ===")
+            logger.debug('criar_sessao_analise chamada')
+            logger.debug('session_id: %s (tipo: %s)', session_id, type(session_id))
+            logger.debug('prompt_id: %s (tipo: %s)', prompt_id, type(prompt_id))
+            logger.debug('prompt_nome: %s (tipo: %s)', prompt_nome, type(prompt_nome))
+            logger.debug('modelo: %s (tipo: %s)', modelo, type(modelo))
+            logger.debug('temperatura: %s (tipo: %s)', temperatura, type(temperatura))
+            logger.debug('max_tokens: %s (tipo: %s)', max_tokens, type(max_tokens))
+            logger.debug('timeout: %s (tipo: %s)', timeout, type(timeout))
+            logger.debug('total_intimacoes: %s (tipo: %s)', total_intimacoes, type(total_intimacoes))
+            logger.debug('configuracoes: %s (tipo: %s)', configuracoes, type(configuracoes))
             
             with self.get_connection() as conn:
                 conn.execute('''
@@ -2650,6 +3265,7 @@ class SQLiteService:
             print(f"Erro ao criar sessão: {e}")
             return False
     
+    @_invalida_cache_consultas
     def atualizar_sessao_analise(self, session_id: str, **kwargs) -> bool:
         """Atualizar dados de uma sessão de análise"""
         try:
@@ -2677,6 +3293,7 @@ class SQLiteService:
             print(f"Erro ao atualizar sessão: {e}")
             return False
     
+    @_invalida_cache_consultas
     def excluir_sessao_analise(self, session_id: str) -> bool:
         """Excluir uma sessão de análise e suas análises associadas"""
         try:
@@ -2686,6 +3303,7 @@ class SQLiteService:
                 
                 # Excluir a sessão
                 conn.execute('DELETE FROM sessoes_analise WHERE session_id = ?', (session_id,))
+                conn.execute('DELETE FROM eventos_progresso_analise WHERE session_id = ?', (session_id,))
                 
                 conn.commit()
                 return True
@@ -2693,6 +3311,35 @@ class SQLiteService:
             print(f"Erro ao excluir sessão: {e}")
             return False
     
+    def registrar_evento_progresso_analise(self, session_id: str, tipo: str, dados: Dict[str, Any]) -> int:
+        """Grava um evento de progresso da sessão; retorna o id (sequencial, usado no SSE)."""
+        with self.get_connection() as conn:
+            cur = conn.execute(
+                'INSERT INTO eventos_progresso_analise (session_id, tipo, dados, criado_em) VALUES (?, ?, ?, ?)',
+                (session_id, tipo, json.dumps(dados, ensure_ascii=False, default=str), datetime.now().isoformat()),
+            )
+            conn.commit()
+            return cur.lastrowid
+    
+    def listar_eventos_progresso_analise(self, session_id: str, apos_id: int = 0,
+                                         limite: int = 500) -> List[Dict[str, Any]]:
+        """Eventos da sessão com id > apos_id, em ordem: [{'id', 'tipo', 'dados'}]."""
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                'SELECT id, tipo, dados FROM eventos_progresso_analise '
+                'WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?',
+                (session_id, apos_id, limite),
+            ).fetchall()
+        return [{'id': r['id'], 'tipo': r['tipo'], 'dados': json.loads(r['dados'])} for r in rows]
+    
+    def limpar_eventos_progresso_analise(self, anteriores_a: str) -> int:
+        """Remove eventos criados antes da data ISO informada; retorna quantos saíram."""
+        with self.get_connection() as conn:
+            cur = conn.execute('DELETE FROM eventos_progresso_analise WHERE criado_em < ?', (anteriores_a,))
+            conn.commit()
+            return cur.rowcount
+    
+    @_invalida_cache_consultas
     def finalizar_sessao_analise(self, session_id: str, estatisticas: Dict[str, Any]) -> bool:
         """Finalizar uma sessão de análise com estatísticas"""
         try:
@@ -2794,6 +3441,141 @@ class SQLiteService:
             print(f"Erro ao calcular custo: {e}")
             return 0.0
 
+    _COLUNAS_LANCAMENTO_CUSTO = (
+        'session_id', 'provider', 'modelo', 'versao_precos', 'preco_input', 'preco_output',
+        'quantidade_analises', 'tokens_input', 'tokens_output', 'custo', 'origem', 'data_registro',
+    )
+
+    def get_media_tokens_saida_prompt_modelo(self, prompt_id: str, modelo: str) -> Optional[float]:
+        """Média de tokens_output das análises gravadas do prompt com o modelo (None sem histórico)."""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                '''
+                SELECT AVG(tokens_output) AS media FROM analises
+                WHERE prompt_id = ? AND modelo = ? AND tokens_output > 0
+                ''',
+                (prompt_id, modelo),
+            ).fetchone()
+        return float(row['media']) if row and row['media'] is not None else None
+
+    def registrar_lancamentos_custos(self, lancamentos: List[Dict[str, Any]]) -> int:
+        """Insere lançamentos no ledger `custos` (nunca atualiza); retorna quantos foram gravados."""
+        colunas = self._COLUNAS_LANCAMENTO_CUSTO
+        agora = datetime.now().isoformat()
+        linhas = [
+            tuple(l.get(c) if c != 'data_registro' else (l.get(c) or agora) for c in colunas)
+            for l in lancamentos
+        ]
+        if not linhas:
+            return 0
+        with self.get_connection() as conn:
+            conn.executemany(
+                f"INSERT INTO custos ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+                linhas,
+            )
+            conn.commit()
+        return len(linhas)
+
+    def obter_custos_consolidados(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Lançamento vigente (o mais recente) de cada sessão/provedor/modelo do ledger `custos`."""
+        filtro = 'WHERE session_id = ?' if session_id else ''
+        parametros = (session_id,) if session_id else ()
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT c.* FROM custos c
+                JOIN (
+                    SELECT MAX(id) AS id FROM custos {filtro}
+                    GROUP BY session_id, provider, modelo
+                ) vigentes ON vigentes.id = c.id
+                ORDER BY c.session_id, c.provider, c.modelo
+            ''', parametros).fetchall()
+            return [dict(r) for r in rows]
+
+    @_invalida_cache_consultas
+    def reprecificar_custos_historico(self, tabela_precos: List[Tuple[str, str, float, float]],
+                                      versao_precos: str, provider_padrao: str = 'openai') -> Dict[str, Any]:
+        """
+        Reprecifica o histórico inteiro em uma transação, sem laço por linha.
+
+        Args:
+            tabela_precos: (provider, modelo, preço input, preço output) por 1M tokens
+            versao_precos: Identificador da tabela (gravado nos lançamentos)
+            provider_padrao: Provedor das análises antigas gravadas sem provider
+
+        Atualiza analises.custo_real (modelos sem preço ficam como estão), custo_total de sessões e
+        prompts e acrescenta ao ledger um lançamento 'reprecificacao' por sessão/provedor/modelo.
+        """
+        agora = datetime.now().isoformat()
+        with self.get_connection() as conn:
+            conn.execute('DROP TABLE IF EXISTS temp.precos_vigentes')
+            conn.execute('''
+                CREATE TEMP TABLE precos_vigentes (
+                    provider TEXT NOT NULL,
+                    modelo TEXT NOT NULL,
+                    preco_input REAL NOT NULL,
+                    preco_output REAL NOT NULL,
+                    PRIMARY KEY (provider, modelo)
+                )
+            ''')
+            conn.executemany(
+                'INSERT OR REPLACE INTO precos_vigentes VALUES (?, ?, ?, ?)', tabela_precos
+            )
+            try:
+                cursor = conn.execute('''
+                    UPDATE analises
+                    SET custo_real = ROUND(
+                        (COALESCE(analises.tokens_input, 0) / 1000000.0) * p.preco_input
+                        + (COALESCE(analises.tokens_output, 0) / 1000000.0) * p.preco_output, 6)
+                    FROM precos_vigentes p
+                    WHERE p.provider = LOWER(COALESCE(analises.provider, ?))
+                      AND p.modelo = analises.modelo
+                ''', (provider_padrao,))
+                analises_reprecificadas = cursor.rowcount
+
+                conn.execute('''
+                    UPDATE sessoes_analise
+                    SET custo_total = t.custo
+                    FROM (
+                        SELECT session_id, SUM(custo_real) AS custo FROM analises
+                        WHERE session_id IS NOT NULL GROUP BY session_id
+                    ) t
+                    WHERE sessoes_analise.session_id = t.session_id
+                ''')
+                conn.execute('''
+                    UPDATE prompts
+                    SET custo_total = t.custo
+                    FROM (
+                        SELECT prompt_id, SUM(custo_real) AS custo FROM analises GROUP BY prompt_id
+                    ) t
+                    WHERE prompts.id = t.prompt_id
+                ''')
+                cursor = conn.execute('''
+                    INSERT INTO custos (
+                        session_id, provider, modelo, versao_precos, preco_input, preco_output,
+                        quantidade_analises, tokens_input, tokens_output, custo, origem, data_registro
+                    )
+                    SELECT a.session_id, p.provider, a.modelo, ?, p.preco_input, p.preco_output,
+                           COUNT(*), SUM(COALESCE(a.tokens_input, 0)), SUM(COALESCE(a.tokens_output, 0)),
+                           ROUND(SUM(a.custo_real), 6), 'reprecificacao', ?
+                    FROM analises a
+                    JOIN precos_vigentes p
+                      ON p.provider = LOWER(COALESCE(a.provider, ?)) AND p.modelo = a.modelo
+                    GROUP BY a.session_id, p.provider, a.modelo
+                ''', (versao_precos, agora, provider_padrao))
+                lancamentos = cursor.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute('DROP TABLE IF EXISTS temp.precos_vigentes')
+
+        return {
+            'versao_precos': versao_precos,
+            'analises_reprecificadas': analises_reprecificadas,
+            'lancamentos_registrados': lancamentos,
+        }
+
     def list_prompt_templates(self) -> List[Dict[str, Any]]:
         """Lista templates para a página Novo prompt (ordem, depois nome)."""
         with self.get_connection() as conn:
@@ -2870,3 +3652,22 @@ class SQLiteService:
             cur = conn.execute('DELETE FROM prompt_templates WHERE id = ?', (template_id,))
             conn.commit()
             return cur.rowcount > 0
+
+
+_instancias_compartilhadas: Dict[str, SQLiteService] = {}
+_lock_instancias_compartilhadas = threading.Lock()
+
+
+def obter_sqlite_service(db_path: Optional[str] = None) -> SQLiteService:
+    """
+    Instância do SQLiteService compartilhada no processo, uma por arquivo de banco.
+
+    O app e os serviços de provedor/exportação usam esta em vez de construir a sua: o esquema é
+    verificado uma vez e a troca de provedor não reabre o banco.
+    """
+    chave = os.path.realpath(db_path or _caminho_banco_padrao())
+    with _lock_instancias_compartilhadas:
+        servico = _instancias_compartilhadas.get(chave)
+        if servico is None:
+            servico = _instancias_compartilhadas[chave] = SQLiteService(db_path=db_path)
+        return servico
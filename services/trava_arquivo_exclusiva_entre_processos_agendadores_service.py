@@ -0,0 +1,63 @@
+"""
+Trava exclusiva entre processos por arquivo, para tarefas que só um processo deve rodar.
+
+Os agendadores de backup automático e de manutenção do banco precisam de um único dono mesmo com
+vários workers do gunicorn: cada processo tenta a trava sem esperar e só quem a obtém inicia as
+threads. A trava (flock no POSIX, msvcrt.locking no Windows) vale enquanto o arquivo ficar aberto,
+e o sistema operacional a solta quando o processo termina, inclusive se ele morrer sem liberar.
+"""
+import os
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class TravaArquivoEntreProcessos:
+    """Trava não bloqueante sobre `caminho`; o arquivo é criado se não existir e nunca é removido."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._arquivo: Optional[IO] = None
+
+    @property
+    def adquirida(self) -> bool:
+        return self._arquivo is not None
+
+    def tentar_adquirir(self) -> bool:
+        """True se a trava ficou (ou já estava) com esta instância; False se outro processo a detém."""
+        if self._arquivo is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        arquivo = open(self.caminho, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            arquivo.close()
+            return False
+        arquivo.seek(0)
+        arquivo.truncate()
+        arquivo.write(f'{os.getpid()}\n')
+        arquivo.flush()
+        self._arquivo = arquivo
+        return True
+
+    def liberar(self) -> None:
+        if self._arquivo is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+            else:
+                self._arquivo.seek(0)
+                msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._arquivo.close()
+            self._arquivo = None
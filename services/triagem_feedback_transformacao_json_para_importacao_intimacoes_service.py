@@ -4,9 +4,18 @@ Transforma JSON de feedback de triagem (content[]) para o formato de importaçã
 """
 import json
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Pattern, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Pattern, TextIO, Tuple
+
+from services.leitura_incremental_itens_array_content_json_grande_service import (
+    TAMANHO_BLOCO_LEITURA_PADRAO,
+    iterar_itens_content,
+)
 
 
 SYSTEM_MARKER = "====== [INICIO: SYSTEM] ======"
@@ -22,6 +31,15 @@ _TRIAGEM_SUCESSO_TEXT_ASSIGN_RE = re.compile(
     r"text\s*=\s*['\"]Triagem IA executada com sucesso para intimação",
     re.IGNORECASE,
 )
+# Mesma atribuição a partir do "=" (literal sem caixa: a busca salta direto para cada "=")
+_TRIAGEM_SUCESSO_ATRIBUICAO_RE = re.compile(
+    r"=\s*['\"]Triagem IA executada com sucesso para intimação",
+    re.IGNORECASE,
+)
+
+# Modo paralelo do run_batch: arquivos a partir deste tamanho têm os itens divididos entre os workers
+LIMIAR_ARQUIVO_GRANDE_PARALELO_BYTES = 64 * 1024 * 1024
+ITENS_POR_TAREFA_PARALELO = 200
 
 # Layout do export: texto em triagem.prompt vs campos estruturados em triagem (export novo)
 LAYOUT_FEEDBACK_LEGACY = "legacy"
@@ -107,14 +125,26 @@ def extract_after_ai(prompt: Optional[str]) -> Optional[str]:
     return result if result else None
 
 
+def _inicio_atribuicao_text_triagem_sucesso(text: str) -> Optional[int]:
+    """Posição de _TRIAGEM_SUCESSO_TEXT_ASSIGN_RE.search(text), localizando antes cada "=" candidato."""
+    for m in _TRIAGEM_SUCESSO_ATRIBUICAO_RE.finditer(text):
+        # "text" precede o "=" separado só por espaços: recua sobre eles e confere a partir dali
+        fim_nome = m.start()
+        while fim_nome > 0 and text[fim_nome - 1].isspace():
+            fim_nome -= 1
+        if fim_nome >= 4 and _TRIAGEM_SUCESSO_TEXT_ASSIGN_RE.match(text, fim_nome - 4):
+            return fim_nome - 4
+    return None
+
+
 def _cut_prompt_antes_sentinela_triagem_sucesso(text: str) -> str:
     """Remove tudo a partir da frase de sucesso da triagem ou de text='…' com essa frase."""
     if not text:
         return text
     cortes: List[int] = []
-    m = _TRIAGEM_SUCESSO_TEXT_ASSIGN_RE.search(text)
-    if m is not None:
-        cortes.append(m.start())
+    inicio = _inicio_atribuicao_text_triagem_sucesso(text)
+    if inicio is not None:
+        cortes.append(inicio)
     idx = text.find(CONTEXTO_INTIMACAO_FIM_SENTINEL)
     if idx != -1:
         cortes.append(idx)
@@ -192,47 +222,75 @@ def extrair_somente_regras_usuario_markdown(texto: Optional[str]) -> Optional[st
     return r
 
 
+# Fim do valor de um campo "**Rótulo**: valor" no markdown do prompt
+_FIM_VALOR_CAMPO_REGEX = r"(?=\s+-\s+\*\*|\s+##\s+|\s+###\s+|\Z)"
+
+
+@lru_cache(maxsize=None)
+def _padrao_campo(field_name: str) -> Pattern[str]:
+    return re.compile(
+        rf"\*\*\s*{re.escape(field_name)}\s*\*\*\s*:\s*(.*?){_FIM_VALOR_CAMPO_REGEX}",
+        re.IGNORECASE,
+    )
+
+
 def extract_field(prompt: Optional[str], field_names: List[str]) -> Optional[str]:
     if not isinstance(prompt, str):
         return None
 
     for field_name in field_names:
-        pattern = (
-            rf"\*\*\s*{re.escape(field_name)}\s*\*\*\s*:\s*(.*?)"
-            rf"(?=\s+-\s+\*\*|\s+##\s+|\s+###\s+|\Z)"
-        )
-        match = re.search(pattern, prompt, flags=re.IGNORECASE)
+        match = _padrao_campo(field_name).search(prompt)
         if match:
             return normalize_spaces(match.group(1))
     return None
 
 
 # Rótulos no prompt: **Intimados**, **Intimados da intimação**, opcionalmente com "- " antes do negrito
-_INTIMADOS_LABEL_REGEX = (
-    r"(?:-\s*)?"
-    r"\*\*\s*Intimados(?:\s+da\s+intimação)?\s*\*\*"
-    r"\s*:\s*"
+_INTIMADOS_NEGRITO_REGEX = r"\*\*\s*Intimados(?:\s+da\s+intimação)?\s*\*\*\s*:\s*"
+_INTIMADOS_LABEL_REGEX = r"(?:-\s*)?" + _INTIMADOS_NEGRITO_REGEX
+# O "- " opcional antes do negrito não altera o bloco capturado; sem ele a busca parte do literal "**"
+_INTIMADOS_BLOCO_RE = re.compile(
+    _INTIMADOS_NEGRITO_REGEX + r"(.*?)" + _FIM_VALOR_CAMPO_REGEX,
+    re.IGNORECASE | re.DOTALL,
 )
+_INTIMADOS_ITEM_LISTA_RE = re.compile(r"-\s*(.+)")
+_INTIMADOS_FIELD_NAMES = ["Intimados da intimação", "Intimados"]
+
+
+def _nomes_intimados_do_bloco(block: str) -> Optional[str]:
+    nomes = [normalize_spaces(m.group(1)) for m in _INTIMADOS_ITEM_LISTA_RE.finditer(block)]
+    nomes_validos = [nome for nome in nomes if nome]
+    return "; ".join(nomes_validos) if nomes_validos else None
 
 
 def extract_intimados(prompt: Optional[str]) -> Optional[str]:
     if not isinstance(prompt, str):
         return None
 
-    block_match = re.search(
-        _INTIMADOS_LABEL_REGEX + r"(.*?)(?=\s+-\s+\*\*|\s+##\s+|\s+###\s+|\Z)",
-        prompt,
-        flags=re.IGNORECASE | re.DOTALL,
-    )
-    if not block_match:
-        return extract_field(prompt, ["Intimados da intimação", "Intimados"])
-
-    block = block_match.group(1)
-    nomes = [normalize_spaces(m.group(1)) for m in re.finditer(r"-\s*(.+)", block)]
-    nomes_validos = [nome for nome in nomes if nome]
-    if not nomes_validos:
-        return extract_field(prompt, ["Intimados da intimação", "Intimados"])
-    return "; ".join(nomes_validos)
+    block_match = _INTIMADOS_BLOCO_RE.search(prompt)
+    if block_match:
+        nomes = _nomes_intimados_do_bloco(block_match.group(1))
+        if nomes:
+            return nomes
+    return extract_field(prompt, _INTIMADOS_FIELD_NAMES)
+
+
+# Todas as variantes começam pela mesma frase: sem ela no prompt, nenhuma precisa ser tentada
+_DEFENSOR_FRASE_RE = re.compile(r"Você está realizando a triagem para", re.IGNORECASE)
+_DEFENSOR_CANDIDATOS_RE: Tuple[Pattern[str], ...] = (
+    re.compile(
+        r"Você está realizando a triagem para o defensor\s*\(a\)\s*:\s*\*\*(.+?)\*\*",
+        re.IGNORECASE | re.DOTALL,
+    ),
+    re.compile(
+        r"Você está realizando a triagem para o defensor\s*\(a\)\s*:\s*([^\n]+?)\s*(?=\n|\Z)",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"Você está realizando a triagem para:\s*\*\*(.+?)\*\*",
+        re.IGNORECASE | re.DOTALL,
+    ),
+)
 
 
 def extract_defensor_name(prompt: Optional[str]) -> Optional[str]:
@@ -246,22 +304,11 @@ def extract_defensor_name(prompt: Optional[str]) -> Optional[str]:
     if not isinstance(prompt, str):
         return None
 
-    candidatos: List[Tuple[str, int]] = [
-        (
-            r"Você está realizando a triagem para o defensor\s*\(a\)\s*:\s*\*\*(.+?)\*\*",
-            re.IGNORECASE | re.DOTALL,
-        ),
-        (
-            r"Você está realizando a triagem para o defensor\s*\(a\)\s*:\s*([^\n]+?)\s*(?=\n|\Z)",
-            re.IGNORECASE,
-        ),
-        (
-            r"Você está realizando a triagem para:\s*\*\*(.+?)\*\*",
-            re.IGNORECASE | re.DOTALL,
-        ),
-    ]
-    for pattern, flags in candidatos:
-        match = re.search(pattern, prompt, flags=flags)
+    frase = _DEFENSOR_FRASE_RE.search(prompt)
+    if frase is None:
+        return None
+    for pattern in _DEFENSOR_CANDIDATOS_RE:
+        match = pattern.search(prompt, frase.start())
         if match:
             val = normalize_spaces(match.group(1))
             if val:
@@ -269,6 +316,72 @@ def extract_defensor_name(prompt: Optional[str]) -> Optional[str]:
     return None
 
 
+# Campos do markdown lidos por transform_item: chave do resultado -> rótulos em ordem de prioridade
+CAMPOS_MARKDOWN_PROMPT: Dict[str, Tuple[str, ...]] = {
+    "processo": ("Processo",),
+    "orgao_julgador": ("Órgão Julgador", "Orgao Julgador"),
+    "classe": ("Classe", "Classe Processual"),
+    "prazo": ("Dias", "Prazo"),
+}
+_ROTULOS_MARKDOWN_PROMPT: Tuple[str, ...] = tuple(
+    dict.fromkeys(
+        [r for rotulos in CAMPOS_MARKDOWN_PROMPT.values() for r in rotulos] + _INTIMADOS_FIELD_NAMES
+    )
+)
+# Fechamento de rótulo em negrito ("**" seguido de ":"); a abertura é o "**" anterior a ele
+_FECHAMENTO_ROTULO_NEGRITO_RE = re.compile(r"\*\*\s*:")
+for _rotulo in _ROTULOS_MARKDOWN_PROMPT:
+    _padrao_campo(_rotulo)
+
+
+def extrair_campos_prompt(prompt: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Extrai de uma vez os campos do markdown do prompt (processo, órgão julgador, classe, prazo,
+    intimado e nome do defensor), com o mesmo resultado de extract_field / extract_intimados /
+    extract_defensor_name chamados campo a campo.
+
+    O prompt é percorrido uma vez atrás de "**rótulo**:"; os padrões de cada campo (pré-compilados)
+    só são testados (ancorados) nessas posições, em vez de cada campo varrer o texto inteiro.
+    """
+    campos: Dict[str, Optional[str]] = dict.fromkeys(
+        list(CAMPOS_MARKDOWN_PROMPT) + ["intimado", "nome_defensor"]
+    )
+    if not isinstance(prompt, str):
+        return campos
+
+    # Primeiro casamento (na ordem do texto) de cada rótulo, como faria um search por rótulo
+    valores: Dict[str, str] = {}
+    bloco_intimados: Optional[str] = None
+    for fechamento in _FECHAMENTO_ROTULO_NEGRITO_RE.finditer(prompt):
+        # Rótulos não têm "*": o negrito abre logo antes do último "*" anterior ao fechamento
+        ultimo_asterisco = prompt.rfind("*", 0, fechamento.start())
+        if ultimo_asterisco < 1 or ultimo_asterisco == fechamento.start() - 1:
+            continue
+        inicio = ultimo_asterisco - 1
+        for rotulo in _ROTULOS_MARKDOWN_PROMPT:
+            if rotulo not in valores:
+                m = _padrao_campo(rotulo).match(prompt, inicio)
+                if m:
+                    valores[rotulo] = m.group(1)
+        if bloco_intimados is None:
+            m = _INTIMADOS_BLOCO_RE.match(prompt, inicio)
+            if m:
+                bloco_intimados = m.group(1)
+
+    def _primeiro(rotulos) -> Optional[str]:
+        for rotulo in rotulos:
+            if rotulo in valores:
+                return normalize_spaces(valores[rotulo])
+        return None
+
+    for chave, rotulos in CAMPOS_MARKDOWN_PROMPT.items():
+        campos[chave] = _primeiro(rotulos)
+    intimado = _nomes_intimados_do_bloco(bloco_intimados) if bloco_intimados is not None else None
+    campos["intimado"] = intimado or _primeiro(_INTIMADOS_FIELD_NAMES)
+    campos["nome_defensor"] = extract_defensor_name(prompt)
+    return campos
+
+
 def map_cor_etiqueta(sucesso: Any) -> Optional[str]:
     if sucesso is True:
         return "verde"
@@ -310,6 +423,17 @@ def _decode_json_string_escapes(s: str) -> str:
         return s.replace("\\n", "\n").replace('\\"', '"').replace("\\\\", "\\")
 
 
+@lru_cache(maxsize=None)
+def _padroes_json_string_field(key: str) -> Tuple[Pattern[str], Pattern[str]]:
+    return (
+        re.compile(rf'"{re.escape(key)}"\s*:\s*"((?:[^"\\]|\\.)*)"', re.DOTALL),
+        re.compile(
+            rf'\\"{re.escape(key)}\\"\s*:\s*\\"((?:[^\\]|\\.)*?)\\"(?=\s*[,}}])',
+            re.DOTALL,
+        ),
+    )
+
+
 def _extract_json_string_field_from_prompt(prompt: Optional[str], key: str) -> Optional[str]:
     """
     Localiza "key":"valor" ou \\"key\\":\\"valor\\" no texto do prompt
@@ -318,15 +442,10 @@ def _extract_json_string_field_from_prompt(prompt: Optional[str], key: str) -> O
     if not isinstance(prompt, str) or not str(key).strip():
         return None
 
-    p1 = rf'"{re.escape(key)}"\s*:\s*"((?:[^"\\]|\\.)*)"'
-    m1 = re.search(p1, prompt, flags=re.DOTALL)
-    if m1:
-        return _decode_json_string_escapes(m1.group(1))
-
-    p2 = rf'\\"{re.escape(key)}\\"\s*:\s*\\"((?:[^\\]|\\.)*?)\\"(?=\s*[,}}])'
-    m2 = re.search(p2, prompt, flags=re.DOTALL)
-    if m2:
-        return _decode_json_string_escapes(m2.group(1))
+    for pattern in _padroes_json_string_field(key):
+        m = pattern.search(prompt)
+        if m:
+            return _decode_json_string_escapes(m.group(1))
 
     return None
 
@@ -393,6 +512,16 @@ def transform_item(
     if layout == LAYOUT_FEEDBACK_POS_2026_03_25:
         p_win = prompt_window_pos_2026_03_25(prompt)
 
+    # Campos do markdown do prompt: uma varredura só, e apenas se algum campo precisar dela
+    campos_prompt: Dict[str, Optional[str]] = {}
+
+    def _campo_prompt(chave: str) -> Optional[str]:
+        if not campos_prompt:
+            campos_prompt.update(
+                extrair_campos_prompt(p_win if layout == LAYOUT_FEEDBACK_POS_2026_03_25 else prompt)
+            )
+        return campos_prompt[chave]
+
     if layout == LAYOUT_FEEDBACK_POS_2026_03_25:
         processo = _triagem_primeiro_texto(
             triagem,
@@ -402,7 +531,7 @@ def transform_item(
             s = str(triagem.get("numeroProcesso")).strip()
             processo = s if s else None
         if not processo:
-            processo = extract_field(p_win, ["Processo"])
+            processo = _campo_prompt("processo")
 
         orgao_julgador = _triagem_primeiro_texto(
             triagem,
@@ -416,22 +545,22 @@ def transform_item(
                 "vara",
                 "nomeVara",
             ],
-        ) or extract_field(p_win, ["Órgão Julgador", "Orgao Julgador"])
+        ) or _campo_prompt("orgao_julgador")
 
         classe = _triagem_primeiro_texto(
             triagem,
             ["classe", "classeProcessual", "classe_processual", "tipoClasse", "classeNome"],
-        ) or extract_field(p_win, ["Classe", "Classe Processual"])
+        ) or _campo_prompt("classe")
 
         intimado = _triagem_primeiro_texto(
             triagem,
             ["intimado", "intimados", "nomeIntimado", "nomesIntimados", "partes", "assistidos"],
-        ) or extract_intimados(p_win)
+        ) or _campo_prompt("intimado")
 
         prazo = _triagem_primeiro_texto(
             triagem,
             ["prazo", "dias", "diasPrazo", "dias_prazo", "prazoDias", "numeroDias"],
-        ) or extract_field(p_win, ["Dias", "Prazo"])
+        ) or _campo_prompt("prazo")
 
         nome_defensor = _triagem_primeiro_texto(
             triagem,
@@ -443,7 +572,7 @@ def transform_item(
                 "matriculaDefensor",
                 "matrículaDefensor",
             ],
-        ) or extract_defensor_name(p_win)
+        ) or _campo_prompt("nome_defensor")
 
         contexto = _triagem_primeiro_texto(
             triagem,
@@ -463,12 +592,12 @@ def transform_item(
             processo = str(processo).strip() or None
         elif isinstance(processo, str):
             processo = processo.strip() or None
-        processo = processo or extract_field(prompt, ["Processo"])
-        orgao_julgador = extract_field(prompt, ["Órgão Julgador", "Orgao Julgador"])
-        classe = extract_field(prompt, ["Classe", "Classe Processual"])
-        intimado = extract_intimados(prompt)
-        prazo = extract_field(prompt, ["Dias", "Prazo"])
-        nome_defensor = extract_defensor_name(prompt)
+        processo = processo or _campo_prompt("processo")
+        orgao_julgador = _campo_prompt("orgao_julgador")
+        classe = _campo_prompt("classe")
+        intimado = _campo_prompt("intimado")
+        prazo = _campo_prompt("prazo")
+        nome_defensor = _campo_prompt("nome_defensor")
         contexto = extract_after_ai(prompt)
 
     if sucesso is True:
@@ -512,6 +641,7 @@ def transform_item(
 
     classificacao_manual = _substituir_analisar_por_analisar_processo(classificacao_manual)
 
+    contexto_antes_regras = contexto
     contexto, regras_md_ctx = extrair_regras_usuario_markdown_e_sanitizar_contexto(contexto)
     regras_usuario_prioridade_alta = _triagem_primeiro_texto(
         triagem,
@@ -522,9 +652,12 @@ def transform_item(
             "regras_do_usuario_prioridade_alta",
         ],
     ) or regras_md_ctx
-    if regras_usuario_prioridade_alta is None:
-        if layout == LAYOUT_FEEDBACK_POS_2026_03_25 and p_win:
-            regras_usuario_prioridade_alta = extrair_somente_regras_usuario_markdown(p_win)
+    # No legado o contexto já é extract_after_ai(prompt), examinado acima; no layout novo só
+    # vale procurar de novo se o contexto veio de campo estruturado (e não da própria janela)
+    if regras_usuario_prioridade_alta is None and layout == LAYOUT_FEEDBACK_POS_2026_03_25:
+        if p_win:
+            if p_win is not contexto_antes_regras:
+                regras_usuario_prioridade_alta = extrair_somente_regras_usuario_markdown(p_win)
         elif isinstance(prompt, str) and prompt.strip():
             regras_usuario_prioridade_alta = extrair_somente_regras_usuario_markdown(
                 extract_after_ai(prompt)
@@ -614,6 +747,41 @@ def load_json_from_path(path: Path) -> Dict[str, Any]:
     return load_json_from_text(raw_text)
 
 
+def _transformar_item_content(
+    item: Any,
+    index: int,
+    layout: str,
+) -> Tuple[Optional[Dict[str, Any]], List[ValidationIssue]]:
+    """Um item de content[] -> (registro de importação ou None se excluído, inconsistências)."""
+    if not isinstance(item, dict):
+        return None, [
+            ValidationIssue(
+                registro_index=index,
+                campo="registro",
+                mensagem="Item em 'content' não é um objeto JSON.",
+            )
+        ]
+
+    feedback = item.get("feedback") if isinstance(item.get("feedback"), dict) else {}
+    sucesso = feedback.get("sucesso")
+    if not _sucesso_feedback_definido(sucesso):
+        return None, [
+            ValidationIssue(
+                registro_index=index,
+                campo="feedback.sucesso",
+                mensagem=(
+                    "feedback.sucesso deve ser exatamente true ou false "
+                    f"(recebido: {_fmt_sucesso_para_aviso(sucesso)}). "
+                    "Registro excluído do JSON de importação."
+                ),
+                intimacao_id=_item_intimacao_id_externo(item),
+            )
+        ]
+
+    registro = transform_item(item, layout=layout)
+    return registro, validate_record(registro, index)
+
+
 def transform_content_to_import_payload(
     data: Dict[str, Any],
     origem: str,
@@ -627,36 +795,10 @@ def transform_content_to_import_payload(
     issues: List[ValidationIssue] = []
 
     for index, item in enumerate(content, start=1):
-        if not isinstance(item, dict):
-            issues.append(
-                ValidationIssue(
-                    registro_index=index,
-                    campo="registro",
-                    mensagem="Item em 'content' não é um objeto JSON.",
-                )
-            )
-            continue
-
-        feedback = item.get("feedback") if isinstance(item.get("feedback"), dict) else {}
-        sucesso = feedback.get("sucesso")
-        if not _sucesso_feedback_definido(sucesso):
-            issues.append(
-                ValidationIssue(
-                    registro_index=index,
-                    campo="feedback.sucesso",
-                    mensagem=(
-                        "feedback.sucesso deve ser exatamente true ou false "
-                        f"(recebido: {_fmt_sucesso_para_aviso(sucesso)}). "
-                        "Registro excluído do JSON de importação."
-                    ),
-                    intimacao_id=_item_intimacao_id_externo(item),
-                )
-            )
-            continue
-
-        registro = transform_item(item, layout=layout)
-        registros_transformados.append(registro)
-        issues.extend(validate_record(registro, index))
+        registro, issues_item = _transformar_item_content(item, index, layout)
+        issues.extend(issues_item)
+        if registro is not None:
+            registros_transformados.append(registro)
 
     output_payload = {
         "origem": origem,
@@ -676,6 +818,76 @@ def transform_feedback_json_text(
     return transform_content_to_import_payload(data, origem=origem, layout=layout)
 
 
+def load_item_json_feedback(texto_item: str) -> Any:
+    """Item isolado de content[]; o reparo de aspas do prompt roda só sobre o item que falhar."""
+    try:
+        return json.loads(texto_item)
+    except json.JSONDecodeError:
+        return json.loads(repair_unescaped_quotes_in_prompt(texto_item))
+
+
+def iter_feedback_stream_registros(
+    fp: TextIO,
+    layout: str = LAYOUT_FEEDBACK_LEGACY,
+    tamanho_bloco: int = TAMANHO_BLOCO_LEITURA_PADRAO,
+) -> Iterator[Tuple[int, Optional[Dict[str, Any]], List[ValidationIssue]]]:
+    """
+    Transforma o export de feedback item a item, lendo content[] incrementalmente.
+
+    Gera (índice do item, registro ou None, inconsistências do item). Um item com JSON inválido
+    mesmo após o reparo vira inconsistência e a leitura segue para o próximo.
+    """
+    for index, texto_item in iterar_itens_content(fp, tamanho_bloco=tamanho_bloco):
+        registro, issues = transform_item_texto(texto_item, index, layout)
+        yield index, registro, issues
+
+
+def transform_item_texto(
+    texto_item: str,
+    index: int,
+    layout: str = LAYOUT_FEEDBACK_LEGACY,
+) -> Tuple[Optional[Dict[str, Any]], List[ValidationIssue]]:
+    """Texto JSON de um item de content[] -> (registro ou None, inconsistências)."""
+    try:
+        item = load_item_json_feedback(texto_item)
+    except json.JSONDecodeError as exc:
+        return None, [
+            ValidationIssue(
+                registro_index=index,
+                campo="registro",
+                mensagem=f"Item em 'content' com JSON inválido (mesmo após reparo de aspas): {exc}",
+            )
+        ]
+    return _transformar_item_content(item, index, layout)
+
+
+def transform_feedback_stream_to_ndjson(
+    fp_in: TextIO,
+    fp_out: TextIO,
+    layout: str = LAYOUT_FEEDBACK_LEGACY,
+) -> Tuple[int, List[ValidationIssue]]:
+    """Grava um registro de importação por linha (NDJSON); devolve (total de registros, issues)."""
+    total = 0
+    issues: List[ValidationIssue] = []
+    for _, registro, issues_item in iter_feedback_stream_registros(fp_in, layout=layout):
+        issues.extend(issues_item)
+        if registro is not None:
+            fp_out.write(json.dumps(registro, ensure_ascii=False))
+            fp_out.write("\n")
+            total += 1
+    return total, issues
+
+
+def transform_file_ndjson(
+    input_path: Path,
+    output_path: Path,
+    layout: str = LAYOUT_FEEDBACK_LEGACY,
+) -> Tuple[int, List[ValidationIssue]]:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with input_path.open("r", encoding="utf-8-sig") as fp_in, output_path.open("w", encoding="utf-8") as fp_out:
+        return transform_feedback_stream_to_ndjson(fp_in, fp_out, layout=layout)
+
+
 def transform_file(
     input_path: Path,
     output_path: Path,
@@ -691,42 +903,170 @@ def transform_file(
     return len(output_payload["registros"]), issues
 
 
+def _transform_arquivo_para_saida(
+    input_file: Path,
+    output_dir: Path,
+    layout: str,
+    ndjson: bool,
+) -> Tuple[str, str, Optional[int], List[ValidationIssue], Optional[str]]:
+    """Transforma um arquivo; devolve (entrada, saída, registros, issues, erro) — também usado nos workers."""
+    output_file = output_dir / (input_file.with_suffix(".ndjson").name if ndjson else input_file.name)
+    try:
+        transformar = transform_file_ndjson if ndjson else transform_file
+        total_registros, issues = transformar(input_file, output_file, layout=layout)
+        return input_file.name, output_file.name, total_registros, issues, None
+    except Exception as exc:
+        return input_file.name, output_file.name, None, [], str(exc)
+
+
+def _transform_bloco_itens(
+    itens: List[Tuple[int, str]],
+    layout: str,
+) -> List[Tuple[Optional[Dict[str, Any]], List[ValidationIssue]]]:
+    """Worker: transforma um bloco de itens (texto) de um arquivo grande."""
+    return [transform_item_texto(texto, index, layout) for index, texto in itens]
+
+
+def _blocos_itens(input_path: Path, tamanho: int) -> Iterator[List[Tuple[int, str]]]:
+    with input_path.open("r", encoding="utf-8-sig") as fp:
+        bloco: List[Tuple[int, str]] = []
+        for item in iterar_itens_content(fp):
+            bloco.append(item)
+            if len(bloco) >= tamanho:
+                yield bloco
+                bloco = []
+        if bloco:
+            yield bloco
+
+
+def _resultados_blocos_em_ordem(
+    executor: ProcessPoolExecutor,
+    blocos: Iterator[List[Tuple[int, str]]],
+    layout: str,
+    max_em_voo: int,
+) -> Iterator[List[Tuple[Optional[Dict[str, Any]], List[ValidationIssue]]]]:
+    """
+    Resultados dos blocos na ordem de leitura, com no máximo max_em_voo blocos submetidos e ainda
+    não consumidos (executor.map leria o arquivo inteiro e enfileiraria todos os blocos de uma vez).
+    """
+    pendentes: deque = deque()
+    for bloco in blocos:
+        if len(pendentes) >= max_em_voo:
+            yield pendentes.popleft().result()
+        pendentes.append(executor.submit(_transform_bloco_itens, bloco, layout))
+    while pendentes:
+        yield pendentes.popleft().result()
+
+
+def _transform_arquivo_grande_paralelo(
+    executor: ProcessPoolExecutor,
+    input_file: Path,
+    output_dir: Path,
+    layout: str,
+    ndjson: bool,
+    itens_por_tarefa: int,
+    max_em_voo: int,
+) -> Tuple[str, str, Optional[int], List[ValidationIssue], Optional[str]]:
+    """
+    Itens de um arquivo grande distribuídos no pool, em blocos lidos sob demanda (até max_em_voo
+    de cada vez); os resultados saem na ordem dos blocos, então a saída é idêntica à da
+    transformação sequencial.
+    """
+    output_file = output_dir / (input_file.with_suffix(".ndjson").name if ndjson else input_file.name)
+    issues: List[ValidationIssue] = []
+    registros: List[Dict[str, Any]] = []
+    try:
+        resultados = _resultados_blocos_em_ordem(
+            executor, _blocos_itens(input_file, itens_por_tarefa), layout, max_em_voo
+        )
+        with ExitStack() as pilha:
+            fp_out = pilha.enter_context(output_file.open("w", encoding="utf-8")) if ndjson else None
+            total = 0
+            for bloco in resultados:
+                for registro, issues_item in bloco:
+                    issues.extend(issues_item)
+                    if registro is None:
+                        continue
+                    total += 1
+                    if fp_out is not None:
+                        fp_out.write(json.dumps(registro, ensure_ascii=False))
+                        fp_out.write("\n")
+                    else:
+                        registros.append(registro)
+        if not ndjson:
+            with output_file.open("w", encoding="utf-8") as f:
+                json.dump(
+                    {"origem": input_file.name, "total_registros": total, "registros": registros},
+                    f, ensure_ascii=False, indent=2,
+                )
+        return input_file.name, output_file.name, total, issues, None
+    except Exception as exc:
+        return input_file.name, output_file.name, None, [], str(exc)
+
+
 def run_batch(
     input_dir: Path,
     output_dir: Path,
     layout: str = LAYOUT_FEEDBACK_LEGACY,
+    ndjson: bool = False,
+    workers: int = 1,
+    limiar_arquivo_grande: int = LIMIAR_ARQUIVO_GRANDE_PARALELO_BYTES,
+    itens_por_tarefa: int = ITENS_POR_TAREFA_PARALELO,
 ) -> int:
+    """
+    Transforma todos os *.json de input_dir.
+
+    Com workers > 1, os arquivos são distribuídos num pool de processos; arquivos a partir de
+    limiar_arquivo_grande bytes têm os itens distribuídos no mesmo pool, em blocos de
+    itens_por_tarefa (no máximo 2 * workers blocos em voo). Saídas e relatório saem na ordem dos arquivos, iguais ao modo sequencial.
+    """
     input_files = sorted(input_dir.glob("*.json"))
     if not input_files:
         print(f"[ERRO] Nenhum arquivo .json encontrado em: {input_dir}")
         return 1
 
     output_dir.mkdir(parents=True, exist_ok=True)
-    total_issues = 0
 
     print(f"[INFO] Arquivos de entrada: {len(input_files)}")
-    for input_file in input_files:
-        output_file = output_dir / input_file.name
-        try:
-            total_registros, issues = transform_file(
-                input_file, output_file, layout=layout
-            )
-            total_issues += len(issues)
-            print(f"[OK] {input_file.name} -> {output_file.name} | registros: {total_registros}")
-
-            if issues:
-                print(f"[WARN] {input_file.name} teve {len(issues)} inconsistência(s):")
-                for issue in issues:
-                    iid = issue.intimacao_id if issue.intimacao_id else "(ausente)"
-                    print(
-                        f"  - registro #{issue.registro_index} | intimacaoId={iid} | "
-                        f"campo '{issue.campo}': {issue.mensagem}"
-                    )
-            else:
-                print(f"[INFO] {input_file.name} sem inconsistências de campos obrigatórios.")
-        except Exception as exc:
+    if workers <= 1:
+        resultados = [
+            _transform_arquivo_para_saida(f, output_dir, layout, ndjson) for f in input_files
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = {
+                f: executor.submit(_transform_arquivo_para_saida, f, output_dir, layout, ndjson)
+                for f in input_files
+                if f.stat().st_size < limiar_arquivo_grande
+            }
+            resultados = []
+            for f in input_files:
+                if f in futuros:
+                    resultados.append(futuros[f].result())
+                else:
+                    resultados.append(_transform_arquivo_grande_paralelo(
+                        executor, f, output_dir, layout, ndjson, itens_por_tarefa, 2 * workers
+                    ))
+
+    total_issues = 0
+    for nome_entrada, nome_saida, total_registros, issues, erro in resultados:
+        if erro is not None:
             total_issues += 1
-            print(f"[ERRO] Falha ao processar {input_file.name}: {exc}")
+            print(f"[ERRO] Falha ao processar {nome_entrada}: {erro}")
+            continue
+        total_issues += len(issues)
+        print(f"[OK] {nome_entrada} -> {nome_saida} | registros: {total_registros}")
+
+        if issues:
+            print(f"[WARN] {nome_entrada} teve {len(issues)} inconsistência(s):")
+            for issue in issues:
+                iid = issue.intimacao_id if issue.intimacao_id else "(ausente)"
+                print(
+                    f"  - registro #{issue.registro_index} | intimacaoId={iid} | "
+                    f"campo '{issue.campo}': {issue.mensagem}"
+                )
+        else:
+            print(f"[INFO] {nome_entrada} sem inconsistências de campos obrigatórios.")
 
     print("\n[RESUMO]")
     print(f"- Saída em: {output_dir}")
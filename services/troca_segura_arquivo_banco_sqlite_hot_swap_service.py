@@ -0,0 +1,222 @@
+"""
+Troca do arquivo do banco SQLite com o sistema no ar (upload e restauração de backup).
+
+Protocolo:
+1. o arquivo enviado é gravado ao lado do banco (mesmo sistema de arquivos) com nome temporário
+   (caminho_temporario_ao_lado);
+2. nele se verificam as tabelas obrigatórias e a integridade (PRAGMA quick_check, com eventos de
+   progresso periódicos: num arquivo de 300 MB a verificação leva segundos) e se aplicam as
+   migrações pendentes, então o banco novo já entra no esquema atual;
+3. o backup do banco atual é criado (cópia online);
+4. o portão de conexões é fechado: novas conexões esperam e as abertas terminam (com prazo);
+5. sobras do banco antigo (-journal, -wal, -shm) são removidas e os.replace põe o arquivo novo no
+   lugar; o portão reabre e as próximas conexões já abrem o banco novo.
+
+Uma escrita em andamento termina no banco antigo antes da troca; as que chegam durante a troca
+esperam no portão e são gravadas no novo. O portão é compartilhado por todas as instâncias de
+SQLiteService do mesmo arquivo (obter_portao_conexoes), mas só vale dentro do processo: com mais
+de um worker os outros processos continuariam com o arquivo antigo aberto.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+TABELAS_OBRIGATORIAS_BANCO = ('prompts', 'intimacoes', 'analises')
+SUFIXOS_ARQUIVOS_AUXILIARES_SQLITE = ('-journal', '-wal', '-shm')
+
+PRAZO_QUIESCENCIA_SEGUNDOS = 30.0
+INTERVALO_PROGRESSO_SEGUNDOS = 0.5
+INSTRUCOES_POR_CHAMADA_PROGRESSO = 10_000
+
+EmitirProgresso = Callable[[Dict[str, Any]], None]
+
+
+class BancoInvalidoError(ValueError):
+    """O arquivo enviado não é um banco utilizável (não é SQLite, faltam tabelas ou está corrompido)."""
+
+
+class TrocaBancoTimeoutError(RuntimeError):
+    """Conexões abertas não terminaram dentro do prazo; o banco atual continua em uso."""
+
+
+class PortaoConexoesBanco:
+    """
+    Trava leitores/escritor das conexões de um arquivo de banco.
+
+    Cada conexão passa por `compartilhado()`; a troca do arquivo usa `exclusivo()`, que barra novas
+    conexões e espera as abertas fecharem. Reentrante por thread: quem já tem uma conexão aberta
+    pode abrir outra sem ficar preso atrás de uma troca pendente.
+    """
+
+    def __init__(self):
+        self._condicao = threading.Condition()
+        self._ativas = 0
+        self._trocando = False
+        self._local = threading.local()
+        self.versao_arquivo = 0
+
+    @contextmanager
+    def compartilhado(self) -> Iterator[None]:
+        profundidade = getattr(self._local, 'profundidade', 0)
+        if profundidade == 0:
+            with self._condicao:
+                while self._trocando:
+                    self._condicao.wait()
+                self._ativas += 1
+        self._local.profundidade = profundidade + 1
+        try:
+            yield
+        finally:
+            self._local.profundidade = profundidade
+            if profundidade == 0:
+                with self._condicao:
+                    self._ativas -= 1
+                    self._condicao.notify_all()
+
+    @contextmanager
+    def exclusivo(self, prazo_segundos: float = PRAZO_QUIESCENCIA_SEGUNDOS) -> Iterator[None]:
+        if getattr(self._local, 'profundidade', 0):
+            raise RuntimeError('Troca do banco pedida por uma thread com conexão aberta')
+        limite = time.monotonic() + prazo_segundos
+        with self._condicao:
+            while self._trocando:
+                self._condicao.wait()
+            self._trocando = True
+            while self._ativas:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    ativas = self._ativas
+                    self._trocando = False
+                    self._condicao.notify_all()
+                    raise TrocaBancoTimeoutError(
+                        f'{ativas} conexão(ões) ainda em uso após {prazo_segundos:.0f}s; '
+                        'tente novamente quando as operações em andamento terminarem'
+                    )
+                self._condicao.wait(restante)
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self._trocando = False
+                self.versao_arquivo += 1
+                self._condicao.notify_all()
+
+
+_portoes: Dict[str, PortaoConexoesBanco] = {}
+_lock_portoes = threading.Lock()
+
+
+def obter_portao_conexoes(db_path: str) -> PortaoConexoesBanco:
+    """Portão compartilhado por todas as instâncias que abrem o mesmo arquivo."""
+    chave = os.path.realpath(db_path)
+    with _lock_portoes:
+        portao = _portoes.get(chave)
+        if portao is None:
+            portao = _portoes[chave] = PortaoConexoesBanco()
+        return portao
+
+
+def caminho_temporario_ao_lado(db_path: str, prefixo: str = '.troca-') -> str:
+    """Arquivo vazio na pasta do banco (os.replace só é atômico dentro do mesmo sistema de arquivos)."""
+    fd, caminho = tempfile.mkstemp(prefix=prefixo, suffix='.db', dir=os.path.dirname(os.path.abspath(db_path)))
+    os.close(fd)
+    return caminho
+
+
+def verificar_integridade_banco(caminho: str,
+                                emitir: Optional[EmitirProgresso] = None,
+                                intervalo_segundos: float = INTERVALO_PROGRESSO_SEGUNDOS) -> None:
+    """
+    Confere que `caminho` é um banco SQLite com as tabelas obrigatórias e roda PRAGMA quick_check,
+    emitindo {'etapa': 'verificando_integridade', ...} a cada `intervalo_segundos`.
+    Levanta BancoInvalidoError com o motivo.
+    """
+    conn = sqlite3.connect(caminho)
+    try:
+        try:
+            tabelas = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            paginas = conn.execute('PRAGMA page_count').fetchone()[0]
+        except sqlite3.DatabaseError as e:
+            raise BancoInvalidoError(f'Arquivo não é um banco SQLite válido: {e}') from e
+        ausentes = [t for t in TABELAS_OBRIGATORIAS_BANCO if t not in tabelas]
+        if ausentes:
+            raise BancoInvalidoError(f'Banco inválido. Tabelas ausentes: {", ".join(ausentes)}')
+
+        inicio = ultimo = time.monotonic()
+
+        def _progresso():
+            nonlocal ultimo
+            agora = time.monotonic()
+            if emitir is not None and agora - ultimo >= intervalo_segundos:
+                ultimo = agora
+                emitir({'etapa': 'verificando_integridade', 'paginas': paginas,
+                        'segundos': round(agora - inicio, 1)})
+            return 0
+
+        conn.set_progress_handler(_progresso, INSTRUCOES_POR_CHAMADA_PROGRESSO)
+        try:
+            problemas = [linha[0] for linha in conn.execute('PRAGMA quick_check')]
+        except sqlite3.DatabaseError as e:
+            raise BancoInvalidoError(f'Banco corrompido: {e}') from e
+        if problemas != ['ok']:
+            raise BancoInvalidoError('Banco corrompido (quick_check): ' + '; '.join(problemas[:5]))
+    finally:
+        conn.close()
+
+
+def substituir_arquivo_banco(db_path: str, caminho_novo: str) -> None:
+    """os.replace do arquivo novo sobre o banco; chame com o portão fechado (sem conexões abertas)."""
+    for sufixo in SUFIXOS_ARQUIVOS_AUXILIARES_SQLITE:
+        # journal/WAL do banco antigo seria aplicado sobre o novo na próxima abertura
+        try:
+            os.remove(db_path + sufixo)
+        except FileNotFoundError:
+            pass
+    os.replace(caminho_novo, db_path)
+
+
+def restaurar_banco_com_troca_segura(data_service,
+                                     caminho_enviado: str,
+                                     criar_backup: Optional[Callable[[], Dict[str, Any]]] = None,
+                                     emitir: Optional[EmitirProgresso] = None,
+                                     prazo_segundos: float = PRAZO_QUIESCENCIA_SEGUNDOS) -> Dict[str, Any]:
+    """
+    Substitui o banco de `data_service` pelo arquivo `caminho_enviado` seguindo o protocolo do
+    módulo. O arquivo deve estar na pasta do banco (caminho_temporario_ao_lado) e é consumido:
+    vira o banco ou é removido. Em qualquer falha o banco atual fica intacto.
+    """
+    emitir = emitir or (lambda evento: None)
+    inicio = time.perf_counter()
+    try:
+        tamanho = os.path.getsize(caminho_enviado)
+        emitir({'etapa': 'verificando_integridade', 'tamanho_bytes': tamanho})
+        verificar_integridade_banco(caminho_enviado, emitir)
+
+        emitir({'etapa': 'migrando_esquema'})
+        versao = data_service.migrar_arquivo_banco(caminho_enviado)
+
+        backup = None
+        if criar_backup is not None:
+            emitir({'etapa': 'backup_banco_atual'})
+            backup = criar_backup()
+
+        emitir({'etapa': 'trocando_arquivo'})
+        data_service.trocar_arquivo_banco(caminho_enviado, prazo_segundos)
+    finally:
+        try:
+            os.remove(caminho_enviado)
+        except FileNotFoundError:
+            pass
+
+    duracao = time.perf_counter() - inicio
+    print(f"Banco substituído sem reinício ({tamanho / 1024 / 1024:.1f} MB, esquema v{versao}, {duracao:.1f}s)")
+    return {
+        'tamanho_bytes': tamanho,
+        'versao_esquema': versao,
+        'backup': backup,
+        'duracao_segundos': round(duracao, 3),
+    }
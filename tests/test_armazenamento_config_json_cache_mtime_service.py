@@ -0,0 +1,100 @@
+"""config.json em cache por mtime: leitura única, gravação atômica e observadores de mudança."""
+
+import json
+import os
+
+import pytest
+
+from services import armazenamento_config_json_cache_mtime_service as modulo
+from services.armazenamento_config_json_cache_mtime_service import ArmazenamentoConfigJson
+from services.cost_calculation_service import CostCalculationService
+from services.sqlite_service import SQLiteService
+
+
+def _escrever(caminho, dados, mtime):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f)
+    os.utime(caminho, (mtime, mtime))
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    caminho = str(tmp_path / 'config.json')
+    _escrever(caminho, {'tema': 'light', 'max_concurrent': 2}, mtime=1_000_000)
+    return caminho
+
+
+def test_le_uma_vez_e_rele_quando_o_arquivo_muda(caminho, monkeypatch):
+    leituras = []
+    original = modulo.json.load
+    monkeypatch.setattr(modulo.json, 'load', lambda f: leituras.append(1) or original(f))
+    armazenamento = ArmazenamentoConfigJson(caminho)
+
+    for _ in range(20):
+        assert armazenamento.ler()['tema'] == 'light'
+    assert len(leituras) == 1
+
+    copia = armazenamento.ler()
+    copia['tema'] = 'alterado'
+    assert armazenamento.ler()['tema'] == 'light'
+
+    _escrever(caminho, {'tema': 'dark', 'max_concurrent': 2}, mtime=2_000_000)
+    assert armazenamento.ler()['tema'] == 'dark'
+    assert len(leituras) == 2
+
+
+def test_gravacao_atomica_e_observadores_so_com_mudanca(caminho):
+    armazenamento = ArmazenamentoConfigJson(caminho)
+    avisos = []
+    armazenamento.registrar_observador(lambda config, alteradas: avisos.append(alteradas))
+    armazenamento.ler()
+
+    armazenamento.gravar({'tema': 'light', 'max_concurrent': 2})
+    assert avisos == []
+    armazenamento.gravar({'tema': 'light', 'max_concurrent': 4, 'novo': True})
+    assert avisos == [{'max_concurrent', 'novo'}]
+    with open(caminho, encoding='utf-8') as f:
+        assert json.load(f)['max_concurrent'] == 4
+
+    with pytest.raises(TypeError):
+        armazenamento.gravar({'invalido': object()})
+    with open(caminho, encoding='utf-8') as f:
+        assert json.load(f)['max_concurrent'] == 4
+    assert os.listdir(os.path.dirname(caminho)) == ['config.json']
+
+
+def test_arquivo_ausente_ou_invalido_vira_dict_vazio(tmp_path):
+    assert ArmazenamentoConfigJson(str(tmp_path / 'nao_existe.json')).ler() == {}
+    invalido = tmp_path / 'invalido.json'
+    invalido.write_text('{ quebrado', encoding='utf-8')
+    assert ArmazenamentoConfigJson(str(invalido)).ler() == {}
+
+
+def test_sqlite_service_get_e_save_config(tmp_path, monkeypatch):
+    monkeypatch.setenv('CHAVE_TESTE_CONFIG', 'segredo')
+    svc = SQLiteService(db_path=str(tmp_path / 't.db'))
+    assert svc.get_config() == {}
+    svc.save_config({'openai_api_key': 'sk-nao-gravar', 'tema': 'dark'})
+    with open(tmp_path / 'config.json', encoding='utf-8') as f:
+        assert json.load(f)['openai_api_key'] == '${OPENAI_API_KEY}'
+
+    svc.save_config({'openai_api_key': '${CHAVE_TESTE_CONFIG}', 'tema': 'dark'})
+    assert svc.get_config()['openai_api_key'] == 'segredo'
+
+
+def test_precos_do_cost_service_so_remontados_quando_precos_mudam(caminho, monkeypatch):
+    armazenamento = modulo.obter_armazenamento_config(caminho)
+    armazenamento.gravar({'precos_openai': {'gpt-4o': {'input': 2.0, 'output': 8.0}}})
+    svc = CostCalculationService(caminho)
+    montagens = []
+    original = svc._load_config
+    monkeypatch.setattr(svc, '_load_config', lambda: montagens.append(1) or original())
+
+    assert svc.calculate_real_cost(1_000_000, 0, 'gpt-4o', 'openai') == 2.0
+    armazenamento.gravar({'precos_openai': {'gpt-4o': {'input': 2.0, 'output': 8.0}}, 'tema': 'dark'})
+    assert svc.calculate_real_cost(1_000_000, 0, 'gpt-4o', 'openai') == 2.0
+    assert len(montagens) == 1
+
+    armazenamento.gravar({'precos_openai': {'gpt-4o': {'input': 3.0, 'output': 8.0}}, 'tema': 'dark'})
+    assert svc.calculate_real_cost(1_000_000, 0, 'gpt-4o', 'openai') == 3.0
+    assert len(montagens) == 2
@@ -0,0 +1,112 @@
+"""Backups online do banco: snapshot consistente, compressão, retenção, agendamento e download."""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.backup_online_banco_sqlite_compactado_retencao_service import (
+    ServicoBackupBanco,
+    copiar_banco_online,
+    extrair_backup,
+)
+
+
+def _contar(db, tabela='t'):
+    with sqlite3.connect(db) as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {tabela}').fetchone()[0]
+
+
+@pytest.fixture
+def banco(tmp_path):
+    db = str(tmp_path / 'database.db')
+    with sqlite3.connect(db) as conn:
+        conn.execute('CREATE TABLE t (x TEXT)')
+        conn.executemany('INSERT INTO t VALUES (?)', [('x' * 500,)] * 2000)
+    return db
+
+
+def _servico(db, **config):
+    config = {'compressao_backup': 'zip', 'max_backups': 10, 'backup_automatico': 'weekly', **config}
+    return ServicoBackupBanco(db, lambda: config)
+
+
+@pytest.mark.parametrize('compressao, extensao', [('zip', '.zip'), ('gzip', '.db.gz'), ('none', '.db')])
+def test_backup_comprimido_e_restauravel(banco, tmp_path, compressao, extensao):
+    servico = _servico(banco, compressao_backup=compressao)
+    backup = servico.criar_backup('manual')
+    assert backup['arquivo'].endswith(extensao)
+    assert os.path.dirname(backup['caminho']) == str(tmp_path / 'backups')
+    assert sorted(os.listdir(tmp_path / 'backups')) == [backup['arquivo']]
+
+    restaurado = str(tmp_path / 'restaurado.db')
+    extrair_backup(backup['caminho'], restaurado)
+    assert _contar(restaurado) == 2000
+
+
+def test_retencao_mantem_os_mais_recentes(banco):
+    servico = _servico(banco, max_backups=2)
+    criados = [servico.criar_backup(motivo)['arquivo'] for motivo in ('manual', 'automatico', 'manual')]
+    assert [b['arquivo'] for b in servico.listar_backups()] == criados[:0:-1]
+
+
+def test_snapshot_consistente_com_escritas_concorrentes(banco, tmp_path):
+    parar = threading.Event()
+
+    def escrever():
+        with sqlite3.connect(banco, timeout=30) as conn:
+            while not parar.is_set():
+                conn.execute("INSERT INTO t VALUES ('novo')")
+                conn.commit()
+
+    escritor = threading.Thread(target=escrever)
+    escritor.start()
+    try:
+        destino = str(tmp_path / 'copia.db')
+        copiar_banco_online(banco, destino, paginas_por_passo=1, max_reinicios=2)
+    finally:
+        parar.set()
+        escritor.join()
+    with sqlite3.connect(destino) as conn:
+        assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    assert 2000 <= _contar(destino) <= _contar(banco)
+
+
+def test_backup_automatico_pendente_conforme_frequencia(banco):
+    assert not _servico(banco, backup_automatico='disabled').backup_automatico_pendente()
+    servico = _servico(banco, backup_automatico='weekly')
+    assert servico.backup_automatico_pendente()
+    servico.criar_backup('automatico')
+    assert not servico.backup_automatico_pendente()
+    assert servico.backup_automatico_pendente(agora=datetime.now() + timedelta(days=8))
+
+
+def test_download_envia_snapshot_e_remove_o_temporario(banco, tmp_path, monkeypatch):
+    import app as m
+
+    monkeypatch.setattr(m, 'backup_service', _servico(banco))
+    with m.app.test_client() as client:
+        resposta = client.get('/api/backup/banco')
+        assert resposta.status_code == 200
+        baixado = tmp_path / 'baixado.db'
+        baixado.write_bytes(resposta.data)
+        resposta.close()
+    assert _contar(str(baixado)) == 2000
+    assert os.listdir(tmp_path / 'backups') == []
+
+
+def test_download_nao_iniciado_tambem_remove_o_temporario(banco, monkeypatch):
+    import app as m
+
+    servico = _servico(banco)
+    monkeypatch.setattr(m, 'backup_service', servico)
+    with m.app.test_client() as client:
+        resposta = client.head('/api/backup/banco')
+        assert resposta.status_code == 200 and resposta.data == b''
+        resposta.close()
+        # cliente que desiste antes do primeiro bloco
+        resposta = client.get('/api/backup/banco', buffered=False)
+        resposta.close()
+    assert os.listdir(servico.diretorio) == []
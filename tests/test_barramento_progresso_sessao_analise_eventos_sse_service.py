@@ -0,0 +1,165 @@
+"""Barramento de progresso das sessões de análise: agregados, eventos no banco e stream SSE retomável."""
+
+import json
+
+import pytest
+
+from services.barramento_progresso_sessao_analise_eventos_sse_service import (
+    TIPO_EVENTO_CANCELADO,
+    TIPO_EVENTO_CONCLUSAO,
+    ProgressoSessaoAnalise,
+    gerar_eventos_sse_sessao,
+)
+from services.sqlite_service import SQLiteService
+
+
+class _Relogio:
+    def __init__(self):
+        self.agora = 100.0
+
+    def __call__(self):
+        return self.agora
+
+    def dormir(self, segundos):
+        self.agora += segundos
+
+
+@pytest.fixture
+def svc(tmp_path):
+    return SQLiteService(db_path=str(tmp_path / "t.db"))
+
+
+def _resultado(n, acertou, custo=0.01):
+    return {
+        'intimacao_id': n,
+        'resultado_ia': 'OCULTAR',
+        'acertou': acertou,
+        'tempo_processamento': 2.0,
+        'custo_real': custo,
+        'tokens_input': 100,
+        'tokens_output': 10,
+        'prompt_completo': 'não vai para o evento',
+    }
+
+
+def _mensagens(stream):
+    return [json.loads(m.split('data: ', 1)[1]) for m in stream if 'data: ' in m]
+
+
+def test_agregados_acuracia_eta_e_contadores_da_sessao(svc):
+    svc.criar_sessao_analise('s1', 'p1', 'Prompt', 'gpt-4', 0.0, 100, 30, 4)
+    relogio = _Relogio()
+    progresso = ProgressoSessaoAnalise(svc, 's1', total=4, relogio=relogio)
+    progresso.iniciar()
+
+    relogio.agora += 10
+    progresso.registrar_item(_resultado('a', True))
+    relogio.agora += 10
+    agregados = progresso.registrar_item({'intimacao_id': 'b', 'erro': 'timeout'})
+    assert agregados['atual'] == 2 and agregados['falhas'] == 1
+    assert agregados['acuracia'] == 100.0
+    assert agregados['vazao_por_minuto'] == 6.0
+    assert agregados['eta_segundos'] == 20.0
+
+    agregados = progresso.registrar_item(_resultado('c', False, custo=0.02))
+    assert agregados['acuracia'] == 50.0
+    assert agregados['custo_total'] == pytest.approx(0.03)
+    assert agregados['tokens_total'] == 220
+
+    sessao = svc.get_sessao_analise('s1')
+    assert (sessao['acertos'], sessao['erros'], sessao['intimações_processadas']) == (1, 1, 2)
+
+    eventos = svc.listar_eventos_progresso_analise('s1')
+    assert [e['tipo'] for e in eventos] == ['inicio', 'item', 'item', 'item']
+    assert 'prompt_completo' not in eventos[1]['dados']['item']
+    assert eventos[2]['dados']['item']['erro'] == 'timeout'
+
+
+def test_stream_retoma_do_ultimo_id_e_para_no_evento_final(svc):
+    progresso = ProgressoSessaoAnalise(svc, 's2', total=2)
+    progresso.iniciar()
+    progresso.registrar_item(_resultado('a', True))
+    progresso.registrar_item(None, 'b')
+    progresso.concluir(TIPO_EVENTO_CONCLUSAO, 'ok')
+    progresso.concluir(TIPO_EVENTO_CANCELADO)  # ignorado: a sessão já terminou
+
+    completo = list(gerar_eventos_sse_sessao(svc, 's2', dormir=lambda s: None))
+    assert [m['tipo'] for m in _mensagens(completo)] == ['inicio', 'item', 'item', 'conclusao']
+    assert _mensagens(completo)[2]['falhas'] == 1
+
+    id_segundo = int(completo[1].split('\n')[0].removeprefix('id: '))
+    retomado = _mensagens(gerar_eventos_sse_sessao(svc, 's2', ultimo_id=id_segundo, dormir=lambda s: None))
+    assert [m['tipo'] for m in retomado] == ['item', 'conclusao']
+
+
+def test_stream_sem_sessao_encerra_com_erro_e_keepalive(svc):
+    relogio = _Relogio()
+    stream = list(gerar_eventos_sse_sessao(
+        svc, 'inexistente', intervalo_consulta=5, intervalo_keepalive=15, espera_max_inicio=40,
+        dormir=relogio.dormir, relogio=relogio,
+    ))
+    assert stream.count(': keep-alive\n\n') == 2
+    assert _mensagens(stream)[-1]['tipo'] == 'erro'
+
+
+def test_rota_sse_exige_session_id_e_respeita_last_event_id(svc):
+    import app as m
+
+    progresso = ProgressoSessaoAnalise(svc, 's3', total=1)
+    progresso.iniciar()
+    progresso.registrar_item(_resultado('a', True))
+    progresso.concluir()
+    primeiro_id = svc.listar_eventos_progresso_analise('s3')[0]['id']
+
+    m.app.config['TESTING'] = True
+    original = m.data_service
+    m.data_service = svc
+    try:
+        with m.app.test_client() as c:
+            assert c.get('/api/analise-progresso').status_code == 400
+            resp = c.get('/api/analise-progresso?session_id=s3', headers={'Last-Event-ID': str(primeiro_id)})
+            assert resp.mimetype == 'text/event-stream'
+            tipos = [json.loads(l[6:])['tipo'] for l in resp.get_data(as_text=True).splitlines() if l.startswith('data: ')]
+            assert tipos == ['item', 'conclusao']
+    finally:
+        m.data_service = original
+
+
+def test_threads_nao_regridem_contadores_da_sessao(svc, monkeypatch):
+    import random
+    import threading
+    import time
+
+    svc.criar_sessao_analise('s1', 'p1', 'Prompt', 'gpt-4', 0.0, 100, 30, 40)
+    progresso = ProgressoSessaoAnalise(svc, 's1', total=40)
+    progresso.iniciar()
+    original = svc.atualizar_sessao_analise
+
+    def atualizar_devagar(*args, **kwargs):
+        time.sleep(random.random() / 200)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(svc, 'atualizar_sessao_analise', atualizar_devagar)
+    threads = [threading.Thread(target=lambda k=k: progresso.registrar_item(_resultado(str(k), True)))
+               for k in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    sessao = svc.get_sessao_analise('s1')
+    assert (sessao['intimações_processadas'], sessao['acertos']) == (40, 40)
+
+
+def test_falha_ao_gravar_progresso_nao_interrompe_a_analise(svc, monkeypatch, caplog):
+    svc.criar_sessao_analise('s1', 'p1', 'Prompt', 'gpt-4', 0.0, 100, 30, 2)
+    progresso = ProgressoSessaoAnalise(svc, 's1', total=2)
+    progresso.iniciar()
+
+    def falhar(*args, **kwargs):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(svc, 'atualizar_sessao_analise', falhar)
+    agregados = progresso.registrar_item(_resultado('a', True))
+    assert agregados['atual'] == 1 and agregados['acertos'] == 1
+    assert 'database is locked' in caplog.text
@@ -0,0 +1,71 @@
+"""Cache das consultas agregadas (dashboard, relatórios) por geração dos dados, com despejo LRU."""
+
+import sqlite3
+import uuid
+
+import pytest
+
+from services.cache_consultas_agregadas_geracao_lru_service import CacheConsultasAgregadas
+from services.sqlite_service import SQLiteService
+
+
+@pytest.fixture
+def svc(tmp_path):
+    svc = SQLiteService(db_path=str(tmp_path / 't.db'))
+    svc.save_prompt({'id': 'p1', 'nome': 'P', 'conteudo': 'x'})
+    svc.save_intimacao({'id': 'i1', 'contexto': 'c' * 50, 'classificacao_manual': 'RECURSO'})
+    return svc
+
+
+def _analise(svc, acertou=True):
+    return svc.save_analise({'id': str(uuid.uuid4()), 'intimacao_id': 'i1', 'prompt_id': 'p1', 'acertou': acertou})
+
+
+def test_lru_por_entradas_e_por_tamanho():
+    cache = CacheConsultasAgregadas(max_entradas=2, max_bytes=400)
+    for chave in ('a', 'b'):
+        cache.obter_ou_calcular(chave, 0, lambda: chave)
+    cache.obter_ou_calcular('a', 0, lambda: 'recalculado')  # 'a' passa a ser a mais recente
+    cache.obter_ou_calcular('c', 0, lambda: 'c')
+    assert cache.obter_ou_calcular('a', 0, lambda: 'recalculado') == 'a'
+    assert cache.obter_ou_calcular('b', 0, lambda: 'recalculado') == 'recalculado'
+
+    assert cache.obter_ou_calcular('grande', 0, lambda: 'x' * 200) == 'x' * 200
+    assert cache.estatisticas()['bytes_estimados'] <= 400
+    assert cache.obter_ou_calcular('grande', 0, lambda: 'de novo') == 'de novo'
+
+
+def test_geracao_diferente_recalcula_e_resultado_e_copia():
+    cache = CacheConsultasAgregadas()
+    valor = cache.obter_ou_calcular('k', 1, lambda: {'total': 1})
+    valor['total'] = 99
+    assert cache.obter_ou_calcular('k', 1, lambda: {'total': 2}) == {'total': 1}
+    assert cache.obter_ou_calcular('k', 2, lambda: {'total': 2}) == {'total': 2}
+
+
+def test_agregados_servidos_do_cache_ate_a_proxima_escrita(svc):
+    _analise(svc)
+    assert svc.get_statistics()['total_analises'] == 1
+    svc.get_dashboard_resumo_graficos()
+    svc.obter_agregados_relatorios_filtrados(prompt_id='p1')
+    antes = svc.cache_consultas.estatisticas()
+
+    for _ in range(5):
+        assert svc.get_statistics()['total_analises'] == 1
+        svc.obter_agregados_relatorios_filtrados(prompt_id='p1')
+    depois = svc.cache_consultas.estatisticas()
+    assert depois['acertos'] - antes['acertos'] == 10
+    assert depois['faltas'] == antes['faltas']
+
+    analise_id = _analise(svc, acertou=False)
+    assert svc.get_statistics()['total_analises'] == 2
+    assert svc.get_dashboard_resumo_graficos()['status_analises']['Concluída'] == 2
+    svc.delete_analise(analise_id)
+    assert svc.get_statistics()['total_analises'] == 1
+
+
+def test_escrita_por_outra_conexao_tambem_invalida(svc):
+    assert svc.get_statistics()['total_prompts'] == 1
+    with sqlite3.connect(svc.db_path) as conn:
+        conn.execute("INSERT INTO prompts (id, nome, conteudo, data_criacao) VALUES ('p2', 'Q', 'y', '2026-01-01')")
+    assert svc.get_statistics()['total_prompts'] == 2
@@ -0,0 +1,98 @@
+"""Testes do extrator incremental de classificação e do consumo de stream com corte antecipado."""
+from types import SimpleNamespace
+
+import pytest
+
+from config import Config
+from services.classificacao_ia_extracao_incremental_streaming_chat_completions_service import (
+    ExtratorIncrementalClassificacaoTriagem,
+    consumir_stream_chat_completions,
+    estimar_tokens_texto,
+)
+
+
+def _chunk(texto=None, usage=None):
+    choices = [] if texto is None else [SimpleNamespace(delta=SimpleNamespace(content=texto))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class _StreamFake:
+    def __init__(self, chunks):
+        self._chunks = list(chunks)
+        self.consumidos = 0
+        self.fechado = False
+
+    def __iter__(self):
+        for c in self._chunks:
+            self.consumidos += 1
+            yield c
+
+    def close(self):
+        self.fechado = True
+
+
+def _deltas(texto, tamanho=3):
+    return [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+
+
+@pytest.fixture
+def extrator():
+    return ExtratorIncrementalClassificacaoTriagem(Config.TIPOS_ACAO)
+
+
+def test_reconhece_somente_apos_fechar_aspas(extrator):
+    assert extrator.alimentar('{"triagem": "OCUL') is None
+    assert extrator.alimentar('TAR') is None
+    assert extrator.alimentar('", "justificativa": "') == "OCULTAR"
+
+
+def test_alias_snake_case_mapeia_canonico(extrator):
+    for d in _deltas('{"triagem":"CONTATAR_ASSISTIDO","justificativa":"longa"}'):
+        extrator.alimentar(d)
+    assert extrator.classificacao == "CONTATAR ASSISTIDO"
+
+
+def test_escape_unicode_json_no_valor(extrator):
+    extrator.alimentar('{"triagem": "ELABORAR PE\\u00c7A"}')
+    assert extrator.classificacao == "ELABORAR PEÇA"
+
+
+def test_valor_desconhecido_nao_classifica(extrator):
+    extrator.alimentar('{"triagem": "QUALQUER COISA", "justificativa": "x"}')
+    assert extrator.classificacao is None
+
+
+def test_chave_longe_do_inicio_com_deltas_pequenos(extrator):
+    texto = '{"justificativa": "' + ("blá " * 200) + '", "triagem": "URGENCIA"}'
+    for d in _deltas(texto, 2):
+        extrator.alimentar(d)
+    assert extrator.classificacao == "URGÊNCIA"
+
+
+def test_stream_interrompido_apos_classificacao_estima_tokens(extrator):
+    texto = '{"triagem": "RENUNCIAR PRAZO", "justificativa": "' + ("x" * 400) + '"}'
+    stream = _StreamFake(_chunk(d) for d in _deltas(texto, 4))
+    resposta, tokens_info, interrompido = consumir_stream_chat_completions(
+        stream, extrator, parar_apos_classificacao=True, prompt="p" * 40
+    )
+    assert interrompido is True
+    assert stream.fechado is True
+    assert stream.consumidos < len(_deltas(texto, 4)) // 2
+    assert resposta.startswith('{"triagem": "RENUNCIAR PRAZO"')
+    assert extrator.classificacao == "RENUNCIAR PRAZO"
+    assert tokens_info["estimado"] is True
+    assert tokens_info["input"] == estimar_tokens_texto("p" * 40)
+    assert tokens_info["total"] == tokens_info["input"] + tokens_info["output"]
+
+
+def test_stream_completo_usa_usage_do_ultimo_chunk(extrator):
+    usage = SimpleNamespace(prompt_tokens=100, completion_tokens=7, total_tokens=107)
+    chunks = [_chunk(d) for d in _deltas('{"triagem": "OCULTAR"}')] + [_chunk(None, usage)]
+    stream = _StreamFake(chunks)
+    resposta, tokens_info, interrompido = consumir_stream_chat_completions(
+        stream, extrator, parar_apos_classificacao=False, prompt="p"
+    )
+    assert interrompido is False
+    assert stream.fechado is False
+    assert resposta == '{"triagem": "OCULTAR"}'
+    assert tokens_info == {"input": 100, "output": 7, "total": 107}
@@ -0,0 +1,153 @@
+"""
+Equivalência do matcher pré-compilado com a implementação original da extração.
+
+A referência abaixo é a versão anterior de extrair_classificacao_da_resposta_ia (padrões compilados
+a cada chamada, IGNORECASE). Entradas aleatórias (semente fixa) combinam tipos, aliases, variações de
+caixa, JSON e fragmentos que disparam cada etapa da precedência.
+"""
+import json
+import random
+import re
+
+import pytest
+
+from config import Config
+from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_service import (
+    ALIASES_TRIAGEM_IA_PARA_CANONICO,
+    MatcherClassificacaoTriagem,
+    extrair_classificacao_da_resposta_ia,
+    obter_matcher_classificacao,
+)
+
+
+def _referencia(resposta, tipos_acao):
+    if resposta is None or not str(resposta).strip():
+        return "ERRO: Resposta vazia"
+    tipos = list(tipos_acao)
+    resposta_limpa = resposta.strip().upper()
+    aliases = ALIASES_TRIAGEM_IA_PARA_CANONICO
+    try:
+        dados_json = json.loads(resposta)
+        if "triagem" in dados_json:
+            triagem_ia = str(dados_json["triagem"]).upper().strip()
+            if triagem_ia in aliases:
+                return aliases[triagem_ia]
+            for tipo_acao in tipos:
+                if tipo_acao.upper() == triagem_ia:
+                    return tipo_acao
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        pass
+    for tipo_acao in tipos:
+        if tipo_acao.upper() in resposta_limpa:
+            return tipo_acao
+    for variacao, classificacao_padrao in aliases.items():
+        if variacao in resposta_limpa:
+            return classificacao_padrao
+    for tipo_acao in tipos:
+        palavras_chave = tipo_acao.upper().split()
+        if palavras_chave and all(p in resposta_limpa for p in palavras_chave):
+            return tipo_acao
+    patterns = [
+        r'"triagem":\s*"([^"]+)"',
+        r"triagem[:\s]*([^\n\.]+)",
+        r"classificação[:\s]*([^\n\.]+)",
+        r"resposta[:\s]*([^\n\.]+)",
+        r"ação[:\s]*([^\n\.]+)",
+        r"^([^\n\.]+)$",
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, resposta_limpa, re.IGNORECASE)
+        if match:
+            possivel = match.group(1).strip()
+            if possivel in aliases:
+                return aliases[possivel]
+            for tipo_acao in tipos:
+                if tipo_acao.upper() == possivel:
+                    return tipo_acao
+    return f"ERRO: Classificação não reconhecida - {resposta[:100]}"
+
+
+_FRAGMENTOS = (
+    list(Config.TIPOS_ACAO)
+    + list(ALIASES_TRIAGEM_IA_PARA_CANONICO)
+    + [w for t in Config.TIPOS_ACAO for w in t.split()]
+    + [
+        "triagem", "Triagem:", "TRİAGEM:", "classificação:", "CLASSIFİCAÇÃO", "resposta:",
+        "ação:", '"triagem": "', '"', "\n", ". ", ": ", " ", "  ", "x", "ok", "{", "}", "[",
+        "null", "123", "ß", "ı", "İ", "ç", "ã", "à", "ê", "_", "\t", " ",
+    ]
+)
+
+
+def _variar_caixa(rng, s):
+    return rng.choice([s, s.lower(), s.upper(), s.title(), s.swapcase()])
+
+
+def _gerar_texto(rng):
+    partes = [_variar_caixa(rng, rng.choice(_FRAGMENTOS)) for _ in range(rng.randint(0, 8))]
+    sep = rng.choice(["", " ", "\n", ". "])
+    return sep.join(partes)
+
+
+def _gerar_resposta(rng):
+    forma = rng.random()
+    if forma < 0.3:
+        valor = _variar_caixa(rng, rng.choice(_FRAGMENTOS))
+        obj = {"triagem": valor, "justificativa": _gerar_texto(rng)}
+        if rng.random() < 0.2:
+            obj = {"outra": valor}
+        texto = json.dumps(obj, ensure_ascii=rng.random() < 0.5)
+        return rng.choice(["", " ", "\n", " "]) + texto
+    if forma < 0.35:
+        return json.dumps(rng.choice([["triagem"], "triagem", 1, None, {"triagem": None}]))
+    return _gerar_texto(rng)
+
+
+@pytest.mark.parametrize("semente", range(8))
+def test_equivalencia_com_referencia_entradas_aleatorias(semente):
+    rng = random.Random(semente)
+    tipos = list(Config.TIPOS_ACAO)
+    for _ in range(2500):
+        resposta = _gerar_resposta(rng)
+        assert extrair_classificacao_da_resposta_ia(resposta, tipos) == _referencia(resposta, tipos), resposta
+
+
+def test_equivalencia_com_ordem_de_tipos_embaralhada():
+    rng = random.Random(99)
+    tipos = list(Config.TIPOS_ACAO)
+    for _ in range(50):
+        rng.shuffle(tipos)
+        for _ in range(40):
+            resposta = _gerar_resposta(rng)
+            assert extrair_classificacao_da_resposta_ia(resposta, tipos) == _referencia(resposta, tipos)
+
+
+def test_sobreposicao_prioriza_ordem_da_lista_e_nao_posicao():
+    tipos = list(Config.TIPOS_ACAO)
+    # OCULTAR aparece antes no texto, mas RENUNCIAR PRAZO vem antes em TIPOS_ACAO
+    assert extrair_classificacao_da_resposta_ia("OCULTARENUNCIAR PRAZO", tipos) == "RENUNCIAR PRAZO"
+
+
+def test_i_com_ponto_turco_ainda_casa_padrao_triagem():
+    tipos = list(Config.TIPOS_ACAO)
+    resposta = "TRİAGEM: CONTATO_PECA"
+    assert extrair_classificacao_da_resposta_ia(resposta, tipos) == _referencia(resposta, tipos)
+
+
+def test_matcher_recompila_quando_alias_eh_adicionado(monkeypatch):
+    tipos = list(Config.TIPOS_ACAO)
+    assert extrair_classificacao_da_resposta_ia('{"triagem": "SILENCIAR"}', tipos).startswith("ERRO")
+    monkeypatch.setitem(ALIASES_TRIAGEM_IA_PARA_CANONICO, "SILENCIAR", "OCULTAR")
+    assert extrair_classificacao_da_resposta_ia('{"triagem": "SILENCIAR"}', tipos) == "OCULTAR"
+
+
+def test_matcher_reaproveitado_entre_chamadas():
+    tipos = list(Config.TIPOS_ACAO)
+    assert obter_matcher_classificacao(tipos) is obter_matcher_classificacao(tuple(tipos))
+
+
+def test_extrair_lote_igual_chamadas_individuais():
+    rng = random.Random(7)
+    respostas = [_gerar_resposta(rng) for _ in range(300)]
+    matcher = MatcherClassificacaoTriagem(Config.TIPOS_ACAO, ALIASES_TRIAGEM_IA_PARA_CANONICO)
+    assert matcher.extrair_lote(respostas) == [_referencia(r, Config.TIPOS_ACAO) for r in respostas]
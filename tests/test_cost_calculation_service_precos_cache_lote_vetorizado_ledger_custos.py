@@ -0,0 +1,121 @@
+"""Tabela de preços com cache por mtime, cálculo em lote (NumPy) e ledger `custos` com reprecificação."""
+
+import json
+import os
+import tempfile
+import uuid
+
+import numpy as np
+import pytest
+
+from services.cost_calculation_service import CostCalculationService
+from services.sqlite_service import SQLiteService
+
+
+def _escrever_config(path, precos_openai, precos_azure=None, mtime=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'precos_openai': precos_openai, 'precos_azure': precos_azure or {}}, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture()
+def ambiente():
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, 'config.json')
+        _escrever_config(config_path, {
+            'gpt-4o': {'input': 2.5, 'output': 10.0},
+            'gpt-4o-mini': {'input': 0.15, 'output': 0.6},
+            'data_atualizacao': '2025-01-23',
+        }, mtime=1_000_000)
+        yield CostCalculationService(config_path), SQLiteService(db_path=os.path.join(tmp, 'test.db')), config_path
+
+
+def test_config_so_relida_quando_mtime_muda(ambiente, monkeypatch):
+    svc, _, config_path = ambiente
+    leituras = []
+    original = svc._load_config
+    monkeypatch.setattr(svc, '_load_config', lambda: leituras.append(1) or original())
+
+    for _ in range(50):
+        svc.calculate_real_cost(1000, 500, 'gpt-4o', 'openai')
+    assert len(leituras) == 1
+
+    _escrever_config(config_path, {'gpt-4o': {'input': 5.0, 'output': 20.0}}, mtime=2_000_000)
+    assert svc.calculate_real_cost(1_000_000, 0, 'gpt-4o', 'openai') == 5.0
+    assert len(leituras) == 2
+
+
+def test_modelo_desconhecido_avisa_uma_vez(ambiente, capsys):
+    svc, _, _ = ambiente
+    for _ in range(5):
+        assert svc.calculate_real_cost(10, 10, 'modelo-x', 'openai') == 0.0
+    assert capsys.readouterr().out.count('modelo-x') == 1
+
+
+def test_lote_igual_ao_calculo_individual(ambiente):
+    svc, _, _ = ambiente
+    rng = np.random.default_rng(3)
+    entrada = rng.integers(0, 200_000, 5000)
+    saida = rng.integers(0, 20_000, 5000)
+    modelos = rng.choice(['gpt-4o', 'gpt-4o-mini', 'desconhecido'], 5000)
+
+    lote = svc.calcular_custos_lote(entrada, saida, modelos, 'litellm')
+    individuais = [
+        svc.calculate_real_cost(int(i), int(o), str(m), 'litellm') for i, o, m in zip(entrada, saida, modelos)
+    ]
+    # np.round (escala e arredonda) pode diferir de round() em 1e-6 nos empates da 6ª casa
+    np.testing.assert_allclose(lote, individuais, rtol=0, atol=1e-6 + 1e-12)
+    assert svc.calcular_custos_lote([1_000_000], [1_000_000], 'gpt-4o', 'openai').tolist() == [12.5]
+
+
+def test_lancamentos_sessao_agregados_por_modelo(ambiente):
+    svc, data, _ = ambiente
+    resultados = [
+        {'modelo': 'gpt-4o', 'tokens_input': 1_000_000, 'tokens_output': 0},
+        {'modelo': 'gpt-4o', 'tokens_input': 0, 'tokens_output': 100_000},
+        {'modelo': 'gpt-4o-mini', 'tokens_input': 1_000_000, 'tokens_output': 0},
+        {'erro': 'falhou', 'modelo': 'gpt-4o'},
+    ]
+    assert svc.registrar_custos_sessao(data, 's1', 'openai', resultados) == 2
+
+    custos = {c['modelo']: c for c in data.obter_custos_consolidados('s1')}
+    assert custos['gpt-4o']['quantidade_analises'] == 2
+    assert custos['gpt-4o']['custo'] == pytest.approx(3.5)
+    assert custos['gpt-4o-mini']['custo'] == pytest.approx(0.15)
+    assert custos['gpt-4o']['versao_precos'] == svc.versao_precos()
+
+
+def test_reprecificacao_em_lote_atualiza_historico_e_acrescenta_ledger(ambiente):
+    svc, data, config_path = ambiente
+    pid = str(uuid.uuid4())
+    data.save_prompt({'id': pid, 'nome': 'P', 'conteudo': 'x'})
+    data.criar_sessao_analise(
+        session_id='s1', prompt_id=pid, prompt_nome='P', modelo='gpt-4o', temperatura=0.0,
+        max_tokens=10, timeout=1, total_intimacoes=3, configuracoes={},
+    )
+    resultados = []
+    for modelo, provider in (('gpt-4o', 'openai'), ('gpt-4o', None), ('sem-preco', 'openai')):
+        analise = {
+            'intimacao_id': str(uuid.uuid4()), 'prompt_id': pid, 'session_id': 's1', 'modelo': modelo,
+            'tokens_input': 1_000_000, 'tokens_output': 0, 'provider': provider,
+            'custo_real': svc.calculate_real_cost(1_000_000, 0, modelo, 'openai'),
+        }
+        data.save_analise(analise)
+        resultados.append(analise)
+    svc.registrar_custos_sessao(data, 's1', 'openai', resultados)
+    lancamentos_antes = len(data.obter_custos_consolidados())
+
+    _escrever_config(config_path, {'gpt-4o': {'input': 4.0, 'output': 10.0}}, mtime=2_000_000)
+    resumo = svc.reprecificar_historico(data, provider_padrao='openai')
+
+    assert resumo['analises_reprecificadas'] == 2
+    custos = sorted(a['custo_real'] for a in data.get_analises_by_prompt(pid))
+    assert custos == [0.0, 4.0, 4.0]
+    assert data.get_sessao_analise('s1')['custo_total'] == pytest.approx(8.0)
+    assert data.get_prompt_by_id(pid)['custo_total'] == pytest.approx(8.0)
+
+    vigente = {c['modelo']: c for c in data.obter_custos_consolidados('s1')}['gpt-4o']
+    assert (vigente['origem'], vigente['custo']) == ('reprecificacao', pytest.approx(8.0))
+    with data.get_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM custos').fetchone()[0] == lancamentos_antes + 1
@@ -0,0 +1,104 @@
+"""Estimativa prévia de tokens/custo de execução em lote (heurística, janela de contexto, piores itens)."""
+
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import pytest
+
+from services.cost_calculation_service import CostCalculationService
+from services.estimativa_previa_tokens_custo_execucao_analise_lote_service import (
+    EstimadorExecucaoAnaliseLote,
+    janela_contexto_modelo,
+    montar_prompt_analise_intimacao,
+)
+from services.sqlite_service import SQLiteService
+
+
+@pytest.fixture()
+def ambiente():
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, 'config.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({'precos_openai': {'gpt-4': {'input': 30.0, 'output': 60.0}}}, f)
+        data = SQLiteService(db_path=os.path.join(tmp, 'test.db'))
+        yield data, CostCalculationService(config_path)
+
+
+def _intimacoes(data, tamanhos):
+    ids = []
+    for n in tamanhos:
+        iid = str(uuid.uuid4())
+        data.save_intimacao({'id': iid, 'contexto': 'x' * n, 'classificacao_manual': 'OCULTAR'})
+        ids.append(iid)
+    return ids
+
+
+def test_montar_prompt_substitui_regra_e_contexto():
+    contexto, final = montar_prompt_analise_intimacao(
+        {'conteudo': 'R={REGRADENEGOCIO}|{CONTEXTO}', 'regra_negocio': 'regra'}, 'abc'
+    )
+    assert contexto == '\nContexto da Intimação:\nabc\n'
+    assert final == 'R=regra|' + contexto
+
+
+def test_janela_contexto_usa_prefixo_mais_longo():
+    assert janela_contexto_modelo('gpt-4') == 8192
+    assert janela_contexto_modelo('gpt-4o-mini-2024') == 128000
+    assert janela_contexto_modelo('desconhecido') is None
+    assert janela_contexto_modelo('meu-modelo', {'meu-modelo': 1000}) == 1000
+
+
+def test_estimativa_heuristica_totais_custo_e_estouro_de_janela(ambiente, monkeypatch):
+    data, custos = ambiente
+    import services.estimativa_previa_tokens_custo_execucao_analise_lote_service as m
+    monkeypatch.setattr(m, 'TIKTOKEN_DISPONIVEL', False)
+
+    ids = _intimacoes(data, [400, 40000, 4000])
+    prompt = {'id': 'p', 'conteudo': '{CONTEXTO}'}
+    estimador = EstimadorExecucaoAnaliseLote(data, custos, 'openai')
+    r = estimador.estimar(prompt, ids + ['inexistente'], 'gpt-4', max_tokens=500, raw_user_prompt_only=True)
+
+    assert r['tokenizador'] == 'heuristica'
+    assert r['total_itens'] == 3
+    assert r['intimacoes_nao_encontradas'] == ['inexistente']
+    assert r['tokens_output_previstos_por_item'] == 150
+    assert r['tokens_output_maximos_por_item'] == 500
+    # 40k caracteres ≈ 10k tokens > janela de 8192 do gpt-4
+    assert r['itens_excedendo_janela'] == 1
+    assert r['piores_itens'][0]['intimacao_id'] == ids[1]
+    assert r['piores_itens'][0]['excede_janela_contexto'] is True
+    assert r['custo_maximo'] == pytest.approx(
+        r['tokens_input_total'] / 1e6 * 30.0 + 3 * 500 / 1e6 * 60.0, abs=1e-5
+    )
+    assert r['custo_previsto'] < r['custo_maximo']
+
+
+def test_saida_prevista_usa_media_historica(ambiente):
+    data, custos = ambiente
+    ids = _intimacoes(data, [100])
+    data.save_prompt({'id': 'p', 'nome': 'P', 'conteudo': '{CONTEXTO}'})
+    data.save_analise({'intimacao_id': ids[0], 'prompt_id': 'p', 'modelo': 'gpt-4', 'tokens_output': 41})
+    r = EstimadorExecucaoAnaliseLote(data, custos, 'openai').estimar(
+        {'id': 'p', 'conteudo': '{CONTEXTO}'}, ids, 'gpt-4'
+    )
+    assert (r['origem_tokens_output'], r['tokens_output_previstos_por_item']) == ('historico', 41)
+
+
+def test_dez_mil_itens_em_menos_de_dois_segundos(ambiente):
+    data, custos = ambiente
+    with data.get_connection() as conn:
+        ids = [str(uuid.uuid4()) for _ in range(10000)]
+        conn.executemany(
+            "INSERT INTO intimacoes (id, contexto, classificacao_manual, data_criacao) VALUES (?, ?, 'OCULTAR', '2025-01-01')",
+            [(i, 'contexto ' * 300) for i in ids],
+        )
+        conn.commit()
+    inicio = time.perf_counter()
+    r = EstimadorExecucaoAnaliseLote(data, custos, 'openai').estimar(
+        {'id': 'p', 'conteudo': 'Classifique:\n{CONTEXTO}'}, ids, 'gpt-4', max_tokens=200
+    )
+    assert r['total_itens'] == 10000
+    assert time.perf_counter() - inicio < 2.0
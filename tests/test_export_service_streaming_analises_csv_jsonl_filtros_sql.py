@@ -0,0 +1,122 @@
+"""Exportação de análises por streaming (CSV/JSONL) com filtros aplicados no SQL."""
+
+import csv
+import io
+import json
+import os
+import tempfile
+import uuid
+
+import pytest
+
+from services.export_service import CABECALHO_CSV_ANALISES, ExportService
+from services.sqlite_service import SQLiteService
+
+
+@pytest.fixture()
+def svc():
+    with tempfile.TemporaryDirectory() as tmp:
+        data = SQLiteService(db_path=os.path.join(tmp, 'test.db'))
+        data.save_prompt({'id': 'p1', 'nome': 'Prompt 1', 'conteudo': 'x'})
+        data.save_prompt({'id': 'p2', 'nome': 'Prompt 2', 'conteudo': 'x'})
+        intimacoes, analises = [], []
+        for n in range(1203):
+            iid = str(uuid.uuid4())
+            intimacoes.append((iid, 'c' * (50 if n % 2 else 150), 'OCULTAR' if n % 3 else 'URGÊNCIA'))
+            analises.append((
+                str(uuid.uuid4()), iid, 'p1' if n % 4 else 'p2', f'2025-01-{1 + n % 28:02d}T10:00:00',
+                bool(n % 3),
+            ))
+        with data.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO intimacoes (id, contexto, classificacao_manual, data_criacao) "
+                "VALUES (?, ?, ?, '2025-01-01')",
+                intimacoes,
+            )
+            conn.executemany(
+                "INSERT INTO analises (id, intimacao_id, prompt_id, data_analise, acertou, resultado_ia, "
+                "modelo, temperatura, tempo_processamento, prompt_completo, resposta_completa) "
+                "VALUES (?, ?, ?, ?, ?, 'OCULTAR', 'gpt-4o', 0.25, 1.5, 'PROMPT', 'RESPOSTA')",
+                analises,
+            )
+            conn.commit()
+        export = ExportService()
+        export.data_service = data
+        yield export
+
+
+def _texto(response):
+    return ''.join(
+        c.decode('utf-8') if isinstance(c, bytes) else c for c in response.response
+    )
+
+
+def test_csv_streaming_layout_e_filtros(svc):
+    response = svc.exportar_analises_streaming('csv', prompt_id='p1', classificacao='OCULTAR')
+    assert response.is_streamed
+    linhas = list(csv.reader(io.StringIO(_texto(response))))
+    assert linhas[0] == CABECALHO_CSV_ANALISES
+    corpo = linhas[1:]
+    esperado = sum(1 for n in range(1203) if n % 4 and n % 3)
+    assert len(corpo) == esperado
+    assert {l[3] for l in corpo} == {'Prompt 1'}
+    assert {l[4] for l in corpo} == {'OCULTAR'}
+    assert {l[6] for l in corpo} == {'Sim'}
+    assert {l[8] for l in corpo} == {'0.2'}
+    assert all(len(l[2]) in (50, 103) for l in corpo)
+
+
+def test_jsonl_tipado_com_conteudos_completos_opcionais(svc):
+    texto = _texto(svc.exportar_analises_streaming('jsonl', data_inicio='2025-01-01', data_fim='2025-01-01'))
+    registros = [json.loads(l) for l in texto.splitlines()]
+    assert len(registros) == sum(1 for n in range(1203) if n % 28 == 0)
+    assert isinstance(registros[0]['acertou'], bool)
+    assert registros[0]['temperatura'] == 0.25
+    assert 'resposta_completa' not in registros[0]
+
+    texto = _texto(svc.exportar_analises_streaming('jsonl', prompt_id='p2', conteudos_completos=True))
+    registro = json.loads(texto.splitlines()[0])
+    assert (registro['prompt_completo'], registro['resposta_completa']) == ('PROMPT', 'RESPOSTA')
+
+
+def test_gerador_emite_blocos_sem_materializar(svc):
+    blocos = list(svc.gerar_csv_analises(svc.data_service.iterar_analises_exportacao()))
+    assert len(blocos) > 2
+
+
+def test_formato_invalido(svc):
+    with pytest.raises(ValueError):
+        svc.exportar_analises_streaming('xml')
+
+
+def test_rota_exportar_analises_jsonl_streaming(svc):
+    import app as m
+
+    m.app.config['TESTING'] = True
+    original = m.export_service.data_service
+    m.export_service.data_service = svc.data_service
+    try:
+        with m.app.test_client() as c:
+            resp = c.get('/exportar?tipo=analises&formato=jsonl&prompt_id=p2')
+            assert resp.status_code == 200
+            assert resp.is_streamed
+            assert resp.mimetype == 'application/x-ndjson'
+            assert len(resp.get_data(as_text=True).splitlines()) == sum(1 for n in range(1203) if n % 4 == 0)
+    finally:
+        m.export_service.data_service = original
+
+
+def test_paginacao_por_chave_sem_conexao_aberta_entre_paginas(svc):
+    data = svc.data_service
+    with data.get_connection() as conn:
+        esperado = [r[0] for r in conn.execute(
+            "SELECT id FROM analises WHERE prompt_id = 'p1' ORDER BY data_analise DESC, id DESC")]
+
+    analises = data.iterar_analises_exportacao(prompt_id='p1', tamanho_lote=100)
+    primeira = next(analises)
+    # entre um yield e outro nenhuma conexão segura o portão: a conexão exclusiva sai na hora
+    with data.conexao_exclusiva(prazo_segundos=0.2):
+        pass
+    assert [primeira['id']] + [a['id'] for a in analises] == esperado
+    # páginas que terminam exatamente no fim do resultado
+    assert len(list(data.iterar_analises_exportacao(prompt_id='p1', tamanho_lote=len(esperado)))) == len(esperado)
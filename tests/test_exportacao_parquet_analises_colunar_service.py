@@ -0,0 +1,104 @@
+"""Exportação Parquet das análises: tipos, dictionary encoding, lotes e filtros."""
+
+import os
+import tempfile
+import uuid
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from services.exportacao_parquet_analises_colunar_service import (  # noqa: E402
+    esquema_parquet_analises,
+    exportar_analises_parquet,
+)
+from services.sqlite_service import SQLiteService  # noqa: E402
+
+
+@pytest.fixture()
+def data():
+    with tempfile.TemporaryDirectory() as tmp:
+        svc = SQLiteService(db_path=os.path.join(tmp, 'test.db'))
+        svc.save_prompt({'id': 'p1', 'nome': 'Prompt 1', 'conteudo': 'x'})
+        intimacoes, analises = [], []
+        for n in range(2500):
+            iid = str(uuid.uuid4())
+            intimacoes.append((iid, 'contexto ' * 20, 'OCULTAR' if n % 3 else 'URGÊNCIA'))
+            analises.append((
+                str(uuid.uuid4()), iid, f'2025-02-{1 + n % 28:02d}T08:30:00.123456',
+                n % 2, 0.5 + n, 100 + n, n % 50, 0.000123 * n,
+            ))
+        with svc.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO intimacoes (id, contexto, classificacao_manual, data_criacao) "
+                "VALUES (?, ?, ?, '2025-01-01')",
+                intimacoes,
+            )
+            conn.executemany(
+                "INSERT INTO analises (id, intimacao_id, prompt_id, data_analise, acertou, resultado_ia, "
+                "modelo, temperatura, tempo_processamento, tokens_input, tokens_output, custo_real) "
+                "VALUES (?, ?, 'p1', ?, ?, 'OCULTAR', 'gpt-4o', 0.0, ?, ?, ?, ?)",
+                analises,
+            )
+            conn.commit()
+        yield svc, tmp
+
+
+def test_tipos_e_dictionary_encoding(data):
+    svc, tmp = data
+    destino = os.path.join(tmp, 'a.parquet')
+    resumo = exportar_analises_parquet(svc, destino, tamanho_lote=1000)
+    assert resumo == {'linhas': 2500, 'lotes': 3}
+
+    arquivo = pq.ParquetFile(destino)
+    assert arquivo.metadata.num_row_groups == 3
+    assert arquivo.schema_arrow == esquema_parquet_analises()
+    tabela = arquivo.read()
+    assert tabela.schema.field('data_analise').type == pa.timestamp('us')
+    assert pa.types.is_dictionary(tabela.schema.field('modelo').type)
+    assert (tabela.column('tokens_input').type, tabela.column('acertou').type) == (pa.int64(), pa.bool_())
+    assert set(tabela.column('classificacao_manual').to_pylist()) == {'OCULTAR', 'URGÊNCIA'}
+    colunas_meta = arquivo.metadata.row_group(0)
+    nomes = [colunas_meta.column(i).path_in_schema for i in range(colunas_meta.num_columns)]
+    meta_modelo = colunas_meta.column(nomes.index('modelo'))
+    assert 'RLE_DICTIONARY' in meta_modelo.encodings or 'PLAIN_DICTIONARY' in meta_modelo.encodings
+    assert meta_modelo.compression == 'ZSTD'
+
+
+def test_filtros_e_contexto_opcional(data):
+    svc, tmp = data
+    destino = os.path.join(tmp, 'b.parquet')
+    exportar_analises_parquet(
+        svc, destino, compressao='none', incluir_contexto=True,
+        classificacao_manual='URGÊNCIA', data_inicio='2025-02-01', data_fim='2025-02-01',
+    )
+    tabela = pq.read_table(destino)
+    esperado = sum(1 for n in range(2500) if n % 3 == 0 and n % 28 == 0)
+    assert tabela.num_rows == esperado
+    assert 'contexto' in tabela.column_names
+
+
+def test_sem_linhas_gera_arquivo_com_schema(data):
+    svc, tmp = data
+    destino = os.path.join(tmp, 'c.parquet')
+    assert exportar_analises_parquet(svc, destino, prompt_id='inexistente')['linhas'] == 0
+    assert pq.read_table(destino).num_rows == 0
+
+
+def test_rota_exportar_formato_parquet(data):
+    import app as m
+
+    svc, tmp = data
+    m.app.config['TESTING'] = True
+    original = m.export_service.data_service
+    m.export_service.data_service = svc
+    try:
+        with m.app.test_client() as c:
+            resp = c.get('/exportar?tipo=analises&formato=parquet&classificacao=URGÊNCIA')
+            assert resp.status_code == 200
+            conteudo = resp.get_data()
+            resp.close()
+        assert pq.read_table(pa.BufferReader(conteudo)).num_rows == sum(1 for n in range(2500) if n % 3 == 0)
+    finally:
+        m.export_service.data_service = original
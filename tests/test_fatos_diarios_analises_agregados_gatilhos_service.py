@@ -0,0 +1,103 @@
+"""fatos_diarios mantida pelos gatilhos: sempre igual à reconstrução a partir de analises."""
+
+import sqlite3
+
+import pytest
+
+from services.fatos_diarios_analises_agregados_gatilhos_service import reconstruir_fatos_diarios
+from services.sqlite_service import SQLiteService
+
+
+def _fatos(conn):
+    return sorted(
+        tuple(round(v, 9) if isinstance(v, float) else v for v in linha)
+        for linha in conn.execute('SELECT * FROM fatos_diarios')
+    )
+
+
+def _assert_fatos_consistentes(svc):
+    with sqlite3.connect(svc.db_path) as conn:
+        incrementais = _fatos(conn)
+        reconstruir_fatos_diarios(conn)
+        assert incrementais == _fatos(conn)
+        conn.rollback()
+    return incrementais
+
+
+@pytest.fixture
+def svc(tmp_path):
+    svc = SQLiteService(db_path=str(tmp_path / 't.db'))
+    svc.save_prompt({'id': 'p1', 'nome': 'Prompt 1', 'conteudo': 'x'})
+    for iid, classificacao in (('i1', 'RECURSO'), ('i2', 'CIÊNCIA')):
+        svc.save_intimacao({'id': iid, 'contexto': 'c' * 50, 'classificacao_manual': classificacao})
+    return svc
+
+
+def _analise(svc, aid, iid, dia, acertou, **extra):
+    svc.save_analise({
+        'id': aid, 'intimacao_id': iid, 'prompt_id': 'p1', 'prompt_nome': 'Prompt 1',
+        'data_analise': f'{dia}T10:00:00', 'resultado_ia': 'RECURSO', 'acertou': acertou,
+        'modelo': 'gpt-4o', 'provider': 'openai', 'tempo_processamento': 1.5,
+        'custo_real': 0.01, 'tokens_input': 100, 'tokens_output': 20, **extra,
+    })
+
+
+def test_insert_replace_update_e_delete_de_analises(svc):
+    _analise(svc, 'a1', 'i1', '2026-03-01', True)
+    _analise(svc, 'a2', 'i1', '2026-03-01', True)
+    _analise(svc, 'a3', 'i2', '2026-03-02', False)
+    fatos = _assert_fatos_consistentes(svc)
+    assert [(f[0], f[5], f[7], f[8]) for f in fatos] == [
+        ('2026-03-01', 'RECURSO', 2, 2),
+        ('2026-03-02', 'CIÊNCIA', 1, 0),
+    ]
+
+    # save_analise usa INSERT OR REPLACE: a linha antiga é descontada, não somada de novo
+    _analise(svc, 'a2', 'i1', '2026-03-05', False, resultado_ia='CIÊNCIA')
+    _assert_fatos_consistentes(svc)
+
+    with sqlite3.connect(svc.db_path) as conn:
+        conn.execute("UPDATE analises SET custo_real = 0.5, acertou = 1 WHERE id = 'a3'")
+        conn.execute("UPDATE analises SET prompt_completo = 'só texto' WHERE id = 'a1'")
+    _assert_fatos_consistentes(svc)
+
+    svc.delete_analise('a1')
+    fatos = _assert_fatos_consistentes(svc)
+    assert '2026-03-01' not in {f[0] for f in fatos}
+
+
+def test_classificacao_manual_da_intimacao_move_as_analises(svc):
+    _analise(svc, 'a1', 'i1', '2026-03-01', True)
+    _analise(svc, 'a2', 'i1', '2026-03-02', True)
+    _analise(svc, 'a3', 'sem-intimacao', '2026-03-02', False)
+
+    svc.save_intimacao({'id': 'i1', 'contexto': 'c' * 50, 'classificacao_manual': 'CIÊNCIA'})
+    fatos = _assert_fatos_consistentes(svc)
+    assert {f[5] for f in fatos} == {'CIÊNCIA', ''}
+
+    with sqlite3.connect(svc.db_path) as conn:
+        conn.execute("UPDATE intimacoes SET classificacao_manual = 'RECURSO' WHERE id = 'i1'")
+    _assert_fatos_consistentes(svc)
+
+    svc.save_intimacao({'id': 'sem-intimacao', 'contexto': 'c' * 50, 'classificacao_manual': 'ARQUIVAR'})
+    _assert_fatos_consistentes(svc)
+
+    svc.delete_intimacao('i1')
+    fatos = _assert_fatos_consistentes(svc)
+    assert {f[5] for f in fatos} == {'ARQUIVAR'}
+
+
+def test_totais_do_dashboard_e_estatisticas_vem_dos_fatos(svc):
+    _analise(svc, 'a1', 'i1', '2026-03-01', True)
+    _analise(svc, 'a2', 'i2', '2026-03-01', False)
+    svc.excluir_sessao_analise('inexistente')
+
+    stats = svc.get_statistics()
+    assert stats['total_analises'] == 2
+    assert stats['acuracia_geral'] == 50.0
+    assert svc.get_dashboard_resumo_graficos()['status_analises']['Concluída'] == 2
+
+    agregados = svc.obter_agregados_relatorios_filtrados(data_inicio='2026-03-01', data_fim='2026-03-01')
+    assert agregados['total_analises'] == 2
+    assert agregados['distribuicao_manual'] == {'CIÊNCIA': 1, 'RECURSO': 1}
+    assert agregados['performance_prompts']['Prompt 1']['acuracia'] == 50.0
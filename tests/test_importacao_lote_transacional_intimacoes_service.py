@@ -0,0 +1,136 @@
+"""Importação em lote de intimações: validação prévia, duplicidade em conjunto, executemany e tudo ou nada."""
+
+import os
+import tempfile
+
+import pytest
+
+from services.importacao_lote_transacional_intimacoes_service import (
+    MENSAGEM_NAO_GRAVADO_TUDO_OU_NADA,
+    importar_registros_intimacoes_lote,
+    sincronizar_registros_intimacoes_lote,
+)
+from services.sqlite_service import SQLiteService
+
+
+def _montar(reg):
+    if not reg.get('contexto'):
+        raise ValueError('contexto obrigatório')
+    dados = {'contexto': reg['contexto'], 'classificacao_manual': 'OCULTAR', 'status': reg.get('status')}
+    if reg.get('intimacaoId'):
+        dados['intimacao_id_externo'] = reg['intimacaoId']
+    return dados
+
+
+@pytest.fixture()
+def svc():
+    with tempfile.TemporaryDirectory() as tmp:
+        data = SQLiteService(db_path=os.path.join(tmp, 'test.db'))
+        data.save_intimacao({'contexto': 'existente', 'intimacao_id_externo': 'EXT-0'})
+        yield data
+
+
+def _total(svc):
+    with svc.get_connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM intimacoes').fetchone()[0]
+
+
+def test_desfecho_por_registro_e_duplicidades(svc):
+    registros = [
+        {'contexto': 'a', 'intimacaoId': 'EXT-1'},
+        {'contexto': 'b', 'intimacaoId': 'EXT-0'},  # já cadastrada
+        'texto',
+        {'contexto': ''},
+        {'contexto': 'c', 'intimacaoId': 'EXT-1'},  # repetida no lote
+    ] + [{'contexto': f'x{n}', 'intimacaoId': f'N{n}'} for n in range(2500)]
+    resumo = importar_registros_intimacoes_lote(svc, registros, _montar, tamanho_lote=700)
+
+    assert (resumo['importados'], resumo['falhas'], resumo['abortado']) == (2501, 4, False)
+    r = resumo['resultados']
+    assert r[0]['sucesso'] and r[0]['id']
+    assert 'já cadastrada' in r[1]['erro']
+    assert r[2]['erro'] == 'Item não é um objeto JSON.'
+    assert r[3]['erro'] == 'contexto obrigatório'
+    assert 'repetido no lote (já usado no índice 0)' in r[4]['erro']
+    assert _total(svc) == 2502
+    assert svc.get_id_por_intimacao_id_externo('N2499') == r[-1]['id']
+
+
+def test_tudo_ou_nada_nao_grava_com_falha_de_validacao(svc):
+    registros = [{'contexto': 'a', 'intimacaoId': 'A'}, {'contexto': 'b', 'intimacaoId': 'EXT-0'}]
+    resumo = importar_registros_intimacoes_lote(svc, registros, _montar, tudo_ou_nada=True)
+    assert (resumo['importados'], resumo['abortado']) == (0, True)
+    assert resumo['resultados'][0]['erro'] == MENSAGEM_NAO_GRAVADO_TUDO_OU_NADA
+    assert _total(svc) == 1
+
+
+def test_tudo_ou_nada_desfaz_blocos_ja_inseridos(svc):
+    dados = [{'contexto': str(n)} for n in range(10)]
+    dados[7]['id'] = dados[2]['id'] = 'mesmo-id'  # viola a PK no segundo bloco
+    resultados = svc.inserir_intimacoes_lote(dados, tudo_ou_nada=True, tamanho_lote=5)
+    assert all('erro' in r for r in resultados)
+    assert _total(svc) == 1
+
+
+def test_sem_tudo_ou_nada_isola_registro_com_erro_no_bloco(svc):
+    dados = [{'contexto': str(n)} for n in range(10)]
+    dados[7]['id'] = dados[2]['id'] = 'mesmo-id'
+    resultados = svc.inserir_intimacoes_lote(dados, tamanho_lote=5)
+    assert [n for n, r in enumerate(resultados) if 'erro' in r] == [7]
+    assert _total(svc) == 10
+
+
+def test_dry_run_valida_duplicidade_sem_gravar(svc):
+    registros = [{'contexto': 'a', 'intimacaoId': 'EXT-0'}, {'contexto': 'b'}]
+    resumo = importar_registros_intimacoes_lote(svc, registros, _montar, dry_run=True)
+    assert (resumo['validados'], resumo['falhas']) == (1, 1)
+    assert resumo['resultados'][1]['dry_run'] is True
+    assert _total(svc) == 1
+
+
+def test_sincronizacao_insere_atualiza_so_o_que_mudou_e_e_idempotente(svc):
+    registros = [{'contexto': f'c{n}', 'intimacaoId': f'S{n}', 'status': 'novo'} for n in range(1500)]
+    primeira = sincronizar_registros_intimacoes_lote(svc, registros, _montar)
+    assert (primeira['inseridos'], primeira['atualizados'], primeira['inalterados']) == (1500, 0, 0)
+
+    id_s7 = svc.get_id_por_intimacao_id_externo('S7')
+    with svc.get_connection() as conn:
+        conn.execute("UPDATE intimacoes SET observacoes = 'nota local' WHERE id = ?", (id_s7,))
+        conn.commit()
+
+    registros[7]['status'] = 'lido'
+    registros.append({'contexto': 'nova', 'intimacaoId': 'S-NOVA'})
+    registros.append({'contexto': 'sem id'})
+    segunda = sincronizar_registros_intimacoes_lote(svc, registros, _montar)
+    assert (segunda['inseridos'], segunda['atualizados'], segunda['inalterados'], segunda['falhas']) == (1, 1, 1499, 1)
+    r7 = segunda['resultados'][7]
+    assert (r7['acao'], r7['colunas_alteradas'], r7['id']) == ('atualizada', ['status'], id_s7)
+    assert 'intimacaoId obrigatório' in segunda['resultados'][-1]['erro']
+    intimacao = svc.get_intimacao_by_id(id_s7)
+    assert (intimacao['status'], intimacao['observacoes']) == ('lido', 'nota local')
+
+    terceira = sincronizar_registros_intimacoes_lote(svc, registros[:-1], _montar)
+    assert (terceira['inseridos'], terceira['atualizados'], terceira['inalterados']) == (0, 0, 1501)
+    assert _total(svc) == 1502
+
+
+def test_sincronizacao_registro_sem_hash_e_dry_run(svc):
+    with svc.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO intimacoes (id, contexto, classificacao_manual, informacao_adicional, processo, "
+            "orgao_julgador, classe, disponibilizacao, intimado, status, prazo, defensor, id_tarefa, "
+            "cor_etiqueta, smart_context, data_criacao, intimacao_id_externo, regras_usuario_prioridade_alta) "
+            "VALUES ('antigo', 'a', 'OCULTAR', '', '', '', '', '', '', NULL, '', '', '', '', 0, '2024-01-01', 'H1', '')"
+        )
+        conn.commit()
+    registros = [{'contexto': 'a', 'intimacaoId': 'H1'}, {'contexto': 'b', 'intimacaoId': 'H1'}]
+    previa = sincronizar_registros_intimacoes_lote(svc, registros[:1] + [{'contexto': 'x', 'intimacaoId': 'H2'}],
+                                                   _montar, dry_run=True)
+    assert [r['acao'] for r in previa['resultados']] == ['inalterada', 'inserida']
+    assert _total(svc) == 2
+
+    resumo = sincronizar_registros_intimacoes_lote(svc, registros, _montar)
+    assert resumo['resultados'][0]['acao'] == 'inalterada'
+    assert 'repetido no lote' in resumo['resultados'][1]['erro']
+    with svc.get_connection() as conn:
+        assert conn.execute("SELECT hash_conteudo FROM intimacoes WHERE id = 'antigo'").fetchone()[0]
@@ -0,0 +1,164 @@
+"""Instrumentação: resumos com quantis, consultas lentas com plano, métodos do SQLiteService, provedores e /metrics."""
+
+import logging
+
+import pytest
+
+import services.instrumentacao_metricas_latencia_consultas_lentas_prometheus_service as instrumentacao
+from services.ai_service_interface import AIServiceInterface
+from services.instrumentacao_metricas_latencia_consultas_lentas_prometheus_service import (
+    METRICA_CONSULTAS_LENTAS,
+    METRICA_METODOS_SQLITE,
+    METRICA_PROVEDORES_IA,
+    METRICA_ROTAS,
+    RegistroMetricas,
+    registro_metricas,
+)
+from services.sqlite_service import SQLiteService
+
+
+@pytest.fixture(autouse=True)
+def _registro_limpo():
+    registro_metricas.limpar()
+    yield
+    registro_metricas.limpar()
+    instrumentacao.definir_limite_consulta_lenta(instrumentacao.LIMITE_CONSULTA_LENTA_MS_PADRAO)
+
+
+@pytest.fixture
+def svc(tmp_path):
+    return SQLiteService(db_path=str(tmp_path / 'database.db'))
+
+
+def test_resumo_com_quantis_sobre_a_janela_e_exportacao():
+    registro = RegistroMetricas(janela=100)
+    for k in range(1, 201):
+        registro.observar('latencia', k / 1000, rota='/x')
+    registro.incrementar('bytes_total', 10, rota='/x')
+    registro.incrementar('bytes_total', 5, rota='/x')
+
+    resumo = registro.resumo('latencia', rota='/x')
+    # contagem e soma acumulam tudo; os quantis só as últimas 100 observações (101..200 ms)
+    assert resumo['contagem'] == 200 and resumo['soma'] == pytest.approx(20.1)
+    assert (resumo['p50'], resumo['p99']) == (0.151, 0.2)
+
+    texto = registro.exportar_prometheus()
+    assert '# TYPE latencia summary' in texto
+    assert 'latencia{rota="/x",quantile="0.95"} 0.196' in texto
+    assert 'latencia_count{rota="/x"} 200' in texto
+    assert 'bytes_total{rota="/x"} 15' in texto
+
+
+def test_cronometrar_marca_erro_e_propaga():
+    registro = RegistroMetricas()
+    with pytest.raises(ZeroDivisionError):
+        with registro.cronometrar('op', nome='a'):
+            1 / 0
+    assert registro.resumo('op', nome='a', resultado='erro')['contagem'] == 1
+
+
+def test_consulta_lenta_vai_para_o_log_com_o_plano(svc, caplog):
+    instrumentacao.definir_limite_consulta_lenta(0)
+    with caplog.at_level(logging.WARNING, logger='instrumentacao.sql'):
+        with svc.get_connection() as conn:
+            conn.execute('SELECT * FROM intimacoes WHERE contexto = ?', ('x',)).fetchall()
+
+    mensagens = [r.getMessage() for r in caplog.records if 'FROM intimacoes WHERE contexto' in r.getMessage()]
+    assert mensagens and 'SCAN intimacoes' in mensagens[0]
+    assert registro_metricas.contador(METRICA_CONSULTAS_LENTAS, operacao='SELECT') >= 1
+
+
+def test_abaixo_do_limite_nada_e_registrado(svc, caplog):
+    instrumentacao.definir_limite_consulta_lenta(60_000)
+    with caplog.at_level(logging.WARNING, logger='instrumentacao.sql'):
+        svc.get_statistics()
+    assert not caplog.records
+    assert registro_metricas.contador(METRICA_CONSULTAS_LENTAS, operacao='SELECT') == 0
+
+
+def test_metodos_publicos_do_sqlite_service_sao_cronometrados(svc):
+    svc.save_prompt({'id': 'p', 'nome': 'P', 'conteudo': 'x'})
+    svc.get_all_prompts()
+    with pytest.raises(Exception):
+        svc.save_prompt(None)
+
+    assert registro_metricas.resumo(METRICA_METODOS_SQLITE, metodo='get_all_prompts', resultado='ok')['contagem'] == 1
+    assert registro_metricas.resumo(METRICA_METODOS_SQLITE, metodo='save_prompt', resultado='ok')['contagem'] == 1
+    assert registro_metricas.resumo(METRICA_METODOS_SQLITE, metodo='save_prompt', resultado='erro')['contagem'] == 1
+    # context managers e geradores ficam de fora
+    assert SQLiteService.get_connection.__name__ == 'get_connection'
+    assert registro_metricas.resumo(METRICA_METODOS_SQLITE, metodo='get_connection', resultado='ok') is None
+
+
+def test_subclasse_de_provedor_tem_chamadas_cronometradas():
+    class FalsoService(AIServiceInterface):
+        def __init__(self):
+            pass
+
+        def analisar_intimacao(self, contexto, prompt, **kwargs):
+            return {'resultado': contexto}
+
+        def test_connection(self):
+            raise ConnectionError('offline')
+
+        def initialize_client(self):
+            return True
+
+        def get_available_models(self):
+            return []
+
+        def get_provider_name(self):
+            return 'Falso'
+
+        def get_default_parameters(self):
+            return {}
+
+        def validate_parameters(self, parametros):
+            return parametros
+
+        def analyze_text(self, prompt, modelo='x', temperatura=0.1, max_tokens=500):
+            return prompt
+
+    provedor = FalsoService()
+    assert provedor.analisar_intimacao('c', 'p') == {'resultado': 'c'}
+    with pytest.raises(ConnectionError):
+        provedor.test_connection()
+
+    assert registro_metricas.resumo(METRICA_PROVEDORES_IA, provedor='falso', operacao='analisar_intimacao',
+                                    resultado='ok')['contagem'] == 1
+    assert registro_metricas.resumo(METRICA_PROVEDORES_IA, provedor='falso', operacao='test_connection',
+                                    resultado='erro')['contagem'] == 1
+
+
+def test_rota_metrics_exporta_latencia_das_rotas(svc, monkeypatch):
+    import app as m
+
+    monkeypatch.setattr(m, 'data_service', svc)
+    with m.app.test_client() as client:
+        assert client.get('/api/backup/stats').status_code == 200
+        resposta = client.get('/metrics')
+
+    texto = resposta.get_data(as_text=True)
+    assert resposta.content_type.startswith('text/plain; version=0.0.4')
+    assert f'{METRICA_ROTAS}_count{{metodo="GET",rota="/api/backup/stats",status="200"}} 1' in texto
+    assert 'http_resposta_bytes_total{rota="/api/backup/stats"}' in texto
+    assert 'sqlite_cache_consultas_acertos' in texto
+
+
+def test_rota_com_excecao_nao_tratada_conta_como_500(monkeypatch):
+    import app as m
+
+    def _falhar():
+        raise RuntimeError('falha')
+
+    monkeypatch.setitem(m.app.view_functions, 'stats_banco', _falhar)
+    for propagar in (False, True):
+        monkeypatch.setitem(m.app.config, 'PROPAGATE_EXCEPTIONS', propagar)
+        with m.app.test_client() as client:
+            if propagar:
+                with pytest.raises(RuntimeError):
+                    client.get('/api/backup/stats')
+            else:
+                assert client.get('/api/backup/stats').status_code == 500
+
+    assert registro_metricas.resumo(METRICA_ROTAS, metodo='GET', rota='/api/backup/stats', status='500')['contagem'] == 2
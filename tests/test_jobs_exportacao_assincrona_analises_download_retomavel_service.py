@@ -0,0 +1,148 @@
+"""Jobs de exportação assíncrona: progresso, arquivo em exports/, download com Range e retenção."""
+
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import pytest
+
+from services.export_service import ExportService
+from services.jobs_exportacao_assincrona_analises_download_retomavel_service import (
+    PREFIXO_ARQUIVO_JOB,
+    STATUS_CONCLUIDO,
+    GerenciadorJobsExportacao,
+    JobExportacaoExpiradoError,
+    JobExportacaoNaoEncontradoError,
+)
+from services.sqlite_service import SQLiteService
+
+
+@pytest.fixture()
+def gerenciador():
+    with tempfile.TemporaryDirectory() as tmp:
+        data = SQLiteService(db_path=os.path.join(tmp, 'test.db'))
+        data.save_prompt({'id': 'p1', 'nome': 'Prompt 1', 'conteudo': 'x'})
+        intimacoes, analises = [], []
+        for n in range(2500):
+            iid = str(uuid.uuid4())
+            intimacoes.append((iid, 'contexto', 'OCULTAR' if n % 2 else 'URGÊNCIA'))
+            analises.append((str(uuid.uuid4()), iid, f'2025-04-{1 + n % 28:02d}T10:00:00'))
+        with data.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO intimacoes (id, contexto, classificacao_manual, data_criacao) "
+                "VALUES (?, ?, ?, '2025-01-01')",
+                intimacoes,
+            )
+            conn.executemany(
+                "INSERT INTO analises (id, intimacao_id, prompt_id, data_analise, acertou, resultado_ia, "
+                "modelo, temperatura, tempo_processamento) VALUES (?, ?, 'p1', ?, 1, 'OCULTAR', 'gpt-4o', 0, 1)",
+                analises,
+            )
+            conn.commit()
+        export = ExportService()
+        export.data_service = data
+        export.config.EXPORT_DIR = os.path.join(tmp, 'exports')
+        g = GerenciadorJobsExportacao(export)
+        yield g
+        g.encerrar()
+
+
+def test_job_jsonl_com_progresso_e_filtros(gerenciador):
+    job = gerenciador.criar_job('jsonl', classificacao='OCULTAR')
+    final = gerenciador.aguardar(job['job_id'])
+    assert final['status'] == STATUS_CONCLUIDO
+    assert (final['linhas_processadas'], final['total_estimado'], final['progresso']) == (1250, 1250, 100.0)
+    caminho = gerenciador.caminho_arquivo_concluido(job['job_id'])
+    assert os.path.basename(caminho) == f"{PREFIXO_ARQUIVO_JOB}{job['job_id']}.jsonl"
+    with open(caminho, encoding='utf-8') as f:
+        registros = [json.loads(l) for l in f]
+    assert len(registros) == 1250
+    assert not any(n.endswith('.parcial') for n in os.listdir(gerenciador.diretorio))
+
+
+def test_job_concluido_localizado_apos_reinicio(gerenciador):
+    job = gerenciador.aguardar(gerenciador.criar_job('csv')['job_id'])
+    novo = GerenciadorJobsExportacao(gerenciador.export_service)
+    try:
+        recuperado = novo.obter_job(job['job_id'])
+        assert (recuperado['status'], recuperado['tamanho_bytes']) == (STATUS_CONCLUIDO, job['tamanho_bytes'])
+        with pytest.raises(JobExportacaoNaoEncontradoError):
+            novo.obter_job('../etc')
+    finally:
+        novo.encerrar()
+
+
+def test_formato_invalido(gerenciador):
+    with pytest.raises(ValueError):
+        gerenciador.criar_job('xml')
+
+
+def test_retencao_por_idade_e_tamanho_preserva_outros_arquivos(gerenciador):
+    os.makedirs(gerenciador.diretorio, exist_ok=True)
+    agora = time.time()
+    for i, idade_horas in enumerate((100, 10, 5, 1)):
+        caminho = os.path.join(gerenciador.diretorio, f'{PREFIXO_ARQUIVO_JOB}{i:032x}.csv')
+        with open(caminho, 'wb') as f:
+            f.write(b'x' * 1000)
+        os.utime(caminho, (agora - idade_horas * 3600,) * 2)
+    outro = os.path.join(gerenciador.diretorio, 'historico_sessao.csv')
+    with open(outro, 'wb') as f:
+        f.write(b'x' * 10000)
+    os.utime(outro, (agora - 1000 * 3600,) * 2)
+
+    gerenciador.retencao_max_bytes = 2000
+    removidos = gerenciador.aplicar_retencao(agora=agora)
+    # 100h passa da idade; depois, os mais antigos saem até o total caber em 2000 bytes
+    assert removidos == [f'{PREFIXO_ARQUIVO_JOB}{0:032x}.csv', f'{PREFIXO_ARQUIVO_JOB}{1:032x}.csv']
+    assert os.path.exists(outro)
+
+
+def test_rota_download_com_range(gerenciador):
+    import app as m
+
+    m.app.config['TESTING'] = True
+    original = m.jobs_exportacao
+    m.jobs_exportacao = gerenciador
+    try:
+        with m.app.test_client() as c:
+            resp = c.post('/api/exportacoes/jobs', json={'formato': 'csv', 'prompt_id': 'p1'})
+            assert resp.status_code == 202
+            job_id = resp.get_json()['job']['job_id']
+            gerenciador.aguardar(job_id)
+            assert c.get(f'/api/exportacoes/jobs/{job_id}').get_json()['job']['status'] == STATUS_CONCLUIDO
+
+            completo = c.get(f'/api/exportacoes/jobs/{job_id}/download')
+            assert completo.status_code == 200
+            assert completo.headers['Accept-Ranges'] == 'bytes'
+            corpo = completo.get_data()
+            completo.close()
+
+            parcial = c.get(f'/api/exportacoes/jobs/{job_id}/download', headers={'Range': 'bytes=100-'})
+            assert parcial.status_code == 206
+            assert parcial.get_data() == corpo[100:]
+            parcial.close()
+
+            assert c.get('/api/exportacoes/jobs/inexistente/download').status_code == 404
+
+            # retenção remove o arquivo: o job sai da tabela e as rotas respondem 410
+            gerenciador.retencao_max_bytes = 0
+            assert gerenciador.aplicar_retencao() == [f'{PREFIXO_ARQUIVO_JOB}{job_id}.csv']
+            assert gerenciador.listar_jobs() == []
+            assert c.get(f'/api/exportacoes/jobs/{job_id}').status_code == 410
+            assert c.get(f'/api/exportacoes/jobs/{job_id}/download').status_code == 410
+    finally:
+        m.jobs_exportacao = original
+
+
+def test_job_com_erro_antigo_sai_da_tabela(gerenciador):
+    gerenciador.export_service.data_service = None  # _executar falha ao contar as análises
+    job_id = gerenciador.criar_job(formato='csv')['job_id']
+    assert gerenciador.aguardar(job_id)['status'] == 'erro'
+
+    gerenciador.aplicar_retencao()
+    assert gerenciador.obter_job(job_id)['status'] == 'erro'
+    gerenciador.aplicar_retencao(agora=time.time() + (gerenciador.retencao_max_idade_horas + 1) * 3600)
+    with pytest.raises(JobExportacaoExpiradoError):
+        gerenciador.obter_job(job_id)
@@ -0,0 +1,152 @@
+"""Leitura incremental de content[] e transformação em streaming do export de feedback (NDJSON/importação)."""
+
+import io
+import json
+
+import pytest
+
+from services.leitura_incremental_itens_array_content_json_grande_service import (
+    ConteudoJsonIncrementalError,
+    iterar_itens_content,
+)
+from services.triagem_feedback_transformacao_json_para_importacao_intimacoes_service import (
+    LAYOUT_FEEDBACK_POS_2026_03_25,
+    iter_feedback_stream_registros,
+    transform_feedback_json_text,
+    transform_feedback_stream_to_ndjson,
+)
+
+
+def _item(n, sucesso=True):
+    return {
+        "feedback": {"sucesso": sucesso},
+        "triagem": {
+            "intimacaoId": f"ext-{n}",
+            "status": "CONCLUIDO",
+            "numeroProcesso": f"000{n}-99.2024.8.01.0001",
+            "orgaoJulgador": "1ª Vara Cível",
+            "classe": "Apelação",
+            "intimados": ["Fulano"],
+            "prazo": 15,
+            "nomeDefensor": "Dr. Silva",
+            "contexto": "Contexto " + "x" * 250 + " {com [chaves]} e \\\\ barra",
+            "triagemResultado": "ELABORAR_PECA",
+            "prompt": "",
+        },
+    }
+
+
+@pytest.mark.parametrize("tamanho_bloco", [1, 5, 64, 1 << 20])
+def test_itens_iguais_ao_json_loads_em_qualquer_tamanho_de_bloco(tamanho_bloco):
+    doc = {
+        "pageable": {"content": ["falso"]},
+        "content": [{"a": 'b"}]{', "n": [1, {"z": "\\"}]}, 5, "s]", None, {}],
+        "totalElements": 5,
+    }
+    texto = json.dumps(doc, indent=2)
+    itens = list(iterar_itens_content(io.StringIO(texto), tamanho_bloco=tamanho_bloco))
+    assert [i for i, _ in itens] == [1, 2, 3, 4, 5]
+    assert [json.loads(t) for _, t in itens] == doc["content"]
+
+
+def test_sem_content_ou_truncado():
+    with pytest.raises(ConteudoJsonIncrementalError, match="chave 'content'"):
+        list(iterar_itens_content(io.StringIO('{"outra": [1, 2]}')))
+    with pytest.raises(ConteudoJsonIncrementalError, match="truncado"):
+        list(iterar_itens_content(io.StringIO('{"content": [{"a": 1}, {"b": ')))
+
+
+def test_stream_equivale_a_transformacao_em_memoria():
+    doc = {"content": [_item(1), _item(2, sucesso="talvez"), "solto", _item(3)]}
+    texto = json.dumps(doc, ensure_ascii=False)
+    payload, issues = transform_feedback_json_text(texto, layout=LAYOUT_FEEDBACK_POS_2026_03_25)
+
+    saida = io.StringIO()
+    total, issues_stream = transform_feedback_stream_to_ndjson(
+        io.StringIO(texto), saida, layout=LAYOUT_FEEDBACK_POS_2026_03_25
+    )
+    assert total == payload["total_registros"] == 2
+    assert [json.loads(l) for l in saida.getvalue().splitlines()] == payload["registros"]
+    assert [i.to_dict() for i in issues_stream] == [i.to_dict() for i in issues]
+
+
+def test_reparo_de_aspas_restrito_ao_item_com_falha():
+    bom = json.dumps(_item(1), ensure_ascii=False)
+    quebrado = (
+        '{\n  "feedback": {"sucesso": false},\n  "triagem": {"intimacaoId": "ext-2",\n'
+        '    "prompt": "Texto com "aspas" soltas",\n    "output": "OCULTAR"}\n}'
+    )
+    texto = '{"content": [' + bom + ',\n' + quebrado + ',\n{"feedback": "x", "triagem": {"prompt": "a"b"c"}}]}'
+    resultado = list(iter_feedback_stream_registros(io.StringIO(texto)))
+    assert [r is not None for _, r, _ in resultado] == [True, True, False]
+    assert resultado[1][1]["intimacaoId"] == "ext-2"
+    assert "JSON inválido" in resultado[2][2][0].mensagem
+
+
+def test_rota_stream_ndjson_e_importacao(tmp_path):
+    import app as m
+    from services.sqlite_service import SQLiteService
+
+    svc = SQLiteService(db_path=str(tmp_path / "t.db"))
+    texto = json.dumps({"content": [_item(n) for n in range(30)] + [_item(99, sucesso=None)]}, ensure_ascii=False)
+    m.app.config['TESTING'] = True
+    original = m.data_service
+    m.data_service = svc
+    try:
+        with m.app.test_client() as c:
+            resp = c.post(
+                '/api/intimacoes/transformar-json-feedback-triagem/stream?layout=pos_2026_03_25',
+                data={'arquivo': (io.BytesIO(texto.encode('utf-8-sig')), 'feedback.json')},
+                content_type='multipart/form-data',
+            )
+            linhas = [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+            assert resp.mimetype == 'application/x-ndjson'
+            assert [l['tipo'] for l in linhas].count('registro') == 30
+            assert linhas[-1] == {'tipo': 'resumo', 'total_registros': 30, 'issues_count': 1}
+
+            resp = c.post(
+                '/api/intimacoes/transformar-json-feedback-triagem/stream'
+                '?layout=pos_2026_03_25&destino=importar',
+                data=texto.encode('utf-8'),
+                content_type='application/json',
+            )
+            corpo = resp.get_json()
+            assert corpo['issues_count'] == 1
+            assert corpo['total'] == 30
+            assert corpo['importados'] + corpo['falhas'] == 30
+    finally:
+        m.data_service = original
+
+
+def test_rota_importacao_interrompida_devolve_resumo_parcial(tmp_path, monkeypatch):
+    import app as m
+    import services.importacao_lote_transacional_intimacoes_service as importacao
+    from services.sqlite_service import SQLiteService
+
+    svc = SQLiteService(db_path=str(tmp_path / "t.db"))
+    svc.criar_defensor("Dr. Silva")
+    texto = json.dumps({"content": [_item(n) for n in range(30)] + [_item(3)]}, ensure_ascii=False)
+    truncado = texto[:texto.rindex('"intimacaoId"')]
+    monkeypatch.setattr(m, 'data_service', svc)
+    monkeypatch.setattr(importacao, 'MAX_FALHAS_DETALHADAS_EM_BLOCOS', 0)
+    with m.app.test_client() as c:
+        resp = c.post(
+            '/api/intimacoes/transformar-json-feedback-triagem/stream?layout=pos_2026_03_25&destino=importar',
+            data=truncado.encode('utf-8'),
+            content_type='application/json',
+        )
+        corpo = resp.get_json()
+        assert resp.status_code == 400 and corpo['success'] is False
+        assert 'truncado' in corpo['message']
+        assert corpo['total'] == 30 and corpo['importados'] == svc.get_statistics()['total_intimacoes'] > 0
+        assert 'resultados' not in corpo
+
+        # reenvio completo: os 30 já gravados viram falhas (duplicados), só contadas além do limite
+        resp = c.post(
+            '/api/intimacoes/transformar-json-feedback-triagem/stream?layout=pos_2026_03_25&destino=importar',
+            data=texto.encode('utf-8'),
+            content_type='application/json',
+        )
+        corpo = resp.get_json()
+        assert corpo['success'] and corpo['falhas'] == corpo['falhas_omitidas'] == 31
+        assert corpo['resultados_com_falha'] == []
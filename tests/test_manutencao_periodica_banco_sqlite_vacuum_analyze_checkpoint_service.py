@@ -0,0 +1,155 @@
+"""Manutenção periódica do banco: vacuum incremental, ANALYZE/optimize, checkpoint do WAL e histórico."""
+
+import os
+import sqlite3
+
+import pytest
+
+import services.manutencao_periodica_banco_sqlite_vacuum_analyze_checkpoint_service as manutencao
+from services.manutencao_periodica_banco_sqlite_vacuum_analyze_checkpoint_service import ServicoManutencaoBanco
+from services.sqlite_service import SQLiteService
+from services.troca_segura_arquivo_banco_sqlite_hot_swap_service import TrocaBancoTimeoutError
+
+
+def _popular(svc, n=3000):
+    with svc.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO intimacoes (id, contexto, classificacao_manual, data_criacao) VALUES (?, ?, 'RECURSO', '2026-01-01')",
+            [(f'i{k}', 'c' * 800) for k in range(n)],
+        )
+        conn.commit()
+
+
+@pytest.fixture
+def svc(tmp_path):
+    svc = SQLiteService(db_path=str(tmp_path / 'database.db'))
+    # a conexão de data_version fica aberta, como no app: o WAL não some a cada conexão fechada
+    svc.geracao_dados()
+    return svc
+
+
+def test_banco_novo_em_wal_com_auto_vacuum_incremental(svc):
+    with svc.get_connection() as conn:
+        estado = ServicoManutencaoBanco(svc).medir(conn)
+    assert (estado['journal_mode'], estado['auto_vacuum']) == ('wal', 'incremental')
+
+
+def test_executar_devolve_paginas_livres_e_registra_amostra(svc):
+    _popular(svc)
+    with svc.get_connection() as conn:
+        conn.execute('DELETE FROM intimacoes')
+        conn.commit()
+    servico = ServicoManutencaoBanco(svc)
+    assert servico.manutencao_pendente()
+    tamanho_antes = os.path.getsize(svc.db_path) + os.path.getsize(svc.db_path + '-wal')
+
+    amostra = servico.executar()
+
+    assert amostra['acoes']['paginas_liberadas'] > 500 and amostra['acoes']['analyze'] is True
+    assert amostra['acoes']['checkpoint']['ocupado'] == 0
+    assert amostra['paginas_livres'] == 0 and amostra['fragmentacao_percentual'] == 0.0
+    assert amostra['tamanho_bytes'] + amostra['wal_bytes'] < tamanho_antes / 4
+    with svc.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()[0] == 1
+    assert not servico.manutencao_pendente()
+
+    # ANALYZE recente: a próxima execução só roda PRAGMA optimize
+    assert servico.executar()['acoes'].get('optimize') is True
+    stats = servico.estatisticas()
+    assert [t['paginas_livres'] for t in stats['tendencia']] == [0, 0]
+    assert stats['ultimas_acoes']['optimize'] is True
+
+
+def _banco_sem_auto_vacuum(tmp_path):
+    caminho = str(tmp_path / 'legado.db')
+    with sqlite3.connect(caminho) as conn:
+        conn.execute('CREATE TABLE x (y)')
+    conn.close()
+    return SQLiteService(db_path=caminho)
+
+
+def test_execucao_periodica_nao_converte_banco_legado(tmp_path):
+    svc = _banco_sem_auto_vacuum(tmp_path)
+    servico = ServicoManutencaoBanco(svc)
+    amostra = servico.executar()
+    assert amostra['auto_vacuum'] == 'none'
+    assert 'auto_vacuum' not in amostra['acoes'] and 'paginas_liberadas' not in amostra['acoes']
+    assert servico.estatisticas()['conversao_auto_vacuum_pendente'] is True
+
+
+def test_conversao_pelo_operador_para_auto_vacuum_incremental(tmp_path):
+    svc = _banco_sem_auto_vacuum(tmp_path)
+    _popular(svc, 500)
+    servico = ServicoManutencaoBanco(svc)
+    amostra = servico.converter_auto_vacuum()
+    assert amostra['acoes'] == {'auto_vacuum': 'incremental'}
+    assert amostra['auto_vacuum'] == 'incremental'
+    assert svc.get_statistics()['total_intimacoes'] == 500
+    assert servico.estatisticas()['conversao_auto_vacuum_pendente'] is False
+    # já convertido: nada a fazer
+    assert servico.converter_auto_vacuum()['acoes'] == {}
+
+
+def test_orcamento_esgotado_interrompe_e_ainda_registra(svc):
+    amostra = ServicoManutencaoBanco(svc, orcamento_segundos=0).executar()
+    assert amostra['acoes'] == {'interrompida_no_passo': 'incremental_vacuum'}
+    assert ServicoManutencaoBanco(svc).estatisticas()['ultima_manutencao'] is not None
+
+
+def test_checkpoint_do_wal_so_acima_do_limite(svc):
+    _popular(svc, 200)
+    assert ServicoManutencaoBanco(svc).verificar_wal() is None
+    resultado = ServicoManutencaoBanco(svc, limite_wal_bytes=0).verificar_wal()
+    assert resultado['ocupado'] == 0
+    assert os.path.getsize(svc.db_path + '-wal') == 0
+
+
+def test_rota_stats_inclui_fragmentacao_e_tendencia(svc, monkeypatch):
+    import app as m
+
+    servico = ServicoManutencaoBanco(svc)
+    servico.executar()
+    monkeypatch.setattr(m, 'data_service', svc)
+    monkeypatch.setattr(m, 'manutencao_service', servico)
+    with m.app.test_client() as client:
+        stats = client.get('/api/backup/stats').get_json()['stats']
+    assert stats['intimacoes'] == 0
+    assert stats['manutencao']['auto_vacuum'] == 'incremental'
+    assert len(stats['manutencao']['tendencia']) == 1
+
+
+def test_conversao_com_banco_ocupado_desiste_no_prazo_do_portao(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    import app as m
+
+    svc = _banco_sem_auto_vacuum(tmp_path)
+    servico = ServicoManutencaoBanco(svc)
+    aberta, soltar = threading.Event(), threading.Event()
+
+    def segurar():
+        with svc.get_connection():
+            aberta.set()
+            soltar.wait()
+
+    t = threading.Thread(target=segurar)
+    t.start()
+    aberta.wait()
+    try:
+        inicio = time.monotonic()
+        with pytest.raises(TrocaBancoTimeoutError):
+            servico.converter_auto_vacuum(prazo_portao_segundos=0.2)
+        assert time.monotonic() - inicio < 5
+
+        monkeypatch.setattr(m, 'manutencao_service', servico)
+        monkeypatch.setattr(manutencao, 'PRAZO_PORTAO_CONVERSAO_SEGUNDOS', 0.2)
+        with m.app.test_client() as client:
+            assert client.post('/api/backup/converter-auto-vacuum').status_code == 409
+    finally:
+        soltar.set()
+        t.join()
+
+    with m.app.test_client() as client:
+        resposta = client.post('/api/backup/converter-auto-vacuum').get_json()
+    assert resposta['success'] and resposta['manutencao']['auto_vacuum'] == 'incremental'
@@ -0,0 +1,165 @@
+"""Matriz de confusão agregada no SQL, métricas por classe (NumPy) e relatórios CSV do ExportService."""
+
+import os
+import tempfile
+import uuid
+
+import numpy as np
+import pytest
+
+from services.export_service import ExportService
+from services.matriz_confusao_metricas_classificacao_analises_service import (
+    ROTULO_ERRO_CLASSIFICACAO,
+    ROTULO_SEM_CLASSIFICACAO_MANUAL,
+    contar_sem_classificacao_manual,
+    matrizes_por_grupo,
+    metricas_por_classe,
+    montar_matriz_confusao,
+)
+from services.sqlite_service import SQLiteService
+
+
+def test_matriz_e_metricas_conhecidas():
+    matriz, rotulos = montar_matriz_confusao(
+        [('A', 'A', 8), ('A', 'B', 2), ('B', 'B', 5), ('B', 'A', 5), ('A', None, 1)],
+        ['A', 'B'],
+    )
+    assert rotulos == ['A', 'B', ROTULO_ERRO_CLASSIFICACAO]
+    assert matriz.tolist() == [[8, 2, 1], [5, 5, 0], [0, 0, 0]]
+
+    m = metricas_por_classe(matriz, rotulos)
+    assert m['total'] == 21
+    assert m['acuracia'] == round(13 / 21, 4)
+    classe_a = next(c for c in m['classes'] if c['classe'] == 'A')
+    assert (classe_a['precisao'], classe_a['recall'], classe_a['suporte']) == (round(8 / 13, 4), round(8 / 11, 4), 11)
+    # ERRO_CLASSIFICACAO foi previsto mas não tem suporte: aparece, mas fica fora das médias
+    assert {c['classe'] for c in m['classes']} == {'A', 'B', ROTULO_ERRO_CLASSIFICACAO}
+    assert m['macro']['recall'] == round((8 / 11 + 5 / 10) / 2, 4)
+
+
+def test_matrizes_por_grupo_compartilham_rotulos():
+    grupos = matrizes_por_grupo([('p1', 'A', 'A', 3), ('p2', 'B', 'X', 1)], ['A', 'B'])
+    assert grupos['p1'][1] == grupos['p2'][1] == ['A', 'B', 'X']
+    assert np.array_equal(grupos['p1'][0] + grupos['p2'][0], montar_matriz_confusao(
+        [('A', 'A', 3), ('B', 'X', 1)], ['A', 'B'])[0])
+
+
+def test_metricas_matriz_vazia():
+    matriz, rotulos = montar_matriz_confusao([], ['A'])
+    m = metricas_por_classe(matriz, rotulos)
+    assert (m['total'], m['acuracia'], m['classes'], m['macro']['f1']) == (0, 0.0, [], 0.0)
+
+
+@pytest.fixture()
+def export():
+    with tempfile.TemporaryDirectory() as tmp:
+        data = SQLiteService(db_path=os.path.join(tmp, 'test.db'))
+        data.save_prompt({'id': 'p1', 'nome': 'Prompt 1', 'conteudo': 'x'})
+        data.save_prompt({'id': 'p2', 'nome': 'Prompt 2', 'conteudo': 'x'})
+        intimacoes, analises = [], []
+        for n in range(300):
+            iid = str(uuid.uuid4())
+            manual = 'OCULTAR' if n % 3 else 'URGÊNCIA'
+            ia = 'ERRO: timeout' if n % 10 == 0 else ('OCULTAR' if n % 2 else 'URGÊNCIA')
+            intimacoes.append((iid, 'c', manual))
+            analises.append((
+                str(uuid.uuid4()), iid, 'p1' if n % 2 else 'p2', f'2025-03-{1 + n % 28:02d}T10:00:00',
+                ia == manual, ia, 'gpt-4o' if n % 5 else 'gpt-4o-mini',
+            ))
+        with data.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO intimacoes (id, contexto, classificacao_manual, data_criacao) "
+                "VALUES (?, ?, ?, '2025-01-01')",
+                intimacoes,
+            )
+            conn.executemany(
+                "INSERT INTO analises (id, intimacao_id, prompt_id, data_analise, acertou, resultado_ia, "
+                "modelo, temperatura, tempo_processamento) VALUES (?, ?, ?, ?, ?, ?, ?, 0.0, 1.0)",
+                analises,
+            )
+            conn.commit()
+        svc = ExportService()
+        svc.data_service = data
+        yield svc, analises, intimacoes
+
+
+def test_contagens_sql_batem_com_python(export):
+    svc, analises, intimacoes = export
+    manual = {i[0]: i[2] for i in intimacoes}
+    esperado = {}
+    for a in analises:
+        if a[2] != 'p1':
+            continue
+        ia = ROTULO_ERRO_CLASSIFICACAO if a[5].startswith('ERRO') else a[5]
+        esperado[(manual[a[1]], ia)] = esperado.get((manual[a[1]], ia), 0) + 1
+    linhas = svc.data_service.contar_analises_matriz_confusao(prompt_id='p1')
+    assert {(l['classificacao_manual'], l['resultado_ia']): l['quantidade'] for l in linhas} == esperado
+
+    por_modelo = svc.data_service.contar_analises_matriz_confusao(agrupar_por='modelo')
+    assert {l['grupo'] for l in por_modelo} == {'gpt-4o', 'gpt-4o-mini'}
+    assert sum(l['quantidade'] for l in por_modelo) == 300
+
+
+def test_csv_matriz_agrupada_por_prompt_e_resumo(export):
+    from flask import Flask
+
+    svc, _, _ = export
+    with Flask(__name__).app_context():
+        texto = svc.exportar_matriz_confusao_csv(agrupar_por='prompt').get_data(as_text=True)
+        resumo = svc.exportar_relatorio_resumo_csv(classificacao='URGÊNCIA').get_data(as_text=True)
+    assert '=== MATRIZ DE CONFUSAO - PROMPT: Prompt 1 ===' in texto
+    assert '=== MATRIZ DE CONFUSAO - PROMPT: Prompt 2 ===' in texto
+    assert texto.count('MEDIA_MACRO') == 3
+    assert 'Total de Análises,100' in resumo
+    assert '=== METRICAS POR CLASSE ===' in resumo
+
+
+def test_rota_exportar_matriz_confusao(export):
+    import app as m
+
+    svc, _, _ = export
+    m.app.config['TESTING'] = True
+    original = m.export_service.data_service
+    m.export_service.data_service = svc.data_service
+    try:
+        with m.app.test_client() as c:
+            resp = c.get('/exportar?tipo=matriz_confusao&agrupar_por=modelo')
+            assert resp.status_code == 200
+            assert 'MODELO: gpt-4o-mini' in resp.get_data(as_text=True)
+            assert c.get('/exportar?tipo=matriz_confusao&agrupar_por=x').status_code == 400
+    finally:
+        m.export_service.data_service = original
+
+
+def test_analises_sem_classificacao_manual_ficam_fora_das_metricas(tmp_path):
+    from flask import Flask
+
+    data = SQLiteService(db_path=str(tmp_path / 'test.db'))
+    with data.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO intimacoes (id, contexto, classificacao_manual, data_criacao) VALUES (?, 'c', ?, '2025-01-01')",
+            # i15..i19 não existem: análise sem intimação também não tem classificação manual
+            [(f'i{n}', 'OCULTAR' if n < 10 else '') for n in range(15)],
+        )
+        conn.executemany(
+            "INSERT INTO analises (id, intimacao_id, prompt_id, data_analise, acertou, resultado_ia, modelo, "
+            "temperatura, tempo_processamento) VALUES (?, ?, 'p1', '2025-03-01T10:00:00', ?, 'OCULTAR', 'm', 0.0, 1.0)",
+            [(f'a{n}', f'i{n}', n < 10) for n in range(20)],
+        )
+        conn.commit()
+
+    contagens = [(l['classificacao_manual'], l['resultado_ia'], l['quantidade'])
+                 for l in data.contar_analises_matriz_confusao()]
+    matriz, rotulos = montar_matriz_confusao(contagens, ['OCULTAR', 'URGÊNCIA'])
+    assert ROTULO_SEM_CLASSIFICACAO_MANUAL not in rotulos
+    m = metricas_por_classe(matriz, rotulos, contar_sem_classificacao_manual(contagens))
+    ocultar = next(c for c in m['classes'] if c['classe'] == 'OCULTAR')
+    assert (m['total'], m['acuracia'], ocultar['precisao'], m['sem_classificacao_manual']) == (10, 1.0, 1.0, 10)
+
+    svc = ExportService()
+    svc.data_service = data
+    with Flask(__name__).app_context():
+        for texto in (svc.exportar_matriz_confusao_csv().get_data(as_text=True),
+                      svc.exportar_matriz_confusao_csv(agrupar_por='modelo').get_data(as_text=True)):
+            assert 'ACURACIA,,,1.0,10' in texto
+            assert f'{ROTULO_SEM_CLASSIFICACAO_MANUAL},,,,10' in texto
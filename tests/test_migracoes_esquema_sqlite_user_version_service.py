@@ -0,0 +1,93 @@
+"""Migrações numeradas do esquema (PRAGMA user_version) e instância compartilhada do SQLiteService."""
+
+import sqlite3
+
+import pytest
+
+from services import sqlite_service
+from services.migracoes_esquema_sqlite_user_version_service import (
+    aplicar_migracoes_pendentes,
+    validar_sequencia_migracoes,
+    versao_esquema,
+)
+from services.sqlite_service import SQLiteService, obter_sqlite_service
+
+VERSAO_ATUAL = len(sqlite_service._MIGRACOES_ESQUEMA)
+
+
+def _versao(db):
+    with sqlite3.connect(db) as conn:
+        return versao_esquema(conn)
+
+
+def _colunas(db, tabela):
+    with sqlite3.connect(db) as conn:
+        return {r[1] for r in conn.execute(f'PRAGMA table_info({tabela})')}
+
+
+def test_sequencia_das_migracoes_do_sqlite_service():
+    validar_sequencia_migracoes(sqlite_service._MIGRACOES_ESQUEMA)
+    with pytest.raises(ValueError):
+        validar_sequencia_migracoes([(1, 'a', None), (3, 'b', None)])
+
+
+def test_banco_novo_fica_na_ultima_versao(tmp_path):
+    db = str(tmp_path / 'novo.db')
+    svc = SQLiteService(db_path=db)
+    assert _versao(db) == VERSAO_ATUAL
+    assert {'intimacao_id_externo', 'hash_conteudo', 'observacoes'} <= _colunas(db, 'intimacoes')
+    assert len(svc.get_areas()) == 4
+
+
+def test_banco_legado_sem_versao_recebe_o_esquema_atual(tmp_path):
+    db = str(tmp_path / 'legado.db')
+    with sqlite3.connect(db) as conn:
+        conn.executescript('''
+            CREATE TABLE intimacoes (id TEXT PRIMARY KEY, contexto TEXT NOT NULL,
+                classificacao_manual TEXT NOT NULL, data_criacao TEXT NOT NULL);
+            CREATE TABLE historico_acuracia (id TEXT PRIMARY KEY, prompt_id TEXT NOT NULL,
+                numero_intimacoes INTEGER NOT NULL, temperatura REAL NOT NULL,
+                acuracia REAL NOT NULL, data_analise TEXT NOT NULL);
+            INSERT INTO intimacoes VALUES ('i1', 'ctx', 'OCULTAR', '2024-01-01');
+        ''')
+    SQLiteService(db_path=db)
+    assert _versao(db) == VERSAO_ATUAL
+    assert {'smart_context', 'hash_conteudo', 'regras_usuario_prioridade_alta'} <= _colunas(db, 'intimacoes')
+    assert {'session_id', 'modelo'} <= _colunas(db, 'historico_acuracia')
+    with sqlite3.connect(db) as conn:
+        assert conn.execute('SELECT contexto FROM intimacoes').fetchall() == [('ctx',)]
+
+
+def test_migracoes_nao_rodam_de_novo_no_banco_atualizado(tmp_path):
+    db = str(tmp_path / 'atual.db')
+    SQLiteService(db_path=db)
+    with sqlite3.connect(db) as conn:
+        conn.execute("DELETE FROM areas WHERE id = 'crime'")
+    SQLiteService(db_path=db)
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM areas WHERE id = 'crime'").fetchone()[0] == 0
+
+
+def test_falha_desfaz_a_rodada_inteira(tmp_path):
+    def falhar(conn):
+        raise RuntimeError('falhou')
+
+    migracoes = [
+        (1, 'tabela', lambda conn: conn.execute('CREATE TABLE t (x)')),
+        (2, 'quebrada', falhar),
+    ]
+    conn = sqlite3.connect(str(tmp_path / 'falha.db'))
+    with pytest.raises(RuntimeError):
+        aplicar_migracoes_pendentes(conn, migracoes)
+    assert versao_esquema(conn) == 0
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 't'").fetchone() is None
+
+    assert aplicar_migracoes_pendentes(conn, migracoes[:1]) == [1]
+    assert aplicar_migracoes_pendentes(conn, migracoes[:1]) == []
+    conn.close()
+
+
+def test_instancia_compartilhada_por_arquivo(tmp_path):
+    db = str(tmp_path / 'compartilhado.db')
+    assert obter_sqlite_service(db) is obter_sqlite_service(str(tmp_path / '.' / 'compartilhado.db'))
+    assert obter_sqlite_service(db) is not obter_sqlite_service(str(tmp_path / 'outro.db'))
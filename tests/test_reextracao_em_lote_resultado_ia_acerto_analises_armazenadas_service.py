@@ -0,0 +1,170 @@
+"""Reextração offline de resultado_ia/acertou e recálculo dos agregados dependentes."""
+
+import json
+import os
+import tempfile
+import uuid
+
+import pytest
+
+from services.classificacao_ia_extracao_resposta_texto_para_tipo_canonico_service import (
+    ALIASES_TRIAGEM_IA_PARA_CANONICO,
+)
+from services.reextracao_em_lote_resultado_ia_acerto_analises_armazenadas_service import (
+    ReextracaoAnalisesJob,
+)
+from services.sqlite_service import SQLiteService
+
+ERRO_SILENCIAR = 'ERRO: Classificação não reconhecida - {"triagem": "SILENCIAR"}'
+
+
+@pytest.fixture()
+def svc():
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        yield SQLiteService(db_path=path)
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _popular(svc, n=6, modo='padrao', alvo=None):
+    pid = str(uuid.uuid4())
+    sid = str(uuid.uuid4())
+    svc.save_prompt({'id': pid, 'nome': 'P', 'conteudo': 'x'})
+    svc.criar_sessao_analise(
+        session_id=sid, prompt_id=pid, prompt_nome='P', modelo='m', temperatura=0.0,
+        max_tokens=10, timeout=1, total_intimacoes=n,
+        configuracoes={'calcular_acuracia': True, 'modo_avaliacao': modo},
+    )
+    for _ in range(n):
+        iid = str(uuid.uuid4())
+        svc.save_intimacao({'id': iid, 'contexto': 'c' * 50, 'classificacao_manual': 'OCULTAR'})
+        svc.save_analise({
+            'intimacao_id': iid,
+            'prompt_id': pid,
+            'session_id': sid,
+            'resultado_ia': ERRO_SILENCIAR,
+            'acertou': False,
+            'resposta_completa': '{"triagem": "SILENCIAR"}',
+            'modo_avaliacao': modo,
+            'tipo_alvo_focado': alvo,
+        })
+    svc.finalizar_sessao_analise(sid, {'total_processadas': n, 'acertos': 0, 'erros': n})
+    svc.salvar_historico_acuracia(pid, n, 0.0, 0.0, session_id=sid, modelo='m')
+    svc.update_prompt_statistics(pid)
+    return pid, sid
+
+
+def test_sem_alias_novo_nada_muda(svc):
+    _popular(svc)
+    resumo = ReextracaoAnalisesJob(svc, workers=1, tamanho_lote=2).executar()
+    assert resumo['linhas_lidas'] == 6
+    assert resumo['linhas_alteradas'] == 0
+    assert resumo['status'] == 'concluido'
+
+
+def test_alias_novo_atualiza_linhas_e_agregados(svc, monkeypatch):
+    pid, sid = _popular(svc)
+    monkeypatch.setitem(ALIASES_TRIAGEM_IA_PARA_CANONICO, 'SILENCIAR', 'OCULTAR')
+
+    resumo = ReextracaoAnalisesJob(svc, workers=1, tamanho_lote=4).executar()
+
+    assert resumo['resultado_ia_alterado'] == 6
+    assert resumo['acertou_alterado'] == 6
+    assert resumo['transicoes_resultado_ia'] == {f'{ERRO_SILENCIAR} -> OCULTAR': 6}
+    assert resumo['transicoes_acertou'] == {'False -> True': 6}
+    assert resumo['sessoes_afetadas'] == [sid]
+    assert resumo['agregados']['acuracia_media_prompts'][pid] == {'antes': 0.0, 'depois': 100.0}
+
+    assert {a['resultado_ia'] for a in svc.get_analises_by_prompt(pid)} == {'OCULTAR'}
+    sessao = svc.get_sessao_analise(sid)
+    assert (sessao['acertos'], sessao['erros']) == (6, 0)
+    historico = svc.get_historico_acuracia_prompt(pid)
+    assert historico and historico[0]['acuracia_media'] == 100.0
+
+
+def test_modo_focado_usa_tipo_alvo_da_linha(svc, monkeypatch):
+    pid, _ = _popular(svc, n=2, modo='focado', alvo='RENUNCIAR PRAZO')
+    monkeypatch.setitem(ALIASES_TRIAGEM_IA_PARA_CANONICO, 'SILENCIAR', 'OCULTAR')
+    ReextracaoAnalisesJob(svc, workers=1).executar()
+    # manual != alvo e IA != INDETERMINADO => erro no modo focado
+    assert {bool(a['acertou']) for a in svc.get_analises_by_prompt(pid)} == {False}
+
+
+def test_simular_nao_grava(svc, monkeypatch):
+    pid, _ = _popular(svc, n=3)
+    monkeypatch.setitem(ALIASES_TRIAGEM_IA_PARA_CANONICO, 'SILENCIAR', 'OCULTAR')
+    resumo = ReextracaoAnalisesJob(svc, workers=1, simular=True).executar()
+    assert resumo['linhas_alteradas'] == 3
+    assert {a['resultado_ia'] for a in svc.get_analises_by_prompt(pid)} == {ERRO_SILENCIAR}
+
+
+def test_retoma_do_checkpoint_apos_falha(svc, monkeypatch):
+    pid, _ = _popular(svc, n=6)
+    monkeypatch.setitem(ALIASES_TRIAGEM_IA_PARA_CANONICO, 'SILENCIAR', 'OCULTAR')
+
+    job = ReextracaoAnalisesJob(svc, job_id='job-retomavel', workers=1, tamanho_lote=2)
+    original = job._iterar_lotes
+
+    def falha_no_segundo_lote(ultimo_id):
+        for i, lote in enumerate(original(ultimo_id)):
+            if i == 1:
+                raise RuntimeError('queda simulada')
+            yield lote
+
+    monkeypatch.setattr(job, '_iterar_lotes', falha_no_segundo_lote)
+    with pytest.raises(RuntimeError):
+        job.executar()
+    parcial = [a['resultado_ia'] for a in svc.get_analises_by_prompt(pid)]
+    assert parcial.count('OCULTAR') == 2
+
+    resumo = ReextracaoAnalisesJob(svc, job_id='job-retomavel', workers=1, tamanho_lote=2).executar()
+    assert resumo['linhas_lidas'] == 6
+    assert resumo['resultado_ia_alterado'] == 6
+    assert {a['resultado_ia'] for a in svc.get_analises_by_prompt(pid)} == {'OCULTAR'}
+
+    with svc.get_connection() as conn:
+        row = conn.execute(
+            "SELECT status, resumo FROM reextracao_analises_jobs WHERE job_id = 'job-retomavel'"
+        ).fetchone()
+    assert row['status'] == 'concluido'
+    assert json.loads(row['resumo'])['linhas_alteradas'] == 6
+
+
+def test_pool_de_processos_equivale_ao_serial(svc, monkeypatch):
+    pid, _ = _popular(svc, n=9)
+    monkeypatch.setitem(ALIASES_TRIAGEM_IA_PARA_CANONICO, 'SILENCIAR', 'OCULTAR')
+    resumo = ReextracaoAnalisesJob(svc, workers=2, tamanho_lote=2, simular=True).executar()
+    assert resumo['linhas_lidas'] == 9
+    assert resumo['linhas_alteradas'] == 9
+
+
+def test_simulacao_concluida_nao_bloqueia_execucao_real(svc, monkeypatch):
+    pid, _ = _popular(svc, n=3)
+    monkeypatch.setitem(ALIASES_TRIAGEM_IA_PARA_CANONICO, 'SILENCIAR', 'OCULTAR')
+    simulado = ReextracaoAnalisesJob(svc, job_id='mesmo-id', workers=1, simular=True).executar()
+    real = ReextracaoAnalisesJob(svc, job_id='mesmo-id', workers=1).executar()
+
+    assert simulado['linhas_alteradas'] == real['linhas_alteradas'] == 3
+    assert {a['resultado_ia'] for a in svc.get_analises_by_prompt(pid)} == {'OCULTAR'}
+    with svc.get_connection() as conn:
+        chaves = {r[0] for r in conn.execute('SELECT job_id FROM reextracao_analises_jobs')}
+    assert chaves == {'mesmo-id', 'mesmo-id:simulacao'}
+
+
+def test_checkpoint_guarda_todas_as_transicoes(svc, monkeypatch):
+    pid, sid = _popular(svc, n=1)
+    with svc.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO analises (id, intimacao_id, prompt_id, session_id, data_analise, acertou, resultado_ia, "
+            "resposta_completa, modelo, temperatura, tempo_processamento) "
+            "VALUES (?, 'sem-intimacao', ?, ?, '2025-01-01', 0, ?, '{\"triagem\": \"OCULTAR\"}', 'm', 0, 1)",
+            [(f'extra-{k}', pid, sid, f'ERRO: antigo {k}') for k in range(40)],
+        )
+        conn.commit()
+    resumo = ReextracaoAnalisesJob(svc, workers=1, simular=True).executar()
+    assert len(resumo['transicoes_resultado_ia']) == 40
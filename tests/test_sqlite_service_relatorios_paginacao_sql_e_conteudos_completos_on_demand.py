@@ -152,3 +152,35 @@ def test_relatorios_agregados_e_busca_conteudo_completo_por_id(svc_db_vazio):
     assert conteudo is not None
     assert conteudo["prompt_completo"] == "PROMPT_LONGO"
     assert conteudo["resposta_completa"] == "RESPOSTA_LONGA"
+
+
+def test_agregados_relatorios_numa_passada_filtros_de_data_e_meses(svc_db_vazio):
+    svc = svc_db_vazio
+    pid = str(uuid.uuid4())
+    _seed_prompt(svc, pid, "Prompt A")
+    i_alfa, i_beta = str(uuid.uuid4()), str(uuid.uuid4())
+    _seed_intimacao(svc, i_alfa, "ALFA")
+    _seed_intimacao(svc, i_beta, "BETA")
+    datas = ["2025-%02d-15T10:00:00" % mes for mes in range(1, 9)] + ["2025-08-31T23:59:59"]
+    for n, data in enumerate(datas):
+        _seed_analise(
+            svc, str(uuid.uuid4()), i_alfa if n % 3 else i_beta, pid,
+            data_analise=data, acertou=n % 2 == 0, prompt_completo="p", resposta_completa="r",
+        )
+
+    agg = svc.obter_agregados_relatorios_filtrados()
+    assert agg["total_analises"] == 9
+    assert agg["acertos"] == 5
+    assert agg["distribuicao_manual"] == {"ALFA": 6, "BETA": 3}
+    assert agg["performance_prompts"]["Prompt A"]["total"] == 9
+    assert agg["dados_graficos"]["acuracia_periodo"]["labels"] == [
+        "03/2025", "04/2025", "05/2025", "06/2025", "07/2025", "08/2025",
+    ]
+    assert agg["dados_graficos"]["acuracia_periodo"]["data"][-1] == 50.0
+
+    # data_fim inclui o dia inteiro, mesmo com hora no data_analise
+    agg = svc.obter_agregados_relatorios_filtrados(data_inicio="2025-08-01", data_fim="2025-08-31")
+    assert agg["total_analises"] == 2
+    agg = svc.obter_agregados_relatorios_filtrados(data_fim="2025-02-15", classificacao_manual="BETA")
+    assert agg["total_analises"] == 1
+    assert agg["analises_hoje"] == 0
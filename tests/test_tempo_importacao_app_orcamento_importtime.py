@@ -0,0 +1,56 @@
+"""
+Boot do app sem as dependências pesadas: `import app` num subprocesso não pode carregar NumPy,
+pandas, pyarrow, tiktoken nem os SDKs dos provedores (openai, httpx); todos são importados no
+primeiro uso.
+
+O orçamento de tempo (`python -X importtime`) só roda com ORCAMENTO_IMPORTACAO_APP_MS definido:
+tempo de parede oscila demais em máquinas lentas ou compartilhadas para valer como teste padrão.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ORCAMENTO_IMPORTACAO_APP_MS = os.environ.get('ORCAMENTO_IMPORTACAO_APP_MS')
+MODULOS_FORA_DO_BOOT = ('numpy', 'pandas', 'pyarrow', 'tiktoken', 'openai', 'httpx')
+
+_LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def _modulos_apos_importar_app():
+    saida = subprocess.run(
+        [sys.executable, '-c', 'import json, sys, app; print(json.dumps(sorted(sys.modules)))'],
+        cwd=RAIZ, capture_output=True, text=True, timeout=120, check=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def _medir_importacao_app_ms():
+    """Tempo em ms de `import app` sem o Flask (werkzeug e jinja2 não dependem do projeto)."""
+    saida = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=RAIZ, capture_output=True, text=True, timeout=120, check=True,
+    ).stderr
+    acumulado = {}
+    for linha in saida.splitlines():
+        m = _LINHA_IMPORTTIME.match(linha)
+        if m:
+            acumulado.setdefault(m.group(4), int(m.group(2)))
+    return (acumulado['app'] - acumulado.get('flask', 0)) / 1000
+
+
+def test_boot_sem_dependencias_pesadas():
+    carregados = [m for m in _modulos_apos_importar_app() if m.split('.')[0] in MODULOS_FORA_DO_BOOT]
+    assert not carregados
+
+
+@pytest.mark.skipif(not ORCAMENTO_IMPORTACAO_APP_MS, reason='defina ORCAMENTO_IMPORTACAO_APP_MS para medir o boot')
+def test_boot_dentro_do_orcamento():
+    # Menor de três medições: a primeira pode pagar a compilação dos .pyc e o disco frio
+    tempo_ms = min(_medir_importacao_app_ms() for _ in range(3))
+    assert tempo_ms < float(ORCAMENTO_IMPORTACAO_APP_MS), f'import app levou {tempo_ms:.0f} ms sem o Flask'
@@ -0,0 +1,51 @@
+"""Trava de arquivo entre processos dos agendadores do banco e boot do app sem threads de fundo."""
+import json
+import os
+import subprocess
+import sys
+
+from services.trava_arquivo_exclusiva_entre_processos_agendadores_service import TravaArquivoEntreProcessos
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_so_um_dono_por_vez_e_liberacao(tmp_path):
+    caminho = str(tmp_path / 'sub' / '.agendadores.lock')
+    primeira, segunda = TravaArquivoEntreProcessos(caminho), TravaArquivoEntreProcessos(caminho)
+
+    assert primeira.tentar_adquirir() and primeira.tentar_adquirir()
+    assert not segunda.tentar_adquirir() and not segunda.adquirida
+
+    primeira.liberar()
+    assert segunda.tentar_adquirir()
+    assert open(caminho).read().strip() == str(os.getpid())
+    segunda.liberar()
+
+
+def test_trava_de_outro_processo_impede_e_morre_com_ele(tmp_path):
+    caminho = str(tmp_path / '.agendadores.lock')
+    codigo = (
+        'import sys; from services.trava_arquivo_exclusiva_entre_processos_agendadores_service import '
+        'TravaArquivoEntreProcessos as T; t = T(sys.argv[1]); print(t.tentar_adquirir(), flush=True); sys.stdin.read()'
+    )
+    processo = subprocess.Popen([sys.executable, '-c', codigo, caminho], cwd=RAIZ,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert processo.stdout.readline().strip() == 'True'
+        assert not TravaArquivoEntreProcessos(caminho).tentar_adquirir()
+    finally:
+        processo.communicate(timeout=30)
+    trava = TravaArquivoEntreProcessos(caminho)
+    assert trava.tentar_adquirir()
+    trava.liberar()
+
+
+def test_importar_app_nao_inicia_agendadores():
+    env = {k: v for k, v in os.environ.items() if k != 'AGENDADORES_BANCO'}
+    saida = subprocess.run(
+        [sys.executable, '-c',
+         'import json, threading, app; print(json.dumps([t.name for t in threading.enumerate()]))'],
+        cwd=RAIZ, env=env, capture_output=True, text=True, timeout=120, check=True,
+    ).stdout
+    threads = json.loads(saida.strip().splitlines()[-1])
+    assert 'backup-automatico' not in threads and 'manutencao-banco' not in threads
@@ -0,0 +1,173 @@
+"""
+Equivalência do extrator de campos em passagem única (padrões pré-compilados) com a extração original.
+
+As referências abaixo são as versões anteriores de extract_field, extract_intimados,
+extract_defensor_name e _extract_json_string_field_from_prompt (padrões montados a cada chamada).
+Os prompts aleatórios (semente fixa) misturam rótulos em negrito com variações de caixa, espaços e
+quebras de linha, rótulos sem valor, negritos soltos, listas de intimados e as frases do defensor;
+os prompts de 5 KB a 50 KB no formato do export são os mesmos do benchmark em benchmarks/.
+"""
+import json
+import random
+import re
+
+import pytest
+
+from services.triagem_feedback_transformacao_json_para_importacao_intimacoes_service import (
+    CAMPOS_MARKDOWN_PROMPT,
+    _TRIAGEM_SUCESSO_TEXT_ASSIGN_RE,
+    _decode_json_string_escapes,
+    _inicio_atribuicao_text_triagem_sucesso,
+    _extract_json_string_field_from_prompt,
+    extract_defensor_name,
+    extract_field,
+    extract_intimados,
+    extrair_campos_prompt,
+    normalize_spaces,
+)
+
+
+def _ref_extract_field(prompt, field_names):
+    if not isinstance(prompt, str):
+        return None
+    for field_name in field_names:
+        pattern = (
+            rf"\*\*\s*{re.escape(field_name)}\s*\*\*\s*:\s*(.*?)"
+            rf"(?=\s+-\s+\*\*|\s+##\s+|\s+###\s+|\Z)"
+        )
+        match = re.search(pattern, prompt, flags=re.IGNORECASE)
+        if match:
+            return normalize_spaces(match.group(1))
+    return None
+
+
+def _ref_extract_intimados(prompt):
+    if not isinstance(prompt, str):
+        return None
+    block_match = re.search(
+        r"(?:-\s*)?\*\*\s*Intimados(?:\s+da\s+intimação)?\s*\*\*\s*:\s*"
+        r"(.*?)(?=\s+-\s+\*\*|\s+##\s+|\s+###\s+|\Z)",
+        prompt,
+        flags=re.IGNORECASE | re.DOTALL,
+    )
+    if not block_match:
+        return _ref_extract_field(prompt, ["Intimados da intimação", "Intimados"])
+    nomes = [normalize_spaces(m.group(1)) for m in re.finditer(r"-\s*(.+)", block_match.group(1))]
+    nomes_validos = [nome for nome in nomes if nome]
+    if not nomes_validos:
+        return _ref_extract_field(prompt, ["Intimados da intimação", "Intimados"])
+    return "; ".join(nomes_validos)
+
+
+def _ref_extract_defensor_name(prompt):
+    if not isinstance(prompt, str):
+        return None
+    candidatos = [
+        (r"Você está realizando a triagem para o defensor\s*\(a\)\s*:\s*\*\*(.+?)\*\*", re.IGNORECASE | re.DOTALL),
+        (r"Você está realizando a triagem para o defensor\s*\(a\)\s*:\s*([^\n]+?)\s*(?=\n|\Z)", re.IGNORECASE),
+        (r"Você está realizando a triagem para:\s*\*\*(.+?)\*\*", re.IGNORECASE | re.DOTALL),
+    ]
+    for pattern, flags in candidatos:
+        match = re.search(pattern, prompt, flags=flags)
+        if match:
+            val = normalize_spaces(match.group(1))
+            if val:
+                return val
+    return None
+
+
+def _ref_extract_json(prompt, key):
+    if not isinstance(prompt, str) or not str(key).strip():
+        return None
+    m1 = re.search(rf'"{re.escape(key)}"\s*:\s*"((?:[^"\\]|\\.)*)"', prompt, flags=re.DOTALL)
+    if m1:
+        return _decode_json_string_escapes(m1.group(1))
+    m2 = re.search(
+        rf'\\"{re.escape(key)}\\"\s*:\s*\\"((?:[^\\]|\\.)*?)\\"(?=\s*[,}}])', prompt, flags=re.DOTALL
+    )
+    return _decode_json_string_escapes(m2.group(1)) if m2 else None
+
+
+_ROTULOS = ["Processo", "PROCESSO", "Órgão Julgador", "orgao julgador", "Classe", "Classe Processual",
+            "Dias", "prazo", "Intimados", "Intimados da intimação", "INTIMADOS  DA intimação", "Outro", "nota"]
+_SEPARADORES = [" ", "  ", "\n", "\n\n", " - ", "\n- ", " ## ", "\n### ", "", ": ", "**", " * "]
+_PALAVRAS = ["João Silva", "Maria", "2ª Vara", "0001-22.2024.8.01.0001", "15", "", "réu", "texto", "x:y"]
+
+
+def _prompt_aleatorio(rng):
+    partes = []
+    for _ in range(rng.randint(1, 30)):
+        forma = rng.random()
+        if forma < 0.45:
+            esp = rng.choice(["", " ", "  ", "\n"])
+            partes.append(f"**{esp}{rng.choice(_ROTULOS)}{rng.choice(['', ' '])}**{rng.choice(['', ' ', chr(10)])}:")
+            partes.append(rng.choice(["", " ", "\n"]) + rng.choice(_PALAVRAS))
+        elif forma < 0.6:
+            partes.append("- " + rng.choice(_PALAVRAS))
+        elif forma < 0.7:
+            partes.append(
+                "Você está realizando a triagem para"
+                + rng.choice([": ", " o defensor (a): ", " O DEFENSOR(a) :"])
+                + rng.choice(["**Dr. Fulano**", "Fulano de Tal", "**", "** **", "\n"])
+            )
+        elif forma < 0.8:
+            partes.append(json.dumps({"categoriaDaTriagem": rng.choice(_PALAVRAS)}, ensure_ascii=False))
+        else:
+            partes.append(rng.choice(_PALAVRAS))
+        partes.append(rng.choice(_SEPARADORES))
+    return "".join(partes)
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_passagem_unica_igual_as_funcoes_originais(semente):
+    rng = random.Random(semente)
+    for _ in range(400):
+        prompt = _prompt_aleatorio(rng)
+        esperado = {chave: _ref_extract_field(prompt, list(rotulos)) for chave, rotulos in CAMPOS_MARKDOWN_PROMPT.items()}
+        esperado["intimado"] = _ref_extract_intimados(prompt)
+        esperado["nome_defensor"] = _ref_extract_defensor_name(prompt)
+        assert extrair_campos_prompt(prompt) == esperado, prompt
+
+        assert extract_field(prompt, ["Classe Processual", "Classe"]) == _ref_extract_field(prompt, ["Classe Processual", "Classe"])
+        assert extract_intimados(prompt) == esperado["intimado"]
+        assert extract_defensor_name(prompt) == esperado["nome_defensor"]
+        assert _extract_json_string_field_from_prompt(prompt, "categoriaDaTriagem") == _ref_extract_json(
+            prompt, "categoriaDaTriagem"
+        )
+
+
+@pytest.mark.parametrize("tamanho", [5_000, 20_000, 50_000])
+def test_passagem_unica_igual_as_funcoes_originais_em_prompts_do_export(tamanho):
+    from benchmarks.bench_extracao_campos_prompt_triagem_feedback import gerar_prompt
+
+    rng = random.Random(tamanho)
+    for _ in range(5):
+        prompt = gerar_prompt(tamanho, rng)
+        esperado = {chave: _ref_extract_field(prompt, list(rotulos)) for chave, rotulos in CAMPOS_MARKDOWN_PROMPT.items()}
+        esperado["intimado"] = _ref_extract_intimados(prompt)
+        esperado["nome_defensor"] = _ref_extract_defensor_name(prompt)
+        assert extrair_campos_prompt(prompt) == esperado
+    assert esperado["nome_defensor"] == "Dr. Fulano" and esperado["intimado"] == "João Silva; Maria Souza"
+
+
+def test_corte_text_triagem_sucesso_igual_a_busca_original():
+    rng = random.Random(7)
+    frases = ["Triagem IA executada com sucesso para intimação", "triagem ia EXECUTADA com sucesso para intimação", "Triagem"]
+
+    def _pedaco():
+        if rng.random() < 0.5:
+            return rng.choice(["x", "\n", "======", "'", "= "])
+        return (
+            rng.choice(["text", "TeXt", "tex", "context", ""]) + rng.choice(["", " ", "\n "])
+            + rng.choice(["=", "==", ""]) + rng.choice(["", "  "]) + rng.choice(["'", '"', ""]) + rng.choice(frases)
+        )
+
+    for _ in range(3000):
+        texto = "".join(_pedaco() for _ in range(rng.randint(0, 8)))
+        m = _TRIAGEM_SUCESSO_TEXT_ASSIGN_RE.search(texto)
+        assert _inicio_atribuicao_text_triagem_sucesso(texto) == (m.start() if m else None), texto
+
+
+def test_prompt_ausente_ou_nao_texto():
+    assert extrair_campos_prompt(None) == dict.fromkeys(list(CAMPOS_MARKDOWN_PROMPT) + ["intimado", "nome_defensor"])
+    assert extrair_campos_prompt(123)["processo"] is None
@@ -0,0 +1,85 @@
+"""run_batch paralelo: arquivos e itens de arquivos grandes no pool, saída idêntica ao modo sequencial."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.triagem_feedback_transformacao_json_para_importacao_intimacoes_service import (
+    LAYOUT_FEEDBACK_POS_2026_03_25,
+    _blocos_itens,
+    _resultados_blocos_em_ordem,
+    run_batch,
+)
+
+
+def _item(n):
+    return {
+        "feedback": {"sucesso": n % 7 != 0 if n % 11 else "talvez"},
+        "triagem": {
+            "intimacaoId": f"ext-{n}",
+            "status": "CONCLUIDO",
+            "numeroProcesso": f"{n:07d}-99.2024.8.01.0001",
+            "orgaoJulgador": "1ª Vara Cível",
+            "classe": "Apelação",
+            "intimados": ["Fulano"],
+            "prazo": 15,
+            "nomeDefensor": "Dr. Silva" if n % 5 else "",
+            "contexto": f"Contexto {n} " + "x" * 50,
+            "triagemResultado": "ELABORAR_PECA",
+            "prompt": "",
+        },
+    }
+
+
+@pytest.fixture()
+def entrada(tmp_path):
+    pasta = tmp_path / "entrada"
+    pasta.mkdir()
+    for arquivo, quantidade in (("a.json", 5), ("b.json", 120), ("c.json", 3)):
+        inicio = len(list(pasta.iterdir())) * 1000
+        doc = {"content": [_item(inicio + n) for n in range(quantidade)]}
+        (pasta / arquivo).write_text(json.dumps(doc, ensure_ascii=False), encoding="utf-8")
+    (pasta / "d.json").write_text('{"content": 5}', encoding="utf-8")
+    return pasta
+
+
+@pytest.mark.parametrize("ndjson", [False, True])
+def test_paralelo_gera_mesma_saida_e_relatorio_que_sequencial(entrada, tmp_path, capsys, ndjson):
+    sequencial, paralelo = tmp_path / "seq", tmp_path / "par"
+    run_batch(entrada, sequencial, layout=LAYOUT_FEEDBACK_POS_2026_03_25, ndjson=ndjson)
+    relatorio_seq = capsys.readouterr().out
+    # b.json passa do limiar e tem os itens divididos em blocos de 25 entre os workers
+    run_batch(
+        entrada, paralelo, layout=LAYOUT_FEEDBACK_POS_2026_03_25, ndjson=ndjson,
+        workers=3, limiar_arquivo_grande=2000, itens_por_tarefa=25,
+    )
+    relatorio_par = capsys.readouterr().out
+
+    assert sorted(p.name for p in paralelo.iterdir()) == sorted(p.name for p in sequencial.iterdir())
+    for arquivo in sequencial.iterdir():
+        assert (paralelo / arquivo.name).read_bytes() == arquivo.read_bytes()
+    assert relatorio_par.replace(str(paralelo), "") == relatorio_seq.replace(str(sequencial), "")
+    assert "[ERRO] Falha ao processar d.json" in relatorio_par
+    assert "registros: 109" in relatorio_par
+
+
+def test_blocos_em_voo_limitados_e_em_ordem(entrada):
+    submetidos = []
+
+    class Pool(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            submetidos.append(args[1][0][0])
+            return super().submit(*args, **kwargs)
+
+    with Pool(max_workers=2) as executor:
+        consumidos = 0
+        for bloco in _resultados_blocos_em_ordem(
+            executor, _blocos_itens(entrada / "b.json", 10), LAYOUT_FEEDBACK_POS_2026_03_25, max_em_voo=4,
+        ):
+            consumidos += 1
+            # o arquivo é lido sob demanda: nunca mais de 4 blocos à frente do consumidor
+            assert len(submetidos) - consumidos < 4
+
+    assert consumidos == len(submetidos) == 12
+    assert submetidos == list(range(1, 121, 10))
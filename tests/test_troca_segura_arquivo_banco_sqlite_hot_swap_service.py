@@ -0,0 +1,171 @@
+"""Troca do arquivo do banco sem reiniciar: validação, migração, quiescência e reabertura."""
+
+import json
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from services.sqlite_service import _MIGRACOES_ESQUEMA, SQLiteService
+from services.troca_segura_arquivo_banco_sqlite_hot_swap_service import (
+    BancoInvalidoError,
+    TrocaBancoTimeoutError,
+    caminho_temporario_ao_lado,
+    restaurar_banco_com_troca_segura,
+    verificar_integridade_banco,
+)
+
+
+@pytest.fixture
+def svc(tmp_path):
+    svc = SQLiteService(db_path=str(tmp_path / 'database.db'))
+    svc.save_prompt({'id': 'atual', 'nome': 'Prompt atual', 'conteudo': 'x'})
+    return svc
+
+
+def _enviado(svc, origem):
+    """Copia `origem` para um temporário ao lado do banco, como as rotas fazem com o upload."""
+    destino = caminho_temporario_ao_lado(svc.db_path)
+    with open(origem, 'rb') as entrada, open(destino, 'wb') as saida:
+        saida.write(entrada.read())
+    return destino
+
+
+def _banco_antigo(caminho, n_prompts=3):
+    """Banco na versão 4 do esquema (antes de fatos_diarios), como o de uma instalação anterior."""
+    SQLiteService(db_path=caminho)
+    with sqlite3.connect(caminho) as conn:
+        for (gatilho,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            conn.execute(f'DROP TRIGGER {gatilho}')
+        conn.execute('DROP TABLE fatos_diarios')
+        conn.execute('PRAGMA user_version = 4')
+        conn.executemany("INSERT INTO prompts (id, nome, conteudo, data_criacao) VALUES (?, ?, 'y', '2025-01-01')",
+                         [(f'p{k}', f'Prompt {k}') for k in range(n_prompts)])
+    conn.close()
+    return caminho
+
+
+def test_troca_migra_o_enviado_e_reabre_sem_reiniciar(svc, tmp_path):
+    assert svc.get_statistics()['total_prompts'] == 1
+    enviado = _enviado(svc, _banco_antigo(str(tmp_path / 'antigo.db')))
+    etapas = []
+
+    resultado = restaurar_banco_com_troca_segura(
+        svc, enviado, criar_backup=lambda: {'arquivo': 'b.zip'}, emitir=lambda e: etapas.append(e['etapa']))
+
+    assert resultado['backup'] == {'arquivo': 'b.zip'}
+    assert resultado['versao_esquema'] == len(_MIGRACOES_ESQUEMA)
+    assert etapas[-1] == 'trocando_arquivo' and 'migrando_esquema' in etapas
+    assert not os.path.exists(enviado)
+    # cache de consultas descartado e esquema atual (fatos_diarios, eventos) no banco novo
+    assert svc.get_statistics()['total_prompts'] == 3
+    assert {p['id'] for p in svc.get_all_prompts()} == {'p0', 'p1', 'p2'}
+    with svc.get_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM fatos_diarios').fetchone()[0] == 0
+    # outra instância do mesmo arquivo também larga o cache do arquivo antigo
+    assert SQLiteService(db_path=svc.db_path).get_statistics()['total_prompts'] == 3
+
+
+@pytest.mark.parametrize('conteudo, mensagem', [
+    (b'isto nao e um banco' * 100, 'não é um banco SQLite'),
+    (None, 'Tabelas ausentes: intimacoes, analises'),
+])
+def test_enviado_invalido_nao_toca_no_banco_atual(svc, tmp_path, conteudo, mensagem):
+    origem = tmp_path / 'enviado.db'
+    if conteudo is None:
+        with sqlite3.connect(origem) as conn:
+            conn.execute('CREATE TABLE prompts (id TEXT)')
+        conn.close()
+    else:
+        origem.write_bytes(conteudo)
+    enviado = _enviado(svc, str(origem))
+    backups = []
+
+    with pytest.raises(BancoInvalidoError, match=mensagem):
+        restaurar_banco_com_troca_segura(svc, enviado, criar_backup=lambda: backups.append(1))
+
+    assert backups == [] and not os.path.exists(enviado)
+    assert [p['id'] for p in svc.get_all_prompts()] == ['atual']
+
+
+def test_quick_check_emite_progresso(tmp_path):
+    caminho = _banco_antigo(str(tmp_path / 'grande.db'), n_prompts=20000)
+    eventos = []
+    verificar_integridade_banco(caminho, eventos.append, intervalo_segundos=0)
+    assert eventos and all(e['etapa'] == 'verificando_integridade' and e['paginas'] > 0 for e in eventos)
+
+
+def test_escritas_durante_a_troca_terminam_inteiras(svc, tmp_path):
+    enviado = _enviado(svc, _banco_antigo(str(tmp_path / 'antigo.db')))
+    parar = threading.Event()
+    gravados, erros = [], []
+
+    def escrever():
+        k = 0
+        while not parar.is_set():
+            try:
+                svc.save_prompt({'id': f'w{k}', 'nome': 'w', 'conteudo': 'w'})
+                gravados.append(f'w{k}')
+            except Exception as e:  # pragma: no cover - falha do teste
+                erros.append(e)
+            k += 1
+
+    escritores = [threading.Thread(target=escrever) for _ in range(2)]
+    for t in escritores:
+        t.start()
+    try:
+        restaurar_banco_com_troca_segura(svc, enviado)
+    finally:
+        parar.set()
+        for t in escritores:
+            t.join()
+
+    assert erros == []
+    with sqlite3.connect(svc.db_path) as conn:
+        assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+        ids = {linha[0] for linha in conn.execute('SELECT id FROM prompts')}
+    assert {'p0', 'p1', 'p2'} <= ids and 'atual' not in ids
+    # nada gravado pela metade: no banco novo só entram escritas que o escritor viu concluir
+    assert ids - {'p0', 'p1', 'p2'} <= set(gravados)
+
+
+def test_conexao_presa_estoura_o_prazo_e_mantem_o_banco(svc, tmp_path):
+    enviado = _enviado(svc, _banco_antigo(str(tmp_path / 'antigo.db')))
+    aberta, soltar = threading.Event(), threading.Event()
+
+    def segurar():
+        with svc.get_connection():
+            aberta.set()
+            soltar.wait()
+
+    t = threading.Thread(target=segurar)
+    t.start()
+    aberta.wait()
+    try:
+        with pytest.raises(TrocaBancoTimeoutError):
+            restaurar_banco_com_troca_segura(svc, enviado, prazo_segundos=0.2)
+    finally:
+        soltar.set()
+        t.join()
+    assert [p['id'] for p in svc.get_all_prompts()] == ['atual']
+
+
+def test_rota_restaurar_transmite_as_etapas(svc, tmp_path, monkeypatch):
+    import app as m
+    from services.backup_online_banco_sqlite_compactado_retencao_service import ServicoBackupBanco
+
+    monkeypatch.setattr(m, 'data_service', svc)
+    monkeypatch.setattr(m, 'backup_service', ServicoBackupBanco(svc.db_path, lambda: {'compressao_backup': 'zip'}))
+    origem = _banco_antigo(str(tmp_path / 'antigo.db'))
+    with m.app.test_client() as client, open(origem, 'rb') as f:
+        resposta = client.post('/api/backup/restaurar?progresso=1',
+                               data={'backup_file': (f, 'antigo.db')},
+                               content_type='multipart/form-data')
+        eventos = [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+
+    assert resposta.mimetype == 'application/x-ndjson'
+    assert eventos[-1]['etapa'] == 'concluido' and eventos[-1]['success'], eventos[-1]
+    assert eventos[-1]['backup'].startswith('database_backup_antes_restauracao_')
+    assert {p['id'] for p in svc.get_all_prompts()} == {'p0', 'p1', 'p2'}
+    assert not [nome for nome in os.listdir(tmp_path) if nome.startswith('.troca-')]